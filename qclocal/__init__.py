@@ -0,0 +1,33 @@
+'''Local backtesting for the QuantConnect algorithms in this repository.
+
+    from qclocal import BacktestEngine, LocalDataSource, load_algorithm
+    result = BacktestEngine(LocalDataSource('data/daily')).run(load_algorithm('25.py'))
+    print(result.summary())
+'''
+
+from .algorithm import QCAlgorithm
+from .data import BarFrame, BarSeries, DataSource, LocalDataSource
+from .engine import BacktestEngine, BacktestResult, run_algorithm
+from .enums import Resolution
+from .loader import load_algorithm
+from .store import BarStore
+from .streaming import StreamingBacktestEngine
+from .symbol import Symbol
+from .synthetic import SyntheticDataSource
+
+__all__ = [
+    'BacktestEngine',
+    'BacktestResult',
+    'BarFrame',
+    'BarSeries',
+    'BarStore',
+    'DataSource',
+    'LocalDataSource',
+    'QCAlgorithm',
+    'Resolution',
+    'StreamingBacktestEngine',
+    'Symbol',
+    'SyntheticDataSource',
+    'load_algorithm',
+    'run_algorithm',
+]
@@ -0,0 +1,291 @@
+'''Command line entry point: python -m qclocal <command> ...'''
+
+import argparse
+import sys
+
+from .batch import format_comparison, load_variants, run_batch
+from .checkpoint import CheckpointSchedule, resume_backtest
+from .data import LocalDataSource
+from .engine import BacktestEngine
+from .fills import ConstantSlippageModel, VolumeParticipationModel
+from .history import HistoryCache
+from .enums import MovingAverageType, Resolution, resolution_to_timedelta
+from .live import run_live, serve_algorithm
+from .loader import load_algorithm
+from .profiling import StageProfiler
+from .robustness import RobustnessSettings, run_robustness
+from .statistics import format_contributions
+from .store import BarStore
+from .streaming import StreamingBacktestEngine
+from .strategy import parameters_from_algorithm
+from .sweep import describe, parameter_grid, run_sweep
+from .synthetic import SyntheticDataSource
+from .turnover import compare_bands, format_savings
+
+
+def _resolution(value):
+    return Resolution[value.capitalize()]
+
+
+def _downsample(value):
+    '''(every, period): a step count, or a resolution whose periods keep their last step'''
+    if value.isdigit():
+        return int(value), None
+    return None, resolution_to_timedelta(_resolution(value))
+
+
+def add_checkpoint_arguments(parser):
+    parser.add_argument('--checkpoint', metavar='PATH', help='write the state of the run to PATH as it goes')
+    parser.add_argument('--checkpoint-every', type=_downsample, default=(1000, None), metavar='N|RESOLUTION',
+                        help='checkpoint every N steps (default 1000), or at the start of each hour/daily period')
+    parser.add_argument('--resume', metavar='PATH', help='continue the run saved in checkpoint PATH')
+
+
+def checkpoints_from_args(args):
+    return CheckpointSchedule(args.checkpoint, *args.checkpoint_every) if args.checkpoint else None
+
+
+def data_source_from_args(args):
+    if args.store:
+        source = BarStore(args.store)
+    elif args.data:
+        source = LocalDataSource(args.data, args.resolution)
+    else:
+        source = SyntheticDataSource(resolution=args.resolution, seed=args.seed)
+    if args.history_cache:
+        source = HistoryCache(source, args.history_cache, args.history_cache_mb * 2 ** 20)
+    return source
+
+
+def add_data_arguments(parser):
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('--data', help='directory with one <TICKER>.csv/.parquet per symbol')
+    group.add_argument('--store', help='bar store directory written by the ingest command')
+    group.add_argument('--synthetic', action='store_true', help='use generated prices (default without --data)')
+    parser.add_argument('--resolution', type=_resolution, default=Resolution.Daily, help='resolution of the data files')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the synthetic prices')
+    parser.add_argument('--history-cache', metavar='DIR', help='keep warm-up history in DIR across runs')
+    parser.add_argument('--history-cache-mb', type=int, default=512, help='size limit of the history cache')
+
+
+def backtest(args):
+    algorithm = load_algorithm(args.algorithm)
+    source = data_source_from_args(args)
+    slippage = ConstantSlippageModel(args.slippage) if args.slippage else None
+    volume = VolumeParticipationModel(args.participation) if args.participation else None
+    profiler = StageProfiler(args.profile_allocations) if args.profile or args.profile_allocations else None
+    checkpoints = checkpoints_from_args(args)
+    if args.resume:
+        # the engine settings are those of the run the checkpoint was written by
+        result = resume_backtest(args.resume, source, profiler, checkpoints)
+    elif args.chunk_rows:
+        engine = StreamingBacktestEngine(source, args.chunk_rows, not args.no_read_ahead, slippage_model=slippage,
+                                         volume_model=volume, profiler=profiler, record_positions=args.positions)
+        result = engine.run(algorithm, checkpoints)
+    else:
+        result = BacktestEngine(source, slippage_model=slippage, volume_model=volume, profiler=profiler,
+                                record_positions=args.positions).run(algorithm, checkpoints)
+    print(result.summary())
+    if args.chunk_rows and not args.resume:
+        print('streamed {} chunks of up to {} rows, {:.3f}s waiting for reads'.format(
+            engine.chunks, engine.chunk_rows, engine.io_wait))
+    if checkpoints is not None:
+        print('wrote {} checkpoints to {}'.format(checkpoints.written, checkpoints.path))
+    if args.contributions:
+        print(format_contributions(result.contributions, args.contributions))
+    if args.equity:
+        every, period = args.downsample
+        result.store.write(args.equity, every, period)
+        print('wrote {} ({} of {} steps)'.format(args.equity, len(result.store.sample(every, period)),
+                                                 result.store.rows))
+    if profiler is not None:
+        print(profiler.format())
+        if args.profile:
+            profiler.write_json(args.profile + '.json')
+            profiler.write_collapsed(args.profile + '.collapsed')
+            print('wrote {0}.json and {0}.collapsed'.format(args.profile))
+    if isinstance(source, HistoryCache):
+        print(source.summary())
+    if args.indicator_report:
+        print(result.algorithm.IndicatorRegistry.report())
+
+
+def batch(args):
+    variants = load_variants(args.config)
+    print('{} variants'.format(len(variants)))
+
+    def progress(name, parameters, statistics):
+        print('finished {:<30} {} {:.3f}'.format(name, 'Sharpe Ratio', statistics['Sharpe Ratio']))
+
+    results = run_batch(variants, data_source_from_args(args), args.workers, None if args.quiet else progress)
+    print(format_comparison(results))
+
+
+def robustness(args):
+    variants = [parameters_from_algorithm(load_algorithm(path)) for path in args.algorithms]
+    settings = RobustnessSettings(args.replicas, args.block, args.keep, args.jitter, not args.no_bootstrap,
+                                  args.replica_seed, args.confidence)
+
+    def progress(done, total):
+        if done % 50 == 0 or done == total:
+            print('{} of {} replicas'.format(done, total), flush=True)
+
+    result = run_robustness(variants, data_source_from_args(args), settings, args.workers,
+                            None if args.quiet else progress)
+    print(result.format(args.algorithms))
+
+
+def _address(value):
+    host, _, port = value.rpartition(':')
+    return host or '127.0.0.1', int(port)
+
+
+def live(args):
+    checkpoints = checkpoints_from_args(args)
+    session = run_live(load_algorithm(args.algorithm), data_source_from_args(args), args.speed,
+                       args.connect or args.socket, checkpoints=checkpoints, resume=args.resume)
+    print(session.result.summary())
+    print(session.summary())
+
+
+def serve(args):
+    print('serving the replay of {} on {}:{}'.format(args.algorithm, args.host, args.port))
+    serve_algorithm(load_algorithm(args.algorithm), data_source_from_args(args), args.port, args.speed, args.host)
+
+
+def turnover(args):
+    print(format_savings(compare_bands(load_algorithm(args.algorithm), data_source_from_args(args), args.band)))
+
+
+def ingest(args):
+    store = BarStore(args.target, args.resolution)
+    symbols = args.symbols
+    if args.algorithm:
+        symbols = (symbols or []) + list(parameters_from_algorithm(load_algorithm(args.algorithm)).symbols)
+    appended = store.ingest(data_source_from_args(args), symbols, args.start, args.end)
+    print('appended {} bars to {} symbols'.format(sum(appended.values()), sum(1 for n in appended.values() if n)))
+    print(store.summary())
+
+
+def _list(convert):
+    return lambda value: [convert(item) for item in value.split(',') if item]
+
+
+def _moving_average_type(value):
+    return MovingAverageType[next(name for name in MovingAverageType.__members__ if name.lower() == value.lower())]
+
+
+def sweep(args):
+    base = parameters_from_algorithm(load_algorithm(args.algorithm))
+    runs = list(parameter_grid(base, fast=args.fast, slow=args.slow, signal=args.signal,
+                               moving_average_type=args.ma, risk_threshold=args.risk))
+    print('{} combinations over {} symbols'.format(len(runs), len(base.symbols)))
+
+    def progress(table, parameters, statistics, rank):
+        print('[{}/{}] {:<40} {} {:.3f}  rank {}'.format(len(table), len(runs), describe(parameters),
+                                                         table.rank_by, statistics[table.rank_by], rank))
+
+    table = run_sweep(runs, data_source_from_args(args), args.workers, args.rank_by,
+                      None if args.quiet else progress)
+    print(table.format(args.top))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m qclocal')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run = commands.add_parser('backtest', help='backtest an algorithm file')
+    run.add_argument('algorithm', help='path of the algorithm file, e.g. 25.py')
+    run.add_argument('--indicator-report', action='store_true', help='print how many indicators were shared')
+    run.add_argument('--slippage', type=float, help='constant slippage, a fraction of the price per share')
+    run.add_argument('--participation', type=float, help='largest fraction of a bar\'s volume one order may fill')
+    run.add_argument('--profile', metavar='PREFIX', help='time the pipeline stages; write PREFIX.json and '
+                     'PREFIX.collapsed (collapsed stacks for flame graphs)')
+    run.add_argument('--profile-allocations', action='store_true', help='also trace allocations per stage (slow)')
+    run.add_argument('--contributions', type=int, metavar='N', help='print the N best and worst contributing symbols')
+    run.add_argument('--equity', metavar='PATH', help='write the equity curve to PATH (.npz)')
+    run.add_argument('--downsample', type=_downsample, default=(None, None), metavar='N|RESOLUTION',
+                     help='write every N-th step, or the last step of each hour/daily period')
+    run.add_argument('--positions', action='store_true', help='also record and write the holdings at each step')
+    run.add_argument('--chunk-rows', type=int, metavar='N', help='stream the bars in chunks of N rows instead of '
+                     'loading the whole window')
+    run.add_argument('--no-read-ahead', action='store_true', help='with --chunk-rows, read each chunk only when '
+                     'it is needed')
+    add_checkpoint_arguments(run)
+    add_data_arguments(run)
+    run.set_defaults(handler=backtest)
+
+    grid = commands.add_parser('sweep', help='run the MACD strategy of an algorithm file over a parameter grid')
+    grid.add_argument('algorithm', help='algorithm file providing the universe, dates and default parameters')
+    grid.add_argument('--fast', type=_list(int), help='comma separated fast periods')
+    grid.add_argument('--slow', type=_list(int), help='comma separated slow periods')
+    grid.add_argument('--signal', type=_list(int), help='comma separated signal periods')
+    grid.add_argument('--ma', type=_list(_moving_average_type), help='comma separated moving average types')
+    grid.add_argument('--risk', type=_list(float), help='comma separated MaximumUnrealizedProfitPercentPerSecurity thresholds')
+    grid.add_argument('--workers', type=int, help='worker processes (default: CPU count)')
+    grid.add_argument('--rank-by', default='Sharpe Ratio', help='statistic to rank by')
+    grid.add_argument('--top', type=int, default=20, help='rows of the final table')
+    grid.add_argument('--quiet', action='store_true', help='only print the final table')
+    add_data_arguments(grid)
+    grid.set_defaults(handler=sweep)
+
+    paper = commands.add_parser('live', help='paper-trade an algorithm on a replayed bar feed')
+    paper.add_argument('algorithm', help='path of the algorithm file')
+    paper.add_argument('--speed', type=float, help='replay at this multiple of real time (default: flat out)')
+    paper.add_argument('--socket', action='store_true', help='send the replay through a local TCP socket')
+    paper.add_argument('--connect', type=_address, metavar='HOST:PORT', help='read bars from an external feed instead')
+    add_checkpoint_arguments(paper)
+    add_data_arguments(paper)
+    paper.set_defaults(handler=live)
+
+    feed = commands.add_parser('serve', help='serve the bar replay of an algorithm over TCP for live --connect')
+    feed.add_argument('algorithm', help='algorithm file providing the universe and dates')
+    feed.add_argument('--host', default='127.0.0.1')
+    feed.add_argument('--port', type=int, default=9870)
+    feed.add_argument('--speed', type=float, help='replay at this multiple of real time (default: flat out)')
+    add_data_arguments(feed)
+    feed.set_defaults(handler=serve)
+
+    bands = commands.add_parser('turnover', help='orders and turnover saved by banded equal weighting')
+    bands.add_argument('algorithm', help='algorithm file using EqualWeightingPortfolioConstructionModel')
+    bands.add_argument('--band', type=_list(float), default=[0.005, 0.01, 0.02],
+                       help='comma separated drift bands, fractions of the portfolio value')
+    add_data_arguments(bands)
+    bands.set_defaults(handler=turnover)
+
+    many = commands.add_parser('batch', help='run the strategy variants of a batch file side by side')
+    many.add_argument('config', help='JSON batch file, e.g. variants.json')
+    many.add_argument('--workers', type=int, help='worker processes (default: CPU count)')
+    many.add_argument('--quiet', action='store_true', help='only print the final table')
+    add_data_arguments(many)
+    many.set_defaults(handler=batch)
+
+    robust = commands.add_parser('robustness', help='confidence intervals of the strategy over bootstrap replicas')
+    robust.add_argument('algorithms', nargs='+', help='algorithm files to compare, e.g. 25.py 22.py Final26.py')
+    robust.add_argument('--replicas', type=int, default=1000)
+    robust.add_argument('--block', type=int, default=20, help='bootstrap block length in bars')
+    robust.add_argument('--keep', type=float, default=0.8, help='fraction of each universe kept per replica')
+    robust.add_argument('--jitter', type=int, default=30, help='largest start date shift in days')
+    robust.add_argument('--no-bootstrap', action='store_true', help='perturb universe and dates on the actual prices')
+    robust.add_argument('--replica-seed', type=int, default=0, help='seed of the replicas\' random draws')
+    robust.add_argument('--confidence', type=float, default=0.95)
+    robust.add_argument('--workers', type=int, help='worker processes (default: CPU count)')
+    robust.add_argument('--quiet', action='store_true', help='only print the intervals')
+    add_data_arguments(robust)
+    robust.set_defaults(handler=robustness)
+
+    load = commands.add_parser('ingest', help='append bars to a memory-mapped bar store')
+    load.add_argument('target', help='bar store directory, created if missing')
+    load.add_argument('--symbols', type=_list(str), help='comma separated tickers (default: those already stored)')
+    load.add_argument('--algorithm', help='also ingest the universe of this algorithm file')
+    load.add_argument('--start', help='first date for tickers new to the store')
+    load.add_argument('--end', help='last date to ingest')
+    add_data_arguments(load)
+    load.set_defaults(handler=ingest)
+
+    args = parser.parse_args(argv)
+    args.handler(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,353 @@
+'''QCAlgorithm shim exposing the part of the LEAN API the algorithm files use.'''
+
+import math
+from datetime import datetime
+
+import numpy as np
+
+from .consolidators import DataConsolidator, IdentityDataConsolidator, TradeBar, TradeBarConsolidator
+from .enums import MovingAverageType, Resolution, resolution_to_timedelta
+from .framework.alpha import CompositeAlphaModel, NullAlphaModel
+from .framework.execution import ImmediateExecutionModel
+from .framework.insight import InsightCollection
+from .framework.portfolio import NullPortfolioConstructionModel, PortfolioTarget
+from .framework.risk import NullRiskManagementModel
+from .indicators import (BollingerBands, DoubleExponentialMovingAverage, ExponentialMovingAverage, HullMovingAverage,
+                         IchimokuKinkoHyo, IntradayVwap, KaufmanAdaptiveMovingAverage, MovingAverageConvergenceDivergence,
+                         RelativeStrengthIndex, SimpleMovingAverage, Stochastic, TradeBarIndicator,
+                         VolumeWeightedAveragePriceIndicator)
+from .registry import IndicatorRegistry
+from .securities import SecurityManager, SecurityPortfolioManager
+from .symbol import Symbol
+
+_RESOLUTION_NAMES = {
+    Resolution.Tick: 'tick',
+    Resolution.Second: 'sec',
+    Resolution.Minute: 'min',
+    Resolution.Hour: 'hr',
+    Resolution.Daily: 'day',
+}
+
+
+class AlgorithmSettings:
+    def __init__(self):
+        self.FreePortfolioValuePercentage = 0.0025
+
+
+class UniverseSettings:
+    def __init__(self):
+        self.Resolution = None
+
+
+class SubscriptionManager:
+    '''Keeps the consolidators registered per symbol'''
+
+    def __init__(self):
+        self._consolidators = {}
+        self.version = 0
+
+    def AddConsolidator(self, symbol, consolidator):
+        consolidators = self._consolidators.setdefault(symbol, [])
+        if consolidator not in consolidators:
+            consolidators.append(consolidator)
+            self.version += 1
+
+    def RemoveConsolidator(self, symbol, consolidator):
+        consolidators = self._consolidators.get(symbol)
+        if consolidators and consolidator in consolidators:
+            consolidators.remove(consolidator)
+            self.version += 1
+            if not consolidators:
+                del self._consolidators[symbol]
+
+    def consolidators(self, symbol):
+        return self._consolidators.get(symbol, ())
+
+    def items(self):
+        return self._consolidators.items()
+
+
+def _as_datetime(year, month, day):
+    if isinstance(year, datetime):
+        return year
+    return datetime(year, month, day)
+
+
+class QCAlgorithm:
+    '''Base class of local algorithms. Subclasses override Initialize and OnData exactly
+    as on QuantConnect; the BacktestEngine drives the framework models each bar.'''
+
+    def __init__(self):
+        self.Securities = SecurityManager()
+        self.Portfolio = SecurityPortfolioManager(self.Securities)
+        self.Insights = InsightCollection()
+        self.Settings = AlgorithmSettings()
+        self.UniverseSettings = UniverseSettings()
+        self.SubscriptionManager = SubscriptionManager()
+        self.IndicatorRegistry = IndicatorRegistry(self)
+        self.StartDate = datetime(1998, 1, 1)
+        self.EndDate = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        self.Time = self.StartDate
+        self.UtcTime = self.StartDate
+        self.IsWarmingUp = False
+        self.CurrentSlice = None
+        self.EnableAutomaticIndicatorWarmUp = False
+        self.Alpha = NullAlphaModel()
+        self.PortfolioConstruction = NullPortfolioConstructionModel()
+        self.Execution = ImmediateExecutionModel()
+        self.RiskManagement = NullRiskManagementModel()
+        self.UniverseSelection = None
+        self.LiveMode = False
+        self.logs = []
+        self.requested_symbols = []
+        self._engine = None
+
+    # entry points overridden by the algorithm
+
+    def Initialize(self):
+        pass
+
+    def OnData(self, data):
+        pass
+
+    def OnSecuritiesChanged(self, changes):
+        pass
+
+    def OnOrderEvent(self, orderEvent):
+        pass
+
+    def OnEndOfAlgorithm(self):
+        pass
+
+    # setup
+
+    def SetStartDate(self, year, month=None, day=None):
+        self.StartDate = _as_datetime(year, month, day)
+
+    def SetEndDate(self, year, month=None, day=None):
+        self.EndDate = _as_datetime(year, month, day)
+
+    def SetCash(self, cash):
+        self.Portfolio.SetCash(cash)
+
+    def SetAlpha(self, alpha):
+        self.Alpha = alpha
+
+    def AddAlpha(self, alpha):
+        if isinstance(self.Alpha, NullAlphaModel):
+            self.Alpha = alpha
+        elif isinstance(self.Alpha, CompositeAlphaModel):
+            self.Alpha.AddAlpha(alpha)
+        else:
+            self.Alpha = CompositeAlphaModel(self.Alpha, alpha)
+
+    def SetExecution(self, execution):
+        self.Execution = execution
+
+    def SetPortfolioConstruction(self, portfolioConstruction):
+        self.PortfolioConstruction = portfolioConstruction
+
+    def SetRiskManagement(self, riskManagement):
+        self.RiskManagement = riskManagement
+
+    def SetUniverseSelection(self, universeSelection):
+        self.UniverseSelection = universeSelection
+
+    def AddEquity(self, ticker, resolution=None, *args, **kwargs):
+        '''Requests data for the ticker for the whole backtest'''
+        symbol = ticker if isinstance(ticker, Symbol) else Symbol.Create(ticker)
+        if symbol not in self.requested_symbols:
+            self.requested_symbols.append(symbol)
+        if self._engine is not None:
+            return self._engine.add_security(symbol)
+        return None
+
+    # logging
+
+    def Debug(self, message):
+        self.logs.append('{} DEBUG {}'.format(self.Time, message))
+
+    def Log(self, message):
+        self.logs.append('{} {}'.format(self.Time, message))
+
+    def Error(self, message):
+        self.logs.append('{} ERROR {}'.format(self.Time, message))
+
+    # trading
+
+    def MarketOrder(self, symbol, quantity, asynchronous=False, tag=''):
+        if not isinstance(symbol, Symbol):
+            symbol = getattr(symbol, 'Symbol', None) or self.Securities[symbol].Symbol
+        return self._engine.market_order(symbol, math.trunc(quantity), tag)
+
+    def market_orders(self, columns, quantities, tag=''):
+        '''Market orders for several portfolio columns at once, filled in one vectorized pass
+        Args:
+            columns: Distinct portfolio columns (Security.column) of the orders
+            quantities: Whole, signed quantities of the orders
+            tag: Tag of every order
+        Returns:
+            The filled quantity of each order'''
+        return self._engine.market_orders(columns, quantities, tag)
+
+    def SetHoldings(self, symbol, percentage, liquidateExistingHoldings=False, tag=''):
+        if not isinstance(symbol, Symbol):
+            symbol = self.Securities[symbol].Symbol
+        if liquidateExistingHoldings:
+            for kvp in self.Portfolio:
+                if kvp.Key != symbol and kvp.Value.Invested:
+                    self.MarketOrder(kvp.Key, -kvp.Value.Quantity, tag=tag)
+        target = PortfolioTarget.Percent(self, symbol, percentage)
+        if target is not None:
+            quantity = target.Quantity - self.Portfolio[symbol].Quantity
+            if quantity != 0:
+                self.MarketOrder(symbol, quantity, tag=tag)
+
+    def Liquidate(self, symbol=None, tag='Liquidated'):
+        tickets = []
+        for kvp in self.Portfolio:
+            if (symbol is None or kvp.Key == symbol) and kvp.Value.Invested:
+                tickets.append(self.MarketOrder(kvp.Key, -kvp.Value.Quantity, tag=tag))
+        return tickets
+
+    # data and indicators
+
+    def History(self, symbol, periods, resolution=None):
+        '''Returns a BarSeries (parallel numpy arrays) of the last `periods` bars before the
+        current bar. LEAN returns a DataFrame here; arrays keep this dependency free.'''
+        if not isinstance(symbol, Symbol):
+            symbol = Symbol.Create(symbol)
+        return self._engine.history(symbol, periods, resolution)
+
+    def CreateIndicatorName(self, symbol, type, resolution):
+        res = '' if resolution is None else '_' + _RESOLUTION_NAMES[Resolution(resolution)]
+        return '{}({}{})'.format(type, symbol.Value, res).replace(')(', ',')
+
+    def ResolveConsolidator(self, symbol, resolution):
+        '''Identity consolidator when the resolution matches the data, otherwise a
+        TradeBarConsolidator aggregating to the requested resolution'''
+        data_resolution = self._engine.resolution
+        if resolution is None or Resolution(resolution) == data_resolution:
+            return IdentityDataConsolidator(symbol)
+        if Resolution(resolution) < data_resolution:
+            raise ValueError('cannot consolidate {} data into {} bars'.format(
+                data_resolution.name, Resolution(resolution).name))
+        return TradeBarConsolidator(resolution_to_timedelta(resolution), symbol)
+
+    def RegisterIndicator(self, symbol, indicator, resolution=None, selector=None):
+        '''Updates the indicator from a consolidator (given or resolved from the resolution)'''
+        if isinstance(resolution, DataConsolidator):
+            consolidator = resolution
+        else:
+            consolidator = self.ResolveConsolidator(symbol, resolution)
+        if selector is None:
+            consolidator.subscribe_indicator(indicator)
+        elif isinstance(indicator, TradeBarIndicator):
+            consolidator.DataConsolidated.append(lambda sender, bar: indicator.Update(selector(bar)))
+        else:
+            consolidator.DataConsolidated.append(lambda sender, bar: indicator.Update(bar.EndTime, selector(bar)))
+        self.SubscriptionManager.AddConsolidator(symbol, consolidator)
+        return consolidator
+
+    def WarmUpIndicator(self, symbol, indicator, resolution=None, selector=None):
+        '''Feeds the indicator the history it needs to be ready'''
+        bars = self.History(symbol, getattr(indicator, 'WarmUpPeriod', 1), resolution)
+        if len(bars.times) == 0:
+            return
+        span = np.timedelta64(resolution_to_timedelta(resolution or self._engine.resolution))
+        end_times = (bars.times + span).astype(datetime)
+        if selector is None and isinstance(indicator, TradeBarIndicator):
+            for end_time, open, high, low, close, volume in zip(end_times, bars.open.tolist(), bars.high.tolist(),
+                                                                bars.low.tolist(), bars.close.tolist(),
+                                                                bars.volume.tolist()):
+                indicator.update_bar(end_time, open, high, low, close, volume)
+        elif selector is None:
+            for end_time, close in zip(end_times, bars.close.tolist()):
+                indicator.Update(end_time, close)
+        else:
+            for i, end_time in enumerate(end_times):
+                bar = TradeBar(end_time - span.item(), symbol, bars.open[i], bars.high[i], bars.low[i],
+                               bars.close[i], bars.volume[i], span.item())
+                if isinstance(indicator, TradeBarIndicator):
+                    indicator.Update(selector(bar))
+                else:
+                    indicator.Update(end_time, selector(bar))
+
+    # indicator helpers, as in LEAN's QCAlgorithm.Indicators. They go through the
+    # IndicatorRegistry, so asking twice for the same indicator returns the same instance.
+
+    def _helper_indicator(self, symbol, name, indicator_type, parameters, resolution, selector=None):
+        return self.IndicatorRegistry.acquire(symbol, name, indicator_type, parameters, resolution, selector,
+                                              self.EnableAutomaticIndicatorWarmUp)
+
+    def BB(self, symbol, period, k, movingAverageType=MovingAverageType.Simple, resolution=None, selector=None):
+        '''Creates a new BollingerBands indicator which will compute the MiddleBand, UpperBand, LowerBand, and StandardDeviation'''
+        name = self.CreateIndicatorName(symbol, 'BB({},{})'.format(period, k), resolution)
+        return self._helper_indicator(symbol, name, BollingerBands, (period, k, MovingAverageType(movingAverageType)),
+                                      resolution, selector)
+
+    def DEMA(self, symbol, period, resolution=None, selector=None):
+        '''Creates a new DoubleExponentialMovingAverage indicator'''
+        name = self.CreateIndicatorName(symbol, 'DEMA({})'.format(period), resolution)
+        return self._helper_indicator(symbol, name, DoubleExponentialMovingAverage, (period,), resolution, selector)
+
+    def EMA(self, symbol, period, smoothingFactor=None, resolution=None, selector=None):
+        '''Creates an ExponentialMovingAverage indicator for the symbol. The smoothing factor
+        may be left out: EMA(symbol, period, resolution) works as the C# overload does.'''
+        if isinstance(smoothingFactor, Resolution):
+            smoothingFactor, resolution, selector = None, smoothingFactor, resolution
+        if smoothingFactor is None:
+            smoothingFactor = ExponentialMovingAverage.SmoothingFactorDefault(period)
+        name = self.CreateIndicatorName(symbol, 'EMA({})'.format(period), resolution)
+        return self._helper_indicator(symbol, name, ExponentialMovingAverage, (period, float(smoothingFactor)),
+                                      resolution, selector)
+
+    def HMA(self, symbol, period, resolution=None, selector=None):
+        '''Creates a new HullMovingAverage indicator'''
+        name = self.CreateIndicatorName(symbol, 'HMA({})'.format(period), resolution)
+        return self._helper_indicator(symbol, name, HullMovingAverage, (period,), resolution, selector)
+
+    def ICHIMOKU(self, symbol, tenkanPeriod, kijunPeriod, senkouAPeriod, senkouBPeriod, senkouADelayPeriod,
+                 senkouBDelayPeriod, resolution=None):
+        '''Creates a new IchimokuKinkoHyo indicator for the symbol'''
+        periods = (tenkanPeriod, kijunPeriod, senkouAPeriod, senkouBPeriod, senkouADelayPeriod, senkouBDelayPeriod)
+        name = self.CreateIndicatorName(symbol, 'ICHIMOKU({},{},{},{},{},{})'.format(*periods), resolution)
+        return self._helper_indicator(symbol, name, IchimokuKinkoHyo, periods, resolution)
+
+    def KAMA(self, symbol, period, fastEmaPeriod, slowEmaPeriod, resolution=None, selector=None):
+        '''Creates a new KaufmanAdaptiveMovingAverage indicator'''
+        name = self.CreateIndicatorName(symbol, 'KAMA({},{},{})'.format(period, fastEmaPeriod, slowEmaPeriod), resolution)
+        return self._helper_indicator(symbol, name, KaufmanAdaptiveMovingAverage, (period, fastEmaPeriod, slowEmaPeriod),
+                                      resolution, selector)
+
+    def MACD(self, symbol, fastPeriod, slowPeriod, signalPeriod, type=MovingAverageType.Exponential, resolution=None,
+             selector=None):
+        '''Creates a MACD indicator for the symbol'''
+        name = self.CreateIndicatorName(symbol, 'MACD({},{},{})'.format(fastPeriod, slowPeriod, signalPeriod), resolution)
+        return self._helper_indicator(symbol, name, MovingAverageConvergenceDivergence,
+                                      (fastPeriod, slowPeriod, signalPeriod, MovingAverageType(type)), resolution, selector)
+
+    def RSI(self, symbol, period, movingAverageType=MovingAverageType.Wilders, resolution=None, selector=None):
+        '''Creates a new RelativeStrengthIndex indicator'''
+        movingAverageType = MovingAverageType(movingAverageType)
+        name = self.CreateIndicatorName(symbol, 'RSI({},{})'.format(period, movingAverageType.name), resolution)
+        return self._helper_indicator(symbol, name, RelativeStrengthIndex, (period, movingAverageType), resolution,
+                                      selector)
+
+    def SMA(self, symbol, period, resolution=None, selector=None):
+        '''Creates an SimpleMovingAverage indicator for the symbol'''
+        name = self.CreateIndicatorName(symbol, 'SMA({})'.format(period), resolution)
+        return self._helper_indicator(symbol, name, SimpleMovingAverage, (period,), resolution, selector)
+
+    def STO(self, symbol, period, kPeriod, dPeriod, resolution=None):
+        '''Creates a new Stochastic indicator'''
+        name = self.CreateIndicatorName(symbol, 'STO({},{},{})'.format(period, kPeriod, dPeriod), resolution)
+        return self._helper_indicator(symbol, name, Stochastic, (period, kPeriod, dPeriod), resolution)
+
+    def VWAP(self, symbol, period=None, resolution=None, selector=None):
+        '''VWAP(symbol, period, ...) creates a VolumeWeightedAveragePriceIndicator; VWAP(symbol)
+        the canonical IntradayVwap that resets each day'''
+        if period is None:
+            return self.IndicatorRegistry.acquire(symbol, self.CreateIndicatorName(symbol, 'VWAP', None), IntradayVwap)
+        name = self.CreateIndicatorName(symbol, 'VWAP({})'.format(period), resolution)
+        return self._helper_indicator(symbol, name, VolumeWeightedAveragePriceIndicator, (period,), resolution, selector)
@@ -0,0 +1,135 @@
+'''Batch runs of declared strategy variants.
+
+22.py, 25.py, Final26.py and MACD Manual.py are the same algorithm with different
+universes and dates. A batch file declares such variants instead:
+
+    {
+        "defaults": {"cash": 100000, "risk_threshold": 0.03},
+        "variants": [
+            {"name": "25", "algorithm": "25.py"},
+            {"name": "25 loose risk", "algorithm": "25.py", "risk_threshold": 0.05},
+            {"name": "banks", "symbols": ["JPM", "BAC", "GS"], "start": "2018-04-16", "end": "2020-04-16",
+             "fast": 8, "slow": 21, "moving_average_type": "Exponential"}
+        ]
+    }
+
+A variant takes any MacdStrategyParameters field. "algorithm" reads the universe, dates
+and model parameters from an algorithm file first. Fields it doesn't set come from
+"defaults", then from the MacdStrategyParameters defaults.
+
+run_batch loads the union of every variant's symbols and windows once, memory-maps it
+in a process pool, and backtests the variants there. A further variant only adds its own
+backtest, plus any symbols or dates no other variant needed.'''
+
+import json
+import os
+from concurrent.futures import as_completed
+from datetime import datetime
+
+from .engine import format_statistic
+from .enums import MovingAverageType, Resolution
+from .loader import load_algorithm
+from .strategy import MacdStrategyParameters, parameters_from_algorithm
+from .sweep import _run, shared_pool
+
+STATISTICS = ('Net Profit', 'Sharpe Ratio', 'Drawdown', 'Total Orders', 'Total Fees', 'Turnover', 'End Equity')
+
+
+def _date(value):
+    return value if isinstance(value, datetime) else datetime.fromisoformat(str(value))
+
+
+def _enum(kind, value):
+    if isinstance(value, str):
+        return kind[next(name for name in kind.__members__ if name.lower() == value.lower())]
+    return kind(value)
+
+
+_CONVERT = {
+    'symbols': lambda value: tuple(str(ticker).upper() for ticker in value),
+    'start': _date,
+    'end': _date,
+    'cash': float,
+    'fast': int,
+    'slow': int,
+    'signal': int,
+    'moving_average_type': lambda value: _enum(MovingAverageType, value),
+    'resolution': lambda value: _enum(Resolution, value),
+    'risk_threshold': float,
+}
+
+
+def variant_parameters(declaration, defaults=None, directory='.'):
+    '''MacdStrategyParameters of one variant declaration (see the module docstring)'''
+    fields = dict(defaults or {})
+    fields.update(declaration)
+    fields.pop('name', None)
+    algorithm = fields.pop('algorithm', None)
+    unknown = set(fields) - set(_CONVERT)
+    if unknown:
+        raise ValueError('unknown variant fields: {}'.format(', '.join(sorted(unknown))))
+    values = {name: _CONVERT[name](value) for name, value in fields.items()}
+    if algorithm is not None:
+        base = parameters_from_algorithm(load_algorithm(os.path.join(directory, algorithm)))
+        # fields the variant sets itself override the file; defaults do not
+        values = {name: value for name, value in values.items() if name in declaration}
+        return base._replace(**values)
+    missing = [name for name in ('symbols', 'start', 'end') if name not in values]
+    if missing:
+        raise ValueError('variant without an algorithm needs {}'.format(', '.join(missing)))
+    return MacdStrategyParameters(**values)
+
+
+def load_variants(path):
+    '''Reads a batch file into a list of (name, MacdStrategyParameters)'''
+    with open(path) as handle:
+        config = json.load(handle)
+    directory = os.path.dirname(os.path.abspath(path))
+    defaults = config.get('defaults', {})
+    variants = []
+    for number, declaration in enumerate(config['variants'], 1):
+        name = declaration.get('name') or declaration.get('algorithm') or 'variant {}'.format(number)
+        variants.append((name, variant_parameters(declaration, defaults, directory)))
+    names = [name for name, _ in variants]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError('duplicate variant names: {}'.format(', '.join(duplicates)))
+    return variants
+
+
+def run_batch(variants, source, workers=None, on_result=None):
+    '''Backtests (name, parameters) variants over one shared data load.
+
+    on_result(name, parameters, statistics) is called in the parent process as each
+    variant finishes. Returns [(name, parameters, statistics)] in the order given.'''
+    variants = list(variants)
+    if not variants:
+        return []
+    results = {}
+    with shared_pool(source, [parameters for _, parameters in variants], workers) as pool:
+        futures = {pool.submit(_run, parameters): name for name, parameters in variants}
+        for future in as_completed(futures):
+            parameters, statistics = future.result()
+            name = futures[future]
+            results[name] = statistics
+            if on_result is not None:
+                on_result(name, parameters, statistics)
+    return [(name, parameters, results[name]) for name, parameters in variants]
+
+
+def format_comparison(results, statistics=STATISTICS):
+    '''Side-by-side table: one column per variant, its setup and then its statistics'''
+    setup = [
+        ('symbols', lambda p: str(len(p.symbols))),
+        ('start', lambda p: _date(p.start).date().isoformat()),
+        ('end', lambda p: _date(p.end).date().isoformat()),
+        ('MACD', lambda p: '{},{},{} {}'.format(p.fast, p.slow, p.signal, MovingAverageType(p.moving_average_type).name)),
+        ('risk', lambda p: '{:g}'.format(p.risk_threshold)),
+    ]
+    lines = [[''] + [name for name, _, _ in results]]
+    lines += [[label] + [function(parameters) for _, parameters, _ in results] for label, function in setup]
+    lines += [[name] + [format_statistic(name, stats[name]) for _, _, stats in results] for name in statistics]
+    widths = [max(len(line[i]) for line in lines) for i in range(len(lines[0]))]
+    return '\n'.join('  '.join(cell.ljust(width) if i == 0 else cell.rjust(width)
+                               for i, (cell, width) in enumerate(zip(line, widths)))
+                     for line in lines)
@@ -0,0 +1,282 @@
+'''Per-update cost of the streaming indicators against naive recomputation.
+
+    python -m qclocal.benchmarks.indicators [--bars 20000] [--period 50] [--repeat 3]
+
+For every indicator of the QCcodes.py family the same synthetic bars are fed three ways:
+the streaming indicator (one Update per bar), a naive version that rebuilds its value
+from the whole trailing window on every bar, and the indicator's compute() batch mode
+over the full array. Times are nanoseconds per bar, best of --repeat runs. EMA, DEMA,
+MACD(Exponential) and RSI(Wilders) are recursive filters with no window to recompute,
+so they have no naive column.'''
+
+import argparse
+import math
+import statistics
+import time
+from collections import deque
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from ..enums import MovingAverageType
+from ..indicators import (BollingerBands, DoubleExponentialMovingAverage, ExponentialMovingAverage, HullMovingAverage,
+                          IchimokuKinkoHyo, KaufmanAdaptiveMovingAverage, MovingAverageConvergenceDivergence,
+                          RelativeStrengthIndex, SimpleMovingAverage, Stochastic, VolumeWeightedAveragePriceIndicator)
+from ..indicators.base import IndicatorBase, TradeBarIndicator
+
+
+def synthetic_bars(count, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, count)))
+    spread = rng.uniform(0, 0.01, (2, count))
+    return close * (1 + spread[0]), close * (1 - spread[1]), close, rng.integers(1, 10000, count).astype(float)
+
+
+# naive versions: keep the raw window and recompute from it every bar
+
+
+class NaiveWindow(IndicatorBase):
+    def __init__(self, period, function):
+        super().__init__('naive')
+        self._window = deque(maxlen=period)
+        self._function = function
+
+    def ComputeNextValue(self, time, value):
+        self._window.append(value)
+        return self._function(self._window)
+
+
+class NaiveBarWindow(TradeBarIndicator):
+    def __init__(self, period, function):
+        super().__init__('naive')
+        self._window = deque(maxlen=period)
+        self._function = function
+
+    def ComputeNextBar(self, time, open, high, low, close, volume):
+        self._window.append((high, low, close, volume))
+        return self._function(self._window)
+
+
+def naive_sma(window):
+    return sum(window) / len(window)
+
+
+def naive_lwma(period):
+    denominator = period * (period + 1) / 2
+
+    def lwma(window):
+        return sum(weight * value for weight, value in enumerate(window, 1 + period - len(window))) / denominator
+    return lwma
+
+
+class NaiveHull(IndicatorBase):
+    def __init__(self, period):
+        super().__init__('naive')
+        self._fast = NaiveWindow(round(period / 2), naive_lwma(round(period / 2)))
+        self._slow = NaiveWindow(period, naive_lwma(period))
+        k = round(math.sqrt(period))
+        self._hull = NaiveWindow(k, naive_lwma(k))
+        self._period = period
+
+    def ComputeNextValue(self, time, value):
+        self._fast.Update(time, value)
+        if self._slow.Update(time, value) and self._fast.IsReady:
+            self._hull.Update(time, 2 * self._fast.Current.Value - self._slow.Current.Value)
+        return self._hull.Current.Value
+
+
+def naive_bollinger(window):
+    mean = sum(window) / len(window)
+    return mean + 2 * statistics.pstdev(window, mean)
+
+
+def naive_kama(period):
+    state = {'kama': None}
+    fast, slow = 2.0 / 3, 2.0 / 31
+
+    def kama(window):
+        values = list(window)
+        if len(values) <= period:
+            state['kama'] = values[-1]
+            return values[-1]
+        volatility = sum(abs(b - a) for a, b in zip(values, values[1:]))
+        change = abs(values[-1] - values[0])
+        ratio = 1.0 if volatility == 0 or volatility <= change else change / volatility
+        constant = (ratio * (fast - slow) + slow) ** 2
+        state['kama'] += (values[-1] - state['kama']) * constant
+        return state['kama']
+    return kama
+
+
+def naive_macd_simple(fast, slow, signal):
+    window = deque(maxlen=slow)
+    history = deque(maxlen=signal)
+
+    def macd(value):
+        window.append(value)
+        values = list(window)
+        current = sum(values[-fast:]) / min(fast, len(values)) - sum(values) / len(values)
+        if len(values) == slow:
+            history.append(current)
+        return sum(history) / len(history) if history else 0.0
+    return macd
+
+
+def naive_rsi_simple(period):
+    window = deque(maxlen=period + 1)
+
+    def rsi(value):
+        window.append(value)
+        values = list(window)
+        changes = [b - a for a, b in zip(values, values[1:])]
+        loss = sum(-c for c in changes if c < 0)
+        if loss == 0:
+            return 100.0
+        return 100.0 - 100.0 / (1 + sum(c for c in changes if c > 0) / loss)
+    return rsi
+
+
+def naive_stochastic(period, k_period, d_period):
+    fasts = deque(maxlen=k_period)
+    slows = deque(maxlen=d_period)
+    state = {}
+
+    def stochastic(window):
+        highest = max(bar[0] for bar in window)
+        lowest = min(bar[1] for bar in window)
+        fast = 0.0
+        if highest != lowest:
+            fast = (window[-1][2] - lowest) / (highest - lowest) if len(window) == period else 0.0
+            fasts.append(fast)
+        # fast %K, its k_period average and that average's d_period average
+        slows.append(sum(fasts) / k_period)
+        state['StochK'], state['StochD'] = slows[-1] * 100, sum(slows) / d_period * 100
+        return fast * 100
+    return stochastic
+
+
+def naive_ichimoku(tenkan, kijun, senkou_b):
+    def midpoint(window, period):
+        bars = list(window)[-period:]
+        return (max(bar[0] for bar in bars) + min(bar[1] for bar in bars)) / 2
+
+    def ichimoku(window):
+        return midpoint(window, tenkan) + midpoint(window, kijun) + midpoint(window, senkou_b)
+    return ichimoku
+
+
+def naive_vwap(window):
+    volume = sum(bar[3] for bar in window)
+    return sum((bar[0] + bar[1] + bar[2]) / 3 * bar[3] for bar in window) / volume
+
+
+class NaiveFunction(IndicatorBase):
+    def __init__(self, function):
+        super().__init__('naive')
+        self._function = function
+
+    def ComputeNextValue(self, time, value):
+        return self._function(value)
+
+
+def cases(period):
+    '''(label, streaming factory, naive factory or None, batch function(high, low, close, volume))'''
+    p = period
+    return [
+        ('SMA({})'.format(p), lambda: SimpleMovingAverage(p), lambda: NaiveWindow(p, naive_sma),
+         lambda h, l, c, v: SimpleMovingAverage.compute(c, p)),
+        ('EMA({})'.format(p), lambda: ExponentialMovingAverage(p), None,
+         lambda h, l, c, v: ExponentialMovingAverage.compute(c, p)),
+        ('DEMA({})'.format(p), lambda: DoubleExponentialMovingAverage(p), None,
+         lambda h, l, c, v: DoubleExponentialMovingAverage.compute(c, p)),
+        ('HMA({})'.format(p), lambda: HullMovingAverage(p), lambda: NaiveHull(p),
+         lambda h, l, c, v: HullMovingAverage.compute(c, p)),
+        ('KAMA({},2,30)'.format(p), lambda: KaufmanAdaptiveMovingAverage(p, 2, 30),
+         lambda: NaiveWindow(p + 1, naive_kama(p)), lambda h, l, c, v: KaufmanAdaptiveMovingAverage.compute(c, p)),
+        ('BB({},2)'.format(p), lambda: BollingerBands(p, 2), lambda: NaiveWindow(p, naive_bollinger),
+         lambda h, l, c, v: BollingerBands.compute(c, p, 2)),
+        ('MACD(12,{},9,Exponential)'.format(p), lambda: MovingAverageConvergenceDivergence(12, p, 9), None,
+         lambda h, l, c, v: MovingAverageConvergenceDivergence.compute(c, 12, p, 9)),
+        ('MACD(12,{},9,Simple)'.format(p),
+         lambda: MovingAverageConvergenceDivergence(12, p, 9, MovingAverageType.Simple),
+         lambda: NaiveFunction(naive_macd_simple(12, p, 9)),
+         lambda h, l, c, v: MovingAverageConvergenceDivergence.compute(c, 12, p, 9, MovingAverageType.Simple)),
+        ('RSI({},Wilders)'.format(p), lambda: RelativeStrengthIndex(p), None,
+         lambda h, l, c, v: RelativeStrengthIndex.compute(c, p)),
+        ('RSI({},Simple)'.format(p), lambda: RelativeStrengthIndex(p, MovingAverageType.Simple),
+         lambda: NaiveFunction(naive_rsi_simple(p)),
+         lambda h, l, c, v: RelativeStrengthIndex.compute(c, p, MovingAverageType.Simple)),
+        ('STO({},3,3)'.format(p), lambda: Stochastic(p, 3, 3), lambda: NaiveBarWindow(p, naive_stochastic(p, 3, 3)),
+         lambda h, l, c, v: Stochastic.compute(h, l, c, p, 3, 3)),
+        ('ICHIMOKU(9,{},{},{},26,26)'.format(p, p, 2 * p), lambda: IchimokuKinkoHyo(9, p, p, 2 * p, 26, 26),
+         lambda: NaiveBarWindow(2 * p, naive_ichimoku(9, p, 2 * p)),
+         lambda h, l, c, v: IchimokuKinkoHyo.compute(h, l, c, 9, p, p, 2 * p, 26, 26)),
+        ('VWAP({})'.format(p), lambda: VolumeWeightedAveragePriceIndicator(p), lambda: NaiveBarWindow(p, naive_vwap),
+         lambda h, l, c, v: VolumeWeightedAveragePriceIndicator.compute(h, l, c, v, p)),
+    ]
+
+
+def time_updates(factory, times, high, low, close, volume, repeat):
+    best = math.inf
+    for _ in range(repeat):
+        indicator = factory()
+        started = time.perf_counter()
+        if isinstance(indicator, TradeBarIndicator):
+            update = indicator.update_bar
+            for bar in zip(times, close, high, low, close, volume):
+                update(*bar)
+        else:
+            update = indicator.Update
+            for end_time, value in zip(times, close):
+                update(end_time, value)
+        best = min(best, time.perf_counter() - started)
+    return best / len(times) * 1e9
+
+
+def time_batch(function, arrays, repeat):
+    best = math.inf
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function(*arrays)
+        best = min(best, time.perf_counter() - started)
+    return best / len(arrays[0]) * 1e9
+
+
+def run(bars=20000, period=50, repeat=3, seed=0):
+    '''Returns rows of (label, streaming ns/bar, naive ns/bar or None, batch ns/bar)'''
+    high, low, close, volume = synthetic_bars(bars, seed)
+    arrays = (high, low, close, volume)
+    columns = [array.tolist() for array in arrays]
+    start = datetime(2000, 1, 1)
+    times = [start + timedelta(minutes=i) for i in range(bars)]
+    rows = []
+    for label, streaming, naive, batch in cases(period):
+        rows.append((label, time_updates(streaming, times, *columns, repeat),
+                     None if naive is None else time_updates(naive, times, *columns, repeat),
+                     time_batch(batch, arrays, repeat)))
+    return rows
+
+
+def format_rows(rows):
+    lines = [('indicator', 'stream ns', 'naive ns', 'speed-up', 'compute ns')]
+    for label, stream, naive, batch in rows:
+        lines.append((label, '{:.0f}'.format(stream), '-' if naive is None else '{:.0f}'.format(naive),
+                      '-' if naive is None else '{:.1f}x'.format(naive / stream), '{:.1f}'.format(batch)))
+    widths = [max(len(line[i]) for line in lines) for i in range(5)]
+    return '\n'.join('  '.join(cell.ljust(widths[0]) if i == 0 else cell.rjust(widths[i]) for i, cell in enumerate(line))
+                     for line in lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m qclocal.benchmarks.indicators')
+    parser.add_argument('--bars', type=int, default=20000, help='bars fed to every indicator')
+    parser.add_argument('--period', type=int, default=50, help='main period of the indicators')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per measurement, the best is reported')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+    print('{} bars, period {}; nanoseconds per bar, best of {}'.format(args.bars, args.period, args.repeat))
+    print(format_rows(run(args.bars, args.period, args.repeat, args.seed)))
+
+
+if __name__ == '__main__':
+    main()
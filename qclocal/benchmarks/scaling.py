@@ -0,0 +1,219 @@
+'''How the MACD / equal weight / unrealized profit pipeline scales with universe size,
+resolution and history length.
+
+    python -m qclocal.benchmarks.scaling run [--symbols 25,250,2500,10000] [--resolutions daily,minute]
+                                             [--years 2,5,10,20] [--max-bars 20000000] [--output scaling.json]
+    python -m qclocal.benchmarks.scaling compare BASELINE.json CANDIDATE.json [--threshold 0.1]
+
+Every case generates synthetic OHLCV bars for its symbols over its window, plus the bars
+the MACD needs to warm up before it, as one (time x symbol) frame. The frame is served to
+the engine through a FrameDataSource, and MacdStrategy is backtested on it at the
+resolution of the data. Each case runs in a fresh process, so the peak RSS of one case
+does not carry into the next.
+
+For each case the result records:
+
+    bars             symbol bars the backtest stepped through
+    generate_seconds time to generate the synthetic frame
+    warmup_seconds   time spent adding the universe, indicator warm-up included
+    run_seconds      the whole backtest, warm-up included
+    bars_per_second  bars / (run_seconds - warmup_seconds)
+    peak_rss_mb      peak resident memory of the case's process
+
+Cases with more bars than --max-bars are listed as skipped instead of being run: 10,000
+symbols of minute bars for 20 years is some 20 billion bars. The results are written as
+JSON together with the machine they ran on. compare matches the cases of two result
+files and flags a regression when throughput falls, or peak RSS or warm-up time grows,
+by more than the threshold. It exits with status 1 when it flags one.'''
+
+import argparse
+import json
+import multiprocessing
+import platform
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from ..data import BarFrame, FrameDataSource
+from ..engine import BacktestEngine
+from ..enums import Resolution
+from ..profiling import StageProfiler
+from ..strategy import MacdStrategy, MacdStrategyParameters, warm_up_bars
+from ..symbol import Symbol
+from ..synthetic import MINUTES_PER_SESSION, generate_paths, trading_calendar
+
+SYMBOLS = (25, 250, 2500, 10000)
+RESOLUTIONS = (Resolution.Daily, Resolution.Minute)
+YEARS = (2, 5, 10, 20)
+END = datetime(2024, 12, 31)
+_BARS_PER_DAY = {Resolution.Daily: 1, Resolution.Minute: MINUTES_PER_SESSION}
+
+
+def case_name(symbols, resolution, years):
+    return '{}x{}x{}y'.format(symbols, Resolution(resolution).name.lower(), years)
+
+
+def estimated_bars(symbols, resolution, years):
+    return symbols * years * 252 * _BARS_PER_DAY[Resolution(resolution)]
+
+
+def synthetic_frame(symbols, resolution, start, end, seed=0):
+    '''BarFrame of generated bars for tickers S00000, S00001, ... between start and end'''
+    resolution = Resolution(resolution)
+    times = trading_calendar(start, end, resolution)
+    paths = generate_paths(times, symbols, seed, bars_per_year=252 * _BARS_PER_DAY[resolution])
+    tickers = [Symbol.Create('S{:05d}'.format(i)) for i in range(symbols)]
+    return BarFrame(times, tickers, *paths)
+
+
+def run_case(symbols, resolution, years, seed=0):
+    '''Backtests one case in the current process; returns its result record'''
+    resolution = Resolution(resolution)
+    start = END - timedelta(days=round(365.25 * years))
+    parameters = MacdStrategyParameters(tuple('S{:05d}'.format(i) for i in range(symbols)), start, END,
+                                        resolution=resolution)
+    # warm-up bars come from the same frame, from the sessions just before the start
+    warm_up_days = warm_up_bars(parameters) // _BARS_PER_DAY[resolution] + 10
+    started = time.perf_counter()
+    frame = synthetic_frame(symbols, resolution, start - timedelta(days=2 * warm_up_days), END, seed)
+    generated = time.perf_counter() - started
+
+    engine = BacktestEngine(FrameDataSource(frame, resolution))
+    timer = StageProfiler()
+    engine._on_securities_changed = timer.wrap('warm-up', engine._on_securities_changed)
+    result = engine.run(MacdStrategy(parameters))
+    warm_up = timer.stages['warm-up'].total if timer.stages else 0.0
+    bars = int(engine.frame.has_bar.sum())
+    return {
+        'case': case_name(symbols, resolution, years),
+        'symbols': symbols,
+        'resolution': resolution.name.lower(),
+        'years': years,
+        'bars': bars,
+        'generate_seconds': generated,
+        'warmup_seconds': warm_up,
+        'run_seconds': result.runtime,
+        'bars_per_second': bars / max(result.runtime - warm_up, 1e-9),
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'orders': result.statistics.get('Total Orders', 0),
+    }
+
+
+def _isolated(symbols, resolution, years, seed):
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(1, mp_context=context) as pool:
+        return pool.submit(run_case, symbols, resolution, years, seed).result()
+
+
+def run(symbols=SYMBOLS, resolutions=RESOLUTIONS, years=YEARS, max_bars=20000000, seed=0, on_result=None):
+    '''Runs every case within max_bars, each in its own process; returns the result document'''
+    results = []
+    for resolution in resolutions:
+        for count in symbols:
+            for length in years:
+                if estimated_bars(count, resolution, length) > max_bars:
+                    record = {'case': case_name(count, resolution, length), 'symbols': count,
+                              'resolution': Resolution(resolution).name.lower(), 'years': length,
+                              'skipped': 'about {:.3g} bars, over --max-bars'.format(
+                                  estimated_bars(count, resolution, length))}
+                else:
+                    record = _isolated(count, resolution, length, seed)
+                results.append(record)
+                if on_result is not None:
+                    on_result(record)
+    return {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'cpus': multiprocessing.cpu_count(),
+        'max_bars': max_bars,
+        'results': results,
+    }
+
+
+def format_result(record):
+    if 'skipped' in record:
+        return '{:<24} skipped: {}'.format(record['case'], record['skipped'])
+    return '{:<24} {:>12,} bars  {:>10,.0f} bars/s  warm-up {:8.3f}s  run {:9.3f}s  peak RSS {:8.1f} MB'.format(
+        record['case'], record['bars'], record['bars_per_second'], record['warmup_seconds'], record['run_seconds'],
+        record['peak_rss_mb'])
+
+
+# (metric, higher is better)
+COMPARED = (('bars_per_second', True), ('peak_rss_mb', False), ('warmup_seconds', False))
+
+
+def compare(baseline, candidate, threshold=0.1):
+    '''Returns (lines, regressions) comparing the cases the two result documents share'''
+    before = {record['case']: record for record in baseline['results'] if 'skipped' not in record}
+    lines = ['{:<24} {:>16} {:>16} {:>16}'.format('case', *(metric for metric, _ in COMPARED))]
+    regressions = []
+    for record in candidate['results']:
+        base = before.get(record['case'])
+        if base is None or 'skipped' in record:
+            continue
+        cells = []
+        for metric, higher_is_better in COMPARED:
+            old, new = base[metric], record[metric]
+            change = (new - old) / old if old else 0.0
+            worse = -change if higher_is_better else change
+            flag = ''
+            # warm-ups of a few milliseconds are dominated by noise
+            if worse > threshold and not (metric == 'warmup_seconds' and max(old, new) < 0.05):
+                flag = '!'
+                regressions.append((record['case'], metric, old, new))
+            cells.append('{:+.1%}{}'.format(change, flag or ' '))
+        lines.append('{:<24} {:>16} {:>16} {:>16}'.format(record['case'], *cells))
+    return lines, regressions
+
+
+def _list(convert):
+    return lambda value: [convert(item) for item in value.split(',') if item]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m qclocal.benchmarks.scaling')
+    commands = parser.add_subparsers(dest='command', required=True)
+    bench = commands.add_parser('run', help='run the scaling cases')
+    bench.add_argument('--symbols', type=_list(int), default=list(SYMBOLS), help='comma separated universe sizes')
+    bench.add_argument('--resolutions', type=_list(lambda value: Resolution[value.capitalize()]),
+                       default=list(RESOLUTIONS), help='comma separated resolutions (daily, minute)')
+    bench.add_argument('--years', type=_list(int), default=list(YEARS), help='comma separated history lengths')
+    bench.add_argument('--max-bars', type=float, default=2e7, help='skip cases with more symbol bars than this')
+    bench.add_argument('--seed', type=int, default=0)
+    bench.add_argument('--output', default='scaling.json', help='result file')
+    check = commands.add_parser('compare', help='flag regressions between two result files')
+    check.add_argument('baseline')
+    check.add_argument('candidate')
+    check.add_argument('--threshold', type=float, default=0.1, help='relative change counted as a regression')
+    args = parser.parse_args(argv)
+
+    if args.command == 'run':
+        document = run(args.symbols, args.resolutions, args.years, args.max_bars, args.seed,
+                       lambda record: print(format_result(record), flush=True))
+        with open(args.output, 'w') as output:
+            json.dump(document, output, indent=1)
+        print('wrote {}'.format(args.output))
+        return 0
+
+    with open(args.baseline) as handle:
+        baseline = json.load(handle)
+    with open(args.candidate) as handle:
+        candidate = json.load(handle)
+    lines, regressions = compare(baseline, candidate, args.threshold)
+    print('\n'.join(lines))
+    for case, metric, old, new in regressions:
+        print('regression: {} {} {:.4g} -> {:.4g}'.format(case, metric, old, new))
+    if not regressions:
+        print('no regressions beyond {:.0%}'.format(args.threshold))
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
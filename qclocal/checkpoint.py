@@ -0,0 +1,234 @@
+'''Checkpoints of a run: its whole state after a step, resumable to the bit.
+
+A checkpoint pickles the engine with everything it reaches: the algorithm and its
+indicators, consolidators and working bars, the alpha, portfolio construction, risk and
+execution models with their state, the insights, holdings and cash, the order ledger,
+the running statistics and the equity store. Lambdas and nested functions, such as
+consolidator handlers, selectors and rebalancing functions, are written as their code,
+so a checkpoint only loads in the Python version that wrote it. The random states of
+the random module and numpy, and the insight id counter, are kept as well.
+
+The price frame of a backtest is not written. The checkpoint keeps the symbols and
+window it was loaded for, plus a digest of its bars. On resume it is loaded again from
+the data source, and the digest must match. A live session has no source to reload its
+frame from, so its checkpoints hold the bars received so far.
+
+Resuming loads the state and runs the steps after the checkpoint. Every value those steps
+read is the one the uninterrupted run had at that point, so the results are identical to
+it, in any process: nothing a step does depends on the hash order of sets. The file of
+the algorithm is loaded if it is not loaded already, and has to be unchanged.
+
+A file is a header, the frame (or how to reload it) and the state, pickled one after the
+other. read_header() reads only the first.'''
+
+import hashlib
+import importlib
+import itertools
+import marshal
+import os
+import pickle
+import random
+import sys
+import tempfile
+import types
+
+import numpy as np
+
+from .consolidation import bucket_starts
+from .data import FIELDS
+from .framework import insight as _insight
+from .loader import load_module, module_name_for
+
+MAGIC = b'QCLOCAL CHECKPOINT\n'
+FORMAT = 1
+
+
+class CheckpointSchedule:
+    '''When a run writes its checkpoint: every `every` steps, or after the first step of
+    each period (a timedelta). Each checkpoint replaces the previous one at path.'''
+
+    def __init__(self, path, every=None, period=None):
+        if every is None and period is None:
+            raise ValueError('a checkpoint schedule needs a step count or a period')
+        self.path = path
+        self.every = every
+        self.period = period
+        self.steps = 0
+        self.written = 0
+        self._bucket = None
+
+    def due(self, time):
+        '''Counts a step ending at time; True if the checkpoint is due after it'''
+        self.steps += 1
+        if self.period is None:
+            return self.steps % self.every == 0
+        # steps are stamped with their end, so one ending on a boundary belongs to the period before it
+        bucket = int(bucket_starts(np.datetime64(time, 'us') - np.timedelta64(1, 'us'), self.period))
+        due = self._bucket is not None and bucket != self._bucket
+        self._bucket = bucket
+        return due
+
+
+def frame_digest(frame):
+    '''Digest of the symbols, times and bars of a BarFrame'''
+    digest = hashlib.sha1(repr([str(symbol) for symbol in frame.symbols]).encode())
+    digest.update(np.ascontiguousarray(frame.times, 'datetime64[s]').tobytes())
+    for field in FIELDS:
+        digest.update(np.ascontiguousarray(getattr(frame, field)).tobytes())
+    return digest.hexdigest()
+
+
+def _file_digest(path):
+    with open(path, 'rb') as handle:
+        return hashlib.sha1(handle.read()).hexdigest()
+
+
+# functions pickled by their code
+
+
+def _function(code, module, name, qualname, defaults, kwdefaults, closure):
+    function = types.FunctionType(marshal.loads(code), vars(sys.modules[module]), name, defaults, closure)
+    function.__qualname__ = qualname
+    function.__kwdefaults__ = kwdefaults
+    return function
+
+
+def _cell():
+    return types.CellType()
+
+
+def _fill_cell(cell, contents):
+    cell.cell_contents = contents
+
+
+class _Pickler(pickle.Pickler):
+    '''Writes the objects in refs as their name, and functions that cannot be imported by
+    name (lambdas, nested functions) as their code'''
+
+    def __init__(self, file, refs):
+        super().__init__(file, pickle.HIGHEST_PROTOCOL)
+        self._refs = {id(value): name for name, value in refs.items() if value is not None}
+
+    def persistent_id(self, obj):
+        return self._refs.get(id(obj))
+
+    def reducer_override(self, obj):
+        if type(obj) is types.CellType:
+            try:
+                contents = obj.cell_contents
+            except ValueError:
+                return _cell, ()
+            return _cell, (), contents, None, None, _fill_cell
+        if type(obj) is types.FunctionType and '<' in obj.__qualname__:
+            return _function, (marshal.dumps(obj.__code__), obj.__module__, obj.__name__, obj.__qualname__,
+                               obj.__defaults__, obj.__kwdefaults__, obj.__closure__)
+        return NotImplemented
+
+
+class _Unpickler(pickle.Unpickler):
+    def __init__(self, file, refs):
+        super().__init__(file)
+        self._refs = refs
+
+    def persistent_load(self, name):
+        return self._refs.get(name)
+
+
+def write_checkpoint(engine, path, row):
+    '''Writes the state of engine to path, replacing the file atomically; row is the next
+    step to run'''
+    refs = engine._checkpoint_refs()
+    algorithm_type = type(engine.algorithm)
+    module = sys.modules.get(algorithm_type.__module__)
+    source_file = getattr(module, '__file__', None)
+    if source_file is None or module_name_for(source_file) != module.__name__:
+        # only algorithm files loaded by the loader are loaded again on resume
+        source_file = None
+    header = {
+        'format': FORMAT,
+        'python': tuple(sys.version_info[:2]),
+        'engine': (type(engine).__module__, type(engine).__qualname__),
+        'algorithm': (algorithm_type.__module__, source_file, source_file and _file_digest(source_file)),
+        'row': row,
+        'time': engine.frame.times[row - 1] if row else None,
+        'refs': sorted(name for name, value in refs.items() if value is not None),
+    }
+    next_id = next(_insight._ids)
+    _insight._ids = itertools.count(next_id)
+    state = {'engine': engine, 'insight_id': next_id, 'random': random.getstate(),
+             'numpy_random': np.random.get_state()}
+    directory = os.path.dirname(os.path.abspath(path))
+    handle, temporary = tempfile.mkstemp(suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(handle, 'wb') as output:
+            output.write(MAGIC)
+            pickle.dump(header, output, pickle.HIGHEST_PROTOCOL)
+            pickle.dump(engine._checkpoint_frame(), output, pickle.HIGHEST_PROTOCOL)
+            _Pickler(output, refs).dump(state)
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+
+
+def _read_header(handle, path):
+    if handle.read(len(MAGIC)) != MAGIC:
+        raise ValueError('{} is not a checkpoint'.format(path))
+    header = pickle.load(handle)
+    if header['format'] != FORMAT:
+        raise ValueError('{} has checkpoint format {}, not {}'.format(path, header['format'], FORMAT))
+    return header
+
+
+def read_header(path):
+    '''The header of a checkpoint: the engine class, algorithm module and file, the next
+    row to run and the time of the last step run'''
+    with open(path, 'rb') as handle:
+        return _read_header(handle, path)
+
+
+def load_checkpoint(path, data_source, profiler=None):
+    '''Loads a checkpoint; returns (engine, row), row being the next step to run.
+
+    Args:
+        path: The checkpoint file
+        data_source: DataSource of the resumed run; a backtest reloads its frame from it
+        profiler: profiling.StageProfiler of the resumed run, or None'''
+    with open(path, 'rb') as handle:
+        header = _read_header(handle, path)
+        if header['python'] != tuple(sys.version_info[:2]):
+            raise ValueError('{} was written by Python {}.{}'.format(path, *header['python']))
+        module_name, source_file, digest = header['algorithm']
+        if source_file is not None:
+            if _file_digest(source_file) != digest:
+                raise ValueError('{} changed since {} was written'.format(source_file, path))
+            if module_name not in sys.modules:
+                load_module(source_file)
+        engine_module, engine_name = header['engine']
+        engine_type = getattr(importlib.import_module(engine_module), engine_name)
+        frame = engine_type._restore_frame(pickle.load(handle), data_source)
+        known = {'source': data_source, 'profiler': profiler, 'frame': frame}
+        refs = {}
+        for name in header['refs']:
+            if name in known:
+                refs[name] = known[name]
+            elif name.startswith('frame.'):
+                refs[name] = getattr(frame, name[len('frame.'):])
+            else:
+                refs[name] = None
+        state = _Unpickler(handle, refs).load()
+    _insight._ids = itertools.count(state['insight_id'])
+    random.setstate(state['random'])
+    np.random.set_state(state['numpy_random'])
+    engine = state['engine']
+    engine.source, engine.profiler = data_source, profiler
+    engine._resumed()
+    return engine, header['row']
+
+
+def resume_backtest(path, data_source, profiler=None, checkpoints=None):
+    '''Runs a backtest from a checkpoint to its end; returns the BacktestResult, identical to
+    that of the uninterrupted run. checkpoints is a CheckpointSchedule for the rest of the run.'''
+    engine, row = load_checkpoint(path, data_source, profiler)
+    engine.checkpoints = checkpoints
+    return engine._run(row)
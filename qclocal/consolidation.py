@@ -0,0 +1,333 @@
+'''Consolidation of the bar stream into coarser resolutions, one pass for all symbols.
+
+A TradeBarConsolidator pushed bar by bar costs a Python call per symbol and per bar for
+each resolution requested. The engine instead feeds the consolidators through a
+ConsolidationRouter, which at each step:
+
+    - pushes the bars of the step to consolidators that need every bar (identity
+      consolidators, and any other consolidator class), as before;
+    - advances one PeriodAggregator per requested period for the TradeBarConsolidators.
+      The bars of a period are already in the price frame, so the aggregator only
+      remembers the row each symbol's working bar began at. When a symbol's first bar of
+      a later period arrives, the same rule TradeBarConsolidator follows, the period's
+      OHLCV is reduced from the frame for every symbol completing it at that step and
+      emitted to their consolidators of the period.
+
+Steps inside a period cost a comparison per period, whatever the universe size. The
+consolidated bars equal those of pushing every bar, to the bit: the volume is summed in
+bar order and highs and lows compare as push does. WorkingBar is computed on request.
+Live mode feeds the same router one row at a time as its frame grows. Backtests that want
+the coarser bars as arrays in advance use consolidate_frame, which reduces a whole
+BarFrame in one vectorized pass.
+
+A backtest streaming its frame in chunks (see streaming.py) calls close_frame() before
+the rows of a chunk go away. The working bars still open are reduced to partial bars,
+and the next chunk continues them from its first row with the same push arithmetic.
+
+Working bars follow the consolidators. A symbol's working bar is dropped when the last
+consolidator aggregating it goes, so one added later starts from its first bar, as it
+would on its own. Consolidators sharing a symbol and period share its working bar.'''
+
+from datetime import datetime
+
+import numpy as np
+
+from .consolidators import TradeBarConsolidator
+from .data import BarFrame
+
+
+def bucket_starts(times, period):
+    '''Start of the period each time falls in, as int64 seconds. Periods are counted from
+    the Unix epoch, as TradeBarConsolidator rounds its bar times down; they start at
+    midnight only when the period divides a day evenly.'''
+    step = int(period.total_seconds())
+    seconds = np.asarray(times, 'datetime64[s]').astype(np.int64)
+    return seconds - seconds % step
+
+
+def consolidate_frame(frame, period, complete=True):
+    '''Aggregates every symbol of a BarFrame into bars of the period in one vectorized pass.
+
+    Args:
+        frame: The BarFrame to consolidate
+        period: timedelta of the consolidated bars
+        complete: Drop the last period, which the frame may not cover fully; consolidators
+            emit it only once a bar of the next period arrives
+    Returns:
+        BarFrame with one row per period that holds a bar, stamped at the period start'''
+    rows = len(frame.times)
+    if rows == 0:
+        return frame
+    buckets = bucket_starts(frame.times, period)
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], rows]
+    has_bar = frame.has_bar
+    index = np.arange(rows)[:, None]
+    # first and last row with a bar at or after / up to each row, per column
+    last = np.maximum.accumulate(np.where(has_bar, index, -1), axis=0)
+    first = np.minimum.accumulate(np.where(has_bar, index, rows)[::-1], axis=0)[::-1]
+    first_rows, last_rows = first[starts], last[ends - 1]
+    traded = first_rows < ends[:, None]
+    columns = np.arange(frame.close.shape[1])
+    open_ = np.where(traded, frame.open[np.minimum(first_rows, rows - 1), columns], np.nan)
+    close = np.where(traded, frame.close[np.maximum(last_rows, 0), columns], np.nan)
+    high = np.where(traded, np.fmax.reduceat(frame.high, starts, axis=0), np.nan)
+    low = np.where(traded, np.fmin.reduceat(frame.low, starts, axis=0), np.nan)
+    volume = np.where(traded, np.add.reduceat(np.nan_to_num(frame.volume), starts, axis=0), np.nan)
+    times = buckets[starts].astype('datetime64[s]')
+    if complete:
+        times, open_, high, low, close, volume = (array[:-1] for array in (times, open_, high, low, close, volume))
+    return BarFrame(times, frame.symbols, open_, high, low, close, volume)
+
+
+def _push_extreme(values, greater):
+    '''High (greater=True) or low of a working bar the way TradeBarConsolidator.push keeps it:
+    a value replaces the working one only when it compares greater (less), so NaN never does'''
+    extreme = values[0]
+    for value in values[1:]:
+        if (value > extreme) if greater else (value < extreme):
+            extreme = value
+    return extreme
+
+
+class PeriodAggregator:
+    '''Working bars of one period for every column of the price frame.
+
+    A working bar is only the row it began at. The bars since then are still in the frame,
+    so the OHLCV of a period is computed from a slice of the frame when the period
+    completes, for all the symbols completing it at once. Steps inside a period cost
+    nothing once every symbol has had its first bar of the period.
+
+    Args:
+        period: timedelta of the consolidated bars
+        columns: Number of columns of the frame'''
+
+    def __init__(self, period, columns):
+        self.period = period
+        self.step = int(period.total_seconds())
+        self.start_row = np.full(columns, -1, np.intp)
+        self.start_bucket = np.zeros(columns, np.int64)
+        self._bucket = None
+        # columns whose working bar is from an earlier period than the current step's
+        self._pending = np.empty(0, np.intp)
+        # subscribed columns waiting for their first bar
+        self._waiting = np.empty(0, np.intp)
+        self._frame = None
+        self._row = -1
+        # column: [start row, end row, OHLCV] of working bars asked for between steps
+        self._working = {}
+        # OHLCV of working bars begun in an earlier frame, continued from row 0 of this one
+        self._carried = np.zeros((5, columns))
+        self._carries = np.zeros(columns, bool)
+
+    def subscribe(self, columns):
+        '''Starts working bars for the columns from their next bar'''
+        columns = np.asarray(columns, np.intp)
+        self._waiting = np.union1d(self._waiting, columns[self.start_row[columns] < 0])
+
+    def reset(self, columns):
+        '''Drops the working bars of the columns'''
+        columns = np.asarray(columns, np.intp)
+        self.start_row[columns] = -1
+        self._carries[columns] = False
+        self._pending = np.setdiff1d(self._pending, columns)
+        self._waiting = np.setdiff1d(self._waiting, columns)
+
+    def working_bar(self, column):
+        '''(start, open, high, low, close, volume) of the column's working bar, or None'''
+        start_row = int(self.start_row[column])
+        if start_row < 0:
+            return None
+        end = self._row + 1
+        cached = self._working.get(column)
+        if cached is None or cached[0] != start_row or cached[1] > end:
+            carried = self._carried[:, column].tolist() if self._carries[column] else None
+            cached = self._working[column] = [start_row, start_row, carried]
+        if cached[1] < end:
+            # extends the bar the way TradeBarConsolidator.push does, bar by bar
+            frame, rows = self._frame, slice(cached[1], end)
+            bar = cached[2]
+            for present, open, high, low, close, volume in zip(
+                    frame.has_bar[rows, column].tolist(), frame.open[rows, column].tolist(),
+                    frame.high[rows, column].tolist(), frame.low[rows, column].tolist(),
+                    frame.close[rows, column].tolist(), frame.volume[rows, column].tolist()):
+                if not present:
+                    continue
+                if bar is None:
+                    bar = [open, high, low, close, volume]
+                    continue
+                if high > bar[1]:
+                    bar[1] = high
+                if low < bar[2]:
+                    bar[2] = low
+                bar[3] = close
+                bar[4] += volume
+            cached[1:] = end, bar
+        start = np.datetime64(int(self.start_bucket[column]), 's').astype(datetime)
+        return (start,) + tuple(cached[2])
+
+    def feed(self, frame, row, stamp):
+        '''Advances to a row of the frame whose bars start at stamp (int64 seconds). Returns
+        (columns, starts, bars) of the periods completed by the row, bars being a (5 x n)
+        OHLCV array, or None if none completes.'''
+        self._frame, self._row = frame, row
+        bucket = stamp - stamp % self.step
+        if bucket != self._bucket:
+            self._bucket = bucket
+            self._pending = np.flatnonzero(self.start_row >= 0)
+        emitted = None
+        if len(self._pending):
+            traded = frame.has_bar[row, self._pending]
+            if traded.any():
+                done = self._pending[traded]
+                self._pending = self._pending[~traded]
+                emitted = done, self.start_bucket[done], self._aggregate(frame, done, row)
+                self._carries[done] = False
+                self.start_row[done] = row
+                self.start_bucket[done] = bucket
+        if len(self._waiting):
+            traded = frame.has_bar[row, self._waiting]
+            if traded.any():
+                started = self._waiting[traded]
+                self._waiting = self._waiting[~traded]
+                self.start_row[started] = row
+                self.start_bucket[started] = bucket
+        return emitted
+
+    def close_frame(self):
+        '''Reduces the open working bars to partial bars before the frame's rows go away;
+        the next frame is fed from its first row and continues them there'''
+        columns = np.flatnonzero(self.start_row >= 0)
+        if len(columns) and self._frame is not None:
+            self._carried[:, columns] = self._aggregate(self._frame, columns, self._row + 1)
+            self._carries[columns] = True
+            self.start_row[columns] = 0
+        self._frame, self._row = None, -1
+        self._working = {}
+
+    def _aggregate(self, frame, columns, end):
+        '''OHLCV of the working bars of the columns over their rows up to end (exclusive),
+        with the arithmetic of TradeBarConsolidator.push, continuing any carried bars'''
+        bars = np.empty((5, len(columns)))
+        starts = self.start_row[columns]
+        for start in np.unique(starts).tolist():
+            group = np.flatnonzero(starts == start)
+            selected = columns[group]
+            carries = self._carries[selected]
+            if start == end:
+                # only carried bars begin before the first row of the frame
+                bars[:, group] = self._carried[:, selected]
+                continue
+            rows = slice(start, end)
+            present = frame.has_bar[rows, selected]
+            high = frame.high[rows, selected]
+            low = frame.low[rows, selected]
+            last = end - 1 - np.argmax(present[::-1], axis=0)
+            volume = np.where(present, frame.volume[rows, selected], 0.0)
+            bars[0, group] = frame.open[start, selected]
+            bars[1, group] = np.max(np.where(present, high, -np.inf), axis=0)
+            bars[2, group] = np.min(np.where(present, low, np.inf), axis=0)
+            bars[3, group] = frame.close[last, selected]
+            # a running total in row order, as the working bar adds each volume
+            bars[4, group] = np.cumsum(volume, axis=0)[-1]
+            if carries.any():
+                continued = np.flatnonzero(carries)
+                carried = self._carried[:, selected[continued]]
+                bars[0, group[continued]] = carried[0]
+                # a NaN extreme stays, as it does in push
+                bars[1, group[continued]] = np.maximum(carried[1], bars[1, group[continued]])
+                bars[2, group[continued]] = np.minimum(carried[2], bars[2, group[continued]])
+                bars[3, group[continued]] = np.where(present[:, continued].any(axis=0), bars[3, group[continued]],
+                                                     carried[3])
+                bars[4, group[continued]] = np.cumsum(np.vstack([carried[4], volume[:, continued]]), axis=0)[-1]
+            unusual = np.isnan(np.where(present, high, 0.0)).any(axis=0) | np.isnan(np.where(present, low, 0.0)).any(axis=0)
+            for position in np.flatnonzero(unusual).tolist():
+                mask = present[:, position]
+                highs, lows = high[mask, position].tolist(), low[mask, position].tolist()
+                if carries[position]:
+                    column = selected[position]
+                    highs, lows = [self._carried[1, column]] + highs, [self._carried[2, column]] + lows
+                bars[1, group[position]] = _push_extreme(highs, True)
+                bars[2, group[position]] = _push_extreme(lows, False)
+        return bars
+
+
+class ConsolidationRouter:
+    '''Feeds the consolidators of the subscription manager from the rows of a price frame'''
+
+    def __init__(self, columns):
+        self.columns = columns
+        self.aggregators = {}
+        self._version = None
+        self._subscribers = {}
+        self._raw = {}
+
+    def route(self, subscriptions, frame):
+        '''Rebuilds the routes from the subscriptions if they changed'''
+        if subscriptions.version == self._version:
+            return
+        raw, periodic = {}, {}
+        for symbol, consolidators in subscriptions.items():
+            column = frame.column(symbol)
+            if column is None:
+                continue
+            for consolidator in consolidators:
+                if type(consolidator) is TradeBarConsolidator:
+                    periodic.setdefault(consolidator.period, {}).setdefault(column, []).append(consolidator)
+                else:
+                    raw.setdefault(column, []).append(consolidator)
+        for period, subscribers in self._subscribers.items():
+            current = periodic.get(period, {})
+            dropped = []
+            for column, consolidators in subscribers.items():
+                kept = current.get(column, ())
+                # a working bar lives as long as one of its consolidators does
+                if not any(consolidator in kept for consolidator in consolidators):
+                    dropped.append(column)
+                for consolidator in consolidators:
+                    if consolidator not in kept:
+                        consolidator._aggregator = None
+            if dropped:
+                self.aggregators[period].reset(dropped)
+        for period, subscribers in periodic.items():
+            aggregator = self.aggregators.get(period)
+            if aggregator is None:
+                aggregator = self.aggregators[period] = PeriodAggregator(period, self.columns)
+            aggregator.subscribe(list(subscribers))
+            for column, consolidators in subscribers.items():
+                for consolidator in consolidators:
+                    consolidator._aggregator = (aggregator, column)
+        self._subscribers = periodic
+        self._raw = raw
+        self._raw_columns = np.array(sorted(raw), np.intp)
+        self._version = subscriptions.version
+
+    def close_frame(self):
+        '''Carries the working bars over to the next frame of a streamed backtest'''
+        for aggregator in self.aggregators.values():
+            aggregator.close_frame()
+
+    def feed(self, frame, row, time, end_time):
+        '''Sends the bars of one row of the frame to the consolidators'''
+        if self._raw:
+            columns = self._raw_columns
+            columns = columns[frame.has_bar[row, columns]]
+            raw = self._raw
+            bars = zip(columns.tolist(), frame.open[row, columns].tolist(), frame.high[row, columns].tolist(),
+                       frame.low[row, columns].tolist(), frame.close[row, columns].tolist(),
+                       frame.volume[row, columns].tolist())
+            for column, open, high, low, close, volume in bars:
+                for consolidator in raw[column]:
+                    consolidator.push(time, end_time, open, high, low, close, volume)
+        if not self._subscribers:
+            return
+        stamp = int(frame.times[row].astype(np.int64))
+        for period, subscribers in self._subscribers.items():
+            emitted = self.aggregators[period].feed(frame, row, stamp)
+            if emitted is None:
+                continue
+            done, starts, bars = emitted
+            starts = starts.astype('datetime64[s]').astype(datetime).tolist()
+            for column, start, open, high, low, close, volume in zip(done.tolist(), starts, *bars.tolist()):
+                for consolidator in subscribers[column]:
+                    consolidator._emit(start, start + period, open, high, low, close, volume)
@@ -0,0 +1,134 @@
+'''TradeBar and the consolidators indicators are registered against.'''
+
+from datetime import timedelta
+
+import numpy as np
+
+from .indicators.base import TradeBarIndicator
+
+
+class TradeBar:
+    '''OHLCV bar. Value is the close, Time the bar start and EndTime the bar end.'''
+
+    __slots__ = ('Symbol', 'Time', 'EndTime', 'Open', 'High', 'Low', 'Close', 'Volume')
+
+    def __init__(self, time, symbol, open, high, low, close, volume, period=timedelta(days=1)):
+        self.Symbol = symbol
+        self.Time = time
+        self.EndTime = time + period
+        self.Open = open
+        self.High = high
+        self.Low = low
+        self.Close = close
+        self.Volume = volume
+
+    @property
+    def Value(self):
+        return self.Close
+
+    @property
+    def Price(self):
+        return self.Close
+
+    @property
+    def Period(self):
+        return self.EndTime - self.Time
+
+    def __repr__(self):
+        return '{} {} O:{} H:{} L:{} C:{} V:{}'.format(self.Symbol, self.EndTime, self.Open, self.High, self.Low, self.Close, self.Volume)
+
+
+class DataConsolidator:
+    '''Base consolidator.
+
+    DataConsolidated holds callables invoked with (sender, bar). Indicators registered
+    without a selector are kept apart and receive (end_time, close), or the bar fields for
+    TradeBarIndicators, directly so the common case does not build a bar object per update.'''
+
+    def __init__(self, symbol=None):
+        self.Symbol = symbol
+        self.DataConsolidated = []
+        self.value_subscribers = []
+        self.bar_subscribers = []
+        self.Consolidated = None
+
+    def subscribe_indicator(self, indicator):
+        if isinstance(indicator, TradeBarIndicator):
+            self.bar_subscribers.append(indicator)
+        else:
+            self.value_subscribers.append(indicator)
+
+    def unsubscribe_indicator(self, indicator):
+        for subscribers in (self.value_subscribers, self.bar_subscribers):
+            if indicator in subscribers:
+                subscribers.remove(indicator)
+
+    def Update(self, bar):
+        '''Feeds a bar object into the consolidator'''
+        self.push(bar.Time, bar.EndTime, bar.Open, bar.High, bar.Low, bar.Close, bar.Volume)
+
+    def push(self, time, end_time, open, high, low, close, volume):
+        raise NotImplementedError
+
+    def _emit(self, time, end_time, open, high, low, close, volume):
+        for indicator in self.value_subscribers:
+            indicator.Update(end_time, close)
+        for indicator in self.bar_subscribers:
+            indicator.update_bar(end_time, open, high, low, close, volume)
+        if self.DataConsolidated:
+            bar = TradeBar(time, self.Symbol, open, high, low, close, volume, end_time - time)
+            self.Consolidated = bar
+            for handler in self.DataConsolidated:
+                handler(self, bar)
+
+
+class IdentityDataConsolidator(DataConsolidator):
+    '''Forwards every bar unchanged; used when the requested resolution matches the data'''
+
+    def push(self, time, end_time, open, high, low, close, volume):
+        self._emit(time, end_time, open, high, low, close, volume)
+
+
+class TradeBarConsolidator(DataConsolidator):
+    '''Aggregates bars into fixed periods counted from the Unix epoch, so a period starts
+    at midnight only when it divides a day evenly (see consolidation.bucket_starts).
+
+    The consolidated bar is emitted when the first bar of the following period arrives.'''
+
+    def __init__(self, period, symbol=None):
+        super().__init__(symbol)
+        self.period = period
+        self._step = np.timedelta64(int(period.total_seconds()), 's')
+        self._working = None
+        # (PeriodAggregator, column) while the engine aggregates this consolidator's bars
+        self._aggregator = None
+
+    def _bucket(self, time):
+        stamp = np.datetime64(time, 's')
+        return (stamp - (stamp - np.datetime64(0, 's')) % self._step).astype(object)
+
+    def push(self, time, end_time, open, high, low, close, volume):
+        working = self._working
+        if working is not None and time >= working[0] + self.period:
+            self._emit(working[0], working[0] + self.period, *working[1:])
+            working = None
+        if working is None:
+            self._working = [self._bucket(time), open, high, low, close, volume]
+            return
+        if high > working[2]:
+            working[2] = high
+        if low < working[3]:
+            working[3] = low
+        working[4] = close
+        working[5] += volume
+
+    @property
+    def WorkingBar(self):
+        working = self._working
+        if working is None and self._aggregator is not None:
+            aggregator, column = self._aggregator
+            working = aggregator.working_bar(column)
+        if working is None:
+            return None
+        time, open, high, low, close, volume = working
+        return TradeBar(time, self.Symbol, open, high, low, close, volume, self.period)
@@ -0,0 +1,309 @@
+'''Local bar data: per-symbol file loading and the aligned (time x symbol) matrix
+the backtest engine iterates over.'''
+
+import csv
+import json
+import os
+from collections import namedtuple
+from datetime import datetime
+
+import numpy as np
+
+from .enums import Resolution, resolution_to_timedelta
+
+FIELDS = ('open', 'high', 'low', 'close', 'volume')
+
+_TIME_COLUMNS = ('date', 'time', 'datetime', 'timestamp')
+
+BarSeries = namedtuple('BarSeries', ('times',) + FIELDS)
+BarSeries.__doc__ = '''Bars of a single symbol as parallel arrays, times in datetime64[s]'''
+
+
+def to_datetime64(value):
+    '''Converts a datetime/date/string/datetime64 into datetime64[s]'''
+    if value is None:
+        return None
+    return np.datetime64(value, 's')
+
+
+def empty_series():
+    return BarSeries(np.empty(0, 'datetime64[s]'), *(np.empty(0) for _ in FIELDS))
+
+
+def slice_series(series, start=None, end=None):
+    '''Returns the bars with start <= time <= end'''
+    lo = 0 if start is None else np.searchsorted(series.times, to_datetime64(start), 'left')
+    hi = len(series.times) if end is None else np.searchsorted(series.times, to_datetime64(end), 'right')
+    return BarSeries(*(column[lo:hi] for column in series))
+
+
+def resample(series, period):
+    '''Aggregates bars into buckets of the given timedelta, time stamped at the bucket start.
+    Daily buckets follow calendar dates, which is what equity daily bars use.'''
+    if len(series.times) == 0:
+        return series
+    step = np.timedelta64(int(period.total_seconds()), 's')
+    if step == np.timedelta64(1, 'D'):
+        buckets = series.times.astype('datetime64[D]').astype('datetime64[s]')
+    else:
+        buckets = series.times - (series.times - np.datetime64(0, 's')) % step
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], len(buckets)] - 1
+    return BarSeries(
+        buckets[starts],
+        series.open[starts],
+        np.maximum.reduceat(series.high, starts),
+        np.minimum.reduceat(series.low, starts),
+        series.close[ends],
+        np.add.reduceat(series.volume, starts),
+    )
+
+
+def read_csv(path):
+    '''Reads a bar file with a header row naming a time column and open/high/low/close/volume'''
+    with open(path, newline='') as handle:
+        reader = csv.reader(handle)
+        header = [name.strip().lower() for name in next(reader)]
+        rows = [row for row in reader if row]
+    time_column = next((i for i, name in enumerate(header) if name in _TIME_COLUMNS), None)
+    if time_column is None:
+        raise ValueError('{}: no time column, expected one of {}'.format(path, _TIME_COLUMNS))
+    columns = []
+    for field in FIELDS:
+        if field not in header:
+            raise ValueError('{}: missing column {!r}'.format(path, field))
+        index = header.index(field)
+        columns.append(np.array([row[index] for row in rows], dtype=np.float64))
+    times = np.array([row[time_column].strip() for row in rows], dtype='datetime64[s]')
+    return _sorted_series(times, columns)
+
+
+def read_parquet(path):
+    '''Reads a bar file in Parquet format, requires pyarrow'''
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError('reading {} requires pyarrow: pip install pyarrow'.format(path))
+    table = pq.read_table(path)
+    names = {name.lower(): name for name in table.column_names}
+    time_name = next((names[name] for name in _TIME_COLUMNS if name in names), None)
+    if time_name is None:
+        raise ValueError('{}: no time column, expected one of {}'.format(path, _TIME_COLUMNS))
+    times = np.asarray(table.column(time_name).to_numpy(), dtype='datetime64[s]')
+    columns = [np.asarray(table.column(names[field]).to_numpy(), dtype=np.float64) for field in FIELDS]
+    return _sorted_series(times, columns)
+
+
+def _sorted_series(times, columns):
+    if len(times) > 1 and np.any(times[1:] < times[:-1]):
+        order = np.argsort(times, kind='stable')
+        times = times[order]
+        columns = [column[order] for column in columns]
+    return BarSeries(times, *columns)
+
+
+class DataSource:
+    '''Base class for bar providers. Subclasses implement read(); history and
+    frame loading are derived from it.'''
+
+    resolution = Resolution.Daily
+
+    def read(self, symbol, start=None, end=None):
+        '''Loads the bars of one symbol between start and end inclusive'''
+        raise NotImplementedError
+
+    def history(self, symbol, end, bar_count, resolution=None):
+        '''Returns up to bar_count bars strictly before end at the requested resolution'''
+        resolution = self.resolution if resolution is None else Resolution(resolution)
+        series = self.read(symbol, end=to_datetime64(end) - np.timedelta64(1, 's'))
+        if resolution > self.resolution:
+            series = resample(series, resolution_to_timedelta(resolution))
+        return BarSeries(*(column[-bar_count:] if bar_count else column[:0] for column in series))
+
+    def load_frame(self, symbols, start=None, end=None):
+        '''Loads and aligns the symbols into one BarFrame'''
+        return BarFrame.from_series(symbols, [self.read(symbol, start, end) for symbol in symbols])
+
+    def frame_chunks(self, symbols, start=None, end=None, rows=65536, carry=None):
+        '''The rows of load_frame(symbols, start, end) as consecutive BarFrames of at most
+        `rows` rows. close_filled runs on from one chunk to the next, starting from carry
+        (the close_filled row before start) when given.
+
+        This loads the whole window and yields slices of it; sources that can read a
+        window piece by piece (BarStore) override it to hold one chunk at a time.'''
+        frame = self.load_frame(symbols, start, end)
+        if carry is not None:
+            frame = BarFrame(frame.times, frame.symbols, *(getattr(frame, field) for field in FIELDS),
+                             frame.has_bar, forward_fill(frame.close, carry))
+        for lo in range(0, len(frame.times), rows):
+            yield frame.take(slice(lo, lo + rows))
+
+    def cache_identity(self):
+        '''String identifying the data this source serves, used to key persistent caches.
+        None (the default) keeps caches of this source in memory only.'''
+        return None
+
+    def data_version(self, symbol):
+        '''Changes whenever the stored bars of the symbol change; None if they never do'''
+        return None
+
+
+class LocalDataSource(DataSource):
+    '''Serves bars from a directory holding one <TICKER>.csv or <TICKER>.parquet per symbol.
+
+    Every call goes back to the file; the source itself keeps no state between requests.'''
+
+    def __init__(self, root, resolution=Resolution.Daily):
+        self.root = root
+        self.resolution = Resolution(resolution)
+        self._files = None
+
+    def _path(self, ticker):
+        if self._files is None:
+            self._files = {}
+            for name in os.listdir(self.root):
+                stem, extension = os.path.splitext(name)
+                if extension.lower() in ('.csv', '.parquet'):
+                    self._files.setdefault(stem.upper(), os.path.join(self.root, name))
+        path = self._files.get(str(ticker).upper())
+        if path is None:
+            raise FileNotFoundError('no data file for {} in {}'.format(ticker, self.root))
+        return path
+
+    def read(self, symbol, start=None, end=None):
+        path = self._path(symbol)
+        series = read_parquet(path) if path.lower().endswith('.parquet') else read_csv(path)
+        return slice_series(series, start, end)
+
+    def cache_identity(self):
+        return 'local:{}:{}'.format(os.path.abspath(self.root), self.resolution.name)
+
+    def data_version(self, symbol):
+        status = os.stat(self._path(symbol))
+        return '{}:{}'.format(status.st_mtime_ns, status.st_size)
+
+
+class FrameDataSource(DataSource):
+    '''Serves bars out of an already loaded (possibly memory-mapped) BarFrame.
+
+    Frames handed to the engine are row slices of the shared matrices, so several
+    backtests over the same data do not copy it.'''
+
+    def __init__(self, frame, resolution=Resolution.Daily):
+        self.frame = frame
+        self.resolution = Resolution(resolution)
+
+    def read(self, symbol, start=None, end=None):
+        if self.frame.column(symbol) is None:
+            raise KeyError('{} is not in the shared frame'.format(symbol))
+        lo, hi = self.frame.rows(start, end)
+        return self.frame.series(symbol, lo, hi)
+
+    def load_frame(self, symbols, start=None, end=None):
+        lo, hi = self.frame.rows(start, end)
+        return self.frame.take(slice(lo, hi), symbols)
+
+
+class BarFrame:
+    '''OHLCV for many symbols aligned on one time index.
+
+    Each field is a (time x symbol) float64 matrix with NaN where a symbol has no bar.
+    `close_filled` carries the last traded price forward and is what holdings are valued
+    at; `close_valuation` is the same with NaN replaced by zero.'''
+
+    MATRICES = FIELDS + ('has_bar', 'close_filled', 'close_valuation')
+
+    def __init__(self, times, symbols, open, high, low, close, volume,
+                 has_bar=None, close_filled=None, close_valuation=None):
+        self.times = times
+        self.symbols = list(symbols)
+        self.open = open
+        self.high = high
+        self.low = low
+        self.close = close
+        self.volume = volume
+        self._columns = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self.has_bar = ~np.isnan(close) if has_bar is None else has_bar
+        self.close_filled = forward_fill(close) if close_filled is None else close_filled
+        self.close_valuation = np.nan_to_num(self.close_filled) if close_valuation is None else close_valuation
+
+    @classmethod
+    def from_series(cls, symbols, series):
+        '''Aligns per-symbol BarSeries on the union of their time stamps'''
+        times = np.unique(np.concatenate([s.times for s in series])) if series else np.empty(0, 'datetime64[s]')
+        matrices = [np.full((len(times), len(series)), np.nan) for _ in FIELDS]
+        for j, s in enumerate(series):
+            rows = np.searchsorted(times, s.times)
+            for matrix, column in zip(matrices, s[1:]):
+                matrix[rows, j] = column
+        return cls(times, symbols, *matrices)
+
+    @property
+    def shape(self):
+        return self.close.shape
+
+    def column(self, symbol):
+        '''Column index of the symbol, or None if the frame does not hold it'''
+        return self._columns.get(symbol)
+
+    def rows(self, start=None, end=None):
+        '''Row range [lo, hi) of the bars with start <= time <= end'''
+        lo = 0 if start is None else int(np.searchsorted(self.times, to_datetime64(start), 'left'))
+        hi = len(self.times) if end is None else int(np.searchsorted(self.times, to_datetime64(end), 'right'))
+        return lo, hi
+
+    def take(self, rows=slice(None), symbols=None):
+        '''Sub-frame for a row slice and optional symbol list. Without a symbol list (or with
+        all symbols in frame order) the matrices are views rather than copies.'''
+        if symbols is None or list(symbols) == self.symbols:
+            return BarFrame(self.times[rows], self.symbols, *(getattr(self, name)[rows] for name in self.MATRICES))
+        columns = np.array([self._columns[symbol] for symbol in symbols], dtype=np.intp)
+        # a slice and an index array copy column-major; the engine's per-row dot products
+        # must see the same row-major layout as a frame loaded for these symbols alone
+        return BarFrame(self.times[rows], symbols,
+                        *(np.ascontiguousarray(getattr(self, name)[rows][:, columns]) for name in self.MATRICES))
+
+    def datetime(self, row):
+        return self.times[row].astype(datetime)
+
+    def series(self, symbol, start_row=0, end_row=None):
+        '''Bars of one symbol between two rows with the empty rows dropped'''
+        j = self._columns[symbol]
+        rows = slice(start_row, end_row)
+        mask = self.has_bar[rows, j]
+        return BarSeries(self.times[rows][mask], *(getattr(self, f)[rows, j][mask] for f in FIELDS))
+
+    def save(self, directory):
+        '''Writes the frame as .npy files that open() can memory-map'''
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, 'times.npy'), self.times)
+        for name in self.MATRICES:
+            np.save(os.path.join(directory, name + '.npy'), np.ascontiguousarray(getattr(self, name)))
+        with open(os.path.join(directory, 'symbols.json'), 'w') as handle:
+            json.dump([symbol.Value for symbol in self.symbols], handle)
+
+    @classmethod
+    def open(cls, directory, mmap_mode='r'):
+        '''Opens a saved frame; with mmap_mode the matrices stay on disk and are shared
+        through the page cache by every process that opens them'''
+        from .symbol import Symbol
+
+        with open(os.path.join(directory, 'symbols.json')) as handle:
+            symbols = [Symbol.Create(ticker) for ticker in json.load(handle)]
+        times = np.load(os.path.join(directory, 'times.npy'))
+        matrices = [np.load(os.path.join(directory, name + '.npy'), mmap_mode=mmap_mode) for name in cls.MATRICES]
+        return cls(times, symbols, *matrices)
+
+
+def forward_fill(matrix, initial=None):
+    '''Carries the last non NaN value of every column forward, from the row initial before
+    the first if given'''
+    if initial is not None:
+        return forward_fill(np.vstack([initial, matrix]))[1:]
+    mask = np.isnan(matrix)
+    if not mask.any():
+        return matrix.copy()
+    rows = np.where(~mask, np.arange(matrix.shape[0])[:, None], 0)
+    np.maximum.accumulate(rows, axis=0, out=rows)
+    filled = matrix[rows, np.arange(matrix.shape[1])]
+    return filled
@@ -0,0 +1,494 @@
+'''Local backtest engine.
+
+Prices for the whole universe are loaded once into a (time x symbol) BarFrame. Each
+step points the portfolio at one row of that matrix, feeds the consolidators of the
+symbols that have a bar (see consolidation.py) and runs the framework pipeline
+(alpha -> portfolio construction -> risk -> execution) on the algorithm.'''
+
+import time as _time
+from datetime import datetime
+
+import numpy as np
+
+from .algorithm import QCAlgorithm
+from .checkpoint import frame_digest, write_checkpoint
+from .consolidation import ConsolidationRouter
+from .consolidators import TradeBar
+from .data import BarFrame, to_datetime64
+from .enums import Resolution, resolution_to_timedelta
+from .framework.insight import InsightBatch
+from .framework.selection import SecurityChanges
+from .fills import FillSimulator
+from .orders import OrderLedger, OrderStatus, OrderTicket
+from .securities import Security
+from .statistics import EquityStore, RunningStatistics
+
+_BARS_PER_YEAR = {
+    Resolution.Daily: 252,
+    Resolution.Hour: 252 * 7,
+    Resolution.Minute: 252 * 390,
+    Resolution.Second: 252 * 390 * 60,
+}
+
+
+class Slice:
+    '''Data of one time step. Bars are built on demand from the price matrix.'''
+
+    __slots__ = ('_engine', '_row', 'Time')
+
+    def __init__(self, engine, row, time):
+        self._engine = engine
+        self._row = row
+        self.Time = time
+
+    @property
+    def frame(self):
+        '''The engine's BarFrame; batched models read the current row from it directly'''
+        return self._engine.frame
+
+    @property
+    def row(self):
+        return self._row
+
+    def _column(self, symbol):
+        frame = self._engine.frame
+        column = frame.column(symbol)
+        if column is None or not frame.has_bar[self._row, column]:
+            return None
+        return column
+
+    def ContainsKey(self, symbol):
+        return self._column(symbol) is not None
+
+    __contains__ = ContainsKey
+
+    def __getitem__(self, symbol):
+        column = self._column(symbol)
+        if column is None:
+            raise KeyError(symbol)
+        return self._engine.bar(self._row, column)
+
+    def get(self, symbol, default=None):
+        column = self._column(symbol)
+        return default if column is None else self._engine.bar(self._row, column)
+
+    @property
+    def Keys(self):
+        frame = self._engine.frame
+        return [frame.symbols[j] for j in np.flatnonzero(frame.has_bar[self._row])]
+
+    @property
+    def Bars(self):
+        return {symbol: self[symbol] for symbol in self.Keys}
+
+    @property
+    def Count(self):
+        return int(self._engine.frame.has_bar[self._row].sum())
+
+    def __len__(self):
+        return self.Count
+
+
+class BacktestResult:
+    '''Equity curve, orders and summary statistics of a finished backtest
+
+    Args:
+        algorithm: The algorithm that ran
+        store: statistics.EquityStore of the run's equity curve
+        orders: OrderLedger of the fills
+        runtime: Seconds the run took
+        statistics: statistics.RunningStatistics updated through the run'''
+
+    def __init__(self, algorithm, store, orders, runtime, statistics):
+        self.algorithm = algorithm
+        self.store = store
+        self.times = store.times
+        self.equity = store.equity
+        self.orders = orders
+        self.runtime = runtime
+        self.running = statistics
+        self.statistics = statistics.as_dict()
+
+    @property
+    def contributions(self):
+        '''{symbol: profit} of every symbol traded or held, realized + unrealized - fees'''
+        values = self.running.contributions()
+        involved = (self.running.traded_by_column != 0) | (values != 0)
+        return {self.store.symbols[column]: value
+                for column, value in zip(np.flatnonzero(involved).tolist(), values[involved].tolist())}
+
+    def summary(self):
+        lines = ['{:<24}{}'.format(name, format_statistic(name, value)) for name, value in self.statistics.items()]
+        lines.append('{:<24}{:.3f}s'.format('Runtime', self.runtime))
+        return '\n'.join(lines)
+
+
+_PERCENT_STATISTICS = ('Net Profit', 'Drawdown')
+
+
+def format_statistic(name, value):
+    if name in _PERCENT_STATISTICS:
+        return '{:.3%}'.format(value)
+    if isinstance(value, float):
+        return '{:.3f}'.format(value) if abs(value) < 1000 else '{:.2f}'.format(value)
+    return str(value)
+
+
+def compute_statistics(equity, orders, starting_equity, bars_per_year=252):
+    '''The statistics RunningStatistics keeps, computed over a whole equity curve and
+    the orders (an OrderLedger or OrderEvents)'''
+    if len(equity) == 0:
+        return {}
+    start, end = float(starting_equity), float(equity[-1])
+    equity = np.r_[start, equity]
+    # steps from no capital have no return, and no drawdown below a zero peak
+    returns = np.divide(np.diff(equity), equity[:-1], out=np.zeros(len(equity) - 1), where=equity[:-1] != 0)
+    deviation = returns.std() if len(returns) else 0.0
+    sharpe = 0.0 if deviation == 0 else returns.mean() / deviation * np.sqrt(bars_per_year)
+    peaks = np.maximum.accumulate(equity)
+    drawdown = float(np.max(np.divide(peaks - equity, peaks, out=np.zeros(len(equity)), where=peaks != 0)))
+    if not isinstance(orders, OrderLedger):
+        orders = _ledger(orders)
+    # summed in order, as a running total over the fills would be
+    traded = sum(np.abs(orders.fill_quantity * orders.fill_price).tolist())
+    mean = np.mean(equity)
+    return {
+        'Start Equity': start,
+        'End Equity': end,
+        'Net Profit': end / start - 1 if start else 0.0,
+        'Sharpe Ratio': float(sharpe),
+        'Drawdown': drawdown,
+        'Total Orders': len(orders),
+        'Total Fees': float(sum(orders.fee.tolist())),
+        'Turnover': float(traded / mean) if mean else 0.0,
+    }
+
+
+def _ledger(events):
+    '''OrderLedger of OrderEvent objects, for statistics over orders recorded elsewhere'''
+    events = list(events)
+    symbols = [event.Symbol for event in events]
+    ledger = OrderLedger(symbols, max(len(events), 1))
+    for column, event in enumerate(events):
+        ledger.append(event.UtcTime, [column], [event.FillQuantity], [event.FillQuantity], [event.FillPrice],
+                      [event.OrderFee], event.Tag)
+    return ledger
+
+
+class BacktestEngine:
+    '''Runs QCAlgorithm subclasses against a data source
+
+    Args:
+        data_source: The DataSource the bars are read from
+        fee_model: Commission model, InteractiveBrokersFeeModel by default
+        slippage_model: Slippage model of the fills (see fills.py); None for none
+        volume_model: Volume participation model capping fills; None fills completely
+        profiler: profiling.StageProfiler timing the pipeline stages; None for none
+        record_positions: Keep the holdings of every symbol at each step in the equity store'''
+
+    def __init__(self, data_source, fee_model=None, slippage_model=None, volume_model=None, profiler=None,
+                 record_positions=False):
+        self.source = data_source
+        self.resolution = Resolution(data_source.resolution)
+        self.fill_simulator = FillSimulator(fee_model, slippage_model, volume_model)
+        self.fee_model = self.fill_simulator.fee_model
+        self.profiler = profiler
+        self.record_positions = record_positions
+        self.algorithm = None
+        self.frame = None
+        self.orders = OrderLedger()
+        self.statistics = None
+        self.equity_store = None
+        self.checkpoints = None
+        self.window = None
+        self._order_events = False
+        self._row = 0
+
+    def run(self, algorithm, checkpoints=None):
+        '''Initializes and backtests the algorithm (class or instance); returns a BacktestResult.
+        checkpoints is a checkpoint.CheckpointSchedule to write checkpoints on, or None.'''
+        started = _time.perf_counter()
+        symbols = self._initialize(algorithm)
+        algorithm = self.algorithm
+        start = to_datetime64(algorithm.StartDate)
+        end = to_datetime64(algorithm.EndDate) + np.timedelta64(86399, 's')
+        self.window = symbols, start, end
+        frame = self.source.load_frame(symbols, start, end)
+        self._attach(frame)
+        self._track(len(frame.times))
+        self.checkpoints = checkpoints
+        return self._run(0, started)
+
+    def _run(self, first, started=None):
+        '''Runs the steps from row first to the end of the frame; returns the BacktestResult'''
+        started = _time.perf_counter() if started is None else started
+        if self.profiler is not None:
+            self.profiler.attach(self)
+        try:
+            self._run_frame(first)
+        finally:
+            if self.profiler is not None:
+                self.profiler.detach()
+        self.algorithm.OnEndOfAlgorithm()
+        return BacktestResult(self.algorithm, self.equity_store, self.orders, _time.perf_counter() - started,
+                              self.statistics)
+
+    def _run_frame(self, first):
+        '''Runs the steps of the rows of the frame from row first on'''
+        portfolio = self.algorithm.Portfolio
+        statistics, store, checkpoints = self.statistics, self.equity_store, self.checkpoints
+        end_times = self.frame.times + self._span
+        positions = portfolio.quantity if self.record_positions else None
+        for row in range(first, len(self.frame.times)):
+            self._step(row)
+            value = portfolio.TotalPortfolioValue
+            store.append(end_times[row], value, positions)
+            statistics.update(value)
+            if checkpoints is not None and checkpoints.due(end_times[row]):
+                self.save_checkpoint(checkpoints.path, row + 1)
+                checkpoints.written += 1
+
+    # checkpoints (see checkpoint.py)
+
+    def save_checkpoint(self, path, row):
+        '''Writes the state of the run to path, row being the next step to run'''
+        profiler = self.profiler
+        attached = profiler is not None and profiler._engine is self
+        # the stage wrappers are not part of the state
+        if attached:
+            profiler.detach()
+        try:
+            write_checkpoint(self, path, row)
+        finally:
+            if attached:
+                profiler.attach(self)
+
+    def _checkpoint_refs(self):
+        '''{name: object} of what a checkpoint refers to by name instead of writing: the data
+        source, profiler and checkpoint schedule, the price frame and the times derived from it'''
+        frame = self.frame
+        refs = {'source': self.source, 'profiler': self.profiler, 'checkpoints': self.checkpoints, 'frame': frame,
+                'frame.symbols': frame.symbols, 'frame.times': frame.times, 'bar_times': self._bar_times,
+                'end_times': self._end_times}
+        refs.update(('frame.' + name, getattr(frame, name)) for name in BarFrame.MATRICES)
+        return refs
+
+    def _checkpoint_frame(self):
+        '''How a resumed run gets the price frame: the window to load and the digest of its bars'''
+        if self._frame_digest is None:
+            self._frame_digest = frame_digest(self.frame)
+        symbols, start, end = self.window
+        return {'symbols': symbols, 'start': start, 'end': end, 'digest': self._frame_digest}
+
+    @staticmethod
+    def _restore_frame(state, data_source):
+        frame = data_source.load_frame(state['symbols'], state['start'], state['end'])
+        if frame_digest(frame) != state['digest']:
+            raise ValueError('the bars of the data source differ from those the checkpoint was written with')
+        return frame
+
+    def _resumed(self):
+        '''Rebuilds what the checkpoint left out'''
+        self._bar_times = self.frame.times.astype(datetime)
+        self._end_times = (self.frame.times + self._span).astype(datetime)
+
+    def _track(self, capacity):
+        '''Starts the running statistics and the equity store at the current portfolio value'''
+        portfolio = self.algorithm.Portfolio
+        self.statistics = RunningStatistics(portfolio.TotalPortfolioValue, _BARS_PER_YEAR.get(self.resolution, 252),
+                                            portfolio)
+        self.equity_store = EquityStore(capacity, self.frame.symbols, self.record_positions)
+        return self.statistics, self.equity_store
+
+    def _initialize(self, algorithm):
+        '''Runs Initialize; returns every symbol the algorithm may trade'''
+        if isinstance(algorithm, type):
+            algorithm = algorithm()
+        self.algorithm = algorithm
+        algorithm._engine = self
+        algorithm.Initialize()
+
+        symbols = list(algorithm.requested_symbols)
+        if algorithm.UniverseSelection is not None:
+            symbols += [s for s in algorithm.UniverseSelection.candidate_symbols(algorithm) if s not in symbols]
+        return symbols
+
+    def _attach(self, frame):
+        '''Points the engine and the portfolio at the price frame the steps read from'''
+        algorithm = self.algorithm
+        self.frame = frame
+        self._span = np.timedelta64(resolution_to_timedelta(self.resolution))
+        self._bar_times = frame.times.astype(datetime)
+        self._end_times = (frame.times + self._span).astype(datetime)
+        self._router = ConsolidationRouter(len(frame.symbols))
+        self._frame_digest = None
+
+        portfolio = algorithm.Portfolio
+        portfolio.resize(len(frame.symbols))
+        portfolio.symbols = frame.symbols
+        for security in algorithm.Securities.Values:
+            security.bind(frame.column(security.Symbol))
+        for symbol in algorithm.requested_symbols:
+            self.add_security(symbol)
+        # ordered, so removals come out in the order symbols were added
+        self._active = {}
+        self._pending_changes = SecurityChanges([algorithm.Securities[s] for s in algorithm.requested_symbols])
+        self.orders = OrderLedger(frame.symbols)
+        self._order_events = type(algorithm).OnOrderEvent is not QCAlgorithm.OnOrderEvent
+
+    def _step(self, row):
+        algorithm = self.algorithm
+        frame = self.frame
+        self._row = row
+        now = self._end_times[row]
+        algorithm.Time = algorithm.UtcTime = now
+        algorithm.Portfolio.set_prices(frame.close_filled[row], frame.close_valuation[row])
+
+        changes = self._pending_changes
+        self._pending_changes = None
+        selection = algorithm.UniverseSelection
+        if selection is not None and selection.GetNextRefreshTimeUtc() <= now:
+            changes = self._merge_changes(changes, self._apply_selection(selection.SelectSymbols(algorithm, now)))
+        if changes:
+            self._on_securities_changed(changes)
+
+        self._feed_consolidators(row)
+
+        data = algorithm.CurrentSlice = Slice(self, row, now)
+        algorithm.OnData(data)
+
+        insights = algorithm.Alpha.Update(algorithm, data)
+        if isinstance(insights, InsightBatch):
+            insights.SetPeriodAndCloseTime(now)
+            insights.name_source(algorithm.Alpha.Name)
+        else:
+            for insight in insights:
+                insight.SetPeriodAndCloseTime(now)
+                if insight.SourceModel is None:
+                    insight.SourceModel = algorithm.Alpha.Name
+        algorithm.Insights.AddRange(insights)
+
+        targets = algorithm.PortfolioConstruction.CreateTargets(algorithm, insights)
+        overrides = algorithm.RiskManagement.ManageRisk(algorithm, targets)
+        if overrides:
+            overridden = {target.Symbol for target in overrides}
+            targets = [target for target in targets if target.Symbol not in overridden] + list(overrides)
+        algorithm.Execution.Execute(algorithm, targets)
+
+    def _feed_consolidators(self, row):
+        router = self._router
+        router.route(self.algorithm.SubscriptionManager, self.frame)
+        router.feed(self.frame, row, self._bar_times[row], self._end_times[row])
+
+    # universe
+
+    def add_security(self, symbol):
+        securities = self.algorithm.Securities
+        if symbol in securities:
+            return securities[symbol]
+        column = None
+        if self.frame is not None:
+            # securities added in Initialize are bound to their column once prices are loaded
+            column = self.frame.column(symbol)
+            if column is None:
+                raise KeyError('{} has no data loaded'.format(symbol))
+        security = Security(symbol, column, self.algorithm.Portfolio, self.resolution)
+        securities.add(security)
+        return security
+
+    def _apply_selection(self, symbols):
+        selected = set(symbols)
+        added = [self.add_security(symbol) for symbol in symbols if symbol not in self._active]
+        removed = [self.algorithm.Securities[symbol] for symbol in self._active if symbol not in selected]
+        return SecurityChanges(added, removed)
+
+    @staticmethod
+    def _merge_changes(first, second):
+        if not first:
+            return second
+        return SecurityChanges(first.AddedSecurities + second.AddedSecurities,
+                               first.RemovedSecurities + second.RemovedSecurities)
+
+    def _on_securities_changed(self, changes):
+        algorithm = self.algorithm
+        for security in changes.AddedSecurities:
+            self._active[security.Symbol] = None
+        for security in changes.RemovedSecurities:
+            self._active.pop(security.Symbol, None)
+        algorithm.Alpha.OnSecuritiesChanged(algorithm, changes)
+        algorithm.PortfolioConstruction.OnSecuritiesChanged(algorithm, changes)
+        algorithm.RiskManagement.OnSecuritiesChanged(algorithm, changes)
+        algorithm.Execution.OnSecuritiesChanged(algorithm, changes)
+        algorithm.OnSecuritiesChanged(changes)
+
+    # services used by the algorithm
+
+    def bar(self, row, column):
+        frame = self.frame
+        return TradeBar(self._bar_times[row], frame.symbols[column], frame.open[row, column],
+                        frame.high[row, column], frame.low[row, column], frame.close[row, column],
+                        frame.volume[row, column], self._span.item())
+
+    def history(self, symbol, periods, resolution=None):
+        '''Bars before the current one; at coarser resolutions the current, still open
+        period is excluded so history and the live consolidator never overlap.'''
+        end = to_datetime64(self.algorithm.StartDate) if self.frame is None else self.frame.times[self._row]
+        if resolution is not None and Resolution(resolution) > self.resolution:
+            step = np.timedelta64(resolution_to_timedelta(resolution))
+            end = end - (end - np.datetime64(0, 's')) % step
+        return self.source.history(symbol, end, periods, resolution)
+
+    def market_order(self, symbol, quantity, tag=''):
+        '''Fills a market order at the current price of the security'''
+        ticket = OrderTicket(len(self.orders) + 1, symbol, quantity, tag)
+        column = self.frame.column(symbol)
+        price = 0.0 if column is None else float(self.frame.close_filled[self._row, column])
+        if quantity == 0 or not price > 0:
+            ticket.Status = OrderStatus.Invalid
+            return ticket
+        filled = float(self.market_orders(np.array([column]), np.array([float(quantity)]), tag)[0])
+        if filled == 0:
+            ticket.Status = OrderStatus.Invalid
+            return ticket
+        ticket.Status = OrderStatus.Filled if filled == quantity else OrderStatus.PartiallyFilled
+        ticket.QuantityFilled = filled
+        ticket.AverageFillPrice = float(self.orders.fill_price[-1])
+        return ticket
+
+    def market_orders(self, columns, quantities, tag=''):
+        '''Fills market orders for distinct portfolio columns in one pass through the fill
+        simulator. Orders without a price, and the part of an order the volume model does
+        not fill, are dropped. Fills are applied and recorded in the order given; order
+        events are sent after all of them.
+
+        Returns:
+            The filled quantity of each order'''
+        algorithm = self.algorithm
+        frame = self.frame
+        columns = np.asarray(columns, np.intp)
+        quantities = np.asarray(quantities, float)
+        prices = frame.close_filled[self._row, columns]
+        filled, fill_prices, fees = self.fill_simulator.fill(quantities, prices, frame.volume[self._row, columns])
+        valid = (filled != 0) & (prices > 0)
+        if not valid.all():
+            filled = np.where(valid, filled, 0.0)
+            columns, quantities = columns[valid], quantities[valid]
+            fill_prices, fees = fill_prices[valid], fees[valid]
+            fills = filled[valid]
+        else:
+            fills = filled
+        if len(columns) == 0:
+            return filled
+        algorithm.Portfolio.process_fills(columns, fills, fill_prices, fees)
+        if self.statistics is not None:
+            self.statistics.record_fills(columns, fills, fill_prices, fees)
+        first = self.orders.append(algorithm.UtcTime, columns, quantities, fills, fill_prices, fees, tag)
+        if self._order_events:
+            for index in range(first, len(self.orders)):
+                algorithm.OnOrderEvent(self.orders[index])
+        return filled
+
+
+def run_algorithm(algorithm, data_source, **engine_options):
+    '''Convenience wrapper: BacktestEngine(data_source, ...).run(algorithm)'''
+    return BacktestEngine(data_source, **engine_options).run(algorithm)
@@ -0,0 +1,83 @@
+'''Enumerations mirroring the LEAN names used by the algorithm files.'''
+
+from datetime import timedelta
+from enum import IntEnum
+
+
+class Resolution(IntEnum):
+    '''Resolution of the data, finest first like LEAN.'''
+    Tick = 0
+    Second = 1
+    Minute = 2
+    Hour = 3
+    Daily = 4
+
+
+_RESOLUTION_SPANS = {
+    Resolution.Tick: timedelta(0),
+    Resolution.Second: timedelta(seconds=1),
+    Resolution.Minute: timedelta(minutes=1),
+    Resolution.Hour: timedelta(hours=1),
+    Resolution.Daily: timedelta(days=1),
+}
+
+
+def resolution_to_timedelta(resolution):
+    '''Equivalent of LEAN's Extensions.ToTimeSpan(resolution)'''
+    return _RESOLUTION_SPANS[Resolution(resolution)]
+
+
+class MovingAverageType(IntEnum):
+    Simple = 0
+    Exponential = 1
+    Wilders = 2
+    LinearWeightedMovingAverage = 3
+    DoubleExponential = 4
+    TripleExponential = 5
+    Triangular = 6
+    T3 = 7
+    Kama = 8
+    Hull = 9
+    Alma = 10
+
+
+class SecurityType(IntEnum):
+    Base = 0
+    Equity = 1
+    Option = 2
+    Commodity = 3
+    Forex = 4
+    Future = 5
+    Cfd = 6
+    Crypto = 7
+
+
+class Market:
+    '''Market identifiers, kept as the lower case strings LEAN uses.'''
+    USA = 'usa'
+    FXCM = 'fxcm'
+    Oanda = 'oanda'
+    GDAX = 'gdax'
+
+
+class InsightDirection(IntEnum):
+    Down = -1
+    Flat = 0
+    Up = 1
+
+
+class InsightType(IntEnum):
+    Price = 0
+    Volatility = 1
+
+
+class PortfolioBias(IntEnum):
+    Short = -1
+    LongShort = 0
+    Long = 1
+
+
+class OrderDirection(IntEnum):
+    Buy = 0
+    Sell = 1
+    Hold = 2
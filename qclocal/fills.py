@@ -0,0 +1,102 @@
+'''Fill simulation for market orders.
+
+The engine fills every order of a time step in one pass over arrays: the orders' portfolio
+columns, signed quantities, the bar closes they fill against and the bar volumes. Three
+pluggable models turn those into fills:
+
+    volume model    caps each quantity at a share of the bar volume (partial fills)
+    slippage model  moves the fill price against the order, per share
+    fee model       commission of each fill (orders.InteractiveBrokersFeeModel by default)
+
+With no volume or slippage model, orders fill completely at the close, as before.'''
+
+import numpy as np
+
+from .orders import InteractiveBrokersFeeModel
+
+
+class NullSlippageModel:
+    '''No slippage: orders fill at the bar close'''
+
+    def slippage(self, prices, quantities, volumes):
+        return np.zeros(len(prices))
+
+
+class ConstantSlippageModel:
+    '''Slippage of a fixed fraction of the price
+
+    Args:
+        slippagePercent: Fraction of the price paid on every share, e.g. 0.0005 for 5 bp'''
+
+    def __init__(self, slippagePercent=0.0):
+        self.slippagePercent = abs(slippagePercent)
+
+    def slippage(self, prices, quantities, volumes):
+        '''Slippage per share of each order, in price units'''
+        return prices * self.slippagePercent
+
+
+class VolumeShareSlippageModel:
+    '''Slippage growing with the square of the order's share of the bar volume, as LEAN's
+    VolumeShareSlippageModel: priceImpact * min(|quantity| / volume, volumeLimit)^2 of the
+    price. Bars without volume count as volumeLimit.
+
+    Args:
+        volumeLimit: Largest volume share the impact is computed for
+        priceImpact: Fraction of the price slipped at a volume share of 1'''
+
+    def __init__(self, volumeLimit=0.025, priceImpact=0.1):
+        self.volumeLimit = volumeLimit
+        self.priceImpact = priceImpact
+
+    def slippage(self, prices, quantities, volumes):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            share = np.abs(quantities) / volumes
+        share = np.where(volumes > 0, np.minimum(share, self.volumeLimit), self.volumeLimit)
+        return share * share * self.priceImpact * prices
+
+
+class VolumeParticipationModel:
+    '''Fills at most a fraction of the bar volume per order; the rest of the order is left
+    unfilled. Orders on a bar without volume do not fill at all.
+
+    Args:
+        participation: Largest fraction of the bar volume one order may take'''
+
+    def __init__(self, participation=0.1):
+        self.participation = participation
+
+    def fill_quantities(self, quantities, volumes):
+        limit = np.floor(self.participation * np.nan_to_num(volumes))
+        return np.sign(quantities) * np.minimum(np.abs(quantities), limit)
+
+
+class FillSimulator:
+    '''Fills arrays of market orders with the given models
+
+    Args:
+        fee_model: Commission model; InteractiveBrokersFeeModel by default. Models with an
+            order_fees(quantities, prices) method are evaluated over the arrays, others
+            through GetOrderFee per fill.
+        slippage_model: Model with slippage(prices, quantities, volumes); None for none
+        volume_model: Model with fill_quantities(quantities, volumes); None fills completely'''
+
+    def __init__(self, fee_model=None, slippage_model=None, volume_model=None):
+        self.fee_model = fee_model or InteractiveBrokersFeeModel()
+        self.slippage_model = slippage_model
+        self.volume_model = volume_model
+
+    def fill(self, quantities, prices, volumes):
+        '''Returns (filled quantities, fill prices, fees); a filled quantity may be zero'''
+        filled = quantities
+        if self.volume_model is not None:
+            filled = self.volume_model.fill_quantities(quantities, volumes)
+        fill_prices = prices
+        if self.slippage_model is not None:
+            fill_prices = prices + np.sign(filled) * self.slippage_model.slippage(prices, filled, volumes)
+        order_fees = getattr(self.fee_model, 'order_fees', None)
+        if order_fees is not None:
+            fees = order_fees(filled, fill_prices)
+        else:
+            fees = np.array([self.fee_model.GetOrderFee(q, p) for q, p in zip(filled.tolist(), fill_prices.tolist())])
+        return filled, fill_prices, fees
@@ -0,0 +1 @@
+'''Algorithm framework models: alpha, portfolio construction, risk, execution and universe selection.'''
@@ -0,0 +1,372 @@
+'''Alpha models.'''
+
+import copy
+
+import numpy as np
+
+from ..enums import InsightDirection, MovingAverageType, Resolution, resolution_to_timedelta
+from ..indicators import MovingAverageConvergenceDivergence
+from ..indicators.batch import BatchMovingAverageConvergenceDivergence, batch_average_type
+from ..signals import SignalEntry
+from .insight import Insight, InsightBatch
+
+
+class AlphaModel:
+    '''Base alpha model: produces insights from the latest data'''
+
+    def __init__(self):
+        self.Name = self.__class__.__name__
+
+    def Update(self, algorithm, data):
+        '''Updates this alpha model with the latest data from the algorithm.
+        This is called each time the algorithm receives data for subscribed securities
+        Args:
+            algorithm: The algorithm instance
+            data: The new data available
+        Returns:
+            The new insights generated'''
+        raise NotImplementedError
+
+    def OnSecuritiesChanged(self, algorithm, changes):
+        '''Event fired each time the we add/remove securities from the data feed
+        Args:
+            algorithm: The algorithm instance that experienced the change in securities
+            changes: The security additions and removals from the algorithm'''
+        pass
+
+
+class NullAlphaModel(AlphaModel):
+    '''Emits no insights'''
+
+    def Update(self, algorithm, data):
+        return []
+
+
+class MacdAlphaModel(AlphaModel):
+    '''Defines a custom alpha model that uses MACD crossovers. The MACD signal line
+    is used to generate up and down predictions if it crosses the bounce threshold'''
+
+    def __init__(self, fastPeriod=12, slowPeriod=26, signalPeriod=9,
+                 movingAverageType=MovingAverageType.Exponential, resolution=Resolution.Daily):
+        '''Initializes a new instance of the MacdAlphaModel class
+        Args:
+            fastPeriod: The MACD fast period
+            slowPeriod: The MACD slow period
+            signalPeriod: The smoothing period for the MACD signal
+            movingAverageType: The type of moving average to use in the MACD'''
+        self.fastPeriod = fastPeriod
+        self.slowPeriod = slowPeriod
+        self.signalPeriod = signalPeriod
+        self.movingAverageType = MovingAverageType(movingAverageType)
+        self.resolution = Resolution(resolution)
+        self.insightPeriod = resolution_to_timedelta(resolution) * fastPeriod
+        self.bounceThresholdPercent = 0.01
+        self.symbolData = {}
+        self.Name = '{}({},{},{},{},{})'.format(self.__class__.__name__, fastPeriod, slowPeriod, signalPeriod,
+                                                self.movingAverageType.name, self.resolution.name)
+
+    def Update(self, algorithm, data):
+        '''Determines an insight for each security based on it's current MACD signal
+        Args:
+            algorithm: The algorithm instance
+            data: The new data available
+        Returns:
+            The new insights generated'''
+        insights = []
+
+        for key, sd in self.symbolData.items():
+            if sd.Security.Price == 0:
+                continue
+
+            direction = InsightDirection.Flat
+            normalized_signal = sd.MACD.Signal.Current.Value / sd.Security.Price
+
+            if normalized_signal > self.bounceThresholdPercent:
+                direction = InsightDirection.Up
+            elif normalized_signal < -self.bounceThresholdPercent:
+                direction = InsightDirection.Down
+
+            # ignore signal for same direction as previous signal
+            if direction == sd.PreviousDirection:
+                continue
+
+            insight = Insight.Price(sd.Security.Symbol, self.insightPeriod, direction)
+            sd.PreviousDirection = insight.Direction
+            insights.append(insight)
+
+        return insights
+
+    def OnSecuritiesChanged(self, algorithm, changes):
+        '''Event fired each time the we add/remove securities from the data feed.
+        This initializes the MACD for each added security and cleans up the indicator for each removed security.
+        Args:
+            algorithm: The algorithm instance that experienced the change in securities
+            changes: The security additions and removals from the algorithm'''
+        for added in changes.AddedSecurities:
+            self.symbolData[added.Symbol] = SymbolData(algorithm, added, self.fastPeriod, self.slowPeriod,
+                                                       self.signalPeriod, self.movingAverageType, self.resolution)
+
+        for removed in changes.RemovedSecurities:
+            data = self.symbolData.pop(removed.Symbol, None)
+            if data is not None:
+                # drop our reference; the registry removes the consolidator once nobody uses it
+                algorithm.IndicatorRegistry.release(data.MACD)
+
+
+class SymbolData:
+    def __init__(self, algorithm, security, fastPeriod, slowPeriod, signalPeriod, movingAverageType, resolution):
+        self.Security = security
+        # the same MACD as algorithm.MACD(...) would give, shared with it and with other models
+        name = algorithm.CreateIndicatorName(security.Symbol, 'MACD({},{},{})'.format(fastPeriod, slowPeriod, signalPeriod),
+                                             resolution)
+        self.MACD = algorithm.IndicatorRegistry.acquire(
+            security.Symbol, name, MovingAverageConvergenceDivergence,
+            (fastPeriod, slowPeriod, signalPeriod, MovingAverageType(movingAverageType)), resolution, warm_up=True)
+
+        self.PreviousDirection = None
+
+
+class BatchedMacdAlphaModel(AlphaModel):
+    '''MacdAlphaModel computed for the whole universe at once.
+
+    Instead of one MACD, consolidator and SymbolData per security, the fast, slow and
+    signal averages of every security live in arrays indexed by the security's column in
+    the engine's price matrix, and each bar is one masked array update. The insights are
+    identical to MacdAlphaModel's, in the same order, and are returned as an InsightBatch.
+    Only the Simple, Exponential and Wilders averages have batched kernels; other types
+    raise ValueError here, and so does a security whose data is not at `resolution`.
+
+    With history=True the signal for the rest of the backtest (or of the chunk, when it
+    streams its frame) is computed in one pass the first time Update runs, after which
+    Update only reads a row of the result. Universe changes replay the live state up to
+    the current bar and recompute from there. A signals.SignalCache given as cache
+    (which implies history=True) keeps that pass across runs: bars a previous run covered
+    are read back, and the MACD resumes from the state it had after them.'''
+
+    _NO_DIRECTION = 2
+
+    def __init__(self, fastPeriod=12, slowPeriod=26, signalPeriod=9,
+                 movingAverageType=MovingAverageType.Exponential, resolution=Resolution.Daily, history=False,
+                 cache=None):
+        self.fastPeriod = fastPeriod
+        self.slowPeriod = slowPeriod
+        self.signalPeriod = signalPeriod
+        self.movingAverageType = batch_average_type(movingAverageType, self.__class__.__name__)
+        self.resolution = Resolution(resolution)
+        self.insightPeriod = resolution_to_timedelta(resolution) * fastPeriod
+        self.bounceThresholdPercent = 0.01
+        self.history = history or cache is not None
+        self.cache = cache
+        self.Name = '{}({},{},{},{},{})'.format(self.__class__.__name__, fastPeriod, slowPeriod, signalPeriod,
+                                                self.movingAverageType.name, self.resolution.name)
+        self.macd = None
+        self._frame = None
+        self.columns = np.empty(0, dtype=np.intp)
+        self.symbols = []
+        self.previous = None
+        self._signals = None
+        self._signals_row = 0
+        self._current_row = None
+
+    def _allocate(self, algorithm):
+        size = len(algorithm.Portfolio.symbols)
+        self.macd = BatchMovingAverageConvergenceDivergence(self.fastPeriod, self.slowPeriod, self.signalPeriod,
+                                                            self.movingAverageType, size)
+        self.previous = np.full(size, self._NO_DIRECTION, dtype=np.int8)
+        self.symbols = list(algorithm.Portfolio.symbols)
+
+    def Update(self, algorithm, data):
+        '''Feeds the current bar of every security into the MACD arrays and emits an insight
+        for each security whose signal direction changed
+        Args:
+            algorithm: The algorithm instance
+            data: The new data available
+        Returns:
+            The new insights generated'''
+        frame, row = data.frame, data.row
+        columns = self.columns
+        if not len(columns):
+            return []
+        if self.history:
+            if self._signals is not None and frame is not self._frame:
+                # a streamed backtest moved on to its next chunk: catch the live state up
+                # with the end of the last one and precompute the new one
+                self._advance(self._frame, self._signals_row, self._current_row + 1)
+                self._signals = self._frame = None
+            if self._signals is None:
+                self._precompute(frame, row)
+            signal = self._signals[row - self._signals_row]
+            self._current_row = row
+        else:
+            self._advance(frame, row, row + 1)
+            signal = self.macd.signal.current[columns]
+
+        prices = algorithm.Portfolio.prices[columns]
+        valid = ~np.isnan(prices) & (prices != 0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            normalized = signal / prices
+        direction = np.where(normalized > self.bounceThresholdPercent, InsightDirection.Up,
+                             np.where(normalized < -self.bounceThresholdPercent, InsightDirection.Down,
+                                      InsightDirection.Flat)).astype(np.int8)
+        # ignore signal for same direction as previous signal
+        emit = np.flatnonzero(valid & (direction != self.previous[columns]))
+        if not len(emit):
+            return []
+        emitted = columns[emit]
+        self.previous[emitted] = direction[emit]
+        return InsightBatch(algorithm.Portfolio.symbols, emitted, direction[emit], self.insightPeriod)
+
+    def _advance(self, frame, start, stop, record=None, positions=None):
+        '''Feeds rows [start, stop) of the frame for the tracked columns, or for those at
+        positions of self.columns, recording their signal into the rows of record'''
+        columns, macd = self.columns, self.macd
+        if positions is not None:
+            columns = columns[positions]
+        has_bar, close = frame.has_bar, frame.close
+        for row in range(start, stop):
+            updated = columns[has_bar[row, columns]]
+            if len(updated):
+                macd.update(updated, close[row, updated])
+            if record is not None:
+                if positions is None:
+                    record[row - start] = macd.signal.current[columns]
+                else:
+                    record[row - start, positions] = macd.signal.current[columns]
+
+    def _precompute(self, frame, row):
+        '''Computes the signal of the tracked columns from row to the end of the frame on a
+        copy of the live state'''
+        live = self.macd
+        self.macd = copy.deepcopy(live)
+        self._signals = np.empty((len(frame.times) - row, len(self.columns)))
+        self._signals_row = row
+        if self.cache is None:
+            self._advance(frame, row, len(frame.times), self._signals)
+        else:
+            self._resume(frame, row)
+        self.macd = live
+        self._frame = frame
+
+    def _resume(self, frame, row):
+        '''_precompute through the signal cache: copies the signal of the bars the cache
+        holds, computes the rest from the cached state and stores the extended entries'''
+        cache, macd, stop = self.cache, self.macd, len(frame.times)
+        parameters = (self.fastPeriod, self.slowPeriod, self.signalPeriod, self.movingAverageType.name,
+                      self.resolution.name)
+        resume = np.full(len(self.columns), row)
+        pending = []
+        for position, column in enumerate(self.columns.tolist()):
+            key = cache.key(self.symbols[column].Value, parameters, frame.times[row], macd.state(column))
+            bars = np.flatnonzero(frame.has_bar[row:, column]) + row
+            entry = cache.load(key)
+            covered = None if entry is None else cache.covered(entry, frame.times[bars], frame.close[bars, column],
+                                                                   frame.times[-1])
+            if entry is not None and covered is None:
+                cache.invalidated += 1
+            if covered is None:
+                cache.misses += 1
+                pending.append((position, column, key, bars))
+                continue
+            cache.hits += 1
+            cache.cached_bars += covered
+            end = stop if covered == len(bars) else bars[covered]
+            # the signal of a row is the one after the last bar at or before it
+            index = np.cumsum(frame.has_bar[row:end, column]) - 1
+            self._signals[:end - row, position] = np.where(index >= 0, entry.signal[np.maximum(index, 0)],
+                                                           macd.signal.current[column])
+            if end < stop:
+                macd.set_state(column, entry.state)
+                resume[position] = end
+                pending.append((position, column, key, bars))
+        for start in np.unique(resume[[position for position, _, _, _ in pending]]).tolist():
+            positions = np.array([position for position, _, _, _ in pending if resume[position] == start], np.intp)
+            self._advance(frame, start, stop, self._signals[start - row:], positions)
+        for position, column, key, bars in pending:
+            cache.computed_bars += int(np.count_nonzero(bars >= resume[position]))
+            cache.save(key, SignalEntry(frame.times[bars], frame.close[bars, column],
+                                        self._signals[bars - row, position], macd.state(column)))
+        if pending:
+            cache.evict()
+
+    def OnSecuritiesChanged(self, algorithm, changes):
+        '''Adds a column for each added security (warmed up from history) and resets the
+        columns of removed securities
+        Args:
+            algorithm: The algorithm instance that experienced the change in securities
+            changes: The security additions and removals from the algorithm'''
+        for security in changes.AddedSecurities:
+            if security.Resolution != self.resolution:
+                raise ValueError('{} needs {} bars but {} has {} data'.format(
+                    self.__class__.__name__, self.resolution.name, security.Symbol, Resolution(security.Resolution).name))
+        if self.macd is None:
+            self._allocate(algorithm)
+        if self._signals is not None:
+            # bring the live state up to the last bar Update saw before the column set changes
+            self._advance(self._frame, self._signals_row, self._current_row + 1)
+            self._signals = self._frame = None
+
+        tracked = set(self.columns.tolist())
+        removed = [security.column for security in changes.RemovedSecurities if security.column in tracked]
+        if removed:
+            removed = np.array(removed, dtype=np.intp)
+            self.macd.reset(removed)
+            self.previous[removed] = self._NO_DIRECTION
+            self.columns = self.columns[~np.isin(self.columns, removed)]
+
+        tracked = set(self.columns.tolist())
+        added = [security for security in changes.AddedSecurities if security.column not in tracked]
+        if added:
+            self._warm_up(algorithm, added)
+            self.columns = np.concatenate([self.columns, [security.column for security in added]]).astype(np.intp)
+
+    def _warm_up(self, algorithm, securities):
+        '''Feeds the history of the added securities, right aligned so the last bars of
+        every security are applied together'''
+        histories = [algorithm.History(security.Symbol, self.macd.warm_up_period, self.resolution).close
+                     for security in securities]
+        length = max((len(history) for history in histories), default=0)
+        if not length:
+            return
+        values = np.zeros((length, len(securities)))
+        present = np.zeros((length, len(securities)), dtype=bool)
+        for j, history in enumerate(histories):
+            if len(history):
+                values[length - len(history):, j] = history
+                present[length - len(history):, j] = True
+        columns = np.array([security.column for security in securities], dtype=np.intp)
+        for i in range(length):
+            mask = present[i]
+            self.macd.update(columns[mask], values[i, mask])
+
+
+class CompositeAlphaModel(AlphaModel):
+    '''Runs several alpha models and concatenates their insights'''
+
+    def __init__(self, *alphaModels):
+        super().__init__()
+        self.alphaModels = list(alphaModels)
+
+    def AddAlpha(self, alphaModel):
+        self.alphaModels.append(alphaModel)
+
+    def Update(self, algorithm, data):
+        emitted = []
+        for model in self.alphaModels:
+            insights = model.Update(algorithm, data)
+            if isinstance(insights, InsightBatch):
+                insights.name_source(model.Name)
+            else:
+                for insight in insights:
+                    if insight.SourceModel is None:
+                        insight.SourceModel = model.Name
+            if len(insights):
+                emitted.append(insights)
+        # batches over the same symbols stay one batch
+        if emitted and all(isinstance(insights, InsightBatch) and insights.symbols is emitted[0].symbols
+                           for insights in emitted):
+            return InsightBatch.concatenate(emitted)
+        return [insight for insights in emitted for insight in insights]
+
+    def OnSecuritiesChanged(self, algorithm, changes):
+        for model in self.alphaModels:
+            model.OnSecuritiesChanged(algorithm, changes)
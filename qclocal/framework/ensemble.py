@@ -0,0 +1,330 @@
+'''Ensemble alpha: several signals over one shared indicator pipeline.
+
+Each extra AlphaModel an algorithm adds brings its own indicators, consolidators and
+insights. EnsembleAlphaModel instead runs a list of signals, MACD, RSI, Bollinger
+Bands, Stochastic, KAMA and Hull crossings, over the same bars. Every signal declares
+the batched indicators it reads (indicators.batch) under a key such as
+('RSI', 14, Wilders), and SharedIndicators keeps one kernel per key. Two signals reading
+the same indicator read the same arrays, and a bar gathers the rows of the frame once
+for all of them.
+
+A signal turns its indicators into a direction per tracked column: 1 up, -1 down, 0
+flat or not ready. The directions of all signals form a (signal x column) matrix, and
+one product with the normalized weights gives every column's score in [-1, 1]. A score
+above the threshold is Up, below minus the threshold Down, anything else Flat. As in
+MacdAlphaModel, an insight is emitted only when a column's direction changes, and the
+absolute score becomes its confidence. The model returns one InsightBatch per step
+however many signals it runs.
+
+An ensemble holding only MacdSignal() emits the insights BatchedMacdAlphaModel would.'''
+
+import numpy as np
+
+from ..enums import InsightDirection, MovingAverageType, Resolution, resolution_to_timedelta
+from ..indicators.batch import (BatchBollingerBands, BatchHullMovingAverage, BatchKaufmanAdaptiveMovingAverage,
+                                BatchMovingAverageConvergenceDivergence, BatchRelativeStrengthIndex, BatchStochastic,
+                                batch_average_type)
+from .alpha import AlphaModel
+from .insight import InsightBatch
+
+
+class SharedIndicators:
+    '''Batched indicators for `size` columns, one per key, fed together bar by bar'''
+
+    def __init__(self, size):
+        self.size = size
+        self.kernels = {}
+        self.ready = {}
+        self.bars = False
+
+    def acquire(self, key, factory):
+        '''The kernel under key, created with factory(size) the first time; returns
+        (kernel, IsReady array over the columns)'''
+        if key not in self.kernels:
+            kernel = factory(self.size)
+            self.kernels[key] = kernel
+            self.ready[key] = np.zeros(self.size, dtype=bool)
+            self.bars = self.bars or getattr(kernel, 'bars', False)
+        return self.kernels[key], self.ready[key]
+
+    @property
+    def warm_up_period(self):
+        return max((kernel.warm_up_period for kernel in self.kernels.values()), default=0)
+
+    def update(self, columns, high, low, close):
+        '''Feeds one bar to each of the given columns; high and low may be None when no
+        kernel takes whole bars'''
+        for key, kernel in self.kernels.items():
+            if getattr(kernel, 'bars', False):
+                self.ready[key][columns] = kernel.update_bar(columns, high, low, close)
+            else:
+                self.ready[key][columns] = kernel.update(columns, close)
+
+    def reset(self, columns):
+        for key, kernel in self.kernels.items():
+            kernel.reset(columns)
+            self.ready[key][columns] = False
+
+
+class EnsembleSignal:
+    '''A direction per column computed from shared indicators'''
+
+    Name = None
+
+    def attach(self, indicators):
+        '''Acquires the indicators the signal reads from a SharedIndicators'''
+        raise NotImplementedError
+
+    def direction(self, columns, prices):
+        '''1, -1 or 0 for each column, given their current prices'''
+        raise NotImplementedError
+
+
+def _crossing(below, above, ready):
+    '''1 where below, -1 where above, 0 elsewhere and where the indicator is not ready'''
+    return np.where(ready, np.where(below, 1.0, np.where(above, -1.0, 0.0)), 0.0)
+
+
+class MacdSignal(EnsembleSignal):
+    '''MacdAlphaModel's rule: up if the signal line is more than bounceThresholdPercent of
+    the price above zero, down if as far below'''
+
+    def __init__(self, fastPeriod=12, slowPeriod=26, signalPeriod=9, movingAverageType=MovingAverageType.Exponential,
+                 bounceThresholdPercent=0.01):
+        self.fastPeriod = fastPeriod
+        self.slowPeriod = slowPeriod
+        self.signalPeriod = signalPeriod
+        self.movingAverageType = batch_average_type(movingAverageType, self.__class__.__name__)
+        self.bounceThresholdPercent = bounceThresholdPercent
+        self.Name = 'MACD({},{},{},{})'.format(fastPeriod, slowPeriod, signalPeriod, self.movingAverageType.name)
+
+    def attach(self, indicators):
+        arguments = self.fastPeriod, self.slowPeriod, self.signalPeriod, self.movingAverageType
+        self.macd, _ = indicators.acquire(
+            ('MACD',) + arguments, lambda size: BatchMovingAverageConvergenceDivergence(*arguments, size))
+
+    def direction(self, columns, prices):
+        # like MacdAlphaModel, the signal line is read whether or not it is ready
+        with np.errstate(divide='ignore', invalid='ignore'):
+            normalized = self.macd.signal.current[columns] / prices
+        threshold = self.bounceThresholdPercent
+        return np.where(normalized > threshold, 1.0, np.where(normalized < -threshold, -1.0, 0.0))
+
+
+class RsiSignal(EnsembleSignal):
+    '''Mean reversion on the RSI: up below oversold, down above overbought'''
+
+    def __init__(self, period=14, movingAverageType=MovingAverageType.Wilders, oversold=30, overbought=70):
+        self.period = period
+        self.movingAverageType = batch_average_type(movingAverageType, self.__class__.__name__)
+        self.oversold = oversold
+        self.overbought = overbought
+        self.Name = 'RSI({},{},{},{})'.format(period, self.movingAverageType.name, oversold, overbought)
+
+    def attach(self, indicators):
+        period, moving_average_type = self.period, self.movingAverageType
+        self.rsi, self.ready = indicators.acquire(
+            ('RSI', period, moving_average_type),
+            lambda size: BatchRelativeStrengthIndex(period, moving_average_type, size))
+
+    def direction(self, columns, prices):
+        rsi = self.rsi.current[columns]
+        return _crossing(rsi < self.oversold, rsi > self.overbought, self.ready[columns])
+
+
+class BollingerSignal(EnsembleSignal):
+    '''Mean reversion on Bollinger Bands: up below the lower band, down above the upper'''
+
+    def __init__(self, period=20, k=2, movingAverageType=MovingAverageType.Simple):
+        self.period = period
+        self.k = k
+        self.movingAverageType = batch_average_type(movingAverageType, self.__class__.__name__)
+        self.Name = 'BB({},{},{})'.format(period, k, self.movingAverageType.name)
+
+    def attach(self, indicators):
+        period, k, moving_average_type = self.period, self.k, self.movingAverageType
+        self.bands, self.ready = indicators.acquire(
+            ('BB', period, k, moving_average_type), lambda size: BatchBollingerBands(period, k, moving_average_type, size))
+
+    def direction(self, columns, prices):
+        return _crossing(prices < self.bands.lower[columns], prices > self.bands.upper[columns], self.ready[columns])
+
+
+class StochasticSignal(EnsembleSignal):
+    '''Mean reversion on the stochastic %K: up below oversold, down above overbought'''
+
+    def __init__(self, period=14, kPeriod=3, dPeriod=3, oversold=20, overbought=80):
+        self.period = period
+        self.kPeriod = kPeriod
+        self.dPeriod = dPeriod
+        self.oversold = oversold
+        self.overbought = overbought
+        self.Name = 'STO({},{},{},{},{})'.format(period, kPeriod, dPeriod, oversold, overbought)
+
+    def attach(self, indicators):
+        arguments = self.period, self.kPeriod, self.dPeriod
+        self.stochastic, self.ready = indicators.acquire(('STO',) + arguments,
+                                                         lambda size: BatchStochastic(*arguments, size))
+
+    def direction(self, columns, prices):
+        stoch_k = self.stochastic.stoch_k[columns]
+        return _crossing(stoch_k < self.oversold, stoch_k > self.overbought, self.ready[columns])
+
+
+class _AverageCrossSignal(EnsembleSignal):
+    '''Trend following on a moving average: up while the price is above it, down below'''
+
+    def direction(self, columns, prices):
+        average = self.average.current[columns]
+        return _crossing(prices > average, prices < average, self.ready[columns])
+
+
+class KamaSignal(_AverageCrossSignal):
+    '''Price against KaufmanAdaptiveMovingAverage(period, fastEmaPeriod, slowEmaPeriod)'''
+
+    def __init__(self, period=10, fastEmaPeriod=2, slowEmaPeriod=30):
+        self.period = period
+        self.fastEmaPeriod = fastEmaPeriod
+        self.slowEmaPeriod = slowEmaPeriod
+        self.Name = 'KAMA({},{},{})'.format(period, fastEmaPeriod, slowEmaPeriod)
+
+    def attach(self, indicators):
+        arguments = self.period, self.fastEmaPeriod, self.slowEmaPeriod
+        self.average, self.ready = indicators.acquire(
+            ('KAMA',) + arguments, lambda size: BatchKaufmanAdaptiveMovingAverage(*arguments, size))
+
+
+class HullSignal(_AverageCrossSignal):
+    '''Price against HullMovingAverage(period)'''
+
+    def __init__(self, period=20):
+        self.period = period
+        self.Name = 'HMA({})'.format(period)
+
+    def attach(self, indicators):
+        period = self.period
+        self.average, self.ready = indicators.acquire(('HMA', period),
+                                                      lambda size: BatchHullMovingAverage(period, size))
+
+
+class EnsembleAlphaModel(AlphaModel):
+    '''Weighted vote of several signals over shared batched indicators (see the module
+    docstring)
+
+    Args:
+        signals: EnsembleSignal instances
+        weights: Weight of each signal, normalized to absolute sum 1; equal by default
+        threshold: Score a column needs to be Up (above it) or Down (below its negative)
+        resolution: Resolution of the bars, which must be that of the securities' data
+        period: Insight period in bars of resolution'''
+
+    _NO_DIRECTION = 2
+
+    def __init__(self, signals, weights=None, threshold=0.0, resolution=Resolution.Daily, period=12):
+        self.signals = list(signals)
+        if not self.signals:
+            raise ValueError('an ensemble needs at least one signal')
+        weights = np.ones(len(self.signals)) if weights is None else np.array(weights, dtype=float)
+        if weights.shape != (len(self.signals),) or not np.abs(weights).sum():
+            raise ValueError('an ensemble needs one weight per signal, not all zero')
+        self.weights = weights / np.abs(weights).sum()
+        self.threshold = threshold
+        self.resolution = Resolution(resolution)
+        self.insightPeriod = resolution_to_timedelta(resolution) * period
+        self.Name = '{}({})'.format(self.__class__.__name__, ','.join(signal.Name for signal in self.signals))
+        self.indicators = None
+        self.columns = np.empty(0, dtype=np.intp)
+        self.previous = None
+
+    def _allocate(self, algorithm):
+        size = len(algorithm.Portfolio.symbols)
+        self.indicators = SharedIndicators(size)
+        for signal in self.signals:
+            signal.attach(self.indicators)
+        self.previous = np.full(size, self._NO_DIRECTION, dtype=np.int8)
+
+    def Update(self, algorithm, data):
+        '''Feeds the current bar of every security to the shared indicators, scores the
+        signals and emits an insight for each security whose direction changed
+        Args:
+            algorithm: The algorithm instance
+            data: The new data available
+        Returns:
+            The new insights generated'''
+        frame, row = data.frame, data.row
+        columns = self.columns
+        if not len(columns):
+            return []
+        updated = columns[frame.has_bar[row, columns]]
+        if len(updated):
+            indicators = self.indicators
+            high = frame.high[row, updated] if indicators.bars else None
+            low = frame.low[row, updated] if indicators.bars else None
+            indicators.update(updated, high, low, frame.close[row, updated])
+
+        prices = algorithm.Portfolio.prices[columns]
+        valid = ~np.isnan(prices) & (prices != 0)
+        directions = np.empty((len(self.signals), len(columns)))
+        for i, signal in enumerate(self.signals):
+            directions[i] = signal.direction(columns, prices)
+        score = self.weights @ directions
+        direction = np.where(score > self.threshold, InsightDirection.Up,
+                             np.where(score < -self.threshold, InsightDirection.Down,
+                                      InsightDirection.Flat)).astype(np.int8)
+        # ignore the vote when it has the same direction as the previous one
+        emit = np.flatnonzero(valid & (direction != self.previous[columns]))
+        if not len(emit):
+            return []
+        emitted = columns[emit]
+        self.previous[emitted] = direction[emit]
+        return InsightBatch(algorithm.Portfolio.symbols, emitted, direction[emit], self.insightPeriod,
+                            confidence=np.abs(score[emit]))
+
+    def OnSecuritiesChanged(self, algorithm, changes):
+        '''Adds a column for each added security (warmed up from history) and resets the
+        columns of removed securities
+        Args:
+            algorithm: The algorithm instance that experienced the change in securities
+            changes: The security additions and removals from the algorithm'''
+        for security in changes.AddedSecurities:
+            if security.Resolution != self.resolution:
+                raise ValueError('{} needs {} bars but {} has {} data'.format(
+                    self.__class__.__name__, self.resolution.name, security.Symbol, Resolution(security.Resolution).name))
+        if self.indicators is None:
+            self._allocate(algorithm)
+
+        tracked = set(self.columns.tolist())
+        removed = [security.column for security in changes.RemovedSecurities if security.column in tracked]
+        if removed:
+            removed = np.array(removed, dtype=np.intp)
+            self.indicators.reset(removed)
+            self.previous[removed] = self._NO_DIRECTION
+            self.columns = self.columns[~np.isin(self.columns, removed)]
+
+        tracked = set(self.columns.tolist())
+        added = [security for security in changes.AddedSecurities if security.column not in tracked]
+        if added:
+            self._warm_up(algorithm, added)
+            self.columns = np.concatenate([self.columns, [security.column for security in added]]).astype(np.intp)
+
+    def _warm_up(self, algorithm, securities):
+        '''Feeds the history of the added securities, right aligned so the last bars of
+        every security are applied together'''
+        histories = [algorithm.History(security.Symbol, self.indicators.warm_up_period, self.resolution)
+                     for security in securities]
+        length = max((len(history.close) for history in histories), default=0)
+        if not length:
+            return
+        values = {field: np.zeros((length, len(securities))) for field in ('high', 'low', 'close')}
+        present = np.zeros((length, len(securities)), dtype=bool)
+        for j, history in enumerate(histories):
+            count = len(history.close)
+            if count:
+                for field, array in values.items():
+                    array[length - count:, j] = getattr(history, field)
+                present[length - count:, j] = True
+        columns = np.array([security.column for security in securities], dtype=np.intp)
+        for i in range(length):
+            mask = present[i]
+            self.indicators.update(columns[mask], values['high'][i, mask], values['low'][i, mask],
+                                   values['close'][i, mask])
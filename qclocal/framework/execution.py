@@ -0,0 +1,101 @@
+'''Execution models.'''
+
+import numpy as np
+
+
+class PortfolioTargetCollection:
+    '''Latest target per symbol'''
+
+    def __init__(self):
+        self._targets = {}
+
+    def AddRange(self, targets):
+        for target in targets:
+            self._targets[target.Symbol] = target
+
+    @property
+    def IsEmpty(self):
+        return not self._targets
+
+    def __len__(self):
+        return len(self._targets)
+
+    def __iter__(self):
+        return iter(list(self._targets.values()))
+
+    def OrderByMarginImpact(self, algorithm):
+        '''Targets that reduce holdings first so their proceeds fund the increases'''
+        portfolio = algorithm.Portfolio
+
+        def impact(target):
+            held = portfolio[target.Symbol].Quantity
+            return abs(target.Quantity) - abs(held)
+
+        return sorted(self._targets.values(), key=impact)
+
+    def Remove(self, symbol):
+        return self._targets.pop(symbol, None) is not None
+
+    def ClearFulfilled(self, algorithm):
+        portfolio = algorithm.Portfolio
+        for symbol in [s for s, t in self._targets.items() if portfolio[s].Quantity == t.Quantity]:
+            del self._targets[symbol]
+
+    def Clear(self):
+        self._targets.clear()
+
+
+class ExecutionModel:
+    '''Base execution model: turns portfolio targets into orders'''
+
+    def Execute(self, algorithm, targets):
+        '''Submit orders for the specified portfolio targets
+        Args:
+            algorithm: The algorithm instance
+            targets: The portfolio targets to be ordered'''
+        raise NotImplementedError
+
+    def OnSecuritiesChanged(self, algorithm, changes):
+        pass
+
+
+class NullExecutionModel(ExecutionModel):
+    def Execute(self, algorithm, targets):
+        pass
+
+
+class ImmediateExecutionModel(ExecutionModel):
+    '''Provides an implementation of IExecutionModel that immediately submits market orders to achieve the desired portfolio targets
+
+    The targets of a step are netted against the holdings as arrays and sent to the
+    engine as one batch, in the order of OrderByMarginImpact; the engine's fill
+    simulator prices and fills them in a single pass. A target the volume model only
+    fills in part stays in the collection and is ordered again on the next step.'''
+
+    def __init__(self):
+        '''Initializes a new instance of the ImmediateExecutionModel class'''
+        self.targetsCollection = PortfolioTargetCollection()
+
+    def Execute(self, algorithm, targets):
+        '''Immediately submits orders for the specified portfolio targets.
+        Args:
+            algorithm: The algorithm instance
+            targets: The portfolio targets to be ordered'''
+        self.targetsCollection.AddRange(targets)
+        if self.targetsCollection.IsEmpty:
+            return
+        pending = list(self.targetsCollection)
+        securities = algorithm.Securities
+        columns = np.fromiter((securities[target.Symbol].column for target in pending), np.intp, len(pending))
+        wanted = np.fromiter((target.Quantity for target in pending), float, len(pending))
+        holdings = algorithm.Portfolio.quantity
+        # OrderByMarginImpact: reductions first, ties in collection order
+        order = np.argsort(np.abs(wanted) - np.abs(holdings[columns]), kind='stable')
+        # calculate remaining quantity to be ordered
+        quantities = np.trunc(wanted[order] - holdings[columns[order]])
+        send = quantities != 0
+        if send.any():
+            algorithm.market_orders(columns[order][send], quantities[send])
+        for target, fulfilled in zip(pending, (holdings[columns] == wanted).tolist()):
+            if fulfilled:
+                self.targetsCollection.Remove(target.Symbol)
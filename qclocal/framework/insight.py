@@ -0,0 +1,447 @@
+'''Insights and the collection the algorithm keeps of them.
+
+An alpha model covering thousands of symbols can emit an insight for most of them on a
+bar, and portfolio construction scans the active ones again on every rebalance. Insight
+objects for all of that are a lot of allocation, so insights are kept as rows of
+parallel arrays instead:
+
+    InsightBatch       the insights of one Update: portfolio column, direction, type,
+                       period, magnitude, confidence and weight as arrays. Models that
+                       compute the whole universe at once return one as it is.
+    InsightCollection  every insight the algorithm holds, one row each, with the symbol
+                       id, generated and close time and source model added. Expiry and
+                       active-insight queries are array operations over the rows.
+
+Insight objects are what LEAN code sees. Iterating a batch, or asking the collection for
+insights, builds them from their rows on demand, once per row, and an insight added as an
+object is kept as it is. The rows are read when an insight is added. Answers come in the
+order of LEAN's per-symbol lists: symbols in the order they got their first insight (or
+got one again after losing all of theirs), and each symbol's insights oldest first.'''
+
+import itertools
+
+import numpy as np
+
+from ..enums import InsightDirection, InsightType, Resolution, resolution_to_timedelta
+
+_ids = itertools.count(1)
+_DIRECTIONS = {direction.value: direction for direction in InsightDirection}
+_TYPES = {type.value: type for type in InsightType}
+
+
+class Insight:
+    '''A prediction about a security emitted by an alpha model'''
+
+    __slots__ = ('Id', 'Symbol', 'Type', 'Direction', 'Period', 'Magnitude', 'Confidence', 'Weight',
+                 'SourceModel', 'GeneratedTimeUtc', 'CloseTimeUtc')
+
+    def __init__(self, symbol, period, type, direction, magnitude=None, confidence=None, sourceModel=None, weight=None):
+        self.Id = next(_ids)
+        self.Symbol = symbol
+        self.Type = type
+        self.Direction = InsightDirection(direction)
+        self.Period = period
+        self.Magnitude = magnitude
+        self.Confidence = confidence
+        self.Weight = weight
+        self.SourceModel = sourceModel
+        self.GeneratedTimeUtc = None
+        self.CloseTimeUtc = None
+
+    @staticmethod
+    def Price(symbol, period, *args, **kwargs):
+        '''Creates a price insight. Accepts Price(symbol, timedelta, direction, ...) and
+        Price(symbol, resolution, barCount, direction, ...) like LEAN.'''
+        if isinstance(period, Resolution):
+            bar_count, *args = args
+            period = resolution_to_timedelta(period) * bar_count
+        return Insight(symbol, period, InsightType.Price, *args, **kwargs)
+
+    def SetPeriodAndCloseTime(self, generated_time):
+        self.GeneratedTimeUtc = generated_time
+        self.CloseTimeUtc = generated_time + self.Period
+
+    def IsActive(self, utcTime):
+        return not self.IsExpired(utcTime)
+
+    def IsExpired(self, utcTime):
+        return self.CloseTimeUtc < utcTime
+
+    def Clone(self):
+        insight = Insight(self.Symbol, self.Period, self.Type, self.Direction, self.Magnitude,
+                          self.Confidence, self.SourceModel, self.Weight)
+        insight.GeneratedTimeUtc = self.GeneratedTimeUtc
+        insight.CloseTimeUtc = self.CloseTimeUtc
+        return insight
+
+    def __repr__(self):
+        return 'Insight({}, {}, {}, {})'.format(self.Symbol, self.Direction.name, self.Period, self.GeneratedTimeUtc)
+
+
+def _optional(values, count):
+    '''float64 array of count values with NaN for None; None gives an array of NaN'''
+    if values is None:
+        return np.full(count, np.nan)
+    if isinstance(values, np.ndarray):
+        return np.broadcast_to(values.astype(np.float64, copy=False), count)
+    return np.array([np.nan if value is None else value for value in values], np.float64)
+
+
+def _build(ids, symbols, types, directions, periods, generated, closes, magnitudes, confidences, weights, sources):
+    '''Insight objects from the fields of their rows'''
+    insights = []
+    for fields in zip(ids.tolist(), symbols, types.tolist(), directions.tolist(), periods.tolist(),
+                      generated.tolist(), closes.tolist(), magnitudes.tolist(), confidences.tolist(),
+                      weights.tolist(), sources.tolist()):
+        id, symbol, type, direction, period, generated_time, close_time, magnitude, confidence, weight, source = fields
+        insight = Insight.__new__(Insight)
+        insight.Id = id
+        insight.Symbol = symbol
+        insight.Type = _TYPES[type]
+        insight.Direction = _DIRECTIONS[direction]
+        insight.Period = period
+        insight.Magnitude = None if magnitude != magnitude else magnitude
+        insight.Confidence = None if confidence != confidence else confidence
+        insight.Weight = None if weight != weight else weight
+        insight.SourceModel = source
+        insight.GeneratedTimeUtc = generated_time
+        insight.CloseTimeUtc = close_time
+        insights.append(insight)
+    return insights
+
+
+class InsightBatch:
+    '''Insights of one alpha update as parallel arrays over the portfolio columns. Behaves as
+    a sequence of Insight, built the first time it is iterated or indexed.
+
+    Args:
+        symbols: Symbols indexed by the columns, normally Portfolio.symbols
+        columns: Column of each insight's symbol
+        direction: InsightDirection of each insight
+        period: timedelta of every insight, or a timedelta64 array with one per insight
+        type: InsightType of every insight
+        magnitude, confidence, weight: Arrays with NaN for none, or None when no insight has one
+        sourceModel: Name of the model emitting the insights'''
+
+    def __init__(self, symbols, columns, direction, period, type=InsightType.Price, magnitude=None,
+                 confidence=None, weight=None, sourceModel=None):
+        count = len(columns)
+        self.symbols = symbols
+        self.columns = np.asarray(columns, np.intp)
+        self.direction = np.asarray(direction, np.int8)
+        self.type = np.broadcast_to(np.asarray(type, np.int8), count)
+        self.period = np.broadcast_to(np.asarray(period, 'timedelta64[us]'), count)
+        self.magnitude = _optional(magnitude, count)
+        self.confidence = _optional(confidence, count)
+        self.weight = _optional(weight, count)
+        self.source = np.full(count, sourceModel, object)
+        self.ids = np.fromiter(itertools.islice(_ids, count), np.int64, count)
+        self.generated = np.full(count, 'NaT', 'datetime64[us]')
+        self.close = self.generated
+        self._insights = None
+
+    @staticmethod
+    def concatenate(batches):
+        '''One batch of the insights of batches over the same symbols, in order'''
+        batches = list(batches)
+        if len(batches) == 1:
+            return batches[0]
+        batch = InsightBatch.__new__(InsightBatch)
+        batch.symbols = batches[0].symbols
+        for name in ('columns', 'direction', 'type', 'period', 'magnitude', 'confidence', 'weight', 'source', 'ids',
+                     'generated', 'close'):
+            setattr(batch, name, np.concatenate([getattr(part, name) for part in batches]))
+        batch._insights = None
+        if any(part._insights is not None for part in batches):
+            batch._insights = [insight for part in batches for insight in part]
+        return batch
+
+    def __len__(self):
+        return len(self.columns)
+
+    def __iter__(self):
+        return iter(self.insights())
+
+    def __getitem__(self, index):
+        return self.insights()[index]
+
+    def insights(self):
+        '''The Insight objects of the batch'''
+        if self._insights is None:
+            symbols = self.symbols
+            self._insights = _build(self.ids, [symbols[column] for column in self.columns.tolist()], self.type,
+                                    self.direction, self.period, self.generated, self.close, self.magnitude,
+                                    self.confidence, self.weight, self.source)
+        return self._insights
+
+    def SetPeriodAndCloseTime(self, generated_time):
+        '''Stamps every insight as generated at generated_time'''
+        self.generated = np.full(len(self), np.datetime64(generated_time, 'us'))
+        self.close = self.generated + self.period
+        if self._insights is not None:
+            for insight in self._insights:
+                insight.SetPeriodAndCloseTime(generated_time)
+
+    def name_source(self, sourceModel):
+        '''Sets the source model of the insights that have none'''
+        unnamed = np.equal(self.source, None)
+        self.source[unnamed] = sourceModel
+        if self._insights is not None:
+            for insight in self._insights:
+                if insight.SourceModel is None:
+                    insight.SourceModel = sourceModel
+
+
+class InsightCollection:
+    '''Insights grouped by symbol, newest last, as rows of parallel arrays'''
+
+    _FIELDS = (('_id', np.int64), ('_symbol', np.intp), ('_type', np.int8), ('_direction', np.int8),
+               ('_period', 'timedelta64[us]'), ('_generated', 'datetime64[us]'), ('_close', 'datetime64[us]'),
+               ('_magnitude', np.float64), ('_confidence', np.float64), ('_weight', np.float64),
+               ('_source', object), ('_insight', object), ('_live', bool))
+
+    def __init__(self, capacity=64):
+        for name, dtype in self._FIELDS:
+            setattr(self, name, np.zeros(capacity, dtype) if dtype is bool else np.empty(capacity, dtype))
+        self._rows = 0
+        self._count = 0
+        self._symbols = []
+        self._symbol_ids = {}
+        # live rows of every symbol id, and the position of the symbol among those holding insights
+        self._held = np.zeros(16, np.intp)
+        self._rank = np.zeros(16, np.int64)
+        self._ranks = 0
+        self._next_expiry = None
+        self._mapped = None
+        self._inverse = None
+        self._version = 0
+        self._active = None
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        return iter(self._insights(self._ordered(self._live_rows())))
+
+    # rows
+
+    def _symbol_id(self, symbol):
+        id = self._symbol_ids.get(symbol)
+        if id is None:
+            id = self._symbol_ids[symbol] = len(self._symbols)
+            self._symbols.append(symbol)
+            if id == len(self._held):
+                self._held = np.resize(self._held, 2 * id)
+                self._held[id:] = 0
+                self._rank = np.resize(self._rank, 2 * id)
+        return id
+
+    def _column_ids(self, symbols):
+        '''Symbol id of every column of a list of symbols'''
+        mapped = self._mapped
+        if mapped is None or mapped[0] is not symbols or len(mapped[1]) != len(symbols):
+            mapped = self._mapped = symbols, np.array([self._symbol_id(symbol) for symbol in symbols], np.intp)
+        return mapped[1]
+
+    def _reserve(self, extra):
+        '''Moves the live rows to the front, growing the arrays if extra more rows do not fit'''
+        keep = self._live_rows()
+        capacity = max(len(self._live), 2 * (len(keep) + extra))
+        for name, dtype in self._FIELDS:
+            old = getattr(self, name)
+            new = np.zeros(capacity, dtype) if dtype is bool else np.empty(capacity, dtype)
+            new[:len(keep)] = old[keep]
+            setattr(self, name, new)
+        self._rows = len(keep)
+
+    def _append(self, symbol, type, direction, period, generated, close, magnitude, confidence, weight, source, ids,
+                insights=None):
+        count = len(symbol)
+        if count == 0:
+            return
+        if self._rows + count > len(self._live):
+            self._reserve(count)
+        rows = slice(self._rows, self._rows + count)
+        for name, values in (('_id', ids), ('_symbol', symbol), ('_type', type), ('_direction', direction),
+                             ('_period', period), ('_generated', generated), ('_close', close),
+                             ('_magnitude', magnitude), ('_confidence', confidence), ('_weight', weight),
+                             ('_source', source)):
+            getattr(self, name)[rows] = values
+        self._insight[rows] = None if insights is None else insights
+        self._live[rows] = True
+        self._rows += count
+        self._count += count
+        # symbols without insights join the end of the order, as they first appear
+        fresh = symbol[self._held[symbol] == 0]
+        if len(fresh):
+            unique, first = np.unique(fresh, return_index=True)
+            unique = unique[np.argsort(first)]
+            self._rank[unique] = np.arange(self._ranks, self._ranks + len(unique))
+            self._ranks += len(unique)
+        self._held[:len(self._symbols)] += np.bincount(symbol, minlength=len(self._symbols))
+        earliest = close.min()
+        if self._next_expiry is None or earliest < self._next_expiry:
+            self._next_expiry = earliest
+        self._version += 1
+
+    def _drop(self, rows):
+        if len(rows) == 0:
+            return
+        self._live[rows] = False
+        self._insight[rows] = None
+        self._held[:len(self._symbols)] -= np.bincount(self._symbol[rows], minlength=len(self._symbols))
+        self._count -= len(rows)
+        self._version += 1
+
+    def _live_rows(self):
+        return np.flatnonzero(self._live[:self._rows])
+
+    def _ordered(self, rows):
+        '''rows (ascending) by symbol in order, then oldest first'''
+        return rows[np.argsort(self._rank[self._symbol[rows]], kind='stable')]
+
+    def _active_rows(self, utcTime):
+        rows = self._live_rows()
+        return rows[self._close[rows] >= np.datetime64(utcTime, 'us')]
+
+    def _active_counts(self, utcTime):
+        '''Active insights of every symbol id at utcTime, kept until the rows change'''
+        active = self._active
+        if active is None or active[0] != utcTime or active[1] != self._version:
+            counts = np.bincount(self._symbol[self._active_rows(utcTime)], minlength=len(self._symbols))
+            active = self._active = utcTime, self._version, counts
+        return active[2]
+
+    def _last_active_rows(self, utcTime):
+        rows = self._active_rows(utcTime)
+        # the last of each symbol's rows, ordered by symbol
+        unique, index = np.unique(self._symbol[rows][::-1], return_index=True)
+        return rows[::-1][index][np.argsort(self._rank[unique])]
+
+    def _symbol_rows(self, symbol):
+        id = self._symbol_ids.get(symbol)
+        if id is None or not self._held[id]:
+            return np.empty(0, np.intp)
+        rows = self._live_rows()
+        return rows[self._symbol[rows] == id]
+
+    def _insights(self, rows):
+        '''Insight objects of rows, built for the rows that have none yet'''
+        objects = self._insight
+        missing = rows[np.equal(objects[rows], None)]
+        if len(missing):
+            symbols = self._symbols
+            objects[missing] = _build(self._id[missing], [symbols[id] for id in self._symbol[missing].tolist()],
+                                      self._type[missing], self._direction[missing], self._period[missing],
+                                      self._generated[missing], self._close[missing], self._magnitude[missing],
+                                      self._confidence[missing], self._weight[missing], self._source[missing])
+        return objects[rows].tolist()
+
+    # LEAN API
+
+    def Add(self, insight):
+        self.AddRange((insight,))
+
+    def AddRange(self, insights):
+        if isinstance(insights, InsightBatch):
+            self._append(self._column_ids(insights.symbols)[insights.columns], insights.type, insights.direction,
+                         insights.period, insights.generated, insights.close, insights.magnitude,
+                         insights.confidence, insights.weight, insights.source, insights.ids, insights._insights)
+            return
+        insights = list(insights)
+        if not insights:
+            return
+        self._append(np.array([self._symbol_id(insight.Symbol) for insight in insights], np.intp),
+                     np.array([insight.Type for insight in insights], np.int8),
+                     np.array([insight.Direction for insight in insights], np.int8),
+                     np.array([insight.Period for insight in insights], 'timedelta64[us]'),
+                     np.array([insight.GeneratedTimeUtc for insight in insights], 'datetime64[us]'),
+                     np.array([insight.CloseTimeUtc for insight in insights], 'datetime64[us]'),
+                     _optional([insight.Magnitude for insight in insights], len(insights)),
+                     _optional([insight.Confidence for insight in insights], len(insights)),
+                     _optional([insight.Weight for insight in insights], len(insights)),
+                     [insight.SourceModel for insight in insights],
+                     np.array([insight.Id for insight in insights], np.int64), insights)
+
+    def ContainsKey(self, symbol):
+        id = self._symbol_ids.get(symbol)
+        return id is not None and bool(self._held[id])
+
+    def GetNextExpiryTime(self):
+        return None if self._next_expiry is None else self._next_expiry.item()
+
+    def HasActiveInsights(self, symbol, utcTime):
+        id = self._symbol_ids.get(symbol)
+        return id is not None and bool(self._held[id]) and bool(self._active_counts(utcTime)[id])
+
+    def GetActiveInsights(self, utcTime):
+        return self._insights(self._ordered(self._active_rows(utcTime)))
+
+    def GetLastActiveInsights(self, utcTime):
+        '''The most recently generated active insight per symbol'''
+        return self._insights(self._last_active_rows(utcTime))
+
+    def RemoveExpiredInsights(self, utcTime):
+        '''Removes and returns the insights that expired before utcTime'''
+        rows = self._expired_rows(utcTime)
+        insights = self._insights(rows)
+        self._drop(rows)
+        return insights
+
+    def RemoveInsights(self, symbol):
+        rows = self._symbol_rows(symbol)
+        insights = self._insights(rows)
+        self._drop(rows)
+        self._update_next_expiry()
+        return insights
+
+    def Clear(self, symbols=None):
+        if symbols is None:
+            self._drop(self._live_rows())
+            self._next_expiry = None
+        else:
+            for symbol in symbols:
+                self._drop(self._symbol_rows(symbol))
+            self._update_next_expiry()
+
+    def _update_next_expiry(self):
+        '''The next expiry becomes that of the live rows left'''
+        close = self._close[self._live_rows()]
+        self._next_expiry = close.min() if len(close) else None
+
+    # array queries
+
+    def _expired_rows(self, utcTime):
+        '''Rows expired before utcTime, in order; the next expiry becomes that of the others'''
+        rows = self._live_rows()
+        close = self._close[rows]
+        expired = close < np.datetime64(utcTime, 'us')
+        kept = close[~expired]
+        self._next_expiry = kept.min() if len(kept) else None
+        return self._ordered(rows[expired])
+
+    def last_active(self, utcTime, symbols):
+        '''(columns, direction) of the insights GetLastActiveInsights returns, in its order,
+        with columns indexing symbols (normally Portfolio.symbols)'''
+        rows = self._last_active_rows(utcTime)
+        return self._columns_in(symbols, self._symbol[rows]), self._direction[rows]
+
+    def remove_expired(self, utcTime, symbols):
+        '''RemoveExpiredInsights returning the columns in symbols (normally Portfolio.symbols)
+        of the expired insights, in its order, instead of the insights'''
+        rows = self._expired_rows(utcTime)
+        columns = self._columns_in(symbols, self._symbol[rows])
+        self._drop(rows)
+        return columns
+
+    def _columns_in(self, symbols, ids):
+        ids_of_columns = self._column_ids(symbols)
+        inverse = self._inverse
+        if inverse is None or inverse[0] is not ids_of_columns or len(inverse[1]) != len(self._symbols):
+            columns = np.full(len(self._symbols), -1, np.intp)
+            columns[ids_of_columns] = np.arange(len(symbols))
+            inverse = self._inverse = ids_of_columns, columns
+        columns = inverse[1][ids]
+        if (columns < 0).any():
+            raise KeyError('{} is not among the symbols'.format(self._symbols[ids[np.argmax(columns < 0)]]))
+        return columns
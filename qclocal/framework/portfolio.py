@@ -0,0 +1,228 @@
+'''Portfolio targets and portfolio construction models.'''
+
+from datetime import timedelta
+
+import numpy as np
+
+from ..enums import InsightDirection, PortfolioBias, Resolution, resolution_to_timedelta
+
+
+class PortfolioTarget:
+    '''Desired quantity of a security'''
+
+    __slots__ = ('Symbol', 'Quantity')
+
+    def __init__(self, symbol, quantity):
+        self.Symbol = symbol
+        self.Quantity = float(quantity)
+
+    @staticmethod
+    def Percent(algorithm, symbol, percent):
+        '''Creates a target holding `percent` of the portfolio value in the security.
+        Returns None when the security has no price yet.'''
+        security = algorithm.Securities[symbol]
+        price = security.Price
+        if price == 0:
+            return None
+        portfolio_value = algorithm.Portfolio.TotalPortfolioValue
+        buffer = portfolio_value * algorithm.Settings.FreePortfolioValuePercentage
+        quantity = int(percent * (portfolio_value - buffer) / price)
+        return PortfolioTarget(symbol, quantity)
+
+    def __repr__(self):
+        return 'PortfolioTarget({}, {})'.format(self.Symbol, self.Quantity)
+
+
+def _rebalancing_func(rebalance):
+    if rebalance is None or callable(rebalance):
+        return rebalance
+    if isinstance(rebalance, Resolution):
+        rebalance = resolution_to_timedelta(rebalance)
+    if isinstance(rebalance, timedelta):
+        return lambda time: time + rebalance
+    raise TypeError('unsupported rebalance argument {!r}'.format(rebalance))
+
+
+class PortfolioConstructionModel:
+    '''Base portfolio construction model.
+
+    Targets are recomputed from the latest active insight per symbol whenever a
+    rebalance is due: on the rebalancing schedule, when new insights arrive, when the
+    universe changes or when an insight expires.'''
+
+    def __init__(self, rebalance=None, portfolioBias=PortfolioBias.LongShort):
+        self.RebalanceOnSecurityChanges = True
+        self.RebalanceOnInsightChanges = True
+        self.portfolioBias = PortfolioBias(portfolioBias)
+        self._rebalancing_func = _rebalancing_func(rebalance)
+        self._rebalancing_time = None
+        self._security_changes = False
+        self._removed_symbols = []
+
+    def CreateTargets(self, algorithm, insights):
+        '''Create portfolio targets from the specified insights
+        Args:
+            algorithm: The algorithm instance
+            insights: The insights to create portfolio targets from
+        Returns:
+            An enumerable of portfolio targets to be sent to the execution model'''
+        if not self.IsRebalanceDue(algorithm, insights, algorithm.UtcTime):
+            return []
+
+        targets = []
+        error_symbols = set()
+        last_active_insights = self.GetTargetInsights(algorithm)
+        percents = self.DetermineTargetPercent(last_active_insights)
+        for insight in last_active_insights:
+            target = PortfolioTarget.Percent(algorithm, insight.Symbol, percents[insight])
+            if target is None:
+                error_symbols.add(insight.Symbol)
+            else:
+                targets.append(target)
+
+        # liquidate symbols whose insights expired without being replaced
+        expired = algorithm.Insights.RemoveExpiredInsights(algorithm.UtcTime)
+        # in the order they expired or were removed: a set would order them by hash
+        flatten = dict.fromkeys([insight.Symbol for insight in expired] + self._removed_symbols)
+        self._removed_symbols = []
+        for symbol in flatten:
+            if symbol not in error_symbols and not algorithm.Insights.HasActiveInsights(symbol, algorithm.UtcTime):
+                targets.append(PortfolioTarget(symbol, 0))
+        return targets
+
+    def IsRebalanceDue(self, algorithm, insights, utcTime):
+        due = False
+        if self._rebalancing_func is not None and (self._rebalancing_time is None or utcTime >= self._rebalancing_time):
+            self._rebalancing_time = self._rebalancing_func(utcTime)
+            due = True
+        if insights and self.RebalanceOnInsightChanges:
+            due = True
+        if self._security_changes and self.RebalanceOnSecurityChanges:
+            due = True
+        next_expiry = algorithm.Insights.GetNextExpiryTime()
+        if next_expiry is not None and next_expiry < utcTime:
+            due = True
+        self._security_changes = False
+        return due
+
+    def GetTargetInsights(self, algorithm):
+        return algorithm.Insights.GetLastActiveInsights(algorithm.UtcTime)
+
+    def DetermineTargetPercent(self, activeInsights):
+        '''Will determine the target percent for each insight
+        Args:
+            activeInsights: The active insights to generate a target for
+        Returns:
+            A target percent for each insight'''
+        raise NotImplementedError
+
+    def RespectPortfolioBias(self, insight):
+        return self.portfolioBias == PortfolioBias.LongShort or insight.Direction == self.portfolioBias
+
+    def OnSecuritiesChanged(self, algorithm, changes):
+        '''Event fired each time the we add/remove securities from the data feed
+        Args:
+            algorithm: The algorithm instance that experienced the change in securities
+            changes: The security additions and removals from the algorithm'''
+        self._security_changes = True
+        for removed in changes.RemovedSecurities:
+            algorithm.Insights.RemoveInsights(removed.Symbol)
+            self._removed_symbols.append(removed.Symbol)
+
+
+class NullPortfolioConstructionModel(PortfolioConstructionModel):
+    def CreateTargets(self, algorithm, insights):
+        return []
+
+
+class EqualWeightingPortfolioConstructionModel(PortfolioConstructionModel):
+    '''Provides an implementation of IPortfolioConstructionModel that gives equal weighting to all securities.
+    The target percent holdings of each security is 1/N where N is the number of securities.
+    For insights of direction InsightDirection.Up, long targets are returned and
+    for insights of direction InsightDirection.Down, short targets are returned.'''
+
+    def __init__(self, rebalance=Resolution.Daily, portfolioBias=PortfolioBias.LongShort):
+        super().__init__(rebalance, portfolioBias)
+
+    def DetermineTargetPercent(self, activeInsights):
+        result = {}
+        count = sum(x.Direction != InsightDirection.Flat and self.RespectPortfolioBias(x) for x in activeInsights)
+        percent = 0 if count == 0 else 1.0 / count
+        for insight in activeInsights:
+            direction = insight.Direction if self.RespectPortfolioBias(insight) else InsightDirection.Flat
+            result[insight] = direction * percent
+        return result
+
+
+class BandedEqualWeightingPortfolioConstructionModel(EqualWeightingPortfolioConstructionModel):
+    '''EqualWeightingPortfolioConstructionModel computed as one weight array over the whole
+    universe, which only sends a target for a security whose holding has left its band.
+
+    The equal weight model re-targets every position to 1/N on each rebalance. As prices
+    and the portfolio value move, that is a small order for nearly every holding every day.
+    Here a holding is traded only when its weight is more than `band` away from the
+    target weight, or when it has to be opened, closed or reversed. With band=0 the orders
+    are the same as those of the equal weight model.
+
+    Args:
+        rebalance: As for EqualWeightingPortfolioConstructionModel
+        portfolioBias: As for EqualWeightingPortfolioConstructionModel
+        band: Allowed drift of a holding from its target, as a fraction of the portfolio value'''
+
+    def __init__(self, rebalance=Resolution.Daily, portfolioBias=PortfolioBias.LongShort, band=0.0):
+        super().__init__(rebalance, portfolioBias)
+        self.band = float(band)
+        self.targets_sent = 0
+        self.targets_in_band = 0
+
+    def CreateTargets(self, algorithm, insights):
+        if not self.IsRebalanceDue(algorithm, insights, algorithm.UtcTime):
+            return []
+        portfolio = algorithm.Portfolio
+        securities = algorithm.Securities
+        columns = len(portfolio.quantity)
+
+        # signed direction of the latest active insight of every column, 0 for none or flat,
+        # read from the insight arrays without building Insight objects
+        latest, latest_direction = algorithm.Insights.last_active(algorithm.UtcTime, portfolio.symbols)
+        if self.portfolioBias != PortfolioBias.LongShort:
+            latest_direction = np.where(latest_direction == self.portfolioBias, latest_direction, 0)
+        direction = np.zeros(columns)
+        direction[latest] = latest_direction
+        insight_held = np.zeros(columns, bool)
+        insight_held[latest] = True
+        # targets go out in the order the equal weight model sends them, so fills match it exactly
+        order = latest.tolist()
+        count = np.count_nonzero(direction)
+        weight = direction * (0 if count == 0 else 1.0 / count)
+
+        # liquidate symbols whose insights expired without being replaced
+        expired = algorithm.Insights.remove_expired(algorithm.UtcTime, portfolio.symbols)
+        flatten = np.zeros(columns, bool)
+        # in the order the equal weight model flattens them: expired first, then removed
+        symbols = dict.fromkeys([portfolio.symbols[column] for column in expired.tolist()] + self._removed_symbols)
+        for symbol in symbols:
+            if not algorithm.Insights.HasActiveInsights(symbol, algorithm.UtcTime):
+                column = securities[symbol].column
+                order.append(column)
+                flatten[column] = True
+        self._removed_symbols = []
+
+        portfolio_value = portfolio.TotalPortfolioValue
+        buffer = portfolio_value * algorithm.Settings.FreePortfolioValuePercentage
+        price = np.nan_to_num(portfolio.prices)
+        priced = price != 0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            target = np.where(priced, np.trunc(weight * (portfolio_value - buffer) / price), 0.0)
+        held = portfolio.quantity
+        # flattened columns have no active insight, so their weight and target are 0
+        change = ((insight_held & priced) | flatten) & (target != held)
+        if self.band > 0:
+            drift = np.abs(target - held) * price / portfolio_value if portfolio_value else np.zeros(columns)
+            # opening, closing and reversing always trade; resizing only outside the band
+            resize = (held != 0) & (target != 0) & (np.sign(held) == np.sign(target))
+            in_band = change & resize & (drift <= self.band)
+            self.targets_in_band += int(np.count_nonzero(in_band))
+            change &= ~in_band
+        self.targets_sent += int(np.count_nonzero(change))
+        return [PortfolioTarget(portfolio.symbols[column], target[column]) for column in order if change[column]]
@@ -0,0 +1,257 @@
+'''Risk management models.
+
+The per-security models are built on IndexedRiskManagementModel. Each rule it holds is a
+condition on one position that can be written as price levels: take profit at 3% above
+the average price of a long, stop out 5% below its high since opening, and so on. The
+levels of every rule are folded into one upper and one lower trigger price per portfolio
+column, the two sides of the index. They are computed when a fill opens, changes or
+closes a position, rather than being re-derived from the holdings on every step.
+
+A step then only looks at held columns that received a bar, because no other price has
+moved. Of those, only the ones whose price reached a trigger are checked against the
+exact condition of the rule. That check uses the same formula as LEAN, so a decision
+never differs from a full scan of the holdings.'''
+
+import numpy as np
+
+from .portfolio import PortfolioTarget
+
+# triggers are widened by this relative margin before the exact check, so rounding in
+# the precomputed level can never hide a position that meets its condition
+_MARGIN = 1e-9
+
+
+class RiskManagementModel:
+    '''Base risk model: may override portfolio targets before execution'''
+
+    def ManageRisk(self, algorithm, targets):
+        '''Manages the algorithm's risk at each time step
+        Args:
+            algorithm: The algorithm instance
+            targets: The current portfolio targets to be assessed for risk'''
+        raise NotImplementedError
+
+    def OnSecuritiesChanged(self, algorithm, changes):
+        pass
+
+
+class NullRiskManagementModel(RiskManagementModel):
+    def ManageRisk(self, algorithm, targets):
+        return []
+
+
+def unrealized_profit_percent(quantity, average_price, price):
+    '''Holdings.UnrealizedProfitPercent over arrays'''
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return quantity * (price - average_price) / np.abs(quantity * average_price)
+
+
+class TriggerRule:
+    '''A condition on one position that liquidates it, written as price levels.
+
+    levels() gives the (upper, lower) trigger prices of positions from their side (+1 long,
+    -1 short), average price and the highest and lowest price since they were opened;
+    inf and -inf stand for no trigger. exact() decides, for positions whose price reached
+    a level, whether the condition really holds. Rules with trailing = True depend on
+    the high and low and are re-evaluated on every bar of a held security.'''
+
+    trailing = False
+
+    def levels(self, side, average, high, low):
+        raise NotImplementedError
+
+    def exact(self, side, quantity, average, price, high, low):
+        raise NotImplementedError
+
+
+class TakeProfitRule(TriggerRule):
+    '''Unrealized profit above percent'''
+
+    def __init__(self, percent):
+        self.percent = abs(percent)
+
+    def levels(self, side, average, high, low):
+        return (np.where(side > 0, average * (1 + self.percent), np.inf),
+                np.where(side < 0, average * (1 - self.percent), -np.inf))
+
+    def exact(self, side, quantity, average, price, high, low):
+        return unrealized_profit_percent(quantity, average, price) > self.percent
+
+
+class StopLossRule(TriggerRule):
+    '''Unrealized loss beyond percent'''
+
+    def __init__(self, percent):
+        self.percent = abs(percent)
+
+    def levels(self, side, average, high, low):
+        return (np.where(side < 0, average * (1 + self.percent), np.inf),
+                np.where(side > 0, average * (1 - self.percent), -np.inf))
+
+    def exact(self, side, quantity, average, price, high, low):
+        return unrealized_profit_percent(quantity, average, price) < -self.percent
+
+
+class TrailingStopRule(TriggerRule):
+    '''Price more than percent below the high (long) or above the low (short) since opening'''
+
+    trailing = True
+
+    def __init__(self, percent):
+        self.percent = abs(percent)
+
+    def levels(self, side, average, high, low):
+        return (np.where(side < 0, low * (1 + self.percent), np.inf),
+                np.where(side > 0, high * (1 - self.percent), -np.inf))
+
+    def exact(self, side, quantity, average, price, high, low):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(side > 0, (high - price) / high, (price - low) / low) > self.percent
+
+
+class IndexedRiskManagementModel(RiskManagementModel):
+    '''Liquidates any position meeting one of its rules (see the module docstring)
+
+    Args:
+        rules: TriggerRule instances; more can be stacked with AddRule'''
+
+    def __init__(self, *rules):
+        self.rules = list(rules)
+        self._portfolio = None
+
+    def AddRule(self, rule):
+        '''Adds a rule; the index is rebuilt on the next step'''
+        self.rules.append(rule)
+        self._detach()
+
+    def ManageRisk(self, algorithm, targets):
+        '''Manages the algorithm's risk at each time step
+        Args:
+            algorithm: The algorithm instance
+            targets: The current portfolio targets to be assessed for risk'''
+        portfolio = algorithm.Portfolio
+        if portfolio is not self._portfolio or len(portfolio.quantity) != len(self._side):
+            self._attach(portfolio)
+        reopened = np.empty(0, np.intp)
+        if self._filled:
+            reopened = np.fromiter(self._filled, np.intp, len(self._filled))
+            self._filled.clear()
+            self._reopen(portfolio, reopened)
+
+        data = algorithm.CurrentSlice
+        check = self._side != 0
+        if data is not None:
+            check &= data.frame.has_bar[data.row]
+        check[self._armed] = True
+        check[reopened] = True
+
+        columns = np.flatnonzero(check)
+        prices = portfolio.prices[columns]
+        if self._trailing:
+            # only checked columns can have a new extreme; the others keep their levels
+            self._high[columns] = np.fmax(self._high[columns], prices)
+            self._low[columns] = np.fmin(self._low[columns], prices)
+            self._update_levels(columns)
+        candidates = columns[(prices >= self._upper[columns]) | (prices <= self._lower[columns])]
+        if len(candidates):
+            arguments = (self._side[candidates], portfolio.quantity[candidates], portfolio.average_price[candidates],
+                         portfolio.prices[candidates], self._high[candidates], self._low[candidates])
+            hit = np.zeros(len(candidates), bool)
+            for rule in self.rules:
+                hit |= rule.exact(*arguments)
+            candidates = candidates[hit & (arguments[1] != 0)]
+        # positions that met a rule are checked again next step even without a new bar,
+        # for as long as they are held
+        self._armed = candidates
+        return [PortfolioTarget(portfolio.symbols[column], 0) for column in candidates]
+
+    # index
+
+    def _attach(self, portfolio):
+        self._detach()
+        columns = len(portfolio.quantity)
+        self._side = np.zeros(columns)
+        self._high = np.full(columns, np.nan)
+        self._low = np.full(columns, np.nan)
+        self._fixed_upper = np.full(columns, np.inf)
+        self._fixed_lower = np.full(columns, -np.inf)
+        self._upper = np.full(columns, np.inf)
+        self._lower = np.full(columns, -np.inf)
+        self._armed = np.empty(0, np.intp)
+        self._trailing = any(rule.trailing for rule in self.rules)
+        self._filled = set(np.flatnonzero(portfolio.quantity != 0).tolist())
+        self._portfolio = portfolio
+        portfolio.fill_listeners.append(self._filled.add)
+
+    def _detach(self):
+        if self._portfolio is not None:
+            self._portfolio.fill_listeners.remove(self._filled.add)
+            self._portfolio = None
+
+    def _reopen(self, portfolio, columns):
+        '''Recomputes the triggers of columns whose holding changed'''
+        side = np.sign(portfolio.quantity[columns])
+        average = portfolio.average_price[columns]
+        opened = side != self._side[columns]
+        self._side[columns] = side
+        self._high[columns] = np.where(opened, average, self._high[columns])
+        self._low[columns] = np.where(opened, average, self._low[columns])
+        upper = np.full(len(columns), np.inf)
+        lower = np.full(len(columns), -np.inf)
+        for rule in self.rules:
+            if not rule.trailing:
+                rule_upper, rule_lower = rule.levels(side, average, self._high[columns], self._low[columns])
+                upper = np.fmin(upper, rule_upper)
+                lower = np.fmax(lower, rule_lower)
+        self._fixed_upper[columns] = upper
+        self._fixed_lower[columns] = lower
+        self._update_levels(columns)
+
+    def _update_levels(self, columns):
+        upper = self._fixed_upper[columns]
+        lower = self._fixed_lower[columns]
+        if self._trailing:
+            side = self._side[columns]
+            average = self._portfolio.average_price[columns]
+            for rule in self.rules:
+                if rule.trailing:
+                    rule_upper, rule_lower = rule.levels(side, average, self._high[columns], self._low[columns])
+                    upper = np.fmin(upper, rule_upper)
+                    lower = np.fmax(lower, rule_lower)
+        flat = self._side[columns] == 0
+        self._upper[columns] = np.where(flat, np.inf, upper * (1 - _MARGIN))
+        self._lower[columns] = np.where(flat, -np.inf, lower * (1 + _MARGIN))
+
+
+class MaximumUnrealizedProfitPercentPerSecurity(IndexedRiskManagementModel):
+    '''Provides an implementation of IRiskManagementModel that limits the unrealized profit per holding to the specified percentage'''
+
+    def __init__(self, maximumUnrealizedProfitPercent=0.05):
+        '''Initializes a new instance of the MaximumUnrealizedProfitPercentPerSecurity class
+        Args:
+            maximumUnrealizedProfitPercent: The maximum percentage unrealized profit allowed for any single security holding, defaults to 5% drawdown per security'''
+        self.maximumUnrealizedProfitPercent = abs(maximumUnrealizedProfitPercent)
+        super().__init__(TakeProfitRule(self.maximumUnrealizedProfitPercent))
+
+
+class MaximumDrawdownPercentPerSecurity(IndexedRiskManagementModel):
+    '''Provides an implementation of IRiskManagementModel that limits the drawdown per holding to the specified percentage'''
+
+    def __init__(self, maximumDrawdownPercent=0.05):
+        '''Initializes a new instance of the MaximumDrawdownPercentPerSecurity class
+        Args:
+            maximumDrawdownPercent: The maximum percentage drawdown allowed for any single security holding'''
+        self.maximumDrawdownPercent = abs(maximumDrawdownPercent)
+        super().__init__(StopLossRule(self.maximumDrawdownPercent))
+
+
+class TrailingStopRiskManagementModel(IndexedRiskManagementModel):
+    '''Provides an implementation of IRiskManagementModel that limits the maximum possible loss
+    measured from the highest unrealized profit'''
+
+    def __init__(self, maximumDrawdownPercent=0.05):
+        '''Initializes a new instance of the TrailingStopRiskManagementModel class
+        Args:
+            maximumDrawdownPercent: The maximum percentage drawdown allowed from the best price since opening'''
+        self.maximumDrawdownPercent = abs(maximumDrawdownPercent)
+        super().__init__(TrailingStopRule(self.maximumDrawdownPercent))
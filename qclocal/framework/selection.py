@@ -0,0 +1,192 @@
+'''Universe selection models and the SecurityChanges they produce.'''
+
+import csv
+from datetime import datetime
+
+import numpy as np
+
+from ..enums import Market, SecurityType, resolution_to_timedelta
+from ..symbol import Symbol
+
+
+class SecurityChanges:
+    '''Securities added to and removed from the universe in one step'''
+
+    def __init__(self, added=(), removed=()):
+        self.AddedSecurities = list(added)
+        self.RemovedSecurities = list(removed)
+
+    @property
+    def Count(self):
+        return len(self.AddedSecurities) + len(self.RemovedSecurities)
+
+    def __bool__(self):
+        return self.Count > 0
+
+    def __repr__(self):
+        return 'SecurityChanges(added={}, removed={})'.format(
+            [s.Symbol.Value for s in self.AddedSecurities], [s.Symbol.Value for s in self.RemovedSecurities])
+
+
+SecurityChanges.None_ = SecurityChanges()
+
+
+class UniverseSelectionModel:
+    '''Base universe selection model.
+
+    The engine calls SelectSymbols whenever GetNextRefreshTimeUtc has passed and diffs
+    the result against the current universe.'''
+
+    def GetNextRefreshTimeUtc(self):
+        return datetime.min
+
+    def SelectSymbols(self, algorithm, utcTime):
+        '''Returns the symbols that should be in the universe at utcTime'''
+        raise NotImplementedError
+
+    def candidate_symbols(self, algorithm):
+        '''Every symbol this model may ever select, so the engine can load their data up front'''
+        raise NotImplementedError
+
+
+def _as_symbol(value):
+    if isinstance(value, Symbol):
+        return value
+    return Symbol.Create(value, SecurityType.Equity, Market.USA)
+
+
+class ManualUniverseSelectionModel(UniverseSelectionModel):
+    '''Provides an implementation of IUniverseSelectionModel that simply subscribes to the specified set of symbols'''
+
+    def __init__(self, symbols=(), *more):
+        if isinstance(symbols, (Symbol, str)):
+            symbols = [symbols]
+        self.symbols = [_as_symbol(symbol) for symbol in list(symbols) + list(more)]
+        self._selected = False
+
+    def GetNextRefreshTimeUtc(self):
+        return datetime.max if self._selected else datetime.min
+
+    def SelectSymbols(self, algorithm, utcTime):
+        self._selected = True
+        return self.symbols
+
+    def candidate_symbols(self, algorithm):
+        return self.symbols
+
+
+class UniverseRankings:
+    '''Precomputed scores of a candidate set by date. Higher scores rank first; NaN leaves
+    a candidate out. Row i holds the scores known from times[i] on.
+
+    Args:
+        times: Sorted times the rows take effect
+        symbols: The candidates, one per column
+        scores: (times x symbols) matrix'''
+
+    def __init__(self, times, symbols, scores):
+        self.times = np.asarray(times, 'datetime64[s]')
+        self.symbols = [_as_symbol(symbol) for symbol in symbols]
+        self.scores = np.asarray(scores, float)
+        if self.scores.shape != (len(self.times), len(self.symbols)):
+            raise ValueError('scores must be a (times x symbols) matrix')
+
+    @classmethod
+    def from_csv(cls, path):
+        '''Reads a date,ticker,score table, e.g. a fundamental screen; one row per ranking
+        date and ticker, tickers missing on a date are not eligible then'''
+        with open(path, newline='') as handle:
+            rows = [(np.datetime64(row['date'], 's'), row['ticker'].upper(), float(row['score']))
+                    for row in csv.DictReader(handle)]
+        times = np.unique(np.array([row[0] for row in rows], 'datetime64[s]'))
+        tickers = sorted({row[1] for row in rows})
+        columns = {ticker: j for j, ticker in enumerate(tickers)}
+        scores = np.full((len(times), len(tickers)), np.nan)
+        for time, ticker, score in rows:
+            scores[np.searchsorted(times, time), columns[ticker]] = score
+        return cls(times, tickers, scores)
+
+    @classmethod
+    def dollar_volume(cls, frame, symbols, resolution, window=20):
+        '''Mean close * volume over the trailing window bars, from the bars of a BarFrame;
+        each row takes effect at the end of its bar. Bars without a trade count as zero.'''
+        columns = np.array([frame.column(symbol) for symbol in symbols], np.intp)
+        traded = np.nan_to_num(frame.close[:, columns] * frame.volume[:, columns])
+        totals = np.cumsum(traded, axis=0)
+        totals[window:] -= totals[:-window].copy()
+        scores = totals / window
+        scores[:window - 1] = np.nan
+        return cls(frame.times + np.timedelta64(resolution_to_timedelta(resolution)), symbols, scores)
+
+    def row(self, time):
+        '''Index of the rankings in effect at time, -1 before the first'''
+        return int(np.searchsorted(self.times, np.datetime64(time, 's'), 'right')) - 1
+
+    def next_time(self, time):
+        '''Time the next row after time takes effect; datetime.max after the last'''
+        row = self.row(time) + 1
+        return self.times[row].astype(datetime) if row < len(self.times) else datetime.max
+
+    def top(self, time, count):
+        '''The count best ranked eligible symbols at time, best first'''
+        row = self.row(time)
+        if row < 0:
+            return []
+        scores = self.scores[row]
+        eligible = np.flatnonzero(~np.isnan(scores))
+        best = eligible[np.argsort(-scores[eligible], kind='stable')[:count]]
+        return [self.symbols[column] for column in best.tolist()]
+
+
+class RankedUniverseSelectionModel(UniverseSelectionModel):
+    '''Selects the best ranked candidates from precomputed, date-indexed rankings.
+
+    The engine diffs each selection against the current universe, so only symbols that
+    enter it are added (and have their indicators warmed up), only symbols that leave it
+    are removed, and the indicators of symbols that stay keep their state.
+
+    Args:
+        rankings: UniverseRankings to select from. None ranks the candidates by their mean
+            dollar volume over the last window bars, computed from the loaded prices on
+            the first selection of a backtest.
+        count: Number of symbols in the universe
+        candidates: Symbols or tickers to choose from; all symbols of the rankings by default
+        rebalance: Time between selections; None selects again whenever a new row of the
+            rankings takes effect
+        window: Bars of the dollar volume average when rankings is None'''
+
+    def __init__(self, rankings=None, count=25, candidates=None, rebalance=None, window=20):
+        if rankings is None and not candidates:
+            raise ValueError('ranking by dollar volume needs the candidate symbols')
+        self.rankings = rankings
+        self.count = count
+        self.candidates = [_as_symbol(symbol) for symbol in candidates] if candidates else None
+        self.rebalance = rebalance
+        self.window = window
+        self._next = datetime.min
+
+    def GetNextRefreshTimeUtc(self):
+        return self._next
+
+    def SelectSymbols(self, algorithm, utcTime):
+        if self.rankings is None:
+            engine = algorithm._engine
+            self.rankings = UniverseRankings.dollar_volume(engine.frame, self.candidates, engine.resolution,
+                                                           self.window)
+        if self.candidates is not None and self.candidates != self.rankings.symbols:
+            # restrict a wider table to the candidates once
+            wanted = set(self.candidates)
+            columns = [j for j, symbol in enumerate(self.rankings.symbols) if symbol in wanted]
+            self.rankings = UniverseRankings(self.rankings.times, [self.rankings.symbols[j] for j in columns],
+                                             self.rankings.scores[:, columns])
+            self.candidates = self.rankings.symbols
+        selected = self.rankings.top(utcTime, self.count)
+        if self.rebalance is None or not selected:
+            # nothing is ranked yet while a dollar volume window fills: retry on the next row
+            self._next = self.rankings.next_time(utcTime)
+        else:
+            self._next = utcTime + self.rebalance
+        return selected
+
+    def candidate_symbols(self, algorithm):
+        return self.candidates if self.candidates is not None else self.rankings.symbols
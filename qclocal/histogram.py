@@ -0,0 +1,54 @@
+'''Bucketed counts of values with percentiles, for latencies and stage timings.
+
+Memory grows with the number of distinct buckets, not with the number of values
+recorded, so a histogram can sit in a session or a profiler for as long as it runs.'''
+
+import math
+from collections import Counter
+
+
+class Histogram:
+    '''Counts of values in buckets; exact for integers (precision None) or logarithmic
+    buckets a fraction `precision` wide for positive reals such as latencies'''
+
+    def __init__(self, precision=None):
+        self.precision = precision
+        self._log_base = None if precision is None else math.log1p(precision)
+        self._counts = Counter()
+        self.count = 0
+        self.total = 0.0
+        self.maximum = None
+
+    def record(self, value):
+        if self._log_base is None:
+            key = value
+        else:
+            key = math.floor(math.log(value) / self._log_base) if value > 0 else -math.inf
+        self._counts[key] += 1
+        self.count += 1
+        self.total += value
+        self.maximum = value if self.maximum is None else max(self.maximum, value)
+
+    def _value(self, key):
+        if self._log_base is None:
+            return key
+        if key == -math.inf:
+            return 0.0
+        # geometric middle of the bucket
+        return math.exp((key + 0.5) * self._log_base)
+
+    def percentile(self, q):
+        '''Value below which q percent of the recorded values fall'''
+        if not self.count:
+            return None
+        rank = max(1, math.ceil(q / 100 * self.count))
+        seen = 0
+        for key in sorted(self._counts):
+            seen += self._counts[key]
+            if seen >= rank:
+                return min(self._value(key), self.maximum)
+        return self.maximum
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else None
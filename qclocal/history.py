@@ -0,0 +1,206 @@
+'''History cache shared by every warm-up request of a backtest, and across backtests.
+
+WarmUpIndicator asks for its own window of bars, so a symbol with a MACD, an RSI and a
+Bollinger Band used to be read from the source three times, and again on every run.
+HistoryCache wraps a data source and keeps, per symbol, every bar before some end time.
+A request is answered by slicing that series whenever the end time is covered;
+otherwise only the missing tail is read and appended. The series are also written to
+disk as compressed columnar .npz files (one int64 time column plus one float64 column
+per field) so the next run starts warm. The disk cache is trimmed to a size limit by
+evicting the least recently used files. A save only adds its file to a running total of
+the directory size; the directory is scanned when that total first goes over the limit,
+and eviction then frees down to EVICT_TO of it, so a full cache is not scanned again on
+every save.'''
+
+import hashlib
+import os
+import re
+import tempfile
+from collections import Counter
+
+import numpy as np
+
+from .data import FIELDS, BarSeries, DataSource, slice_series, to_datetime64
+
+_EVERYTHING = np.datetime64('9999-12-31T00:00:00', 's')
+
+# fraction of max_bytes an eviction triggered by a save frees the cache down to
+EVICT_TO = 0.9
+
+
+class _Entry:
+    '''Every bar of a symbol with time < end'''
+
+    __slots__ = ('series', 'end', 'version')
+
+    def __init__(self, series, end, version):
+        self.series = series
+        self.end = end
+        self.version = version
+
+
+class HistoryCache(DataSource):
+    '''DataSource wrapper answering read() and history() from one load per symbol.
+
+    Args:
+        source: The data source to cache
+        directory: Where to persist the cached series; None keeps them in memory only.
+            Sources without a cache_identity() are never persisted.
+        max_bytes: Size limit of the directory, enforced by least recently used eviction
+        horizon: Optional time the first read of a symbol extends to, so later requests
+            (universe additions during the backtest) are answered without reading again.
+            Requests still only see bars before their own end time.'''
+
+    def __init__(self, source, directory=None, max_bytes=512 * 2 ** 20, horizon=None):
+        self.source = source
+        self.resolution = source.resolution
+        self.root = directory
+        self.directory = None
+        identity = source.cache_identity()
+        if directory is not None and identity is not None:
+            self.directory = os.path.join(directory, hashlib.sha1(identity.encode()).hexdigest()[:16])
+            os.makedirs(self.directory, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.horizon = to_datetime64(horizon)
+        self._entries = {}
+        self.fetches = Counter()
+        self.requests = 0
+        self.disk_hits = 0
+        # bytes of .npz files under root, counted on the first save and kept up to date
+        self._disk_bytes = None
+
+    def read(self, symbol, start=None, end=None):
+        self.requests += 1
+        bound = _EVERYTHING if end is None else to_datetime64(end) + np.timedelta64(1, 's')
+        return slice_series(self._covering(symbol, bound).series, start, end)
+
+    def load_frame(self, symbols, start=None, end=None):
+        # the backtest window is read once anyway; only history goes through the cache
+        return self.source.load_frame(symbols, start, end)
+
+    def cache_identity(self):
+        return self.source.cache_identity()
+
+    def data_version(self, symbol):
+        return self.source.data_version(symbol)
+
+    def _covering(self, symbol, bound):
+        '''The entry of the symbol, extended to hold every bar before bound'''
+        ticker = str(symbol).upper()
+        entry = self._entries.get(ticker)
+        if entry is None:
+            entry = self._load(ticker)
+        if entry is not None and entry.end >= bound:
+            return entry
+
+        target = bound if self.horizon is None or bound == _EVERYTHING else max(bound, self.horizon)
+        last = None if target == _EVERYTHING else target - np.timedelta64(1, 's')
+        self.fetches[ticker] += 1
+        if entry is None:
+            entry = _Entry(self.source.read(symbol, None, last), target, self.source.data_version(symbol))
+        else:
+            tail = self.source.read(symbol, entry.end, last)
+            entry.series = BarSeries(*(np.concatenate([old, new]) for old, new in zip(entry.series, tail)))
+            entry.end = target
+        self._entries[ticker] = entry
+        self._save(ticker, entry)
+        return entry
+
+    # disk
+
+    def _path(self, ticker):
+        return os.path.join(self.directory, re.sub(r'[^A-Z0-9._-]', '_', ticker) + '.npz')
+
+    def _load(self, ticker):
+        if self.directory is None:
+            return None
+        path = self._path(ticker)
+        try:
+            with np.load(path) as stored:
+                version = str(stored['version'])
+                if version != str(self.source.data_version(ticker)):
+                    return None
+                times = stored['times'].astype('datetime64[s]')
+                entry = _Entry(BarSeries(times, *(stored[field] for field in FIELDS)),
+                               stored['end'].astype('datetime64[s]')[()], version)
+        except (OSError, KeyError, ValueError):
+            return None
+        os.utime(path)
+        self.disk_hits += 1
+        self._entries[ticker] = entry
+        return entry
+
+    def _save(self, ticker, entry):
+        if self.directory is None:
+            return
+        path = self._path(ticker)
+        if self._disk_bytes is None:
+            self._disk_bytes = sum(size for _, size, _ in _cached_files(self.root))
+        replaced = _size(path)
+        handle, temporary = tempfile.mkstemp(suffix='.npz', dir=self.directory)
+        with os.fdopen(handle, 'wb') as output:
+            np.savez_compressed(output, times=entry.series.times.astype(np.int64),
+                                end=np.int64(entry.end.astype(np.int64)), version=np.str_(entry.version),
+                                **{field: np.asarray(getattr(entry.series, field), dtype=np.float64)
+                                   for field in FIELDS})
+        os.replace(temporary, path)
+        self._disk_bytes += _size(path) - replaced
+        if self._disk_bytes > self.max_bytes:
+            self.evict(int(self.max_bytes * EVICT_TO))
+
+    def evict(self, max_bytes=None):
+        '''Deletes the least recently used files until the cache directory fits max_bytes
+        (default: the cache's limit). Returns the number of bytes freed.'''
+        files = _cached_files(self.root)
+        total = sum(size for _, size, _ in files)
+        freed = _evict(files, total, self.max_bytes if max_bytes is None else max_bytes)
+        self._disk_bytes = total - freed
+        return freed
+
+    def summary(self):
+        return '{} history requests, {} source reads for {} symbols, {} served from disk'.format(
+            self.requests, sum(self.fetches.values()), len(self._entries), self.disk_hits)
+
+
+def evict_least_recent(root, max_bytes):
+    '''Deletes the least recently used .npz files under root until they fit max_bytes.
+    Returns the number of bytes freed.'''
+    files = _cached_files(root)
+    return _evict(files, sum(size for _, size, _ in files), max_bytes)
+
+
+def _cached_files(root):
+    '''(mtime, size, path) of the .npz files under root'''
+    files = []
+    if root is None or not os.path.isdir(root):
+        return files
+    for directory, _, names in os.walk(root):
+        for name in names:
+            if name.endswith('.npz'):
+                path = os.path.join(directory, name)
+                try:
+                    status = os.stat(path)
+                except OSError:
+                    continue
+                files.append((status.st_mtime_ns, status.st_size, path))
+    return files
+
+
+def _evict(files, total, max_bytes):
+    freed = 0
+    for _, size, path in sorted(files):
+        if total - freed <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        freed += size
+    return freed
+
+
+def _size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
@@ -0,0 +1,29 @@
+'''Names available to algorithm files, the local counterpart of LEAN's AlgorithmImports.
+
+Algorithm files written for QuantConnect use these names without importing them; the
+loader executes them with this module's public names in scope.'''
+
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+from .algorithm import QCAlgorithm
+from .consolidators import IdentityDataConsolidator, TradeBar, TradeBarConsolidator
+from .enums import (InsightDirection, InsightType, Market, MovingAverageType, OrderDirection, PortfolioBias,
+                    Resolution, SecurityType)
+from .fills import ConstantSlippageModel, NullSlippageModel, VolumeParticipationModel, VolumeShareSlippageModel
+from .framework.alpha import AlphaModel, BatchedMacdAlphaModel, CompositeAlphaModel, MacdAlphaModel, NullAlphaModel
+from .framework.ensemble import (BollingerSignal, EnsembleAlphaModel, EnsembleSignal, HullSignal, KamaSignal, MacdSignal,
+                                 RsiSignal, StochasticSignal)
+from .framework.execution import ExecutionModel, ImmediateExecutionModel, NullExecutionModel
+from .framework.insight import Insight, InsightBatch, InsightCollection
+from .framework.portfolio import (BandedEqualWeightingPortfolioConstructionModel, EqualWeightingPortfolioConstructionModel,
+                                  NullPortfolioConstructionModel, PortfolioConstructionModel, PortfolioTarget)
+from .framework.risk import (IndexedRiskManagementModel, MaximumDrawdownPercentPerSecurity,
+                             MaximumUnrealizedProfitPercentPerSecurity, NullRiskManagementModel, RiskManagementModel,
+                             StopLossRule, TakeProfitRule, TrailingStopRiskManagementModel, TrailingStopRule)
+from .framework.selection import (ManualUniverseSelectionModel, RankedUniverseSelectionModel, SecurityChanges,
+                                  UniverseRankings, UniverseSelectionModel)
+from .indicators import *  # noqa: F401,F403
+from .orders import ConstantFeeModel, InteractiveBrokersFeeModel, OrderEvent, OrderStatus, OrderTicket
+from .symbol import Symbol
@@ -0,0 +1,42 @@
+'''Indicators with the LEAN class names and constructor signatures.
+
+Every indicator updates in constant time from fixed-size windows (window.py) and has a
+compute() classmethod that returns its values over a whole history array at once.'''
+
+from .averages import (AsIndicator, DoubleExponentialMovingAverage, ExponentialMovingAverage, HullMovingAverage,
+                       KaufmanAdaptiveMovingAverage, LinearWeightedMovingAverage, MovingAverageConvergenceDivergence,
+                       SimpleMovingAverage, WildersMovingAverage)
+from .base import Identity, IndicatorBase, IndicatorDataPoint, TradeBarIndicator
+from .ichimoku import IchimokuKinkoHyo
+from .oscillators import RelativeStrengthIndex, Stochastic
+from .rolling import Delay, Maximum, Minimum, Sum
+from .volatility import BollingerBands, StandardDeviation, Variance
+from .volume import IntradayVwap, VolumeWeightedAveragePriceIndicator
+
+__all__ = [
+    'AsIndicator',
+    'BollingerBands',
+    'Delay',
+    'DoubleExponentialMovingAverage',
+    'ExponentialMovingAverage',
+    'HullMovingAverage',
+    'IchimokuKinkoHyo',
+    'Identity',
+    'IndicatorBase',
+    'IndicatorDataPoint',
+    'IntradayVwap',
+    'KaufmanAdaptiveMovingAverage',
+    'LinearWeightedMovingAverage',
+    'Maximum',
+    'Minimum',
+    'MovingAverageConvergenceDivergence',
+    'RelativeStrengthIndex',
+    'SimpleMovingAverage',
+    'StandardDeviation',
+    'Stochastic',
+    'Sum',
+    'TradeBarIndicator',
+    'Variance',
+    'VolumeWeightedAveragePriceIndicator',
+    'WildersMovingAverage',
+]
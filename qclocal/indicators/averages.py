@@ -0,0 +1,357 @@
+'''Moving averages and MACD.
+
+Window averages keep running sums over a RingBuffer, so Update is O(1) whatever the
+period. Every class also has a compute() classmethod returning the Current value after
+each element of a whole history array.'''
+
+import math
+from collections import namedtuple
+
+import numpy as np
+
+from ..enums import MovingAverageType
+from . import vectorized
+from .base import Identity, IndicatorBase, name_and_args, record
+from .window import RingBuffer, RollingSum
+
+
+class SimpleMovingAverage(IndicatorBase):
+    '''SimpleMovingAverage([name,] period)'''
+
+    def __init__(self, *args):
+        name, (period,) = name_and_args(args)
+        super().__init__(name or 'SMA({})'.format(period))
+        self.Period = period
+        self.WarmUpPeriod = period
+        self._sum = RollingSum(period)
+
+    def ComputeNextValue(self, time, value):
+        rolling = self._sum
+        return rolling.push(value) / rolling.count
+
+    def Reset(self):
+        super().Reset()
+        self._sum.clear()
+
+    @classmethod
+    def compute(cls, values, period):
+        values = vectorized.as_array(values)
+        return vectorized.rolling_sum(values, period) / vectorized.rolling_count(len(values), period)
+
+
+class ExponentialMovingAverage(IndicatorBase):
+    '''ExponentialMovingAverage([name,] period[, smoothingFactor])
+
+    The first sample seeds the average, as in LEAN.'''
+
+    @staticmethod
+    def SmoothingFactorDefault(period):
+        return 2.0 / (1 + period)
+
+    def __init__(self, *args):
+        name, args = name_and_args(args)
+        period = args[0]
+        k = float(args[1]) if len(args) > 1 else self.SmoothingFactorDefault(period)
+        super().__init__(name or 'EMA({})'.format(period))
+        self.Period = period
+        self.WarmUpPeriod = period
+        self._k = k
+
+    def ComputeNextValue(self, time, value):
+        if self.Samples == 1:
+            return value
+        return value * self._k + self.Current.Value * (1 - self._k)
+
+    @classmethod
+    def compute(cls, values, period, smoothingFactor=None):
+        k = cls.SmoothingFactorDefault(period) if smoothingFactor is None else float(smoothingFactor)
+        return vectorized.exponential(values, k)
+
+
+class WildersMovingAverage(ExponentialMovingAverage):
+    '''Exponential average with smoothing factor 1/period'''
+
+    def __init__(self, *args):
+        name, (period,) = name_and_args(args)
+        super().__init__(name or 'WWMA({})'.format(period), period, 1.0 / period)
+
+    @classmethod
+    def compute(cls, values, period):
+        return vectorized.exponential(values, 1.0 / period)
+
+
+class LinearWeightedMovingAverage(IndicatorBase):
+    '''LinearWeightedMovingAverage([name,] period)
+
+    The newest value has weight `period`, the oldest weight 1; the sum is always divided
+    by period * (period + 1) / 2, as in LEAN, so the value is damped until the window is
+    full. The weighted sum is updated from the plain running sum instead of re-weighting
+    the window.'''
+
+    def __init__(self, *args):
+        name, (period,) = name_and_args(args)
+        super().__init__(name or 'LWMA({})'.format(period))
+        self.Period = period
+        self.WarmUpPeriod = period
+        self._window = RingBuffer(period)
+        self._denominator = period * (period + 1) / 2.0
+        self._sum = 0.0
+        self._weighted = 0.0
+
+    def ComputeNextValue(self, time, value):
+        window = self._window
+        if window.IsReady:
+            # every weight drops by one, the evicted value falls off at weight zero
+            self._weighted += self.Period * value - self._sum
+            self._sum += value - window.push(value)
+        else:
+            window.push(value)
+            self._weighted += window.count * value
+            self._sum += value
+        return self._weighted / self._denominator
+
+    def Reset(self):
+        super().Reset()
+        self._window.clear()
+        self._sum = self._weighted = 0.0
+
+    @classmethod
+    def compute(cls, values, period):
+        values = vectorized.as_array(values)
+        weighted = np.empty(len(values))
+        head = min(period - 1, len(values))
+        weighted[:head] = np.cumsum(np.arange(1, head + 1) * values[:head])
+        if len(values) >= period:
+            weighted[head:] = vectorized.sliding_window_view(values, period) @ np.arange(1.0, period + 1)
+        return weighted / (period * (period + 1) / 2.0)
+
+
+class DoubleExponentialMovingAverage(IndicatorBase):
+    '''DoubleExponentialMovingAverage([name,] period): 2 * EMA - EMA(EMA)'''
+
+    def __init__(self, *args):
+        name, (period,) = name_and_args(args)
+        name = name or 'DEMA({})'.format(period)
+        super().__init__(name)
+        self.Period = period
+        self.WarmUpPeriod = 2 * period - 1
+        self._ema1 = ExponentialMovingAverage(name + '_1', period)
+        self._ema2 = ExponentialMovingAverage(name + '_2', period)
+
+    def ComputeNextValue(self, time, value):
+        ema1 = self._ema1
+        if not ema1.Update(time, value):
+            return ema1.Current.Value
+        self._ema2.Update(time, ema1.Current.Value)
+        return 2 * ema1.Current.Value - self._ema2.Current.Value
+
+    def Reset(self):
+        super().Reset()
+        self._ema1.Reset()
+        self._ema2.Reset()
+
+    @classmethod
+    def compute(cls, values, period):
+        ema1 = ExponentialMovingAverage.compute(values, period)
+        ready = period - 1
+        if len(ema1) <= ready:
+            return ema1
+        result = ema1.copy()
+        result[ready:] = 2 * ema1[ready:] - ExponentialMovingAverage.compute(ema1[ready:], period)
+        return result
+
+
+class HullMovingAverage(IndicatorBase):
+    '''HullMovingAverage([name,] period): LWMA(sqrt(period)) of 2 * LWMA(period / 2) - LWMA(period)'''
+
+    def __init__(self, *args):
+        name, (period,) = name_and_args(args)
+        name = name or 'HMA({})'.format(period)
+        super().__init__(name)
+        self.Period = period
+        self._slow = LinearWeightedMovingAverage(name + '_Slow', period)
+        self._fast = LinearWeightedMovingAverage(name + '_Fast', round(period / 2))
+        k = round(math.sqrt(period))
+        self._hull = LinearWeightedMovingAverage(name + '_Hull', k)
+        self.WarmUpPeriod = period + k - 1
+
+    def ComputeNextValue(self, time, value):
+        fast_ready = self._fast.Update(time, value)
+        slow_ready = self._slow.Update(time, value)
+        if fast_ready and slow_ready:
+            self._hull.Update(time, 2 * self._fast.Current.Value - self._slow.Current.Value)
+        return self._hull.Current.Value
+
+    def Reset(self):
+        super().Reset()
+        for indicator in (self._slow, self._fast, self._hull):
+            indicator.Reset()
+
+    @classmethod
+    def compute(cls, values, period):
+        values = vectorized.as_array(values)
+        fast = LinearWeightedMovingAverage.compute(values, round(period / 2))
+        slow = LinearWeightedMovingAverage.compute(values, period)
+        ready = max(period, round(period / 2)) - 1
+        hull = LinearWeightedMovingAverage.compute(2 * fast[ready:] - slow[ready:], round(math.sqrt(period)))
+        return vectorized.after(hull, ready, len(values))
+
+
+class KaufmanAdaptiveMovingAverage(IndicatorBase):
+    '''KaufmanAdaptiveMovingAverage([name,] period, fastEmaPeriod=2, slowEmaPeriod=30)
+
+    The efficiency ratio |x - x[period]| / sum|x - x[-1]| picks a smoothing constant
+    between the fast and slow EMA factors. The volatility sum is a RollingSum of absolute
+    one-bar changes. Until `period` changes are known the value is the input.'''
+
+    def __init__(self, *args):
+        name, args = name_and_args(args)
+        period = args[0]
+        fast = args[1] if len(args) > 1 else 2
+        slow = args[2] if len(args) > 2 else 30
+        super().__init__(name or 'KAMA({},{},{})'.format(period, fast, slow))
+        self.Period = period
+        self.WarmUpPeriod = period + 1
+        self._slow_factor = 2.0 / (slow + 1)
+        self._factor_range = 2.0 / (fast + 1) - self._slow_factor
+        self._window = RingBuffer(period + 1)
+        self._volatility = RollingSum(period)
+
+    def ComputeNextValue(self, time, value):
+        window = self._window
+        if window.count:
+            self._volatility.push(abs(value - window[0]))
+        window.push(value)
+        if not window.IsReady:
+            return value
+        change = abs(value - window.oldest)
+        volatility = self._volatility.sum
+        ratio = 1.0 if volatility == 0 or volatility <= change else change / volatility
+        constant = ratio * self._factor_range + self._slow_factor
+        constant *= constant
+        previous = self.Current.Value
+        return (value - previous) * constant + previous
+
+    def Reset(self):
+        super().Reset()
+        self._window.clear()
+        self._volatility.clear()
+
+    @classmethod
+    def compute(cls, values, period, fastEmaPeriod=2, slowEmaPeriod=30):
+        values = vectorized.as_array(values)
+        result = values.copy()
+        if len(values) <= period:
+            return result
+        slow_factor = 2.0 / (slowEmaPeriod + 1)
+        factor_range = 2.0 / (fastEmaPeriod + 1) - slow_factor
+        change = np.abs(values[period:] - values[:-period])
+        volatility = vectorized.rolling_sum(np.abs(np.diff(values)), period)[period - 1:]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratio = np.where((volatility == 0) | (volatility <= change), 1.0, change / volatility)
+        constants = ratio * factor_range + slow_factor
+        constants *= constants
+        current = values[period - 1]
+        for i, (value, constant) in enumerate(zip(values[period:].tolist(), constants.tolist()), period):
+            current = (value - current) * constant + current
+            result[i] = current
+        return result
+
+
+_AVERAGES = {
+    MovingAverageType.Simple: SimpleMovingAverage,
+    MovingAverageType.Exponential: ExponentialMovingAverage,
+    MovingAverageType.Wilders: WildersMovingAverage,
+    MovingAverageType.LinearWeightedMovingAverage: LinearWeightedMovingAverage,
+    MovingAverageType.DoubleExponential: DoubleExponentialMovingAverage,
+    MovingAverageType.Kama: KaufmanAdaptiveMovingAverage,
+    MovingAverageType.Hull: HullMovingAverage,
+}
+
+
+def _average_class(movingAverageType):
+    try:
+        return _AVERAGES[MovingAverageType(movingAverageType)]
+    except KeyError:
+        raise NotImplementedError('moving average type {} is not supported'.format(MovingAverageType(movingAverageType).name))
+
+
+def AsIndicator(movingAverageType, period, name=None):
+    '''Equivalent of LEAN's MovingAverageType.AsIndicator extension'''
+    cls = _average_class(movingAverageType)
+    return cls(name, period) if name else cls(period)
+
+
+def compute_average(movingAverageType, values, period):
+    '''compute() of the average AsIndicator would create'''
+    return _average_class(movingAverageType).compute(values, period)
+
+
+MacdValues = namedtuple('MacdValues', ('Current', 'Fast', 'Slow', 'Signal', 'Histogram'))
+
+
+class MovingAverageConvergenceDivergence(IndicatorBase):
+    '''MovingAverageConvergenceDivergence([name,] fastPeriod, slowPeriod, signalPeriod, type=Exponential)
+
+    Current is the fast minus slow average; Signal averages it once both are ready. With
+    Simple averages the three running sums are pushed here directly: going through three
+    SMA updates made it slower than recomputing the averages from a window.'''
+
+    def __init__(self, *args):
+        name, args = name_and_args(args)
+        fast, slow, signal = args[:3]
+        ma_type = MovingAverageType(args[3]) if len(args) > 3 else MovingAverageType.Exponential
+        name = name or 'MACD({},{},{})'.format(fast, slow, signal)
+        super().__init__(name)
+        self.Fast = AsIndicator(ma_type, fast, name + '_Fast')
+        self.Slow = AsIndicator(ma_type, slow, name + '_Slow')
+        self.Signal = AsIndicator(ma_type, signal, name + '_Signal')
+        self.Histogram = Identity(name + '_Histogram')
+        self.WarmUpPeriod = slow + signal - 1
+        self._simple = ma_type == MovingAverageType.Simple
+
+    @property
+    def IsReady(self):
+        return self.Signal.IsReady
+
+    def ComputeNextValue(self, time, value):
+        fast, slow, signal = self.Fast, self.Slow, self.Signal
+        if self._simple:
+            rolling = fast._sum
+            record(fast, time, rolling.push(value) / rolling.count)
+            rolling = slow._sum
+            record(slow, time, rolling.push(value) / rolling.count)
+            macd = fast.Current.Value - slow.Current.Value
+            if fast.Samples >= fast.WarmUpPeriod and slow.Samples >= slow.WarmUpPeriod:
+                rolling = signal._sum
+                record(signal, time, rolling.push(macd) / rolling.count)
+                if signal.Samples >= signal.WarmUpPeriod:
+                    record(self.Histogram, time, macd - signal.Current.Value)
+            return macd
+        fast_ready = fast.Update(time, value)
+        slow_ready = slow.Update(time, value)
+        macd = fast.Current.Value - slow.Current.Value
+        if fast_ready and slow_ready:
+            if signal.Update(time, macd):
+                self.Histogram.Update(time, macd - signal.Current.Value)
+        return macd
+
+    def Reset(self):
+        super().Reset()
+        for indicator in (self.Fast, self.Slow, self.Signal, self.Histogram):
+            indicator.Reset()
+
+    @classmethod
+    def compute(cls, values, fastPeriod, slowPeriod, signalPeriod, type=MovingAverageType.Exponential):
+        '''Returns MacdValues(Current, Fast, Slow, Signal, Histogram) arrays'''
+        values = vectorized.as_array(values)
+        length = len(values)
+        fast = compute_average(type, values, fastPeriod)
+        slow = compute_average(type, values, slowPeriod)
+        macd = fast - slow
+        ready = max(AsIndicator(type, fastPeriod).WarmUpPeriod, AsIndicator(type, slowPeriod).WarmUpPeriod) - 1
+        signal = vectorized.after(compute_average(type, macd[ready:], signalPeriod), ready, length)
+        histogram = np.zeros(length)
+        done = ready + AsIndicator(type, signalPeriod).WarmUpPeriod - 1
+        histogram[done:] = macd[done:] - signal[done:]
+        return MacdValues(macd, fast, slow, signal, histogram)
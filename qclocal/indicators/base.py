@@ -0,0 +1,125 @@
+'''Indicator base classes following LEAN's IndicatorBase contract.'''
+
+
+class IndicatorDataPoint:
+    '''Time stamped indicator value. Indicators mutate their Current point in
+    place so an update never allocates.'''
+
+    __slots__ = ('Time', 'Value')
+
+    def __init__(self, time=None, value=0.0):
+        self.Time = time
+        self.Value = value
+
+    @property
+    def EndTime(self):
+        return self.Time
+
+    def __float__(self):
+        return float(self.Value)
+
+    def __repr__(self):
+        return 'IndicatorDataPoint({}, {})'.format(self.Time, self.Value)
+
+
+class IndicatorBase:
+    '''Base class for indicators updated with a single value per bar.
+
+    Subclasses implement ComputeNextValue(time, value) and set WarmUpPeriod.'''
+
+    WarmUpPeriod = 1
+
+    def __init__(self, name):
+        self.Name = name
+        self.Samples = 0
+        self.Current = IndicatorDataPoint()
+        self.Updated = []
+
+    @property
+    def IsReady(self):
+        return self.Samples >= self.WarmUpPeriod
+
+    def Update(self, time, value=None):
+        '''Updates the indicator with a new value, returns IsReady.
+
+        Also accepts Update(data) for anything with EndTime and Value.'''
+        if value is None:
+            time, value = time.EndTime, time.Value
+        self.Samples += 1
+        current = self.Current
+        current.Value = self.ComputeNextValue(time, value)
+        current.Time = time
+        if self.Updated:
+            for handler in self.Updated:
+                handler(self, current)
+        return self.IsReady
+
+    def ComputeNextValue(self, time, value):
+        raise NotImplementedError
+
+    def Reset(self):
+        self.Samples = 0
+        self.Current.Time = None
+        self.Current.Value = 0.0
+
+    def __float__(self):
+        return float(self.Current.Value)
+
+    def __repr__(self):
+        return '{}: {}'.format(self.Name, self.Current.Value)
+
+
+class TradeBarIndicator(IndicatorBase):
+    '''Base class for indicators updated with whole bars (high, low, close, volume).
+
+    Subclasses implement ComputeNextBar(time, open, high, low, close, volume). Consolidators
+    call update_bar with the bar fields directly, so no TradeBar object is built.'''
+
+    def Update(self, bar):
+        '''Updates the indicator with a new bar, returns IsReady'''
+        return self.update_bar(bar.EndTime, bar.Open, bar.High, bar.Low, bar.Close, bar.Volume)
+
+    def update_bar(self, time, open, high, low, close, volume):
+        self.Samples += 1
+        current = self.Current
+        current.Value = self.ComputeNextBar(time, open, high, low, close, volume)
+        current.Time = time
+        if self.Updated:
+            for handler in self.Updated:
+                handler(self, current)
+        return self.IsReady
+
+    def ComputeNextBar(self, time, open, high, low, close, volume):
+        raise NotImplementedError
+
+
+def record(indicator, time, value):
+    '''Stores value as the indicator's next sample, as Update would after computing it.
+
+    Composite indicators use it to feed parts whose values they compute themselves, which
+    saves the Update and ComputeNextValue calls on every bar.'''
+    indicator.Samples += 1
+    current = indicator.Current
+    current.Value = value
+    current.Time = time
+    if indicator.Updated:
+        for handler in indicator.Updated:
+            handler(indicator, current)
+
+
+class Identity(IndicatorBase):
+    '''Passes the input value through; used for composite indicator outputs'''
+
+    def __init__(self, name='Identity'):
+        super().__init__(name)
+
+    def ComputeNextValue(self, time, value):
+        return value
+
+
+def name_and_args(args):
+    '''LEAN constructors optionally take the name as first argument.
+    Returns (name or None, remaining positional arguments).'''
+    if args and isinstance(args[0], str):
+        return args[0], args[1:]
+    return None, args
@@ -0,0 +1,466 @@
+'''Indicators over many series at once.
+
+Each kernel holds its state as arrays with one entry per series and is updated with an
+array of series indices plus their new values, so symbols without a bar simply are not
+in the update. The arithmetic follows the single-series indicators operation for
+operation, so a batched value is bit-identical to the value the matching per-symbol
+indicator would hold.'''
+
+import math
+
+import numpy as np
+
+from ..enums import MovingAverageType
+
+
+class BatchSimpleMovingAverage:
+    '''SimpleMovingAverage for `size` series: ring buffer per series plus a running sum'''
+
+    def __init__(self, period, size):
+        self.period = period
+        self.window = np.zeros((period, size))
+        self.position = np.zeros(size, dtype=np.intp)
+        self.samples = np.zeros(size, dtype=np.int64)
+        self.sum = np.zeros(size)
+        self.current = np.zeros(size)
+
+    def update(self, columns, values):
+        '''Updates the given series, returns their IsReady mask'''
+        samples = self.samples[columns]
+        positions = self.position[columns]
+        full = samples >= self.period
+        if full.any():
+            self.sum[columns[full]] -= self.window[positions[full], columns[full]]
+        self.window[positions, columns] = values
+        self.position[columns] = (positions + 1) % self.period
+        self.sum[columns] += values
+        samples += 1
+        self.samples[columns] = samples
+        self.current[columns] = self.sum[columns] / np.minimum(samples, self.period)
+        return samples >= self.period
+
+    def reset(self, columns):
+        # the stale window would never be read, but state() would carry it
+        self.window[:, columns] = 0.0
+        self.position[columns] = 0
+        self.samples[columns] = 0
+        self.sum[columns] = 0.0
+        self.current[columns] = 0.0
+
+    def state(self, column):
+        '''The state of one series as a flat float array, for set_state'''
+        return np.r_[self.window[:, column], self.position[column], self.samples[column], self.sum[column],
+                     self.current[column]]
+
+    def set_state(self, column, state):
+        period = self.period
+        self.window[:, column] = state[:period]
+        self.position[column] = int(state[period])
+        self.samples[column] = int(state[period + 1])
+        self.sum[column] = state[period + 2]
+        self.current[column] = state[period + 3]
+
+
+class BatchExponentialMovingAverage:
+    '''ExponentialMovingAverage for `size` series; the first sample seeds each series'''
+
+    def __init__(self, period, size, smoothing_factor=None):
+        self.period = period
+        self.k = 2.0 / (1 + period) if smoothing_factor is None else float(smoothing_factor)
+        self.samples = np.zeros(size, dtype=np.int64)
+        self.current = np.zeros(size)
+
+    def update(self, columns, values):
+        samples = self.samples[columns] + 1
+        self.samples[columns] = samples
+        k = self.k
+        self.current[columns] = np.where(samples == 1, values, values * k + self.current[columns] * (1 - k))
+        return samples >= self.period
+
+    def reset(self, columns):
+        self.samples[columns] = 0
+        self.current[columns] = 0.0
+
+    def state(self, column):
+        '''The state of one series as a flat float array, for set_state'''
+        return np.array([self.samples[column], self.current[column]], dtype=float)
+
+    def set_state(self, column, state):
+        self.samples[column] = int(state[0])
+        self.current[column] = state[1]
+
+
+# the moving average types batch_average has a kernel for
+BATCH_AVERAGE_TYPES = (MovingAverageType.Simple, MovingAverageType.Exponential, MovingAverageType.Wilders)
+
+
+def batch_average_type(moving_average_type, owner):
+    '''The MovingAverageType, checked to have a batched kernel; ValueError naming owner if not'''
+    moving_average_type = MovingAverageType(moving_average_type)
+    if moving_average_type not in BATCH_AVERAGE_TYPES:
+        raise ValueError('{} supports the {} moving averages, not {}'.format(
+            owner, ', '.join(kind.name for kind in BATCH_AVERAGE_TYPES), moving_average_type.name))
+    return moving_average_type
+
+
+def batch_average(moving_average_type, period, size):
+    '''Batched counterpart of indicators.AsIndicator'''
+    moving_average_type = batch_average_type(moving_average_type, 'batch_average')
+    if moving_average_type == MovingAverageType.Simple:
+        return BatchSimpleMovingAverage(period, size)
+    if moving_average_type == MovingAverageType.Exponential:
+        return BatchExponentialMovingAverage(period, size)
+    return BatchExponentialMovingAverage(period, size, 1.0 / period)
+
+
+class BatchMovingAverageConvergenceDivergence:
+    '''MovingAverageConvergenceDivergence for `size` series'''
+
+    def __init__(self, fast, slow, signal, moving_average_type, size):
+        self.fast = batch_average(moving_average_type, fast, size)
+        self.slow = batch_average(moving_average_type, slow, size)
+        self.signal = batch_average(moving_average_type, signal, size)
+        self.histogram = np.zeros(size)
+        self.current = np.zeros(size)
+        self.samples = np.zeros(size, dtype=np.int64)
+        self.warm_up_period = slow + signal - 1
+
+    def update(self, columns, values):
+        '''Updates the given series, returns their IsReady (signal ready) mask'''
+        fast_ready = self.fast.update(columns, values)
+        slow_ready = self.slow.update(columns, values)
+        macd = self.fast.current[columns] - self.slow.current[columns]
+        self.current[columns] = macd
+        self.samples[columns] += 1
+        both = fast_ready & slow_ready
+        if both.any():
+            updated = columns[both]
+            signal_ready = self.signal.update(updated, macd[both])
+            done = updated[signal_ready]
+            self.histogram[done] = self.current[done] - self.signal.current[done]
+        return self.signal.samples[columns] >= self.signal.period
+
+    def reset(self, columns):
+        for kernel in (self.fast, self.slow, self.signal):
+            kernel.reset(columns)
+        self.histogram[columns] = 0.0
+        self.current[columns] = 0.0
+        self.samples[columns] = 0
+
+    def state(self, column):
+        '''The state of one series as a flat float array, for set_state'''
+        return np.r_[self.fast.state(column), self.slow.state(column), self.signal.state(column),
+                     self.histogram[column], self.current[column], self.samples[column]]
+
+    def set_state(self, column, state):
+        offset = 0
+        for kernel in (self.fast, self.slow, self.signal):
+            size = len(kernel.state(column))
+            kernel.set_state(column, state[offset:offset + size])
+            offset += size
+        self.histogram[column] = state[offset]
+        self.current[column] = state[offset + 1]
+        self.samples[column] = int(state[offset + 2])
+
+
+class BatchRollingSum:
+    '''window.RollingSum for `size` series'''
+
+    def __init__(self, period, size):
+        self.period = period
+        self.window = np.zeros((period, size))
+        self.position = np.zeros(size, dtype=np.intp)
+        self.count = np.zeros(size, dtype=np.int64)
+        self.sum = np.zeros(size)
+
+    def push(self, columns, values):
+        '''Pushes a value into each given series, returns their sums'''
+        positions = self.position[columns]
+        full = self.count[columns] == self.period
+        if full.any():
+            self.sum[columns[full]] -= self.window[positions[full], columns[full]]
+        self.window[positions, columns] = values
+        self.position[columns] = (positions + 1) % self.period
+        self.count[columns] = np.minimum(self.count[columns] + 1, self.period)
+        self.sum[columns] += values
+        return self.sum[columns]
+
+    def reset(self, columns):
+        self.window[:, columns] = 0.0
+        self.position[columns] = 0
+        self.count[columns] = 0
+        self.sum[columns] = 0.0
+
+
+class BatchRelativeStrengthIndex:
+    '''RelativeStrengthIndex for `size` series'''
+
+    def __init__(self, period, moving_average_type, size):
+        self.period = period
+        self.average_gain = batch_average(moving_average_type, period, size)
+        self.average_loss = batch_average(moving_average_type, period, size)
+        self.previous = np.zeros(size)
+        self.samples = np.zeros(size, dtype=np.int64)
+        self.current = np.zeros(size)
+        self.warm_up_period = period + 1
+
+    def update(self, columns, values):
+        '''Updates the given series, returns their IsReady mask'''
+        seen = self.samples[columns] > 0
+        if seen.any():
+            changed, value = columns[seen], values[seen]
+            previous = self.previous[changed]
+            rising = value >= previous
+            self.average_gain.update(changed, np.where(rising, value - previous, 0.0))
+            self.average_loss.update(changed, np.where(rising, 0.0, previous - value))
+        self.previous[columns] = values
+        self.samples[columns] += 1
+        gain, loss = self.average_gain.current[columns], self.average_loss.current[columns]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.current[columns] = np.where(loss == 0, 100.0, 100.0 - 100.0 / (1 + gain / loss))
+        return (self.average_gain.samples[columns] >= self.period) & (self.average_loss.samples[columns] >= self.period)
+
+    def reset(self, columns):
+        self.average_gain.reset(columns)
+        self.average_loss.reset(columns)
+        self.previous[columns] = 0.0
+        self.samples[columns] = 0
+        self.current[columns] = 0.0
+
+
+class BatchBollingerBands:
+    '''BollingerBands for `size` series; the price is not kept, it is the caller's input'''
+
+    def __init__(self, period, k, moving_average_type, size):
+        self.period = period
+        self.k = float(k)
+        # a simple middle band is the mean of the variance's running sum, to the bit
+        simple = MovingAverageType(moving_average_type) == MovingAverageType.Simple
+        self.middle = None if simple else batch_average(moving_average_type, period, size)
+        self._sum = BatchRollingSum(period, size)
+        self._squares = BatchRollingSum(period, size)
+        self.samples = np.zeros(size, dtype=np.int64)
+        self.standard_deviation = np.zeros(size)
+        self.upper = np.zeros(size)
+        self.lower = np.zeros(size)
+        self.warm_up_period = period
+
+    def update(self, columns, values):
+        '''Updates the given series, returns their IsReady mask'''
+        total = self._sum.push(columns, values)
+        squares = self._squares.push(columns, values * values)
+        count = self._sum.count[columns]
+        mean = total / count
+        # rounding can take the difference slightly below zero for a flat window
+        deviation = np.sqrt(np.maximum(squares / count - mean * mean, 0.0))
+        self.standard_deviation[columns] = deviation
+        if self.middle is None:
+            middle, middle_ready = mean, True
+        else:
+            middle_ready = self.middle.update(columns, values)
+            middle = self.middle.current[columns]
+        width = self.k * deviation
+        self.upper[columns] = middle + width
+        self.lower[columns] = middle - width
+        self.samples[columns] += 1
+        return middle_ready & (self.samples[columns] >= self.period)
+
+    def reset(self, columns):
+        for kernel in (self.middle, self._sum, self._squares):
+            if kernel is not None:
+                kernel.reset(columns)
+        for values in (self.samples, self.standard_deviation, self.upper, self.lower):
+            values[columns] = 0
+
+
+class BatchStochastic:
+    '''Stochastic for `size` series, updated with whole bars. The range extremes are kept
+    as running values over a (size x period) window of highs and lows; a series' window is
+    scanned again only when the value leaving it was the extreme.'''
+
+    bars = True
+
+    def __init__(self, period, k_period, d_period, size):
+        self.period = period
+        self.k_period = k_period
+        self.d_period = d_period
+        self.highs = np.full((size, period), -np.inf)
+        self.lows = np.full((size, period), np.inf)
+        self.highest = np.full(size, -np.inf)
+        self.lowest = np.full(size, np.inf)
+        self.samples = np.zeros(size, dtype=np.int64)
+        self._sum_fast_k = BatchRollingSum(k_period, size)
+        self._sum_slow_k = BatchRollingSum(d_period, size)
+        self.fast_stoch = np.zeros(size)
+        self.stoch_k = np.zeros(size)
+        self.stoch_d = np.zeros(size)
+        self.warm_up_period = period
+
+    def update_bar(self, columns, high, low, close):
+        '''Updates the given series with a bar each, returns their IsReady mask'''
+        samples = self.samples[columns]
+        positions = samples % self.period
+        highest = self._push(self.highs, self.highest, columns, positions, high, np.maximum)
+        lowest = self._push(self.lows, self.lowest, columns, positions, low, np.minimum)
+        samples = samples + 1
+        self.samples[columns] = samples
+        period, k_period, d_period = self.period, self.k_period, self.d_period
+
+        denominator = highest - lowest
+        # LEAN leaves the fast %K sum untouched on a bar without range
+        ranged = denominator != 0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            fast = np.where(ranged & (samples >= period), (close - lowest) / denominator, 0.0)
+        if ranged.any():
+            self._sum_fast_k.push(columns[ranged], fast[ranged])
+        self.fast_stoch[columns] = fast * 100
+
+        stoch_k = np.where(samples >= period + k_period - 1, self._sum_fast_k.sum[columns] / k_period, 0.0)
+        self._sum_slow_k.push(columns, stoch_k)
+        self.stoch_k[columns] = stoch_k * 100
+
+        stoch_d = np.where(samples >= period + k_period + d_period - 2, self._sum_slow_k.sum[columns] / d_period, 0.0)
+        self.stoch_d[columns] = stoch_d * 100
+        return samples >= period
+
+    @staticmethod
+    def _push(window, extreme, columns, positions, values, better):
+        '''Writes values into the windows of columns; returns and keeps their new extremes'''
+        evicted = window[columns, positions]
+        window[columns, positions] = values
+        previous = extreme[columns]
+        current = better(previous, values)
+        # the extreme left the window and the new value does not replace it
+        stale = np.flatnonzero((evicted == previous) & (current == previous))
+        if len(stale):
+            current[stale] = better.reduce(window[columns[stale]], axis=1)
+        extreme[columns] = current
+        return current
+
+    def reset(self, columns):
+        self.highs[columns] = -np.inf
+        self.lows[columns] = np.inf
+        self.highest[columns] = -np.inf
+        self.lowest[columns] = np.inf
+        self.samples[columns] = 0
+        self._sum_fast_k.reset(columns)
+        self._sum_slow_k.reset(columns)
+        for values in (self.fast_stoch, self.stoch_k, self.stoch_d):
+            values[columns] = 0.0
+
+
+class BatchKaufmanAdaptiveMovingAverage:
+    '''KaufmanAdaptiveMovingAverage for `size` series'''
+
+    def __init__(self, period, fast, slow, size):
+        self.period = period
+        self.slow_factor = 2.0 / (slow + 1)
+        self.factor_range = 2.0 / (fast + 1) - self.slow_factor
+        self.window = np.zeros((period + 1, size))
+        self.samples = np.zeros(size, dtype=np.int64)
+        self._volatility = BatchRollingSum(period, size)
+        self.current = np.zeros(size)
+        self.warm_up_period = period + 1
+
+    def update(self, columns, values):
+        '''Updates the given series, returns their IsReady mask'''
+        length = self.period + 1
+        samples = self.samples[columns]
+        seen = samples > 0
+        if seen.any():
+            newest = self.window[(samples[seen] - 1) % length, columns[seen]]
+            self._volatility.push(columns[seen], np.abs(values[seen] - newest))
+        self.window[samples % length, columns] = values
+        samples = samples + 1
+        self.samples[columns] = samples
+        ready = samples >= length
+        current = values.copy()
+        if ready.any():
+            updated, value = columns[ready], values[ready]
+            # the slot after the newest holds the oldest value of a full window
+            change = np.abs(value - self.window[samples[ready] % length, updated])
+            volatility = self._volatility.sum[updated]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                ratio = np.where((volatility == 0) | (volatility <= change), 1.0, change / volatility)
+            constant = ratio * self.factor_range + self.slow_factor
+            constant *= constant
+            previous = self.current[updated]
+            current[ready] = (value - previous) * constant + previous
+        self.current[columns] = current
+        return ready
+
+    def reset(self, columns):
+        self.samples[columns] = 0
+        self._volatility.reset(columns)
+        self.current[columns] = 0.0
+
+
+class BatchLinearWeightedMovingAverage:
+    '''LinearWeightedMovingAverage for `size` series'''
+
+    def __init__(self, period, size):
+        self.period = period
+        self.denominator = period * (period + 1) / 2.0
+        self.window = np.zeros((period, size))
+        self.samples = np.zeros(size, dtype=np.int64)
+        self.sum = np.zeros(size)
+        self.weighted = np.zeros(size)
+        self.current = np.zeros(size)
+
+    def update(self, columns, values):
+        '''Updates the given series, returns their IsReady mask'''
+        period = self.period
+        samples = self.samples[columns]
+        positions = samples % period
+        full = samples >= period
+        total, weighted = self.sum[columns], self.weighted[columns]
+        evicted = self.window[positions, columns]
+        # every weight drops by one once the window is full, the evicted value falls off at weight zero
+        weighted = np.where(full, weighted + (period * values - total), weighted + (samples + 1) * values)
+        total = np.where(full, total + (values - evicted), total + values)
+        self.window[positions, columns] = values
+        samples = samples + 1
+        self.samples[columns] = samples
+        self.sum[columns] = total
+        self.weighted[columns] = weighted
+        self.current[columns] = weighted / self.denominator
+        return samples >= period
+
+    def reset(self, columns):
+        self.samples[columns] = 0
+        self.sum[columns] = 0.0
+        self.weighted[columns] = 0.0
+        self.current[columns] = 0.0
+
+
+class BatchHullMovingAverage:
+    '''HullMovingAverage for `size` series'''
+
+    def __init__(self, period, size):
+        self.period = period
+        self.slow = BatchLinearWeightedMovingAverage(period, size)
+        self.fast = BatchLinearWeightedMovingAverage(round(period / 2), size)
+        k = round(math.sqrt(period))
+        self.hull = BatchLinearWeightedMovingAverage(k, size)
+        self.samples = np.zeros(size, dtype=np.int64)
+        self.warm_up_period = period + k - 1
+
+    @property
+    def current(self):
+        return self.hull.current
+
+    def update(self, columns, values):
+        '''Updates the given series, returns their IsReady mask'''
+        fast_ready = self.fast.update(columns, values)
+        slow_ready = self.slow.update(columns, values)
+        both = fast_ready & slow_ready
+        if both.any():
+            updated = columns[both]
+            self.hull.update(updated, 2 * self.fast.current[updated] - self.slow.current[updated])
+        self.samples[columns] += 1
+        return self.samples[columns] >= self.warm_up_period
+
+    def reset(self, columns):
+        for kernel in (self.slow, self.fast, self.hull):
+            kernel.reset(columns)
+        self.samples[columns] = 0
@@ -0,0 +1,126 @@
+'''Ichimoku Kinko Hyo.'''
+
+from collections import namedtuple
+
+import numpy as np
+
+from . import vectorized
+from .base import Identity, TradeBarIndicator, name_and_args, record
+from .rolling import Delay, Maximum, Minimum
+
+IchimokuKinkoHyoValues = namedtuple('IchimokuKinkoHyoValues', ('Tenkan', 'Kijun', 'SenkouA', 'SenkouB', 'Chikou'))
+
+
+class IchimokuKinkoHyo(TradeBarIndicator):
+    '''IchimokuKinkoHyo([name,] tenkanPeriod=9, kijunPeriod=26, senkouAPeriod=26, senkouBPeriod=52,
+    senkouADelayPeriod=26, senkouBDelayPeriod=26)
+
+    Tenkan and Kijun are the midpoints of the high-low range over their periods, SenkouA
+    their average and SenkouB the midpoint over senkouBPeriod, both shifted by their delay;
+    Chikou is the close shifted by senkouADelayPeriod. The six range extremes are
+    Maximum/Minimum indicators backed by monotonic deques. senkouAPeriod is kept for
+    signature compatibility; LEAN does not use it either. Current is the close.'''
+
+    def __init__(self, *args):
+        name, args = name_and_args(args)
+        defaults = (9, 26, 26, 52, 26, 26)
+        tenkan, kijun, senkou_a, senkou_b, delay_a, delay_b = tuple(args) + defaults[len(args):]
+        name = name or 'ICHIMOKU({},{},{},{},{},{})'.format(tenkan, kijun, senkou_a, senkou_b, delay_a, delay_b)
+        super().__init__(name)
+        self.WarmUpPeriod = max(tenkan + delay_a, kijun + delay_a, senkou_b + delay_b)
+        self.Tenkan = Identity(name + '_Tenkan')
+        self.Kijun = Identity(name + '_Kijun')
+        self.SenkouA = Identity(name + '_SenkouA')
+        self.SenkouB = Identity(name + '_SenkouB')
+        self.Chikou = Delay(name + '_Chikou', delay_a)
+        self.TenkanMaximum = Maximum(name + '_TenkanMax', tenkan)
+        self.TenkanMinimum = Minimum(name + '_TenkanMin', tenkan)
+        self.KijunMaximum = Maximum(name + '_KijunMax', kijun)
+        self.KijunMinimum = Minimum(name + '_KijunMin', kijun)
+        self.SenkouBMaximum = Maximum(name + '_SenkouBMaximum', senkou_b)
+        self.SenkouBMinimum = Minimum(name + '_SenkouBMinimum', senkou_b)
+        self.DelayedTenkanSenkouA = Delay(name + '_DelayedTenkan', delay_a)
+        self.DelayedKijunSenkouA = Delay(name + '_DelayedKijun', delay_a)
+        self.DelayedMaximumSenkouB = Delay(name + '_DelayedMax', delay_b)
+        self.DelayedMinimumSenkouB = Delay(name + '_DelayedMin', delay_b)
+
+    @property
+    def IsReady(self):
+        return self.Tenkan.IsReady and self.Kijun.IsReady and self.SenkouA.IsReady and self.SenkouB.IsReady
+
+    def ComputeNextBar(self, time, open, high, low, close, volume):
+        # the parts are fed through record(): fifteen Update calls a bar cost more than the
+        # windows behind them, and made this slower than rescanning the bars
+        tenkan_ready = _push_range(self.TenkanMaximum, self.TenkanMinimum, time, high, low)
+        kijun_ready = _push_range(self.KijunMaximum, self.KijunMinimum, time, high, low)
+        senkou_b_ready = _push_range(self.SenkouBMaximum, self.SenkouBMinimum, time, high, low)
+        _push_delay(self.Chikou, time, close)
+
+        delayed_tenkan, delayed_kijun = self.DelayedTenkanSenkouA, self.DelayedKijunSenkouA
+        if tenkan_ready:
+            tenkan = (self.TenkanMaximum.Current.Value + self.TenkanMinimum.Current.Value) / 2
+            record(self.Tenkan, time, tenkan)
+            _push_delay(delayed_tenkan, time, tenkan)
+        if kijun_ready:
+            kijun = (self.KijunMaximum.Current.Value + self.KijunMinimum.Current.Value) / 2
+            record(self.Kijun, time, kijun)
+            _push_delay(delayed_kijun, time, kijun)
+        if (delayed_tenkan.Samples >= delayed_tenkan.WarmUpPeriod and
+                delayed_kijun.Samples >= delayed_kijun.WarmUpPeriod):
+            record(self.SenkouA, time, (delayed_tenkan.Current.Value + delayed_kijun.Current.Value) / 2)
+        delayed_maximum, delayed_minimum = self.DelayedMaximumSenkouB, self.DelayedMinimumSenkouB
+        if senkou_b_ready:
+            _push_delay(delayed_maximum, time, self.SenkouBMaximum.Current.Value)
+            _push_delay(delayed_minimum, time, self.SenkouBMinimum.Current.Value)
+        if (delayed_maximum.Samples >= delayed_maximum.WarmUpPeriod and
+                delayed_minimum.Samples >= delayed_minimum.WarmUpPeriod):
+            record(self.SenkouB, time, (delayed_maximum.Current.Value + delayed_minimum.Current.Value) / 2)
+        return close
+
+    def Reset(self):
+        super().Reset()
+        for indicator in (self.Tenkan, self.Kijun, self.SenkouA, self.SenkouB, self.Chikou,
+                          self.TenkanMaximum, self.TenkanMinimum, self.KijunMaximum, self.KijunMinimum,
+                          self.SenkouBMaximum, self.SenkouBMinimum, self.DelayedTenkanSenkouA,
+                          self.DelayedKijunSenkouA, self.DelayedMaximumSenkouB, self.DelayedMinimumSenkouB):
+            indicator.Reset()
+
+    @classmethod
+    def compute(cls, high, low, close, tenkanPeriod=9, kijunPeriod=26, senkouAPeriod=26, senkouBPeriod=52,
+                senkouADelayPeriod=26, senkouBDelayPeriod=26):
+        '''Returns IchimokuKinkoHyoValues(Tenkan, Kijun, SenkouA, SenkouB, Chikou) arrays'''
+        close = vectorized.as_array(close)
+        length = len(close)
+
+        def midpoint(period):
+            middle = (vectorized.rolling_max(high, period) + vectorized.rolling_min(low, period)) / 2
+            middle[:period - 1] = 0.0
+            return middle
+
+        def shifted(values, ready, delay):
+            # a Delay fed from sample `ready` on, read wherever it is ready
+            result = np.zeros(length)
+            result[ready + delay:] = values[ready:length - delay]
+            return result
+
+        tenkan, kijun, senkou_b = midpoint(tenkanPeriod), midpoint(kijunPeriod), midpoint(senkouBPeriod)
+        senkou_a = (shifted(tenkan, tenkanPeriod - 1, senkouADelayPeriod) +
+                    shifted(kijun, kijunPeriod - 1, senkouADelayPeriod)) / 2
+        senkou_a[:max(tenkanPeriod, kijunPeriod) - 1 + senkouADelayPeriod] = 0.0
+        return IchimokuKinkoHyoValues(tenkan, kijun, senkou_a,
+                                      shifted(senkou_b, senkouBPeriod - 1, senkouBDelayPeriod),
+                                      vectorized.delay(close, senkouADelayPeriod))
+
+
+def _push_range(maximum, minimum, time, high, low):
+    '''Maximum.Update(high) and Minimum.Update(low); returns whether both are ready'''
+    record(maximum, time, maximum._extreme.push(high))
+    record(minimum, time, minimum._extreme.push(low))
+    return minimum.Samples >= minimum.WarmUpPeriod
+
+
+def _push_delay(delay, time, value):
+    '''Delay.Update(value)'''
+    window = delay._window
+    window.push(value)
+    record(delay, time, window.oldest)
@@ -0,0 +1,144 @@
+'''Relative Strength Index and Stochastic oscillator.'''
+
+from collections import namedtuple
+
+import numpy as np
+
+from ..enums import MovingAverageType
+from . import vectorized
+from .averages import AsIndicator, compute_average
+from .base import Identity, IndicatorBase, TradeBarIndicator, name_and_args, record
+from .window import RollingExtreme, RollingSum
+
+
+class RelativeStrengthIndex(IndicatorBase):
+    '''RelativeStrengthIndex([name,] period, movingAverageType=Wilders)
+
+    100 - 100 / (1 + average gain / average loss); 100 while there is no average loss.'''
+
+    def __init__(self, *args):
+        name, args = name_and_args(args)
+        period = args[0]
+        ma_type = MovingAverageType(args[1]) if len(args) > 1 else MovingAverageType.Wilders
+        name = name or 'RSI({})'.format(period)
+        super().__init__(name)
+        self.Period = period
+        self.MovingAverageType = ma_type
+        self.WarmUpPeriod = period + 1
+        self.AverageGain = AsIndicator(ma_type, period, name + '_AverageGain')
+        self.AverageLoss = AsIndicator(ma_type, period, name + '_AverageLoss')
+        self._previous = None
+
+    @property
+    def IsReady(self):
+        return self.AverageGain.IsReady and self.AverageLoss.IsReady
+
+    def ComputeNextValue(self, time, value):
+        previous = self._previous
+        if previous is not None:
+            if value >= previous:
+                self.AverageGain.Update(time, value - previous)
+                self.AverageLoss.Update(time, 0.0)
+            else:
+                self.AverageGain.Update(time, 0.0)
+                self.AverageLoss.Update(time, previous - value)
+        self._previous = value
+        loss = self.AverageLoss.Current.Value
+        if loss == 0:
+            return 100.0
+        return 100.0 - 100.0 / (1 + self.AverageGain.Current.Value / loss)
+
+    def Reset(self):
+        super().Reset()
+        self.AverageGain.Reset()
+        self.AverageLoss.Reset()
+        self._previous = None
+
+    @classmethod
+    def compute(cls, values, period, movingAverageType=MovingAverageType.Wilders):
+        values = vectorized.as_array(values)
+        length = len(values)
+        change = np.diff(values)
+        gain = vectorized.after(compute_average(movingAverageType, np.maximum(change, 0.0), period), 1, length)
+        loss = vectorized.after(compute_average(movingAverageType, np.maximum(-change, 0.0), period), 1, length)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(loss == 0, 100.0, 100.0 - 100.0 / (1 + gain / loss))
+
+
+StochasticValues = namedtuple('StochasticValues', ('FastStoch', 'StochK', 'StochD'))
+
+
+class Stochastic(TradeBarIndicator):
+    '''Stochastic([name,] period, kPeriod, dPeriod)
+
+    FastStoch is where the close sits in the high-low range of the last `period` bars;
+    StochK and StochD are its kPeriod and dPeriod smoothings, all scaled to 0..100.
+    Current is FastStoch. The range extremes come from monotonic deques and the
+    smoothings from running sums, so a bar costs O(1) for any period.'''
+
+    def __init__(self, *args):
+        name, (period, k_period, d_period) = name_and_args(args)
+        name = name or 'STO({},{},{})'.format(period, k_period, d_period)
+        super().__init__(name)
+        self.Period = period
+        self.KPeriod = k_period
+        self.DPeriod = d_period
+        self.WarmUpPeriod = period
+        self.FastStoch = Identity(name + '_FastStoch')
+        self.StochK = Identity(name + '_StochK')
+        self.StochD = Identity(name + '_StochD')
+        self._maximum = RollingExtreme(period, True)
+        self._minimum = RollingExtreme(period, False)
+        self._sum_fast_k = RollingSum(k_period)
+        self._sum_slow_k = RollingSum(d_period)
+
+    def ComputeNextBar(self, time, open, high, low, close, volume):
+        highest = self._maximum.push(high)
+        lowest = self._minimum.push(low)
+        samples = self._maximum.samples
+        period, k_period, d_period = self.Period, self.KPeriod, self.DPeriod
+
+        fast = 0.0
+        denominator = highest - lowest
+        # LEAN leaves the fast %K sum untouched on a bar without range
+        if denominator != 0:
+            fast = (close - lowest) / denominator if samples >= period else 0.0
+            self._sum_fast_k.push(fast)
+        # the parts are fed through record(), as three Identity updates cost as much as the rest
+        record(self.FastStoch, time, fast * 100)
+
+        stoch_k = self._sum_fast_k.sum / k_period if samples >= period + k_period - 1 else 0.0
+        self._sum_slow_k.push(stoch_k)
+        record(self.StochK, time, stoch_k * 100)
+
+        stoch_d = self._sum_slow_k.sum / d_period if samples >= period + k_period + d_period - 2 else 0.0
+        record(self.StochD, time, stoch_d * 100)
+        return fast * 100
+
+    def Reset(self):
+        super().Reset()
+        for indicator in (self.FastStoch, self.StochK, self.StochD):
+            indicator.Reset()
+        for window in (self._maximum, self._minimum, self._sum_fast_k, self._sum_slow_k):
+            window.clear()
+
+    @classmethod
+    def compute(cls, high, low, close, period, kPeriod, dPeriod):
+        '''Returns StochasticValues(FastStoch, StochK, StochD) arrays'''
+        close = vectorized.as_array(close)
+        length = len(close)
+        highest = vectorized.rolling_max(high, period)
+        lowest = vectorized.rolling_min(low, period)
+        samples = np.arange(1, length + 1)
+        denominator = highest - lowest
+        ranged = denominator != 0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            fast = np.where(ranged & (samples >= period), (close - lowest) / denominator, 0.0)
+        # the %K sum only advances on bars with a range
+        pushed = np.cumsum(ranged) - 1
+        sums = vectorized.rolling_sum(fast[ranged], kPeriod)
+        sum_fast_k = np.where(pushed >= 0, sums[np.maximum(pushed, 0)] if len(sums) else 0.0, 0.0)
+        stoch_k = np.where(samples >= period + kPeriod - 1, sum_fast_k / kPeriod, 0.0)
+        stoch_d = np.where(samples >= period + kPeriod + dPeriod - 2,
+                           vectorized.rolling_sum(stoch_k, dPeriod) / dPeriod, 0.0)
+        return StochasticValues(fast * 100, stoch_k * 100, stoch_d * 100)
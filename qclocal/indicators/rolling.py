@@ -0,0 +1,93 @@
+'''Window indicators: Sum, Maximum, Minimum and Delay.'''
+
+from . import vectorized
+from .base import IndicatorBase, name_and_args
+from .window import RingBuffer, RollingExtreme, RollingSum
+
+
+class Sum(IndicatorBase):
+    '''Sum([name,] period)'''
+
+    def __init__(self, *args):
+        name, (period,) = name_and_args(args)
+        super().__init__(name or 'SUM({})'.format(period))
+        self.Period = period
+        self.WarmUpPeriod = period
+        self._sum = RollingSum(period)
+
+    def ComputeNextValue(self, time, value):
+        return self._sum.push(value)
+
+    def Reset(self):
+        super().Reset()
+        self._sum.clear()
+
+    @classmethod
+    def compute(cls, values, period):
+        return vectorized.rolling_sum(values, period)
+
+
+class Maximum(IndicatorBase):
+    '''Maximum([name,] period): highest value of the window, kept by a monotonic deque'''
+
+    _maximum = True
+
+    def __init__(self, *args):
+        name, (period,) = name_and_args(args)
+        super().__init__(name or '{}({})'.format('MAX' if self._maximum else 'MIN', period))
+        self.Period = period
+        self.WarmUpPeriod = period
+        self._extreme = RollingExtreme(period, self._maximum)
+
+    def ComputeNextValue(self, time, value):
+        return self._extreme.push(value)
+
+    def Reset(self):
+        super().Reset()
+        self._extreme.clear()
+
+    @classmethod
+    def compute(cls, values, period):
+        return vectorized.rolling_max(values, period)
+
+    @property
+    def PeriodsSinceMaximum(self):
+        return self._extreme.periods_since
+
+
+class Minimum(Maximum):
+    '''Minimum([name,] period): lowest value of the window, kept by a monotonic deque'''
+
+    _maximum = False
+
+    @classmethod
+    def compute(cls, values, period):
+        return vectorized.rolling_min(values, period)
+
+    @property
+    def PeriodsSinceMinimum(self):
+        return self._extreme.periods_since
+
+
+class Delay(IndicatorBase):
+    '''Delay([name,] period): the input from `period` samples ago'''
+
+    def __init__(self, *args):
+        name, (period,) = name_and_args(args)
+        super().__init__(name or 'DELAY({})'.format(period))
+        self.Period = period
+        self.WarmUpPeriod = period + 1
+        self._window = RingBuffer(period + 1)
+
+    def ComputeNextValue(self, time, value):
+        window = self._window
+        window.push(value)
+        return window.oldest
+
+    def Reset(self):
+        super().Reset()
+        self._window.clear()
+
+    @classmethod
+    def compute(cls, values, period):
+        return vectorized.delay(values, period)
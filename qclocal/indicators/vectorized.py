@@ -0,0 +1,68 @@
+'''Whole-history building blocks for the indicators' compute() batch mode.
+
+Each function takes the full input array and returns, for every position, the value the
+matching streaming window would hold after that sample, partial windows included.
+Window statistics are numpy operations; recursive filters (EMA and friends) have a
+sequential dependency and run as one tight pass over the array instead.'''
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def as_array(values):
+    return np.asarray(values, dtype=np.float64)
+
+
+def rolling_count(length, period):
+    '''Number of values in the window after each sample'''
+    return np.minimum(np.arange(1, length + 1), period)
+
+
+def rolling_sum(values, period):
+    values = as_array(values)
+    sums = np.cumsum(values)
+    if len(values) > period:
+        sums[period:] = sums[period:] - sums[:-period]
+    return sums
+
+
+def _rolling_extreme(values, period, reduce, accumulate):
+    values = as_array(values)
+    result = np.empty(len(values))
+    head = min(period - 1, len(values))
+    result[:head] = accumulate(values[:head])
+    if len(values) >= period:
+        result[head:] = reduce(sliding_window_view(values, period), axis=1)
+    return result
+
+
+def rolling_max(values, period):
+    return _rolling_extreme(values, period, np.max, np.maximum.accumulate)
+
+
+def rolling_min(values, period):
+    return _rolling_extreme(values, period, np.min, np.minimum.accumulate)
+
+
+def delay(values, period):
+    '''The value `period` samples back, the first value while there is none'''
+    values = as_array(values)
+    return values[np.maximum(np.arange(len(values)) - period, 0)]
+
+
+def exponential(values, k):
+    '''EMA seeded by the first value: y = x * k + y_prev * (1 - k)'''
+    result = np.empty(len(values))
+    current = 0.0
+    for i, value in enumerate(as_array(values).tolist()):
+        current = value if i == 0 else value * k + current * (1 - k)
+        result[i] = current
+    return result
+
+
+def after(values, start, length, fill=0.0):
+    '''Places values computed from sample `start` on into a full-length array; positions
+    before start keep `fill`, the value an indicator holds before its first update'''
+    result = np.full(length, fill)
+    result[start:] = values
+    return result
@@ -0,0 +1,124 @@
+'''Rolling variance, standard deviation and Bollinger Bands.'''
+
+import math
+from collections import namedtuple
+
+import numpy as np
+
+from ..enums import MovingAverageType
+from . import vectorized
+from .averages import AsIndicator, compute_average
+from .base import Identity, IndicatorBase, name_and_args
+from .window import RollingSum
+
+
+class Variance(IndicatorBase):
+    '''Variance([name,] period): population variance from running sums of x and x^2'''
+
+    def __init__(self, *args):
+        name, (period,) = name_and_args(args)
+        super().__init__(name or 'VAR({})'.format(period))
+        self.Period = period
+        self.WarmUpPeriod = period
+        self._sum = RollingSum(period)
+        self._squares = RollingSum(period)
+
+    def ComputeNextValue(self, time, value):
+        total = self._sum.push(value)
+        squares = self._squares.push(value * value)
+        count = self._sum.count
+        mean = total / count
+        # rounding can take the difference slightly below zero for a flat window
+        return max(squares / count - mean * mean, 0.0)
+
+    def Reset(self):
+        super().Reset()
+        self._sum.clear()
+        self._squares.clear()
+
+    @classmethod
+    def compute(cls, values, period):
+        values = vectorized.as_array(values)
+        count = vectorized.rolling_count(len(values), period)
+        mean = vectorized.rolling_sum(values, period) / count
+        return np.maximum(vectorized.rolling_sum(values * values, period) / count - mean * mean, 0.0)
+
+
+class StandardDeviation(Variance):
+    '''StandardDeviation([name,] period): population standard deviation over the window'''
+
+    def __init__(self, *args):
+        name, (period,) = name_and_args(args)
+        super().__init__(name or 'STD({})'.format(period), period)
+
+    def ComputeNextValue(self, time, value):
+        return math.sqrt(super().ComputeNextValue(time, value))
+
+    @classmethod
+    def compute(cls, values, period):
+        return np.sqrt(Variance.compute(values, period))
+
+
+BollingerBandsValues = namedtuple('BollingerBandsValues', (
+    'MiddleBand', 'UpperBand', 'LowerBand', 'StandardDeviation', 'BandWidth', 'PercentB'))
+
+
+class BollingerBands(IndicatorBase):
+    '''BollingerBands([name,] period, k, movingAverageType=Simple)
+
+    MiddleBand is the moving average, Upper/LowerBand are k standard deviations away.
+    Current is the input price, as in LEAN.'''
+
+    def __init__(self, *args):
+        name, args = name_and_args(args)
+        period, k = args[0], float(args[1])
+        ma_type = MovingAverageType(args[2]) if len(args) > 2 else MovingAverageType.Simple
+        name = name or 'BB({},{})'.format(period, args[1])
+        super().__init__(name)
+        self.Period = period
+        self.K = k
+        self.MovingAverageType = ma_type
+        self.WarmUpPeriod = period
+        self.StandardDeviation = StandardDeviation(name + '_StandardDeviation', period)
+        self.MiddleBand = AsIndicator(ma_type, period, name + '_MiddleBand')
+        self.UpperBand = Identity(name + '_UpperBand')
+        self.LowerBand = Identity(name + '_LowerBand')
+        self.BandWidth = Identity(name + '_BandWidth')
+        self.PercentB = Identity(name + '_PercentB')
+        self.Price = Identity(name + '_Close')
+
+    @property
+    def IsReady(self):
+        return self.MiddleBand.IsReady and self.StandardDeviation.IsReady
+
+    def ComputeNextValue(self, time, value):
+        self.StandardDeviation.Update(time, value)
+        self.MiddleBand.Update(time, value)
+        middle = self.MiddleBand.Current.Value
+        width = self.K * self.StandardDeviation.Current.Value
+        upper, lower = middle + width, middle - width
+        self.UpperBand.Update(time, upper)
+        self.LowerBand.Update(time, lower)
+        self.BandWidth.Update(time, 0.0 if middle == 0 else (upper - lower) / middle)
+        self.PercentB.Update(time, 0.0 if upper == lower else (value - lower) / (upper - lower))
+        self.Price.Update(time, value)
+        return value
+
+    def Reset(self):
+        super().Reset()
+        for indicator in (self.StandardDeviation, self.MiddleBand, self.UpperBand, self.LowerBand,
+                          self.BandWidth, self.PercentB, self.Price):
+            indicator.Reset()
+
+    @classmethod
+    def compute(cls, values, period, k, movingAverageType=MovingAverageType.Simple):
+        '''Returns BollingerBandsValues(MiddleBand, UpperBand, LowerBand, StandardDeviation,
+        BandWidth, PercentB) arrays'''
+        values = vectorized.as_array(values)
+        middle = compute_average(movingAverageType, values, period)
+        deviation = StandardDeviation.compute(values, period)
+        upper, lower = middle + float(k) * deviation, middle - float(k) * deviation
+        with np.errstate(divide='ignore', invalid='ignore'):
+            width = np.where(middle == 0, 0.0, (upper - lower) / middle)
+            percent = np.where(upper == lower, 0.0, (values - lower) / (upper - lower))
+        return BollingerBandsValues(middle, upper, lower, deviation, width, percent)
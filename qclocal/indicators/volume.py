@@ -0,0 +1,88 @@
+'''Volume weighted average price indicators.
+
+Both weight the typical price (high + low + close) / 3 by volume, as LEAN does for
+TradeBar input.'''
+
+import numpy as np
+
+from . import vectorized
+from .base import TradeBarIndicator, name_and_args
+from .window import RollingSum
+
+
+class VolumeWeightedAveragePriceIndicator(TradeBarIndicator):
+    '''VolumeWeightedAveragePriceIndicator([name,] period): VWAP over the last `period` bars
+    from running sums of price * volume and volume'''
+
+    def __init__(self, *args):
+        name, (period,) = name_and_args(args)
+        super().__init__(name or 'VWAP({})'.format(period))
+        self.Period = period
+        self.WarmUpPeriod = period
+        self._price_volume = RollingSum(period)
+        self._volume = RollingSum(period)
+
+    def ComputeNextBar(self, time, open, high, low, close, volume):
+        price = (high + low + close) / 3
+        price_volume = self._price_volume.push(price * volume)
+        total = self._volume.push(volume)
+        return price if total == 0 else price_volume / total
+
+    def Reset(self):
+        super().Reset()
+        self._price_volume.clear()
+        self._volume.clear()
+
+    @classmethod
+    def compute(cls, high, low, close, volume, period):
+        price = (vectorized.as_array(high) + vectorized.as_array(low) + vectorized.as_array(close)) / 3
+        volume = vectorized.as_array(volume)
+        total = vectorized.rolling_sum(volume, period)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(total == 0, price, vectorized.rolling_sum(price * volume, period) / total)
+
+
+class IntradayVwap(TradeBarIndicator):
+    '''IntradayVwap([name]): VWAP since the first bar of the current day'''
+
+    def __init__(self, name='VWAP'):
+        super().__init__(name)
+        self._date = None
+        self._price_volume = 0.0
+        self._volume = 0.0
+
+    @property
+    def IsReady(self):
+        return self._volume != 0
+
+    def ComputeNextBar(self, time, open, high, low, close, volume):
+        date = time.date()
+        if date != self._date:
+            self._date = date
+            self._price_volume = self._volume = 0.0
+        price = (high + low + close) / 3
+        self._price_volume += price * volume
+        self._volume += volume
+        return price if self._volume == 0 else self._price_volume / self._volume
+
+    def Reset(self):
+        super().Reset()
+        self._date = None
+        self._price_volume = self._volume = 0.0
+
+    @classmethod
+    def compute(cls, end_times, high, low, close, volume):
+        '''end_times are the bar end times (datetime64); the sums restart with each date'''
+        price = (vectorized.as_array(high) + vectorized.as_array(low) + vectorized.as_array(close)) / 3
+        volume = vectorized.as_array(volume)
+        dates = np.asarray(end_times, dtype='datetime64[us]').astype('datetime64[D]')
+        starts = np.flatnonzero(np.r_[True, dates[1:] != dates[:-1]]) if len(dates) else np.empty(0, np.intp)
+
+        def daily_cumsum(values):
+            sums = np.cumsum(values)
+            offsets = np.r_[0.0, sums[starts[1:] - 1]]
+            return sums - np.repeat(offsets, np.diff(np.r_[starts, len(values)]))
+
+        total = daily_cumsum(volume)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(total == 0, price, daily_cumsum(price * volume) / total)
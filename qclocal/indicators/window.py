@@ -0,0 +1,139 @@
+'''Fixed-size rolling windows the streaming indicators are built on.
+
+All state is preallocated when the window is created; a push overwrites one slot and
+adjusts a few running values, so an update costs the same whatever the period.'''
+
+from collections import deque
+
+
+class RingBuffer:
+    '''The last `size` values in a preallocated list.
+
+    Indexing follows LEAN's RollingWindow: [0] is the newest value, [Count - 1] the oldest.'''
+
+    __slots__ = ('size', 'count', '_values', '_position')
+
+    def __init__(self, size):
+        if size < 1:
+            raise ValueError('window size must be at least 1, got {}'.format(size))
+        self.size = size
+        self.count = 0
+        self._values = [0.0] * size
+        self._position = 0
+
+    def push(self, value):
+        '''Adds a value; returns the value it pushed out, or None while the window fills'''
+        position = self._position
+        evicted = self._values[position] if self.count == self.size else None
+        self._values[position] = value
+        self._position = position + 1 if position + 1 < self.size else 0
+        if evicted is None:
+            self.count += 1
+        return evicted
+
+    @property
+    def IsReady(self):
+        return self.count == self.size
+
+    @property
+    def oldest(self):
+        return self._values[self._position if self.count == self.size else 0]
+
+    def __getitem__(self, i):
+        if not 0 <= i < self.count:
+            raise IndexError('window index {} out of range'.format(i))
+        return self._values[(self._position - 1 - i) % self.size]
+
+    def __len__(self):
+        return self.count
+
+    def clear(self):
+        self.count = 0
+        self._position = 0
+
+
+class RollingSum:
+    '''Sum of the last `period` values, kept by adding the new and subtracting the evicted value.
+
+    The window is kept inline rather than in a RingBuffer: averages push into one on every
+    update, and the extra call cost as much as the sum itself.'''
+
+    __slots__ = ('size', 'count', 'sum', '_values', '_position')
+
+    def __init__(self, period):
+        if period < 1:
+            raise ValueError('window size must be at least 1, got {}'.format(period))
+        self.size = period
+        self.count = 0
+        self.sum = 0.0
+        self._values = [0.0] * period
+        self._position = 0
+
+    def push(self, value):
+        position = self._position
+        if self.count == self.size:
+            self.sum -= self._values[position]
+        else:
+            self.count += 1
+        self._values[position] = value
+        self._position = position + 1 if position + 1 < self.size else 0
+        self.sum += value
+        return self.sum
+
+    def clear(self):
+        self.count = 0
+        self._position = 0
+        self.sum = 0.0
+
+
+class RollingExtreme:
+    '''Maximum (or minimum) of the last `period` values.
+
+    A monotonic deque holds the sample numbers of the values that can still become the
+    extreme, best first; every value enters and leaves it once, so a push is amortized
+    O(1) instead of a scan of the window.'''
+
+    __slots__ = ('period', 'samples', 'maximum', '_values', '_candidates')
+
+    def __init__(self, period, maximum=True):
+        if period < 1:
+            raise ValueError('window size must be at least 1, got {}'.format(period))
+        self.period = period
+        self.maximum = maximum
+        self.samples = 0
+        self._values = [0.0] * period
+        self._candidates = deque()
+
+    def push(self, value):
+        '''Adds a value and returns the current extreme'''
+        sample, period = self.samples, self.period
+        values, candidates = self._values, self._candidates
+        if candidates and candidates[0] <= sample - period:
+            candidates.popleft()
+        if self.maximum:
+            while candidates and values[candidates[-1] % period] <= value:
+                candidates.pop()
+        else:
+            while candidates and values[candidates[-1] % period] >= value:
+                candidates.pop()
+        values[sample % period] = value
+        candidates.append(sample)
+        self.samples = sample + 1
+        return values[candidates[0] % period]
+
+    @property
+    def value(self):
+        if not self._candidates:
+            return 0.0
+        return self._values[self._candidates[0] % self.period]
+
+    @property
+    def periods_since(self):
+        '''Bars since the extreme was set, 0 when it is the newest value'''
+        if not self._candidates:
+            return 0
+        return self.samples - 1 - self._candidates[0]
+
+    def clear(self):
+        self.samples = 0
+        self._candidates.clear()
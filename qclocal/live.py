@@ -0,0 +1,368 @@
+'''Live/paper trading against a local replay feed.
+
+Bars arrive one time step at a time, from a data source replayed at some multiple of
+real time or from a local socket. An asyncio task receives them and puts each time step
+on a queue together with its arrival time. A single worker thread takes steps off the
+queue and runs the same pipeline as the backtest engine on them (consolidators, OnData,
+alpha, portfolio construction, risk, execution). Receiving never waits for the pipeline:
+a slow step only makes the queue longer, and the queue depth is recorded at every arrival.
+
+For every step the session records three latencies: the wait in the queue, the pipeline
+time, and their sum (arrival to orders sent). They go into log-bucketed histograms, so
+memory stays bounded however long the session runs. A replay processed with no pacing
+reproduces the backtest of the same data exactly.
+
+Socket feeds speak a line protocol: one `time,ticker,open,high,low,close,volume` line per
+bar, ISO times, with a blank line closing each time step.'''
+
+import asyncio
+import time as _time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+
+from .checkpoint import load_checkpoint
+from .data import FIELDS, BarFrame, to_datetime64
+from .engine import BacktestEngine, BacktestResult
+from .histogram import Histogram
+
+
+class LiveEngine(BacktestEngine):
+    '''BacktestEngine whose price frame grows by one row per received time step.
+
+    Args:
+        history_source: DataSource answering History and indicator warm-up requests
+        fee_model: As for BacktestEngine
+        capacity: Initial number of rows; the frame doubles when it fills up'''
+
+    def __init__(self, history_source, fee_model=None, capacity=1024):
+        super().__init__(history_source, fee_model)
+        self._capacity = capacity
+        self.rows = 0
+
+    def start(self, algorithm):
+        '''Initializes the algorithm and an empty frame over its universe'''
+        symbols = self._initialize(algorithm)
+        frame = _empty_frame(symbols, self._capacity)
+        self._attach(frame)
+        self._bar_times, self._end_times = [], []
+        self._tickers = {str(symbol).upper(): column for column, symbol in enumerate(frame.symbols)}
+        self._track(self._capacity)
+        self.starting_equity = self.statistics.starting_equity
+        self.unknown = Counter()
+        if self.profiler is not None:
+            self.profiler.attach(self)
+        return self.algorithm
+
+    def on_bars(self, time, bars):
+        '''Runs one time step. bars maps tickers to (open, high, low, close, volume); time is
+        the start of the bars. Returns the portfolio value after the step.'''
+        row = self.rows
+        frame = self.frame
+        if row == len(frame.times):
+            self.frame = frame = _grown(frame, 2 * len(frame.times))
+        time = to_datetime64(time)
+        frame.times[row] = time
+        for field in FIELDS:
+            getattr(frame, field)[row] = np.nan
+        for ticker, values in bars.items():
+            column = self._tickers.get(str(ticker).upper())
+            if column is None:
+                self.unknown[ticker] += 1
+                continue
+            for field, value in zip(FIELDS, values):
+                getattr(frame, field)[row, column] = value
+        has_bar = frame.has_bar[row] = ~np.isnan(frame.close[row])
+        previous = frame.close_filled[row - 1] if row else np.nan
+        frame.close_filled[row] = np.where(has_bar, frame.close[row], previous)
+        frame.close_valuation[row] = np.nan_to_num(frame.close_filled[row])
+        self._bar_times.append(time.astype(datetime))
+        self._end_times.append((time + self._span).astype(datetime))
+        self.rows = row + 1
+
+        self._step(row)
+        portfolio = self.algorithm.Portfolio
+        value = portfolio.TotalPortfolioValue
+        self.equity_store.append(time + self._span, value, portfolio.quantity if self.record_positions else None)
+        self.statistics.update(value)
+        checkpoints = self.checkpoints
+        if checkpoints is not None and checkpoints.due(time + self._span):
+            self.save_checkpoint(checkpoints.path, self.rows)
+            checkpoints.written += 1
+        return value
+
+    # checkpoints hold the bars received so far, as no data source can reload them
+
+    def _checkpoint_refs(self):
+        frame = self.frame
+        refs = {'source': self.source, 'profiler': self.profiler, 'checkpoints': self.checkpoints, 'frame': frame,
+                'frame.symbols': frame.symbols, 'frame.times': frame.times}
+        refs.update(('frame.' + name, getattr(frame, name)) for name in BarFrame.MATRICES)
+        return refs
+
+    def _checkpoint_frame(self):
+        frame, rows = self.frame, self.rows
+        arrays = {name: getattr(frame, name)[:rows] for name in ('times',) + BarFrame.MATRICES}
+        return {'symbols': frame.symbols, 'capacity': len(frame.times), 'rows': rows, 'arrays': arrays}
+
+    @staticmethod
+    def _restore_frame(state, data_source):
+        frame = _empty_frame(state['symbols'], state['capacity'])
+        for name, received in state['arrays'].items():
+            getattr(frame, name)[:state['rows']] = received
+        return frame
+
+    def _resumed(self):
+        pass
+
+    def finish(self, runtime=0.0):
+        '''Ends the algorithm; returns a BacktestResult over the steps received'''
+        if self.profiler is not None:
+            self.profiler.detach()
+        self.algorithm.OnEndOfAlgorithm()
+        return BacktestResult(self.algorithm, self.equity_store, self.orders, runtime, self.statistics)
+
+
+def _empty_frame(symbols, capacity):
+    shape = (capacity, len(symbols))
+    matrices = [np.full(shape, np.nan) for _ in FIELDS]
+    return BarFrame(np.zeros(capacity, 'datetime64[s]'), symbols, *matrices, np.zeros(shape, bool),
+                    np.full(shape, np.nan), np.zeros(shape))
+
+
+def _grown(frame, capacity):
+    bigger = _empty_frame(frame.symbols, capacity)
+    rows = len(frame.times)
+    bigger.times[:rows] = frame.times
+    for name in BarFrame.MATRICES:
+        getattr(bigger, name)[:rows] = getattr(frame, name)
+    return bigger
+
+
+# feeds: async iterators of (time, {ticker: (open, high, low, close, volume)})
+
+
+class ReplayFeed:
+    '''Replays the bars of a data source.
+
+    Args:
+        source: The DataSource to replay
+        symbols: Symbols to replay
+        start, end: The window to replay
+        speed: Multiple of real time; the gap between two time steps is slept divided
+            by it. None or 0 replays as fast as possible.'''
+
+    def __init__(self, source, symbols, start=None, end=None, speed=None):
+        self.frame = source.load_frame(list(symbols), start, end)
+        self.speed = speed
+
+    async def __aiter__(self):
+        frame = self.frame
+        tickers = [str(symbol).upper() for symbol in frame.symbols]
+        started = _time.perf_counter()
+        first = frame.times[0] if len(frame.times) else None
+        for row in range(len(frame.times)):
+            if self.speed:
+                # sleep to an absolute schedule so pacing errors do not accumulate
+                due = started + (frame.times[row] - first) / np.timedelta64(1, 's') / self.speed
+                delay = due - _time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            else:
+                await asyncio.sleep(0)
+            columns = np.flatnonzero(frame.has_bar[row])
+            values = zip(*(getattr(frame, field)[row, columns].tolist() for field in FIELDS))
+            yield frame.times[row], {tickers[column]: bar for column, bar in zip(columns.tolist(), values)}
+
+
+def algorithm_feed(algorithm, symbols, source, speed=None):
+    '''ReplayFeed of the symbols over the start and end dates of an initialized algorithm'''
+    start = to_datetime64(algorithm.StartDate)
+    end = to_datetime64(algorithm.EndDate) + np.timedelta64(86399, 's')
+    return ReplayFeed(source, symbols, start, end, speed)
+
+
+def format_step(time, bars):
+    '''One time step in the socket line protocol'''
+    lines = ['{},{},{!r},{!r},{!r},{!r},{!r}\n'.format(time, ticker, *values) for ticker, values in bars.items()]
+    return ''.join(lines) + '\n'
+
+
+class SocketFeed:
+    '''Reads time steps in the line protocol from a TCP connection'''
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+
+    async def __aiter__(self):
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        try:
+            time, bars = None, {}
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                line = line.strip()
+                if not line:
+                    if time is not None:
+                        yield time, bars
+                    time, bars = None, {}
+                    continue
+                stamp, ticker, *values = line.decode().split(',')
+                time = np.datetime64(stamp, 's')
+                bars[ticker] = tuple(float(value) for value in values)
+            if time is not None:
+                yield time, bars
+        finally:
+            writer.close()
+
+
+def serve_algorithm(algorithm, source, port, speed=None, host='127.0.0.1'):
+    '''Serves the replay of an algorithm's universe and dates until interrupted'''
+    engine = BacktestEngine(source)
+    symbols = engine._initialize(algorithm)
+    feed = algorithm_feed(engine.algorithm, symbols, source, speed)
+
+    async def main():
+        server = await serve_feed(feed, host, port)
+        async with server:
+            await server.serve_forever()
+
+    asyncio.run(main())
+
+
+async def serve_feed(feed, host='127.0.0.1', port=0):
+    '''Starts a server sending the steps of feed (a ReplayFeed) to each client that connects.
+    Returns the asyncio server; its port is server.sockets[0].getsockname()[1].'''
+
+    async def send(reader, writer):
+        try:
+            async for time, bars in feed:
+                writer.write(format_step(time, bars).encode())
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(send, host, port)
+
+
+# sessions
+
+
+class LiveSession:
+    '''Drives a started LiveEngine from a feed and instruments it.
+
+    Args:
+        engine: The LiveEngine to run
+        precision: Relative bucket width of the latency histograms'''
+
+    def __init__(self, engine, precision=0.02):
+        self.engine = engine
+        self.queue_wait = Histogram(precision)
+        self.processing = Histogram(precision)
+        self.latency = Histogram(precision)
+        self.queue_depth = Histogram()
+        self.received = 0
+        self.result = None
+
+    async def run(self, feed):
+        '''Processes every step of the feed on the started engine; returns the result'''
+        started = _time.perf_counter()
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        with ThreadPoolExecutor(1, thread_name_prefix='qclocal-live') as worker:
+            receiver = asyncio.ensure_future(self._receive(feed, queue))
+            while True:
+                step = await queue.get()
+                if step is None:
+                    break
+                arrived, time, bars = step
+                begun = _time.perf_counter()
+                await loop.run_in_executor(worker, self.engine.on_bars, time, bars)
+                done = _time.perf_counter()
+                self.queue_wait.record(begun - arrived)
+                self.processing.record(done - begun)
+                self.latency.record(done - arrived)
+            await receiver
+        self.result = self.engine.finish(_time.perf_counter() - started)
+        return self.result
+
+    async def _receive(self, feed, queue):
+        try:
+            async for time, bars in feed:
+                queue.put_nowait((_time.perf_counter(), time, bars))
+                self.received += 1
+                self.queue_depth.record(queue.qsize())
+        finally:
+            queue.put_nowait(None)
+
+    def summary(self):
+        lines = ['{} steps received, {} processed'.format(self.received, self.latency.count)]
+        for label, histogram in (('end to end', self.latency), ('queue wait', self.queue_wait),
+                                 ('processing', self.processing)):
+            if histogram.count:
+                lines.append('{:<12} p50 {:9.3f} ms  p99 {:9.3f} ms  max {:9.3f} ms'.format(
+                    label, histogram.percentile(50) * 1e3, histogram.percentile(99) * 1e3, histogram.maximum * 1e3))
+        if self.queue_depth.count:
+            lines.append('queue depth  p50 {}  p99 {}  max {}'.format(
+                self.queue_depth.percentile(50), self.queue_depth.percentile(99), self.queue_depth.maximum))
+        if self.engine.unknown:
+            lines.append('bars of symbols outside the universe: {}'.format(sum(self.engine.unknown.values())))
+        return '\n'.join(lines)
+
+
+async def _after(feed, time):
+    '''The steps of feed after time'''
+    async for step in feed:
+        if step[0] > time:
+            yield step
+
+
+def run_live(algorithm, source, speed=None, socket=None, history_source=None, checkpoints=None, resume=None):
+    '''Paper-trades the algorithm on a replay of source over its start and end dates.
+
+    Args:
+        algorithm: Algorithm class or instance
+        source: DataSource to replay
+        speed: Multiple of real time, None for as fast as possible
+        socket: None to read the replay directly, True to send it through a local socket
+            server first, or (host, port) of an external feed to connect to instead
+        history_source: DataSource for warm-up, default source
+        checkpoints: checkpoint.CheckpointSchedule to write checkpoints on, or None
+        resume: Checkpoint of an earlier session to continue from instead of starting the
+            algorithm; steps up to its last one are skipped
+    Returns:
+        The LiveSession, with the BacktestResult in session.result'''
+    if resume is None:
+        engine = LiveEngine(history_source or source)
+        algorithm = engine.start(algorithm)
+    else:
+        engine, _ = load_checkpoint(resume, history_source or source)
+        algorithm = engine.algorithm
+    engine.checkpoints = checkpoints
+    session = LiveSession(engine)
+
+    def resumed(feed):
+        return feed if resume is None else _after(feed, engine.frame.times[engine.rows - 1])
+
+    async def main():
+        if isinstance(socket, tuple):
+            return await session.run(resumed(SocketFeed(*socket)))
+        feed = algorithm_feed(algorithm, engine.frame.symbols, source, speed)
+        if not socket:
+            return await session.run(resumed(feed))
+        server = await serve_feed(feed)
+        try:
+            host, port = server.sockets[0].getsockname()[:2]
+            return await session.run(resumed(SocketFeed(host, port)))
+        finally:
+            server.close()
+            await server.wait_closed()
+
+    asyncio.run(main())
+    return session
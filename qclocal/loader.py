@@ -0,0 +1,75 @@
+'''Loads QuantConnect algorithm files so they run unchanged against the local engine.'''
+
+import importlib
+import os
+import re
+import sys
+import types
+
+# LEAN framework module paths imported by the algorithm files -> local implementation
+LEAN_MODULES = {
+    'AlgorithmImports': 'qclocal.imports',
+    'Alphas.MacdAlphaModel': 'qclocal.framework.alpha',
+    'Alphas.NullAlphaModel': 'qclocal.framework.alpha',
+    'Execution.ImmediateExecutionModel': 'qclocal.framework.execution',
+    'Execution.NullExecutionModel': 'qclocal.framework.execution',
+    'Portfolio.EqualWeightingPortfolioConstructionModel': 'qclocal.framework.portfolio',
+    'Portfolio.NullPortfolioConstructionModel': 'qclocal.framework.portfolio',
+    'Risk.MaximumUnrealizedProfitPercentPerSecurity': 'qclocal.framework.risk',
+    'Risk.NullRiskManagementModel': 'qclocal.framework.risk',
+    'Selection.ManualUniverseSelectionModel': 'qclocal.framework.selection',
+}
+
+
+def install_lean_modules():
+    '''Registers the LEAN module paths in sys.modules, pointing at the local modules'''
+    for name, target in LEAN_MODULES.items():
+        if name in sys.modules:
+            continue
+        parent_name, _, child = name.rpartition('.')
+        module = importlib.import_module(target)
+        if parent_name:
+            parent = sys.modules.get(parent_name)
+            if parent is None:
+                parent = types.ModuleType(parent_name)
+                parent.__path__ = []
+                sys.modules[parent_name] = parent
+            setattr(parent, child, module)
+        sys.modules[name] = module
+
+
+def module_name_for(path):
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return 'qclocal_algorithm_' + re.sub(r'\W', '_', stem)
+
+
+def load_module(path):
+    '''Executes an algorithm file with the AlgorithmImports names in scope.
+
+    The module is registered in sys.modules under a stable name derived from the file
+    name so its classes can be pickled (process pools, checkpoints).'''
+    from . import imports
+
+    install_lean_modules()
+    name = module_name_for(path)
+    module = types.ModuleType(name)
+    module.__file__ = os.path.abspath(path)
+    module.__dict__.update({key: value for key, value in vars(imports).items() if not key.startswith('_')})
+    sys.modules[name] = module
+    with open(path) as handle:
+        source = handle.read()
+    exec(compile(source, module.__file__, 'exec'), module.__dict__)
+    return module
+
+
+def load_algorithm(path):
+    '''Returns the QCAlgorithm subclass defined in the algorithm file'''
+    from .algorithm import QCAlgorithm
+
+    module = load_module(path)
+    classes = [value for value in vars(module).values()
+               if isinstance(value, type) and issubclass(value, QCAlgorithm)
+               and value is not QCAlgorithm and value.__module__ == module.__name__]
+    if not classes:
+        raise ValueError('{} does not define a QCAlgorithm subclass'.format(path))
+    return classes[-1]
@@ -0,0 +1,149 @@
+'''Orders, fills and fee models.'''
+
+from collections import namedtuple
+
+import numpy as np
+
+
+class OrderStatus:
+    New = 'New'
+    PartiallyFilled = 'PartiallyFilled'
+    Filled = 'Filled'
+    Invalid = 'Invalid'
+
+
+OrderEvent = namedtuple('OrderEvent', ('OrderId', 'Symbol', 'UtcTime', 'Status', 'FillQuantity', 'FillPrice', 'OrderFee', 'Tag'))
+OrderEvent.__doc__ = '''Result of processing an order; market orders fill at once, in part when the
+volume model caps them, or are invalid'''
+
+
+class OrderTicket:
+    '''Handle returned from order methods'''
+
+    __slots__ = ('OrderId', 'Symbol', 'Quantity', 'Status', 'AverageFillPrice', 'QuantityFilled', 'Tag')
+
+    def __init__(self, order_id, symbol, quantity, tag=''):
+        self.OrderId = order_id
+        self.Symbol = symbol
+        self.Quantity = quantity
+        self.Status = OrderStatus.New
+        self.AverageFillPrice = 0.0
+        self.QuantityFilled = 0.0
+        self.Tag = tag
+
+    def __repr__(self):
+        return 'OrderTicket({}, {} {} @ {}, {})'.format(self.OrderId, self.Symbol, self.QuantityFilled,
+                                                       self.AverageFillPrice, self.Status)
+
+
+class InteractiveBrokersFeeModel:
+    '''US equity fees of the IB fixed plan, LEAN's default for equities:
+    $0.005 per share, at least $1 and at most 0.5% of the order value'''
+
+    def GetOrderFee(self, quantity, price):
+        shares = abs(quantity)
+        fee = max(1.0, 0.005 * shares)
+        return min(fee, 0.005 * shares * price)
+
+    def order_fees(self, quantities, prices):
+        '''GetOrderFee over arrays of fills'''
+        shares = np.abs(quantities)
+        return np.minimum(np.maximum(1.0, 0.005 * shares), 0.005 * shares * prices)
+
+
+class ConstantFeeModel:
+    def __init__(self, fee=0.0):
+        self.fee = fee
+
+    def GetOrderFee(self, quantity, price):
+        return self.fee
+
+    def order_fees(self, quantities, prices):
+        return np.full(len(quantities), float(self.fee))
+
+
+class OrderLedger:
+    '''Order events of a backtest, held as parallel arrays with one row per fill.
+
+    The engine appends a whole step of fills at once. OrderEvent objects are only built
+    when an event is looked up or iterated, so statistics over thousands of orders read
+    the columns directly.
+
+    Args:
+        symbols: Symbols of the portfolio columns the fills refer to
+        capacity: Rows allocated up front; the arrays double when they fill up'''
+
+    _COLUMNS = (('time', 'datetime64[us]'), ('column', np.intp), ('quantity', float), ('fill_quantity', float),
+                ('fill_price', float), ('fee', float))
+
+    def __init__(self, symbols=(), capacity=1024):
+        self.symbols = symbols
+        self._size = 0
+        self._arrays = {name: np.empty(capacity, dtype) for name, dtype in self._COLUMNS}
+        # tags are rare, so only the rows that have one are stored
+        self._tags = {}
+
+    def __len__(self):
+        return self._size
+
+    def __getstate__(self):
+        # only the rows recorded; the arrays are allocated again on load
+        state = dict(self.__dict__, capacity=len(self._arrays['time']))
+        state['_arrays'] = {name: array[:self._size].copy() for name, array in self._arrays.items()}
+        return state
+
+    def __setstate__(self, state):
+        capacity = state.pop('capacity')
+        self.__dict__.update(state)
+        for name, recorded in state['_arrays'].items():
+            array = np.empty(capacity, recorded.dtype)
+            array[:self._size] = recorded
+            self._arrays[name] = array
+
+    def append(self, time, columns, quantities, fill_quantities, fill_prices, fees, tag=''):
+        '''Records fills made at one time; returns the row of the first of them'''
+        first, count = self._size, len(columns)
+        if first + count > len(self._arrays['time']):
+            capacity = max(2 * len(self._arrays['time']), first + count)
+            for name, array in self._arrays.items():
+                grown = np.empty(capacity, array.dtype)
+                grown[:first] = array[:first]
+                self._arrays[name] = grown
+        block = slice(first, first + count)
+        self._arrays['time'][block] = np.datetime64(time, 'us')
+        self._arrays['column'][block] = columns
+        self._arrays['quantity'][block] = quantities
+        self._arrays['fill_quantity'][block] = fill_quantities
+        self._arrays['fill_price'][block] = fill_prices
+        self._arrays['fee'][block] = fees
+        if tag:
+            self._tags.update(dict.fromkeys(range(first, first + count), tag))
+        self._size += count
+        return first
+
+    def __getattr__(self, name):
+        # views of the recorded rows: time, column, quantity, fill_quantity, fill_price, fee
+        arrays = self.__dict__.get('_arrays')
+        if arrays is None or name not in arrays:
+            raise AttributeError(name)
+        return arrays[name][:self._size]
+
+    @property
+    def filled(self):
+        '''True for rows that filled their whole quantity'''
+        return self.fill_quantity == self.quantity
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError('order index out of range')
+        arrays = self._arrays
+        fill_quantity = float(arrays['fill_quantity'][index])
+        status = OrderStatus.Filled if fill_quantity == arrays['quantity'][index] else OrderStatus.PartiallyFilled
+        return OrderEvent(index + 1, self.symbols[arrays['column'][index]], arrays['time'][index].item(), status,
+                          fill_quantity, float(arrays['fill_price'][index]), float(arrays['fee'][index]),
+                          self._tags.get(index, ''))
+
+    def __iter__(self):
+        return (self[index] for index in range(self._size))
@@ -0,0 +1,246 @@
+'''Per-stage profiling of the framework pipeline.
+
+A StageProfiler given to BacktestEngine(profiler=...) is attached once Initialize has
+run. It replaces the methods of each stage with timed wrappers, set as attributes on the
+engine, the algorithm and its models:
+
+    step                          one time step of the engine
+      securities changed          universe additions and removals, warm-ups included
+      consolidators               feeding the bars of the step to the consolidators
+        <Consolidator class>      each consolidator's push, indicator updates included;
+                                  for the TradeBarConsolidators the engine aggregates
+                                  (consolidation.py), each consolidated bar it emits
+      <Algorithm>.OnData
+      <AlphaModel>.Update
+      <PortfolioConstructionModel>.CreateTargets
+      <RiskManagementModel>.ManageRisk
+      <ExecutionModel>.Execute
+
+Consolidators created during the run are wrapped when the engine next routes bars to
+them. detach() removes every wrapper again. An engine without a profiler runs no
+profiling code at all, so disabled profiling costs nothing.
+
+Every stage records its call count, total and self time (total less the stages inside
+it) and a log-bucketed histogram of its wall times for percentiles. With
+allocations=True, tracemalloc also records the bytes each stage left allocated and the
+peak it reached above its starting point. Tracing slows the run down several times, so
+the timings of such a run are not comparable to those of a plain one.
+
+report() gives the numbers per stage path. write_json() saves them, and
+write_collapsed() writes collapsed stacks ("step;consolidators;TradeBarConsolidator 1234",
+self time in microseconds) for flamegraph.pl, speedscope or inferno.'''
+
+import json
+import time as _time
+import tracemalloc
+
+from .consolidators import TradeBarConsolidator
+from .histogram import Histogram
+
+PERCENTILES = (50, 90, 99)
+
+
+class StageStatistics:
+    '''Counts, times and allocations of one stage path'''
+
+    __slots__ = ('calls', 'total', 'self_time', 'durations', 'allocated', 'peak')
+
+    def __init__(self, precision):
+        self.calls = 0
+        self.total = 0.0
+        self.self_time = 0.0
+        self.durations = Histogram(precision)
+        self.allocated = 0
+        self.peak = 0
+
+    def as_dict(self, allocations=False):
+        values = {
+            'calls': self.calls,
+            'total_seconds': self.total,
+            'self_seconds': self.self_time,
+            'mean_seconds': self.total / self.calls if self.calls else None,
+            'max_seconds': self.durations.maximum,
+        }
+        for q in PERCENTILES:
+            values['p{}_seconds'.format(q)] = self.durations.percentile(q)
+        if allocations:
+            values['allocated_bytes'] = self.allocated
+            values['peak_bytes'] = self.peak
+        return values
+
+
+class StageProfiler:
+    '''Times the stages of a backtest (see the module docstring)
+
+    Args:
+        allocations: Also trace memory allocations per stage with tracemalloc
+        precision: Relative width of the buckets the percentiles come from'''
+
+    def __init__(self, allocations=False, precision=0.01):
+        self.allocations = allocations
+        self.precision = precision
+        self.stages = {}
+        self.runtime = 0.0
+        self._stack = []
+        self._wrapped = []
+        self._engine = None
+        self._started_tracing = False
+        self._attached_at = None
+
+    # instrumentation
+
+    def wrap(self, name, function):
+        '''Returns function timed as the stage name, nested under the stage it is called from'''
+        clock = _time.perf_counter
+        stack = self._stack
+
+        def timed(*args, **kwargs):
+            parent = stack[-1] if stack else None
+            path = name if parent is None else parent[0] + ';' + name
+            frame = [path, 0.0, 0, 0, clock()]
+            if self.allocations:
+                self._enter_memory(frame, parent)
+            stack.append(frame)
+            try:
+                return function(*args, **kwargs)
+            finally:
+                elapsed = clock() - frame[4]
+                stack.pop()
+                self._record(frame, elapsed, parent)
+
+        timed.__wrapped__ = function
+        return timed
+
+    def _record(self, frame, elapsed, parent):
+        path, child_time = frame[0], frame[1]
+        stage = self.stages.get(path)
+        if stage is None:
+            stage = self.stages[path] = StageStatistics(self.precision)
+        stage.calls += 1
+        stage.total += elapsed
+        stage.self_time += elapsed - child_time
+        stage.durations.record(elapsed)
+        if parent is not None:
+            parent[1] += elapsed
+        if self.allocations:
+            current, peak = tracemalloc.get_traced_memory()
+            peak = max(peak, frame[3])
+            stage.allocated += current - frame[2]
+            stage.peak = max(stage.peak, peak - frame[2])
+            if parent is not None:
+                parent[3] = max(parent[3], peak)
+
+    def _enter_memory(self, frame, parent):
+        current, peak = tracemalloc.get_traced_memory()
+        # the peak since the last reset belongs to the enclosing stage
+        if parent is not None:
+            parent[3] = max(parent[3], peak)
+        tracemalloc.reset_peak()
+        frame[2] = frame[3] = current
+
+    def _patch(self, owner, attribute, name):
+        self._wrapped.append((owner, attribute, attribute in vars(owner)))
+        setattr(owner, attribute, self.wrap(name, getattr(owner, attribute)))
+
+    def attach(self, engine):
+        '''Instruments the engine and the initialized algorithm it runs'''
+        if self._engine is not None:
+            raise RuntimeError('the profiler is already attached to an engine')
+        algorithm = engine.algorithm
+        self._engine = engine
+        self._attached_at = _time.perf_counter()
+        if self.allocations and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        self._patch(engine, '_step', 'step')
+        self._patch(engine, '_on_securities_changed', 'securities changed')
+        self._patch(algorithm, 'OnData', '{}.OnData'.format(type(algorithm).__name__))
+        for model, method in ((algorithm.Alpha, 'Update'), (algorithm.PortfolioConstruction, 'CreateTargets'),
+                              (algorithm.RiskManagement, 'ManageRisk'), (algorithm.Execution, 'Execute')):
+            self._patch(model, method, '{}.{}'.format(type(model).__name__, method))
+
+        feed = self.wrap('consolidators', engine._feed_consolidators)
+        subscriptions = algorithm.SubscriptionManager
+        seen = [None]
+
+        def feed_consolidators(row):
+            if subscriptions.version != seen[0]:
+                for _, consolidators in subscriptions.items():
+                    for consolidator in consolidators:
+                        # the router aggregates exact TradeBarConsolidators and calls their _emit
+                        method = '_emit' if type(consolidator) is TradeBarConsolidator else 'push'
+                        if method not in vars(consolidator):
+                            self._patch(consolidator, method, type(consolidator).__name__)
+                seen[0] = subscriptions.version
+            feed(row)
+
+        feed_consolidators.__wrapped__ = engine._feed_consolidators
+        self._wrapped.append((engine, '_feed_consolidators', '_feed_consolidators' in vars(engine)))
+        engine._feed_consolidators = feed_consolidators
+
+    def detach(self):
+        '''Removes the wrappers and stops tracing if attach started it'''
+        for owner, attribute, own in reversed(self._wrapped):
+            if own:
+                setattr(owner, attribute, getattr(owner, attribute).__wrapped__)
+            else:
+                delattr(owner, attribute)
+        self._wrapped = []
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+        if self._attached_at is not None:
+            self.runtime += _time.perf_counter() - self._attached_at
+            self._attached_at = None
+        self._engine = None
+
+    # output
+
+    def report(self):
+        '''{stage path: statistics}, outermost stages first'''
+        return {path: self.stages[path].as_dict(self.allocations) for path in sorted(self.stages)}
+
+    def write_json(self, path):
+        with open(path, 'w') as output:
+            json.dump({'runtime_seconds': self.runtime, 'allocations': self.allocations, 'stages': self.report()},
+                      output, indent=1)
+
+    def collapsed_stacks(self):
+        '''Lines of "stage;stage;stage microseconds" with the self time of each stage path'''
+        return ['{} {}'.format(path, int(round(self.stages[path].self_time * 1e6))) for path in sorted(self.stages)]
+
+    def write_collapsed(self, path):
+        with open(path, 'w') as output:
+            output.write('\n'.join(self.collapsed_stacks()) + '\n')
+
+    def format(self):
+        '''Table of the stages by total time, indented by nesting'''
+        header = '{:<56} {:>9} {:>10} {:>10} {:>10} {:>10}'.format('stage', 'calls', 'total s', 'self s', 'p50 ms',
+                                                                   'p99 ms')
+        if self.allocations:
+            header += ' {:>12} {:>12}'.format('alloc KiB', 'peak KiB')
+        lines = [header]
+
+        def children(parent):
+            depth = 0 if parent is None else parent.count(';') + 1
+            paths = [path for path in self.stages if path.count(';') == depth
+                     and (parent is None or path.startswith(parent + ';'))]
+            return sorted(paths, key=lambda path: -self.stages[path].total)
+
+        def add(path):
+            stage = self.stages[path]
+            depth = path.count(';')
+            label = '  ' * depth + path.rsplit(';', 1)[-1]
+            line = '{:<56} {:>9} {:>10.3f} {:>10.3f} {:>10.3f} {:>10.3f}'.format(
+                label[:56], stage.calls, stage.total, stage.self_time, stage.durations.percentile(50) * 1e3,
+                stage.durations.percentile(99) * 1e3)
+            if self.allocations:
+                line += ' {:>12.1f} {:>12.1f}'.format(stage.allocated / 1024, stage.peak / 1024)
+            lines.append(line)
+            for child in children(path):
+                add(child)
+
+        for root in children(None):
+            add(root)
+        lines.append('profiled for {:.3f}s'.format(self.runtime))
+        return '\n'.join(lines)
@@ -0,0 +1,148 @@
+'''Indicator registry shared by the indicator helpers and the alpha models.
+
+The helpers of QCcodes.py name every indicator with CreateIndicatorName, but LEAN still
+creates a new indicator and consolidator on each call. The registry keys indicators on
+that name plus the constructor parameters and the selector. Asking again for the same
+key returns the live instance and adds a reference. Consolidators are shared per
+(symbol, resolution), so each symbol has one consolidator per resolution feeding all of
+its registered indicators.
+
+References are counted. Releasing the last reference unsubscribes the indicator, and the
+consolidator goes once nothing is left on it. A symbol that leaves the universe and comes
+back therefore gets a freshly warmed indicator, as it would without the registry.'''
+
+from collections import Counter
+
+from .enums import Resolution
+from .indicators.base import TradeBarIndicator
+
+
+def selector_key(selector):
+    '''Selectors compare by their code, so equal lambdas written in different places match'''
+    if selector is None:
+        return None
+    code = getattr(selector, '__code__', None)
+    if code is None or getattr(selector, '__closure__', None) or getattr(selector, '__defaults__', None):
+        return selector
+    return code.co_code, code.co_consts, code.co_names
+
+
+class _Registration:
+    __slots__ = ('indicator', 'symbol', 'consolidator_key', 'handler', 'references')
+
+    def __init__(self, indicator, symbol, consolidator_key, handler):
+        self.indicator = indicator
+        self.symbol = symbol
+        self.consolidator_key = consolidator_key
+        self.handler = handler
+        self.references = 1
+
+
+class IndicatorRegistry:
+    '''Deduplicates indicators and consolidators of one algorithm'''
+
+    def __init__(self, algorithm):
+        self.algorithm = algorithm
+        self._registrations = {}
+        self._by_indicator = {}
+        self._consolidators = {}
+        self.requests = Counter()
+        self.created = 0
+        self.collapsed = 0
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        # keyed by id(), so rebuilt for the loaded indicators
+        self._by_indicator = {id(registration.indicator): key for key, registration in self._registrations.items()}
+
+    def acquire(self, symbol, name, indicator_type, parameters=(), resolution=None, selector=None, warm_up=False):
+        '''Returns the registered indicator_type(name, *parameters) for the symbol, creating,
+        registering and (with warm_up) warming it up on first use
+        Args:
+            symbol: The symbol whose data updates the indicator
+            name: The indicator name, normally from CreateIndicatorName
+            indicator_type: The indicator class
+            parameters: Constructor arguments after the name
+            resolution: The resolution of the bars the indicator receives
+            selector: Selects the value to send into the indicator from each bar
+            warm_up: Whether a newly created indicator is warmed up from history
+        Returns:
+            The shared indicator instance'''
+        key = (symbol, name, indicator_type, tuple(parameters), selector_key(selector))
+        self.requests[name] += 1
+        registration = self._registrations.get(key)
+        if registration is not None:
+            registration.references += 1
+            self.collapsed += 1
+            return registration.indicator
+
+        indicator = indicator_type(name, *parameters)
+        self.created += 1
+        consolidator_key = (symbol, self._resolution(resolution))
+        consolidator = self._consolidator(consolidator_key)
+        handler = None
+        if selector is None:
+            consolidator.subscribe_indicator(indicator)
+        elif isinstance(indicator, TradeBarIndicator):
+            handler = lambda sender, bar: indicator.Update(selector(bar))
+        else:
+            handler = lambda sender, bar: indicator.Update(bar.EndTime, selector(bar))
+        if handler is not None:
+            consolidator.DataConsolidated.append(handler)
+        registration = _Registration(indicator, symbol, consolidator_key, handler)
+        self._registrations[key] = registration
+        self._by_indicator[id(indicator)] = key
+        if warm_up:
+            self.algorithm.WarmUpIndicator(symbol, indicator, resolution, selector)
+        return indicator
+
+    def release(self, indicator):
+        '''Drops one reference; the last one unsubscribes the indicator from its consolidator'''
+        key = self._by_indicator.get(id(indicator))
+        if key is None:
+            return
+        registration = self._registrations[key]
+        registration.references -= 1
+        if registration.references > 0:
+            return
+        del self._registrations[key]
+        del self._by_indicator[id(indicator)]
+        consolidator, users = self._consolidators[registration.consolidator_key]
+        if registration.handler is None:
+            consolidator.unsubscribe_indicator(indicator)
+        else:
+            consolidator.DataConsolidated.remove(registration.handler)
+        if users == 1:
+            del self._consolidators[registration.consolidator_key]
+            self.algorithm.SubscriptionManager.RemoveConsolidator(registration.symbol, consolidator)
+        else:
+            self._consolidators[registration.consolidator_key] = (consolidator, users - 1)
+
+    def _resolution(self, resolution):
+        if resolution is None:
+            engine = self.algorithm._engine
+            return None if engine is None else engine.resolution
+        return Resolution(resolution)
+
+    def _consolidator(self, key):
+        entry = self._consolidators.get(key)
+        if entry is None:
+            symbol, resolution = key
+            consolidator = self.algorithm.ResolveConsolidator(symbol, resolution)
+            self.algorithm.SubscriptionManager.AddConsolidator(symbol, consolidator)
+            entry = (consolidator, 0)
+        consolidator, users = entry
+        self._consolidators[key] = (consolidator, users + 1)
+        return consolidator
+
+    def report(self):
+        '''Text summary of how many registrations were collapsed onto shared instances'''
+        lines = ['{} indicator registrations: {} created, {} collapsed onto an existing instance; '
+                 '{} live indicators on {} consolidators'.format(sum(self.requests.values()), self.created,
+                                                                 self.collapsed, len(self._registrations),
+                                                                 len(self._consolidators))]
+        shared = sorted(((r.references, key[1]) for key, r in self._registrations.items() if r.references > 1),
+                        reverse=True)
+        for references, name in shared:
+            lines.append('  {:<40} {} users'.format(name, references))
+        return '\n'.join(lines)
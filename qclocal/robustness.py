@@ -0,0 +1,184 @@
+'''Bootstrap and Monte Carlo robustness tests of MacdStrategy variants.
+
+One backtest over one window says little about how much of its result is luck. A
+robustness run backtests each variant on many replicas of the market, each of them:
+
+    - a block bootstrap of the prices. The bar returns of the shared frame (every field
+      relative to the previous close) are resampled in circular blocks of whole rows, so
+      the cross-section and the short-term autocorrelation inside a block are kept, and
+      prices are rebuilt from the resampled returns;
+    - a random subset of each variant's universe (a fraction `keep` of its symbols);
+    - a random shift of the start date by up to `start_jitter` days either way.
+
+Replica i draws everything from its own generator, seeded by (seed, i). Every variant
+runs on the same replicas, so their differences are measured with common random numbers:
+the paired difference of a metric over the replicas has a much narrower interval than
+the two intervals taken apart. The results do not depend on the number of workers.
+
+The prices are loaded once and memory-mapped by the workers of a process pool (see
+sweep.shared_pool). A replica rebuilds its own bootstrap prices from that read-only copy
+and backtests all the variants on them.
+
+The output holds, per variant and metric, the value on the actual prices and a percentile
+confidence interval over the replicas. For every variant after the first it also holds
+the interval of its paired difference to the first.'''
+
+from collections import namedtuple
+from concurrent.futures import as_completed
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from .data import BarFrame, FrameDataSource
+from .engine import BacktestEngine, format_statistic
+from .strategy import MacdStrategy
+from .sweep import _shared, describe, shared_pool
+
+METRICS = ('Sharpe Ratio', 'Net Profit', 'Drawdown', 'Turnover')
+
+RobustnessSettings = namedtuple('RobustnessSettings', (
+    'replicas', 'block', 'keep', 'start_jitter', 'bootstrap', 'seed', 'confidence'),
+    defaults=(1000, 20, 0.8, 30, True, 0, 0.95))
+RobustnessSettings.__doc__ = '''Number of replicas, bootstrap block length in bars, fraction of each universe kept,
+largest start shift in days, whether to resample the prices, seed and confidence level'''
+
+
+def _date(value):
+    return value if isinstance(value, datetime) else datetime.fromisoformat(str(value))
+
+
+def bootstrap_frame(frame, rng, block):
+    '''BarFrame with the bars of frame rebuilt from its bar returns resampled in circular
+    blocks of block rows. The first row is kept as it is and anchors the prices; a bar is
+    left out where either its own row or the resampled one has none.'''
+    rows = len(frame.times)
+    if rows < 2:
+        return frame
+    steps = rows - 1
+    starts = rng.integers(0, steps, -(-steps // block))
+    picked = ((starts[:, None] + np.arange(block)) % steps).ravel()[:steps] + 1
+    previous = frame.close_filled[:-1]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ratios = {field: getattr(frame, field)[picked] / previous[picked - 1]
+                  for field in ('open', 'high', 'low', 'close')}
+    present = frame.has_bar[1:] & ~np.isnan(ratios['close'])
+    # the first price of every column, so columns listed after the first row have a level
+    anchor = frame.close_filled[np.argmax(frame.has_bar, axis=0), np.arange(frame.shape[1])]
+    anchor = np.where(np.isnan(frame.close_filled[0]), anchor, frame.close_filled[0])
+    growth = np.where(present, ratios['close'], 1.0)
+    path = np.vstack([anchor, anchor * np.cumprod(growth, axis=0)])
+    fields = {}
+    for field in ('open', 'high', 'low', 'close'):
+        values = np.where(present, ratios[field] * path[:-1], np.nan)
+        fields[field] = np.vstack([getattr(frame, field)[:1], values])
+    fields['volume'] = np.vstack([frame.volume[:1], np.where(present, frame.volume[picked], np.nan)])
+    return BarFrame(frame.times, frame.symbols, fields['open'], fields['high'], fields['low'], fields['close'],
+                    fields['volume'])
+
+
+def perturb(parameters, draws, settings):
+    '''The variant's parameters on one replica, from the replica's common draws: a uniform
+    number per ticker and one for the start shift'''
+    ranks, shift = draws
+    symbols = parameters.symbols
+    if settings.keep < 1:
+        kept = max(1, int(round(settings.keep * len(symbols))))
+        order = sorted(range(len(symbols)), key=lambda i: ranks[symbols[i]])
+        symbols = tuple(symbols[i] for i in sorted(order[:kept]))
+    start, end = _date(parameters.start), _date(parameters.end)
+    days = int(round((2 * shift - 1) * settings.start_jitter))
+    start = min(start + timedelta(days=days), end - timedelta(days=1))
+    return parameters._replace(symbols=symbols, start=start, end=end)
+
+
+def _backtest(source, parameters):
+    statistics = BacktestEngine(source).run(MacdStrategy(parameters)).statistics
+    return {metric: statistics.get(metric, float('nan')) for metric in METRICS}
+
+
+def _replicate(index, variants, settings):
+    '''Backtests every variant on replica index, or on the actual prices for None'''
+    source = _shared['source']
+    if index is None:
+        return index, [_backtest(source, parameters) for parameters in variants]
+    rng = np.random.default_rng([settings.seed, index])
+    frame = source.frame
+    if settings.bootstrap:
+        frame = bootstrap_frame(frame, rng, settings.block)
+    tickers = sorted({ticker for parameters in variants for ticker in parameters.symbols})
+    draws = dict(zip(tickers, rng.random(len(tickers)).tolist())), float(rng.random())
+    replica = FrameDataSource(frame, source.resolution)
+    return index, [_backtest(replica, perturb(parameters, draws, settings)) for parameters in variants]
+
+
+class RobustnessResult:
+    '''Metrics of the variants on the actual prices and on every replica
+
+    Attributes:
+        observed: [variant][metric] value on the actual prices
+        values: {metric: (replica x variant) array}'''
+
+    def __init__(self, variants, settings, observed, values):
+        self.variants = variants
+        self.settings = settings
+        self.observed = observed
+        self.values = values
+
+    def interval(self, metric, variant=0):
+        '''(low, high) percentile interval of the metric of a variant over the replicas'''
+        return self._interval(self.values[metric][:, variant])
+
+    def difference(self, metric, variant):
+        '''(mean, low, high) of the paired difference variant - first variant over the replicas'''
+        values = self.values[metric]
+        difference = values[:, variant] - values[:, 0]
+        return (float(np.nanmean(difference)),) + self._interval(difference)
+
+    def _interval(self, values):
+        tail = (1 - self.settings.confidence) / 2 * 100
+        low, high = np.nanpercentile(values, [tail, 100 - tail])
+        return float(low), float(high)
+
+    def format(self, names=None):
+        names = names or [describe(parameters) for parameters in self.variants]
+        level = '{:.0%}'.format(self.settings.confidence)
+        lines = ['{} replicas, {} intervals'.format(len(self.values[METRICS[0]]), level)]
+        for variant, name in enumerate(names):
+            lines.append(name)
+            for metric in METRICS:
+                low, high = self.interval(metric, variant)
+                line = '  {:<14}{:>10}  [{}, {}]'.format(metric, format_statistic(metric, self.observed[variant][metric]),
+                                                         format_statistic(metric, low), format_statistic(metric, high))
+                if variant:
+                    mean, low, high = self.difference(metric, variant)
+                    line += '  vs {}: {} [{}, {}]'.format(names[0], format_statistic(metric, mean),
+                                                          format_statistic(metric, low), format_statistic(metric, high))
+                lines.append(line)
+        return '\n'.join(lines)
+
+
+def run_robustness(variants, source, settings=RobustnessSettings(), workers=None, on_replica=None):
+    '''Backtests the MacdStrategyParameters variants on settings.replicas replicas across a
+    process pool sharing one memory-mapped copy of the prices; returns a RobustnessResult.
+
+    on_replica(done, total) is called in the parent process as replicas finish.'''
+    variants = list(variants)
+    # load enough history for the earliest shifted start
+    loaded = [parameters._replace(start=_date(parameters.start) - timedelta(days=settings.start_jitter))
+              for parameters in variants]
+    values = {metric: np.full((settings.replicas, len(variants)), np.nan) for metric in METRICS}
+    observed = None
+    with shared_pool(source, loaded, workers) as pool:
+        futures = [pool.submit(_replicate, index, variants, settings)
+                   for index in [None] + list(range(settings.replicas))]
+        for done, future in enumerate(as_completed(futures), 1):
+            index, metrics = future.result()
+            if index is None:
+                observed = metrics
+            else:
+                for variant, values_of_variant in enumerate(metrics):
+                    for metric in METRICS:
+                        values[metric][index, variant] = values_of_variant[metric]
+            if on_replica is not None:
+                on_replica(done, len(futures))
+    return RobustnessResult(variants, settings, observed, values)
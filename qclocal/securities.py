@@ -0,0 +1,296 @@
+'''Securities and portfolio state.
+
+Holdings live in arrays indexed by the column of the symbol in the engine's price
+matrix; Security and SecurityHolding are thin views over those arrays so valuing the
+portfolio each bar is a handful of vector operations.'''
+
+from collections import namedtuple
+
+import numpy as np
+
+KeyValuePair = namedtuple('KeyValuePair', ('Key', 'Value'))
+
+
+class SecurityHolding:
+    '''View of the holdings of one security'''
+
+    __slots__ = ('_portfolio', '_column', 'Symbol')
+
+    def __init__(self, portfolio, column, symbol):
+        self._portfolio = portfolio
+        self._column = column
+        self.Symbol = symbol
+
+    @property
+    def Quantity(self):
+        return float(self._portfolio.quantity[self._column])
+
+    @property
+    def AbsoluteQuantity(self):
+        return abs(self.Quantity)
+
+    @property
+    def AveragePrice(self):
+        return float(self._portfolio.average_price[self._column])
+
+    @property
+    def Price(self):
+        return float(self._portfolio.prices[self._column])
+
+    @property
+    def Invested(self):
+        return self.Quantity != 0
+
+    @property
+    def IsLong(self):
+        return self.Quantity > 0
+
+    @property
+    def IsShort(self):
+        return self.Quantity < 0
+
+    @property
+    def HoldingsValue(self):
+        return self.Quantity * self.Price
+
+    @property
+    def AbsoluteHoldingsValue(self):
+        return abs(self.HoldingsValue)
+
+    @property
+    def HoldingsCost(self):
+        return self.Quantity * self.AveragePrice
+
+    @property
+    def AbsoluteHoldingsCost(self):
+        return abs(self.HoldingsCost)
+
+    @property
+    def UnrealizedProfit(self):
+        return self.Quantity * (self.Price - self.AveragePrice)
+
+    @property
+    def UnrealizedProfitPercent(self):
+        cost = self.AbsoluteHoldingsCost
+        return 0.0 if cost == 0 else self.UnrealizedProfit / cost
+
+    @property
+    def TotalFees(self):
+        return float(self._portfolio.fees[self._column])
+
+    @property
+    def Profit(self):
+        return float(self._portfolio.realized_profit[self._column])
+
+
+class Security:
+    '''A subscribed security; price fields read the engine's current bar'''
+
+    __slots__ = ('Symbol', 'Type', 'Resolution', 'Holdings', '_portfolio', '_column')
+
+    def __init__(self, symbol, column, portfolio, resolution):
+        self.Symbol = symbol
+        self.Type = symbol.SecurityType
+        self.Resolution = resolution
+        self._portfolio = portfolio
+        self._column = column
+        self.Holdings = SecurityHolding(portfolio, column, symbol)
+
+    @property
+    def column(self):
+        return self._column
+
+    def bind(self, column):
+        '''Points the security at its column of the price matrix'''
+        self._column = column
+        self.Holdings._column = column
+
+    @property
+    def Price(self):
+        price = self._portfolio.prices[self._column]
+        return 0.0 if price != price else float(price)
+
+    @property
+    def Close(self):
+        return self.Price
+
+    @property
+    def HasData(self):
+        return self.Price != 0
+
+    @property
+    def Invested(self):
+        return self.Holdings.Invested
+
+    def __repr__(self):
+        return 'Security({})'.format(self.Symbol)
+
+
+class SecurityManager:
+    '''Symbol -> Security mapping with the LEAN accessors'''
+
+    def __init__(self):
+        self._securities = {}
+        self._by_ticker = {}
+
+    def add(self, security):
+        self._securities[security.Symbol] = security
+        self._by_ticker[security.Symbol.Value] = security
+
+    def remove(self, symbol):
+        security = self._securities.pop(symbol, None)
+        if security is not None:
+            self._by_ticker.pop(symbol.Value, None)
+        return security
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return self._by_ticker[key.upper()]
+        return self._securities[key]
+
+    def __contains__(self, key):
+        if isinstance(key, str):
+            return key.upper() in self._by_ticker
+        return key in self._securities
+
+    def ContainsKey(self, key):
+        return key in self
+
+    def __len__(self):
+        return len(self._securities)
+
+    def __iter__(self):
+        for symbol, security in self._securities.items():
+            yield KeyValuePair(symbol, security)
+
+    @property
+    def Keys(self):
+        return list(self._securities)
+
+    @property
+    def Values(self):
+        return list(self._securities.values())
+
+    @property
+    def Count(self):
+        return len(self._securities)
+
+
+class SecurityPortfolioManager:
+    '''Cash plus array backed holdings for every column of the price matrix'''
+
+    def __init__(self, securities, cash=100000.0):
+        self.Securities = securities
+        self.CashBook = cash
+        self.quantity = np.zeros(0)
+        self.average_price = np.zeros(0)
+        self.realized_profit = np.zeros(0)
+        self.fees = np.zeros(0)
+        self.prices = np.zeros(0)
+        self.symbols = []
+        self._valuation_prices = np.zeros(0)
+        # called with the column of every fill, after the holding is updated
+        self.fill_listeners = []
+
+    def resize(self, columns):
+        '''Allocates the holding arrays for a price matrix with the given column count'''
+        self.quantity = np.zeros(columns)
+        self.average_price = np.zeros(columns)
+        self.realized_profit = np.zeros(columns)
+        self.fees = np.zeros(columns)
+        self.prices = np.full(columns, np.nan)
+        self._valuation_prices = np.zeros(columns)
+
+    def set_prices(self, prices, valuation_prices=None):
+        '''Points the portfolio at the current row of last traded prices. valuation_prices
+        is the same row with NaN (no trade yet) replaced by zero.'''
+        self.prices = prices
+        self._valuation_prices = np.nan_to_num(prices) if valuation_prices is None else valuation_prices
+
+    @property
+    def Cash(self):
+        return self.CashBook
+
+    def SetCash(self, cash):
+        self.CashBook = float(cash)
+
+    @property
+    def TotalHoldingsValue(self):
+        return float(np.abs(self.quantity) @ self._valuation_prices)
+
+    @property
+    def TotalPortfolioValue(self):
+        return self.CashBook + float(self.quantity @ self._valuation_prices)
+
+    @property
+    def TotalUnrealizedProfit(self):
+        return float(self.quantity @ (self._valuation_prices - self.average_price))
+
+    def unrealized_profits(self):
+        '''Unrealized profit of every column at the current prices'''
+        return self.quantity * (self._valuation_prices - self.average_price)
+
+    @property
+    def TotalFees(self):
+        return float(self.fees.sum())
+
+    @property
+    def TotalProfit(self):
+        return float(self.realized_profit.sum())
+
+    @property
+    def Invested(self):
+        return bool(np.any(self.quantity != 0))
+
+    def __getitem__(self, symbol):
+        return self.Securities[symbol].Holdings
+
+    def __iter__(self):
+        for kvp in self.Securities:
+            yield KeyValuePair(kvp.Key, kvp.Value.Holdings)
+
+    @property
+    def Values(self):
+        return [security.Holdings for security in self.Securities.Values]
+
+    def process_fill(self, column, quantity, price, fee):
+        '''Applies a fill to cash and holdings, realizing profit on the reduced part'''
+        held = self.quantity[column]
+        average = self.average_price[column]
+        new_quantity = held + quantity
+        if held == 0 or (held > 0) == (quantity > 0):
+            self.average_price[column] = (held * average + quantity * price) / new_quantity
+        else:
+            closed = min(abs(quantity), abs(held)) * np.sign(held)
+            self.realized_profit[column] += closed * (price - average)
+            if new_quantity == 0:
+                self.average_price[column] = 0.0
+            elif (new_quantity > 0) != (held > 0):
+                self.average_price[column] = price
+        self.quantity[column] = new_quantity
+        self.fees[column] += fee
+        self.CashBook -= quantity * price + fee
+        for listener in self.fill_listeners:
+            listener(column)
+
+    def process_fills(self, columns, quantities, prices, fees):
+        '''process_fill over arrays of fills in distinct columns. Cash is debited fill by
+        fill in the order given, so the balance matches sequential process_fill calls.'''
+        held = self.quantity[columns]
+        average = self.average_price[columns]
+        new_quantity = held + quantities
+        adding = (held == 0) | ((held > 0) == (quantities > 0))
+        reducing = ~adding
+        closed = np.minimum(np.abs(quantities[reducing]), np.abs(held[reducing])) * np.sign(held[reducing])
+        self.realized_profit[columns[reducing]] += closed * (prices[reducing] - average[reducing])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            added = (held * average + quantities * prices) / new_quantity
+        flipped = np.where((new_quantity > 0) != (held > 0), prices, average)
+        self.average_price[columns] = np.where(adding, added, np.where(new_quantity == 0, 0.0, flipped))
+        self.quantity[columns] = new_quantity
+        self.fees[columns] += fees
+        for value in (quantities * prices + fees).tolist():
+            self.CashBook -= value
+        for listener in self.fill_listeners:
+            for column in columns.tolist():
+                listener(column)
@@ -0,0 +1,97 @@
+'''Signal cache for BatchedMacdAlphaModel(history=True), kept on disk across runs.
+
+The precomputed MACD signal of a symbol is a function of the bars it is fed from the
+start of the backtest and of the state its warm-up left. Moving the end date of a
+backtest only adds bars at the end, so the signal of the bars a previous run already
+covered does not change.
+
+An entry holds one symbol's bars from the start (times and closes), the signal after
+each bar and the MACD state after the last bar. It is keyed by the ticker, the MACD
+parameters and resolution, the time of the first bar and a digest of the warmed-up
+state, which fingerprints the warm-up history. A later run takes the signals of the
+bars the entry holds and resumes the MACD from the stored state, so it only computes
+the bars after them, with the same arithmetic and to the bit.
+
+The cached bars are compared with the bars of the run before an entry is used. If any
+of them changed, the entry is dropped and the symbol computed and stored again. Entries
+are .npz files, trimmed to a size limit by evicting the least recently used.'''
+
+import hashlib
+import os
+import tempfile
+from collections import namedtuple
+
+import numpy as np
+
+from .history import evict_least_recent
+
+SignalEntry = namedtuple('SignalEntry', ('times', 'close', 'signal', 'state'))
+SignalEntry.__doc__ = '''Bar times (datetime64[s]) and closes, the signal after each bar and the state after the last'''
+
+
+class SignalCache:
+    '''Directory of SignalEntry files
+
+    Args:
+        directory: Where the entries are written
+        max_bytes: Size limit of the directory, enforced by least recently used eviction'''
+
+    def __init__(self, directory, max_bytes=256 * 2 ** 20):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.invalidated = 0
+        self.cached_bars = 0
+        self.computed_bars = 0
+
+    @staticmethod
+    def key(ticker, parameters, start, state):
+        '''Key of a symbol's entry: parameters are the model's (fast, slow, signal, moving
+        average type, resolution), start the time of the first bar, state the warmed-up state'''
+        digest = hashlib.sha1(repr((str(ticker).upper(), tuple(str(value) for value in parameters),
+                                    str(np.datetime64(start, 's')))).encode())
+        digest.update(np.ascontiguousarray(state, dtype=np.float64).tobytes())
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.npz')
+
+    def load(self, key):
+        '''The entry stored under key, or None'''
+        path = self._path(key)
+        try:
+            with np.load(path) as stored:
+                entry = SignalEntry(stored['times'].astype('datetime64[s]'), stored['close'], stored['signal'],
+                                    stored['state'])
+        except (OSError, KeyError, ValueError):
+            return None
+        os.utime(path)
+        return entry
+
+    def save(self, key, entry):
+        handle, temporary = tempfile.mkstemp(suffix='.npz', dir=self.directory)
+        with os.fdopen(handle, 'wb') as output:
+            np.savez(output, times=entry.times.astype('datetime64[s]').astype(np.int64), close=entry.close,
+                     signal=entry.signal, state=entry.state)
+        os.replace(temporary, self._path(key))
+
+    def evict(self):
+        '''Deletes the least recently used entries until the directory fits max_bytes'''
+        return evict_least_recent(self.directory, self.max_bytes)
+
+    def covered(self, entry, times, close, end):
+        '''Number of leading bars of (times, close), the bars of a run ending at time end,
+        that the entry holds; None if the entry disagrees with them'''
+        count = int(np.searchsorted(times, entry.times[-1], 'right')) if len(entry.times) else 0
+        if not (np.array_equal(times[:count], entry.times[:count]) and np.array_equal(close[:count], entry.close[:count])):
+            return None
+        # a run ending within the entry has all of its bars in it, and no bar in between
+        if count < len(entry.times) and (count < len(times) or end >= entry.times[count]):
+            return None
+        return count
+
+    def summary(self):
+        return '{} signal cache hits, {} misses, {} invalidated; {} bars from the cache, {} computed'.format(
+            self.hits, self.misses, self.invalidated, self.cached_bars, self.computed_bars)
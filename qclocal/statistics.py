@@ -0,0 +1,211 @@
+'''Performance statistics kept up to date as a run steps, and the store of its equity curve.
+
+RunningStatistics follows the portfolio value one step at a time, in constant memory:
+
+    Sharpe Ratio   mean and variance of the step returns (Welford's update), annualized
+    Drawdown       running peak of the equity and the deepest fall below it
+    Turnover       value traded over the mean equity, both running sums
+    Total Fees     running sums over the fills, in fill order
+    Total Orders
+
+The metrics can be read at any step, so sweeps and long minute backtests report them
+without going back over a history. Per symbol it keeps the value traded in an array over
+the portfolio columns, and reads each symbol's contribution to the profit (realized plus
+unrealized profit, less fees) from the holding arrays of the portfolio when asked.
+
+EquityStore keeps the equity curve, and optionally the holdings of every column, in
+arrays allocated for the whole run up front (doubling when a live run outgrows them).
+write() saves them as .npz, every step or downsampled to every n-th step or to the last
+step of each period.'''
+
+import math
+
+import numpy as np
+
+from .consolidation import bucket_starts
+
+
+class RunningStatistics:
+    '''Statistics of a run, updated with each step's portfolio value and each batch of fills
+
+    Args:
+        starting_equity: Portfolio value before the first step
+        bars_per_year: Steps per year, to annualize the Sharpe ratio
+        portfolio: SecurityPortfolioManager the contributions are read from'''
+
+    def __init__(self, starting_equity, bars_per_year=252, portfolio=None):
+        self.starting_equity = float(starting_equity)
+        self.bars_per_year = bars_per_year
+        self.portfolio = portfolio
+        self.steps = 0
+        self.equity = self.starting_equity
+        self.peak = self.starting_equity
+        self.drawdown = 0.0
+        self.equity_total = self.starting_equity
+        self.orders = 0
+        self.fees = 0
+        self.traded = 0
+        self.traded_by_column = np.zeros(0 if portfolio is None else len(portfolio.quantity))
+        self._mean = 0.0
+        self._squares = 0.0
+
+    def update(self, equity):
+        '''Adds the portfolio value at the end of a step'''
+        previous = self.equity
+        self.steps += 1
+        # a step from no capital has no return, as in compute_statistics
+        step_return = (equity - previous) / previous if previous else 0.0
+        # Welford's update of the mean and the sum of squared deviations
+        delta = step_return - self._mean
+        self._mean += delta / self.steps
+        self._squares += delta * (step_return - self._mean)
+        if equity > self.peak:
+            self.peak = equity
+        drawdown = (self.peak - equity) / self.peak if self.peak else 0.0
+        if drawdown > self.drawdown:
+            self.drawdown = drawdown
+        self.equity = equity
+        self.equity_total += equity
+
+    def record_fills(self, columns, quantities, prices, fees):
+        '''Adds a batch of fills in distinct portfolio columns'''
+        traded = np.abs(quantities * prices)
+        self.orders += len(columns)
+        # running totals in fill order, as the order ledger would sum them
+        for value in traded.tolist():
+            self.traded += value
+        for fee in fees.tolist():
+            self.fees += fee
+        if self.portfolio is not None:
+            self.traded_by_column[columns] += traded
+
+    @property
+    def sharpe_ratio(self):
+        deviation = math.sqrt(self._squares / self.steps) if self.steps else 0.0
+        return 0.0 if deviation == 0 else self._mean / deviation * math.sqrt(self.bars_per_year)
+
+    @property
+    def turnover(self):
+        mean = self.equity_total / (self.steps + 1)
+        return self.traded / mean if mean else 0.0
+
+    def contributions(self):
+        '''Profit of every portfolio column so far: realized + unrealized - fees. The columns
+        sum to the change of the portfolio value.'''
+        portfolio = self.portfolio
+        return portfolio.realized_profit + portfolio.unrealized_profits() - portfolio.fees
+
+    def as_dict(self):
+        '''The summary statistics of the run so far; empty before the first step'''
+        if self.steps == 0:
+            return {}
+        return {
+            'Start Equity': self.starting_equity,
+            'End Equity': float(self.equity),
+            'Net Profit': self.equity / self.starting_equity - 1 if self.starting_equity else 0.0,
+            'Sharpe Ratio': float(self.sharpe_ratio),
+            'Drawdown': float(self.drawdown),
+            'Total Orders': self.orders,
+            'Total Fees': float(self.fees),
+            'Turnover': float(self.turnover),
+        }
+
+
+class EquityStore:
+    '''Equity curve of a run, and optionally its holdings, in preallocated arrays
+
+    Args:
+        capacity: Steps allocated up front; the arrays double when a run outgrows them
+        symbols: Symbols of the portfolio columns
+        positions: Also record the holding quantity of every column at each step'''
+
+    def __init__(self, capacity, symbols=(), positions=False):
+        capacity = max(int(capacity), 1)
+        self.symbols = list(symbols)
+        self.rows = 0
+        self._times = np.empty(capacity, 'datetime64[us]')
+        self._equity = np.empty(capacity)
+        self._positions = np.empty((capacity, len(self.symbols))) if positions else None
+
+    def append(self, time, equity, quantities=None):
+        '''Records the end time and portfolio value of a step, with the holdings if kept'''
+        row = self.rows
+        if row == len(self._equity):
+            self._grow()
+        self._times[row] = time
+        self._equity[row] = equity
+        if self._positions is not None:
+            self._positions[row] = quantities
+        self.rows = row + 1
+
+    def __getstate__(self):
+        # only the rows written; the rest is allocated again on load
+        state = dict(self.__dict__, capacity=len(self._equity))
+        for name in ('_times', '_equity', '_positions'):
+            if state[name] is not None:
+                state[name] = state[name][:self.rows].copy()
+        return state
+
+    def __setstate__(self, state):
+        capacity = state.pop('capacity')
+        self.__dict__.update(state)
+        for name in ('_times', '_equity', '_positions'):
+            written = state[name]
+            if written is not None:
+                array = np.empty((capacity,) + written.shape[1:], written.dtype)
+                array[:self.rows] = written
+                setattr(self, name, array)
+
+    def _grow(self):
+        size = 2 * len(self._equity)
+        self._times = np.resize(self._times, size)
+        self._equity = np.resize(self._equity, size)
+        if self._positions is not None:
+            positions = np.empty((size, self._positions.shape[1]))
+            positions[:self.rows] = self._positions[:self.rows]
+            self._positions = positions
+
+    @property
+    def times(self):
+        '''End time of every step'''
+        return self._times[:self.rows]
+
+    @property
+    def equity(self):
+        return self._equity[:self.rows]
+
+    @property
+    def positions(self):
+        '''(step x column) holding quantities, or None if they are not kept'''
+        return None if self._positions is None else self._positions[:self.rows]
+
+    def sample(self, every=None, period=None):
+        '''Rows kept when downsampling: every n-th step, or the last step of each period
+        (timedelta). The last step is always kept.'''
+        rows = self.rows
+        if rows == 0 or (every is None and period is None):
+            return np.arange(rows)
+        if period is not None:
+            # steps are stamped with their end, so one ending on a boundary closes the period before it
+            buckets = bucket_starts(self.times - np.timedelta64(1, 'us'), period)
+            return np.flatnonzero(np.r_[buckets[1:] != buckets[:-1], True])
+        kept = np.arange(every - 1, rows, every)
+        return kept if len(kept) and kept[-1] == rows - 1 else np.r_[kept, rows - 1]
+
+    def write(self, path, every=None, period=None):
+        '''Saves the times, equity and any positions of the sampled rows to an .npz file'''
+        kept = self.sample(every, period)
+        arrays = {'times': self.times[kept], 'equity': self.equity[kept]}
+        if self._positions is not None:
+            arrays['positions'] = self.positions[kept]
+            arrays['symbols'] = np.array([str(symbol) for symbol in self.symbols])
+        np.savez(path, **arrays)
+
+
+def format_contributions(contributions, count):
+    '''The count symbols contributing most and least to the profit'''
+    ranked = sorted(contributions.items(), key=lambda item: -item[1])
+    shown = ranked if len(ranked) <= 2 * count else ranked[:count] + [None] + ranked[-count:]
+    lines = ['{:<24}{}'.format('Contribution', 'profit')]
+    lines += ['  ...' if item is None else '{:<24}{:.2f}'.format(str(item[0]), item[1]) for item in shown]
+    return '\n'.join(lines)
@@ -0,0 +1,279 @@
+'''Memory-mapped columnar bar store.
+
+Every algorithm file reads the same few dozen equities over overlapping windows, and a CSV
+source parses each file again on every read. BarStore keeps the bars on disk as raw
+little-endian arrays that are memory-mapped on demand:
+
+    <root>/store.json          resolution and, per symbol, its first calendar row
+    <root>/calendar.i8         bar times of the store (int64 seconds), shared by all symbols
+    <root>/<TICKER>/<field>.f8 open/high/low/close/volume of one symbol, one value per
+                               calendar row from its first row on, NaN where it has no bar
+
+A date range resolves to a row range of the calendar by binary search, and the bars of a
+symbol over that range are slices of its mapped files. Nothing is read into memory until a
+page is touched, so minute bars for thousands of symbols cost only the rows a backtest uses.
+
+The files only ever grow. ingest() appends the new calendar rows and, per symbol, the rows
+after the last one it holds; earlier bytes are never rewritten. A symbol added later starts
+at the calendar row of its first bar.'''
+
+import json
+import os
+import re
+import tempfile
+
+import numpy as np
+
+from .data import FIELDS, BarFrame, BarSeries, DataSource, empty_series, forward_fill, to_datetime64
+from .enums import Resolution
+
+_ONE_SECOND = np.timedelta64(1, 's')
+
+
+def _read_array(path, dtype):
+    '''Memory-maps a raw array file; empty or missing files give an empty array'''
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        return np.empty(0, dtype)
+    count = size // np.dtype(dtype).itemsize
+    if count == 0:
+        return np.empty(0, dtype)
+    return np.memmap(path, dtype=dtype, mode='r', shape=(count,))
+
+
+def _append_array(path, values, dtype):
+    with open(path, 'ab') as handle:
+        np.ascontiguousarray(values, dtype=dtype).tofile(handle)
+
+
+class BarStore(DataSource):
+    '''DataSource over a memory-mapped store directory.
+
+    Args:
+        root: The store directory; created by the first ingest()
+        resolution: Resolution of a new store. An existing store keeps the one it was
+            created with.'''
+
+    def __init__(self, root, resolution=Resolution.Daily):
+        self.root = root
+        self._meta_path = os.path.join(root, 'store.json')
+        if os.path.exists(self._meta_path):
+            with open(self._meta_path) as handle:
+                meta = json.load(handle)
+            self.resolution = Resolution[meta['resolution']]
+            self._offsets = meta['symbols']
+        else:
+            self.resolution = Resolution(resolution)
+            self._offsets = {}
+        self.refresh()
+
+    def refresh(self):
+        '''Drops the mapped files so the next access sees rows appended since'''
+        self._calendar = None
+        self._columns = {}
+
+    # layout
+
+    @staticmethod
+    def _ticker(symbol):
+        return str(symbol).upper()
+
+    def _directory(self, ticker):
+        return os.path.join(self.root, re.sub(r'[^A-Z0-9._-]', '_', ticker))
+
+    def _field_path(self, ticker, field):
+        return os.path.join(self._directory(ticker), field + '.f8')
+
+    @property
+    def calendar(self):
+        '''Bar times of the store as datetime64[s], a view of the mapped calendar file'''
+        if self._calendar is None:
+            self._calendar = _read_array(os.path.join(self.root, 'calendar.i8'), '<i8').view('datetime64[s]')
+        return self._calendar
+
+    @property
+    def tickers(self):
+        return sorted(self._offsets)
+
+    def __contains__(self, symbol):
+        return self._ticker(symbol) in self._offsets
+
+    def rows(self, start=None, end=None):
+        '''Calendar row range [lo, hi) of start <= time <= end'''
+        calendar = self.calendar
+        lo = 0 if start is None else int(np.searchsorted(calendar, to_datetime64(start), 'left'))
+        hi = len(calendar) if end is None else int(np.searchsorted(calendar, to_datetime64(end), 'right'))
+        return lo, max(lo, hi)
+
+    def _mapped(self, ticker):
+        '''(first row, field arrays) of a symbol; the arrays all have the same length, which
+        a crash half way through an append may leave short of the calendar'''
+        mapped = self._columns.get(ticker)
+        if mapped is None:
+            arrays = [_read_array(self._field_path(ticker, field), '<f8') for field in FIELDS]
+            length = min(len(self.calendar) - self._offsets[ticker], *(len(array) for array in arrays))
+            mapped = self._columns[ticker] = (self._offsets[ticker], [array[:max(length, 0)] for array in arrays])
+        return mapped
+
+    def columns(self, symbol, lo, hi):
+        '''(first, arrays): views of the symbol's fields over calendar rows [first, first + len)
+        within [lo, hi); first is hi and the arrays are empty if it has no rows there'''
+        ticker = self._ticker(symbol)
+        if ticker not in self._offsets:
+            raise KeyError('{} is not in the bar store {}'.format(symbol, self.root))
+        offset, arrays = self._mapped(ticker)
+        first, last = max(lo, offset), min(hi, offset + len(arrays[0]))
+        if first >= last:
+            return hi, [array[:0] for array in arrays]
+        return first, [array[first - offset:last - offset] for array in arrays]
+
+    # DataSource
+
+    def read(self, symbol, start=None, end=None):
+        first, arrays = self.columns(symbol, *self.rows(start, end))
+        if len(arrays[0]) == 0:
+            return empty_series()
+        times = self.calendar[first:first + len(arrays[0])]
+        mask = ~np.isnan(arrays[3])
+        if mask.all():
+            # the common case: every row in range is a bar, so the series is views only
+            return BarSeries(times, *arrays)
+        return BarSeries(times[mask], *(array[mask] for array in arrays))
+
+    def load_frame(self, symbols, start=None, end=None):
+        '''Copies the requested window into a BarFrame. Rows where none of the symbols has
+        a bar are left out, as they are when the frame is built from per-symbol series.'''
+        times, matrices = self._window(symbols, *self.rows(start, end))
+        return BarFrame(times, symbols, *matrices)
+
+    def frame_chunks(self, symbols, start=None, end=None, rows=65536, carry=None):
+        '''load_frame's rows as BarFrames copied from `rows` calendar rows at a time, so only
+        the chunk being built is read into memory (see DataSource.frame_chunks)'''
+        lo, hi = self.rows(start, end)
+        for first in range(lo, hi, rows):
+            times, matrices = self._window(symbols, first, min(first + rows, hi))
+            if not len(times):
+                continue
+            close_filled = forward_fill(matrices[3], carry)
+            carry = close_filled[-1]
+            yield BarFrame(times, symbols, *matrices, close_filled=close_filled)
+
+    def _window(self, symbols, lo, hi):
+        '''(times, field matrices) of the calendar rows [lo, hi) where a symbol has a bar'''
+        matrices = [np.full((hi - lo, len(symbols)), np.nan) for _ in FIELDS]
+        for j, symbol in enumerate(symbols):
+            first, arrays = self.columns(symbol, lo, hi)
+            for matrix, array in zip(matrices, arrays):
+                matrix[first - lo:first - lo + len(array), j] = array
+        times = self.calendar[lo:hi]
+        traded = ~np.isnan(matrices[3]).all(axis=1)
+        if not traded.all():
+            times = times[traded]
+            matrices = [matrix[traded] for matrix in matrices]
+        return np.array(times), matrices
+
+    def cache_identity(self):
+        return 'store:{}:{}'.format(os.path.abspath(self.root), self.resolution.name)
+
+    def data_version(self, symbol):
+        ticker = self._ticker(symbol)
+        if ticker not in self._offsets:
+            return None
+        offset, arrays = self._mapped(ticker)
+        return '{}:{}'.format(offset, len(arrays[0]))
+
+    # ingest
+
+    def last_time(self, symbol):
+        '''Time of the last bar row stored for the symbol, None if it has none'''
+        ticker = self._ticker(symbol)
+        if ticker not in self._offsets:
+            return None
+        offset, arrays = self._mapped(ticker)
+        return self.calendar[offset + len(arrays[0]) - 1] if len(arrays[0]) else None
+
+    def ingest(self, source, symbols=None, start=None, end=None):
+        '''Appends the bars of the source after the last stored row of every symbol.
+
+        New calendar rows come from the union of the new bar times, so the source is read
+        twice: once for the times, then symbol by symbol for the values. Memory use is
+        bounded by the calendar and one symbol. Bars falling on or before the store's last
+        calendar time must land on existing calendar rows.
+
+        Args:
+            source: The DataSource to copy from; must have the store's resolution
+            symbols: Symbols or tickers to ingest; None updates every stored symbol
+            start: Earliest bar for symbols not yet in the store
+            end: Last bar time to ingest (inclusive)
+        Returns:
+            {ticker: number of bars appended}'''
+        if Resolution(source.resolution) != self.resolution:
+            raise ValueError('the store holds {} bars, the source serves {}'.format(
+                self.resolution.name, Resolution(source.resolution).name))
+        tickers = self.tickers if symbols is None else [self._ticker(symbol) for symbol in symbols]
+        os.makedirs(self.root, exist_ok=True)
+
+        def pending(ticker):
+            last = self.last_time(ticker)
+            return source.read(ticker, start if last is None else last + _ONE_SECOND, end)
+
+        calendar = self.calendar
+        tail = calendar[-1] if len(calendar) else None
+        new_times = np.empty(0, 'datetime64[s]')
+        for ticker in tickers:
+            times = pending(ticker).times
+            if tail is not None:
+                times = times[times > tail]
+            new_times = np.union1d(new_times, times)
+        _append_array(os.path.join(self.root, 'calendar.i8'), new_times.astype(np.int64), '<i8')
+        self.refresh()
+        calendar = self.calendar
+
+        appended = {}
+        for ticker in tickers:
+            series = pending(ticker)
+            rows = np.searchsorted(calendar, series.times)
+            if len(rows) and (rows[-1] >= len(calendar) or np.any(calendar[rows] != series.times)):
+                raise ValueError('{}: bars at times missing from the store calendar; ingest them before '
+                                 'later bars of other symbols, or into a new store'.format(ticker))
+            if ticker not in self._offsets:
+                if not len(rows):
+                    appended[ticker] = 0
+                    continue
+                # files left by an ingest that died before recording the symbol are dropped
+                self._truncate(ticker, 0)
+                self._offsets[ticker] = int(rows[0])
+                os.makedirs(self._directory(ticker), exist_ok=True)
+            offset, arrays = self._mapped(ticker)
+            self._columns.pop(ticker, None)
+            self._truncate(ticker, len(arrays[0]))
+            stored = offset + len(arrays[0])
+            size = int(rows[-1]) + 1 - stored if len(rows) else 0
+            for field, values in zip(FIELDS, series[1:]):
+                block = np.full(max(size, 0), np.nan)
+                block[rows - stored] = values
+                _append_array(self._field_path(ticker, field), block, '<f8')
+            appended[ticker] = len(rows)
+        self._write_meta()
+        return appended
+
+    def _truncate(self, ticker, length):
+        '''Cuts the field files back to a common length after an interrupted append'''
+        for field in FIELDS:
+            path = self._field_path(ticker, field)
+            if os.path.exists(path) and os.path.getsize(path) > length * 8:
+                os.truncate(path, length * 8)
+
+    def _write_meta(self):
+        handle, temporary = tempfile.mkstemp(suffix='.json', dir=self.root)
+        with os.fdopen(handle, 'w') as output:
+            json.dump({'resolution': self.resolution.name, 'symbols': self._offsets}, output, indent=1,
+                      sort_keys=True)
+        os.replace(temporary, self._meta_path)
+
+    def summary(self):
+        calendar = self.calendar
+        span = '' if not len(calendar) else ' from {} to {}'.format(calendar[0], calendar[-1])
+        return '{} {} bars for {} symbols{}'.format(len(calendar), self.resolution.name.lower(), len(self._offsets),
+                                                     span)
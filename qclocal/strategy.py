@@ -0,0 +1,66 @@
+'''Parameterised form of the MACD / equal weight strategy the algorithm files implement.
+
+22.py, 25.py, Final26.py and MACD Manual.py differ only in their symbols and dates;
+MacdStrategy runs the same pipeline from a MacdStrategyParameters value so sweeps and
+batch runs can vary any of it without editing code.'''
+
+from collections import namedtuple
+from datetime import datetime
+
+from .algorithm import QCAlgorithm
+from .enums import MovingAverageType, Resolution
+from .framework.alpha import MacdAlphaModel
+from .framework.execution import ImmediateExecutionModel
+from .framework.portfolio import EqualWeightingPortfolioConstructionModel
+from .framework.risk import MaximumUnrealizedProfitPercentPerSecurity
+from .framework.selection import ManualUniverseSelectionModel
+from .symbol import Symbol
+
+MacdStrategyParameters = namedtuple('MacdStrategyParameters', (
+    'symbols', 'start', 'end', 'cash', 'fast', 'slow', 'signal', 'moving_average_type', 'resolution',
+    'risk_threshold'), defaults=(100000, 12, 26, 9, MovingAverageType.Simple, Resolution.Daily, 0.03))
+MacdStrategyParameters.__doc__ = '''Universe (tickers), window, cash and model parameters of one strategy run'''
+
+
+def parameters_from_algorithm(algorithm_class):
+    '''Reads the universe, dates, cash and model parameters an algorithm file sets in Initialize'''
+    algorithm = algorithm_class()
+    algorithm.Initialize()
+    symbols = list(algorithm.requested_symbols)
+    if algorithm.UniverseSelection is not None:
+        symbols += [s for s in algorithm.UniverseSelection.candidate_symbols(algorithm) if s not in symbols]
+    parameters = MacdStrategyParameters(tuple(s.Value for s in symbols), algorithm.StartDate, algorithm.EndDate,
+                                        algorithm.Portfolio.Cash)
+    alpha = algorithm.Alpha
+    if isinstance(alpha, MacdAlphaModel):
+        parameters = parameters._replace(fast=alpha.fastPeriod, slow=alpha.slowPeriod, signal=alpha.signalPeriod,
+                                         moving_average_type=alpha.movingAverageType, resolution=alpha.resolution)
+    risk = algorithm.RiskManagement
+    if isinstance(risk, MaximumUnrealizedProfitPercentPerSecurity):
+        parameters = parameters._replace(risk_threshold=risk.maximumUnrealizedProfitPercent)
+    return parameters
+
+
+def warm_up_bars(parameters):
+    '''Bars of history the alpha needs before the start date'''
+    return parameters.slow + parameters.signal - 1
+
+
+class MacdStrategy(QCAlgorithm):
+    '''MacdAlphaModel + EqualWeightingPortfolioConstructionModel + ImmediateExecutionModel +
+    MaximumUnrealizedProfitPercentPerSecurity over a manual universe'''
+
+    def __init__(self, parameters):
+        super().__init__()
+        self.parameters = parameters
+
+    def Initialize(self):
+        p = self.parameters
+        self.SetStartDate(p.start if isinstance(p.start, datetime) else datetime.fromisoformat(str(p.start)))
+        self.SetEndDate(p.end if isinstance(p.end, datetime) else datetime.fromisoformat(str(p.end)))
+        self.SetCash(p.cash)
+        self.AddAlpha(MacdAlphaModel(p.fast, p.slow, p.signal, p.moving_average_type, p.resolution))
+        self.SetExecution(ImmediateExecutionModel())
+        self.SetPortfolioConstruction(EqualWeightingPortfolioConstructionModel())
+        self.SetRiskManagement(MaximumUnrealizedProfitPercentPerSecurity(p.risk_threshold))
+        self.SetUniverseSelection(ManualUniverseSelectionModel([Symbol.Create(t) for t in p.symbols]))
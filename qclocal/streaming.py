@@ -0,0 +1,203 @@
+'''Out-of-core backtests: the price frame streamed in chunks of rows.
+
+Minute bars of thousands of symbols over years do not fit in memory as one frame.
+StreamingBacktestEngine runs the same steps as BacktestEngine, but over a generator of
+consecutive BarFrames of at most `chunk_rows` rows (DataSource.frame_chunks; a BarStore
+copies each chunk from its memory-mapped files). Only the frame is chunked. The algorithm,
+its indicators and models, the portfolio, the insights, orders and statistics live
+through the whole run and never see a chunk boundary:
+
+    - close_filled continues from the last row of the previous chunk, so holdings of
+      symbols without a bar keep their last price;
+    - the columns are the same in every chunk and the chunks share one symbols list;
+    - working bars of the consolidators still open at the end of a chunk are carried
+      over as partial bars (ConsolidationRouter.close_frame) and completed in the next;
+    - BatchedMacdAlphaModel(history=True) precomputes its signal chunk by chunk.
+
+A ChunkReader reads the next chunk in a background thread while the current one runs.
+numpy releases the GIL while it copies bars out of the mapped files, so the reads overlap
+the steps. The read of the chunk after the next only starts once the engine has let go
+of the previous chunk, so at most two chunks are in memory: about rows x symbols x 58
+bytes each. The equity store and order ledger keep a row per step or fill for the whole
+run, as in memory.
+
+Every step reads the values it would read from the whole frame, so results match
+BacktestEngine to the bit whatever the chunk size. Models that need the whole frame at
+once cannot stream: RankedUniverseSelectionModel has to be given its rankings, and
+run() raises ValueError before the first step if it is not.
+
+Checkpoints of a streamed run hold the bounds of the current chunk and the close_filled
+row before it. On resume that chunk is read again, checked against its digest, and
+the stream continues after it.'''
+
+import time as _time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+
+from .checkpoint import frame_digest
+from .data import FIELDS, BarFrame, to_datetime64
+from .engine import BacktestEngine
+from .framework.selection import RankedUniverseSelectionModel
+
+_ONE_SECOND = np.timedelta64(1, 's')
+
+
+class ChunkReader:
+    '''Takes chunks from an iterator of frames, reading the next one ahead in a thread
+
+    Args:
+        chunks: Iterator of BarFrame
+        read_ahead: Read in a background thread; False reads each chunk when it is taken'''
+
+    def __init__(self, chunks, read_ahead=True):
+        self._chunks = chunks
+        self._pool = ThreadPoolExecutor(1, 'qclocal-chunks') if read_ahead else None
+        self._pending = None
+        self.wait = 0.0
+
+    def read_ahead(self):
+        '''Starts reading the next chunk'''
+        if self._pool is not None and self._pending is None:
+            self._pending = self._pool.submit(next, self._chunks, None)
+
+    def take(self):
+        '''The next chunk, None after the last; the time spent waiting for it adds to wait'''
+        started = _time.perf_counter()
+        if self._pending is None:
+            chunk = next(self._chunks, None)
+        else:
+            chunk, self._pending = self._pending.result(), None
+        self.wait += _time.perf_counter() - started
+        return chunk
+
+    def close(self):
+        if self._pool is not None:
+            if self._pending is not None:
+                self._pending.cancel()
+            self._pool.shutdown(wait=True)
+            self._pool = self._pending = None
+        self._chunks.close()
+
+
+def _empty_frame(symbols):
+    return BarFrame(np.empty(0, 'datetime64[s]'), symbols, *(np.empty((0, len(symbols))) for _ in FIELDS))
+
+
+class StreamingBacktestEngine(BacktestEngine):
+    '''BacktestEngine reading its price frame in chunks (see the module docstring)
+
+    Args:
+        data_source: The DataSource the bars are read from
+        chunk_rows: Rows of a chunk; a BarStore reads this many calendar rows at a time
+        read_ahead: Read the next chunk while the current one runs
+        fee_model, slippage_model, volume_model, profiler, record_positions: As for
+            BacktestEngine'''
+
+    def __init__(self, data_source, chunk_rows=65536, read_ahead=True, fee_model=None, slippage_model=None,
+                 volume_model=None, profiler=None, record_positions=False):
+        super().__init__(data_source, fee_model, slippage_model, volume_model, profiler, record_positions)
+        if chunk_rows < 1:
+            raise ValueError('chunks need at least one row, got {}'.format(chunk_rows))
+        self.chunk_rows = chunk_rows
+        self.read_ahead = read_ahead
+        self.chunks = 0
+        self._reader = None
+        self._carry = None
+
+    def run(self, algorithm, checkpoints=None):
+        started = _time.perf_counter()
+        symbols = self._initialize(algorithm)
+        algorithm = self.algorithm
+        selection = algorithm.UniverseSelection
+        if isinstance(selection, RankedUniverseSelectionModel) and selection.rankings is None:
+            raise ValueError('a streamed backtest has no whole frame to rank dollar volume from: precompute '
+                             'UniverseRankings (UniverseRankings.dollar_volume over daily bars, or from_csv) '
+                             'and give them to RankedUniverseSelectionModel')
+        start = to_datetime64(algorithm.StartDate)
+        end = to_datetime64(algorithm.EndDate) + np.timedelta64(86399, 's')
+        self.window = symbols, start, end
+        self._open(start)
+        frame = self._reader.take()
+        self._attach(_empty_frame(symbols) if frame is None else frame)
+        self.chunks = int(frame is not None)
+        self._reader.read_ahead()
+        self._track(self.chunk_rows)
+        self.checkpoints = checkpoints
+        return self._run(0, started)
+
+    def _open(self, start, carry=None):
+        symbols, _, end = self.window
+        self._reader = ChunkReader(self.source.frame_chunks(symbols, start, end, self.chunk_rows, carry),
+                                   self.read_ahead)
+
+    def _run(self, first, started=None):
+        try:
+            return super()._run(first, started)
+        finally:
+            self._reader.close()
+
+    def _run_frame(self, first):
+        while True:
+            super()._run_frame(first)
+            frame = self._reader.take()
+            if frame is None:
+                return
+            self._next_chunk(frame)
+            self._reader.read_ahead()
+            first = 0
+
+    def _next_chunk(self, frame):
+        '''Moves the engine from the rows of the current chunk to those of frame'''
+        self._router.close_frame()
+        previous = self.frame
+        self._carry = previous.close_filled[-1].copy()
+        # one symbols list for the whole run, as portfolio and insights key on it
+        frame.symbols = previous.symbols
+        self.frame = frame
+        self._bar_times = frame.times.astype(datetime)
+        self._end_times = (frame.times + self._span).astype(datetime)
+        self._frame_digest = None
+        self.chunks += 1
+
+    @property
+    def io_wait(self):
+        '''Seconds the steps waited for a chunk to be read'''
+        return 0.0 if self._reader is None else self._reader.wait
+
+    # checkpoints: the bounds of the current chunk and the price it continues from
+
+    def _checkpoint_refs(self):
+        refs = super()._checkpoint_refs()
+        refs['reader'] = self._reader
+        return refs
+
+    def _checkpoint_frame(self):
+        state = super()._checkpoint_frame()
+        frame = self.frame
+        state.update(rows=self.chunk_rows, carry=self._carry, chunk=(frame.times[0], frame.times[-1])
+                     if len(frame.times) else None)
+        return state
+
+    @staticmethod
+    def _restore_frame(state, data_source):
+        symbols = state['symbols']
+        if state['chunk'] is None:
+            frame = _empty_frame(symbols)
+        else:
+            first, last = state['chunk']
+            chunks = data_source.frame_chunks(symbols, first, last, state['rows'], state['carry'])
+            frame = next(chunks, None)
+            chunks.close()
+            frame = _empty_frame(symbols) if frame is None else frame
+        if frame_digest(frame) != state['digest']:
+            raise ValueError('the bars of the data source differ from those the checkpoint was written with')
+        return frame
+
+    def _resumed(self):
+        super()._resumed()
+        frame = self.frame
+        start = frame.times[-1] + _ONE_SECOND if len(frame.times) else self.window[2] + _ONE_SECOND
+        self._open(start, frame.close_filled[-1] if len(frame.times) else None)
+        self._reader.read_ahead()
@@ -0,0 +1,138 @@
+'''Parallel parameter sweeps of MacdStrategy.
+
+The prices for the union of all runs are loaded once and written as .npy matrices;
+every worker process memory-maps those files, so the operating system keeps a single
+copy in the page cache no matter how many workers or combinations there are.'''
+
+import bisect
+import contextlib
+import itertools
+import math
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import timedelta
+
+import numpy as np
+
+from .data import BarFrame, FrameDataSource, to_datetime64
+from .engine import BacktestEngine, format_statistic
+from .enums import MovingAverageType, resolution_to_timedelta
+from .strategy import MacdStrategy, warm_up_bars
+from .symbol import Symbol
+
+SWEEP_FIELDS = ('fast', 'slow', 'signal', 'moving_average_type', 'risk_threshold')
+
+
+def parameter_grid(base, **values):
+    '''Every combination of the given field values applied to the base parameters.
+    Fields not given keep their base value; combinations with fast >= slow are skipped.'''
+    unknown = set(values) - set(SWEEP_FIELDS)
+    if unknown:
+        raise ValueError('cannot sweep {}'.format(', '.join(sorted(unknown))))
+    fields = [field for field in SWEEP_FIELDS if values.get(field)]
+    for combination in itertools.product(*(values[field] for field in fields)):
+        parameters = base._replace(**dict(zip(fields, combination)))
+        if parameters.fast < parameters.slow:
+            yield parameters
+
+
+def lookback(parameters):
+    '''Calendar time to load before the start date so the warm up finds enough bars'''
+    bars = warm_up_bars(parameters)
+    span = resolution_to_timedelta(parameters.resolution)
+    return span * math.ceil(bars * 1.5) + timedelta(days=14)
+
+
+def share_frame(source, runs, directory):
+    '''Loads the prices every run needs (symbols, warm up and window) once and saves them
+    to directory for memory-mapping. Returns the directory.'''
+    symbols = []
+    for parameters in runs:
+        symbols += [ticker for ticker in parameters.symbols if ticker not in symbols]
+    start = min(to_datetime64(p.start) - np.timedelta64(lookback(p)) for p in runs)
+    end = max(to_datetime64(p.end) for p in runs) + np.timedelta64(1, 'D')
+    source.load_frame([Symbol.Create(ticker) for ticker in symbols], start, end).save(directory)
+    return directory
+
+
+_shared = {}
+
+
+def _open_shared(directory, resolution):
+    _shared['source'] = FrameDataSource(BarFrame.open(directory), resolution)
+
+
+def _run(parameters):
+    result = BacktestEngine(_shared['source']).run(MacdStrategy(parameters))
+    return parameters, result.statistics
+
+
+class RankedTable:
+    '''Results kept sorted by one statistic as they arrive'''
+
+    def __init__(self, rank_by='Sharpe Ratio', descending=True):
+        self.rank_by = rank_by
+        self.descending = descending
+        self._keys = []
+        self.rows = []
+
+    def add(self, parameters, statistics):
+        '''Inserts a result, returns its 1-based rank'''
+        value = statistics[self.rank_by]
+        key = -value if self.descending else value
+        position = bisect.bisect_right(self._keys, key)
+        self._keys.insert(position, key)
+        self.rows.insert(position, (parameters, statistics))
+        return position + 1
+
+    def __len__(self):
+        return len(self.rows)
+
+    def format(self, top=None, statistics=('Sharpe Ratio', 'Net Profit', 'Drawdown', 'Total Orders', 'Turnover')):
+        header = ['rank', 'fast', 'slow', 'signal', 'ma', 'risk'] + list(statistics)
+        lines = [header]
+        for rank, (p, stats) in enumerate(self.rows[:top], 1):
+            lines.append([str(rank), str(p.fast), str(p.slow), str(p.signal), MovingAverageType(p.moving_average_type).name,
+                          '{:g}'.format(p.risk_threshold)] + [format_statistic(name, stats[name]) for name in statistics])
+        widths = [max(len(line[i]) for line in lines) for i in range(len(header))]
+        return '\n'.join('  '.join(cell.rjust(width) for cell, width in zip(line, widths)) for line in lines)
+
+
+def describe(parameters):
+    return 'MACD({},{},{},{}) risk={:g}'.format(parameters.fast, parameters.slow, parameters.signal,
+                                                MovingAverageType(parameters.moving_average_type).name,
+                                                parameters.risk_threshold)
+
+
+def run_sweep(runs, source, workers=None, rank_by='Sharpe Ratio', on_result=None):
+    '''Backtests every parameter set across a process pool and returns a RankedTable.
+
+    on_result(table, parameters, statistics, rank) is called in the parent process as
+    each run finishes.'''
+    runs = list(runs)
+    table = RankedTable(rank_by)
+    if not runs:
+        return table
+    with shared_pool(source, runs, workers) as pool:
+        futures = [pool.submit(_run, parameters) for parameters in runs]
+        for future in as_completed(futures):
+            parameters, statistics = future.result()
+            rank = table.add(parameters, statistics)
+            if on_result is not None:
+                on_result(table, parameters, statistics, rank)
+    return table
+
+
+@contextlib.contextmanager
+def shared_pool(source, runs, workers=None):
+    '''Process pool whose workers backtest MacdStrategy runs (submit _run) over one
+    memory-mapped copy of the prices all runs need'''
+    directory = tempfile.mkdtemp(prefix='qclocal-sweep-')
+    try:
+        share_frame(source, runs, directory)
+        with ProcessPoolExecutor(workers, initializer=_open_shared,
+                                 initargs=(directory, source.resolution)) as pool:
+            yield pool
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
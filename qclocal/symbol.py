@@ -0,0 +1,51 @@
+'''Minimal Symbol implementation compatible with Symbol.Create(...) calls.'''
+
+from .enums import Market, SecurityType
+
+
+class Symbol:
+    '''Identifies a security by ticker, security type and market.
+
+    Instances are interned so the same ticker always maps to the same object,
+    which keeps dictionary lookups keyed by Symbol cheap.'''
+
+    __slots__ = ('Value', 'SecurityType', 'ID', '_hash', '__weakref__')
+
+    _cache = {}
+
+    def __init__(self, ticker, security_type=SecurityType.Equity, market=Market.USA):
+        self.Value = ticker.upper()
+        self.SecurityType = SecurityType(security_type)
+        self.ID = '{} {} {}'.format(self.Value, self.SecurityType.name, market)
+        self._hash = hash(self.ID)
+
+    @staticmethod
+    def Create(ticker, securityType=SecurityType.Equity, market=Market.USA, alias=None):
+        '''Creates (or returns the already interned) symbol for the ticker'''
+        key = (ticker.upper(), int(securityType), market)
+        symbol = Symbol._cache.get(key)
+        if symbol is None:
+            symbol = Symbol(ticker, securityType, market)
+            Symbol._cache[key] = symbol
+        return symbol
+
+    def __reduce__(self):
+        market = self.ID.rsplit(' ', 1)[1]
+        return (Symbol.Create, (self.Value, int(self.SecurityType), market))
+
+    def __eq__(self, other):
+        if isinstance(other, Symbol):
+            return self.ID == other.ID
+        return NotImplemented
+
+    def __hash__(self):
+        return self._hash
+
+    def __lt__(self, other):
+        return self.Value < other.Value
+
+    def __str__(self):
+        return self.Value
+
+    def __repr__(self):
+        return 'Symbol({})'.format(self.Value)
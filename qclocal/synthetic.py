@@ -0,0 +1,72 @@
+'''Deterministic synthetic OHLCV bars for running algorithms without downloaded data.'''
+
+import zlib
+from datetime import datetime
+
+import numpy as np
+
+from .data import BarSeries, DataSource, slice_series
+from .enums import Resolution, resolution_to_timedelta
+
+MINUTES_PER_SESSION = 390
+
+
+def trading_calendar(start, end, resolution=Resolution.Daily):
+    '''Weekday bar times between start and end; intraday bars cover 09:30-16:00 stamped at their open.'''
+    days = np.arange(np.datetime64(start, 'D'), np.datetime64(end, 'D') + 1)
+    days = days[np.is_busday(days)]
+    if resolution >= Resolution.Daily:
+        return days.astype('datetime64[s]')
+    step = int(resolution_to_timedelta(resolution).total_seconds())
+    offsets = np.arange(9 * 3600 + 30 * 60, 16 * 3600, step).astype('timedelta64[s]')
+    return (days.astype('datetime64[s]')[:, None] + offsets[None, :]).ravel()
+
+
+def generate_paths(times, count, seed=0, annual_drift=0.06, annual_volatility=0.3, bars_per_year=252):
+    '''Generates (time x count) OHLCV matrices following a geometric random walk'''
+    rng = np.random.default_rng(seed)
+    shape = (len(times), count)
+    sigma = annual_volatility / np.sqrt(bars_per_year)
+    mu = annual_drift / bars_per_year - 0.5 * sigma * sigma
+    start = rng.uniform(20.0, 400.0, size=count)
+    close = start * np.exp(np.cumsum(rng.normal(mu, sigma, size=shape), axis=0))
+    previous = np.vstack([start[None, :], close[:-1]])
+    open_ = previous * np.exp(rng.normal(0.0, sigma / 4, size=shape))
+    wick = np.abs(rng.normal(0.0, sigma / 2, size=(2,) + shape))
+    high = np.maximum(open_, close) * (1 + wick[0])
+    low = np.minimum(open_, close) * (1 - wick[1])
+    volume = np.floor(rng.lognormal(13.0, 0.5, size=shape))
+    return open_, high, low, close, volume
+
+
+class SyntheticDataSource(DataSource):
+    '''Data source that invents bars for any ticker.
+
+    Each ticker gets its own random walk seeded from the ticker name, so repeated runs
+    and different universes containing the same ticker see the same prices.'''
+
+    def __init__(self, start=datetime(2015, 1, 1), end=datetime(2021, 12, 31), resolution=Resolution.Daily, seed=0):
+        self.resolution = Resolution(resolution)
+        self.seed = seed
+        self.times = trading_calendar(start, end, self.resolution)
+        self._bars_per_year = 252
+        if self.resolution < Resolution.Daily:
+            step = resolution_to_timedelta(self.resolution).total_seconds()
+            self._bars_per_year *= int(MINUTES_PER_SESSION * 60 // step)
+        self._series = {}
+
+    def _generate(self, ticker):
+        series = self._series.get(ticker)
+        if series is None:
+            seed = (self.seed, zlib.crc32(str(ticker).upper().encode()))
+            paths = generate_paths(self.times, 1, seed, bars_per_year=self._bars_per_year)
+            series = BarSeries(self.times, *(path[:, 0] for path in paths))
+            self._series[ticker] = series
+        return series
+
+    def read(self, symbol, start=None, end=None):
+        return slice_series(self._generate(str(symbol).upper()), start, end)
+
+    def cache_identity(self):
+        return 'synthetic:{}:{}:{}:{}'.format(self.seed, self.times[0] if len(self.times) else '',
+                                              self.times[-1] if len(self.times) else '', self.resolution.name)
@@ -0,0 +1,62 @@
+'''Order count and turnover of the banded equal weight model against the equal weight one.
+
+compare_bands backtests an algorithm file as written, then once per band with its
+EqualWeightingPortfolioConstructionModel replaced by a
+BandedEqualWeightingPortfolioConstructionModel with the same rebalance and bias. It reports
+what each band saves in orders, fees and turnover, and what it does to the returns.'''
+
+from .engine import BacktestEngine, format_statistic
+from .framework.portfolio import BandedEqualWeightingPortfolioConstructionModel, EqualWeightingPortfolioConstructionModel
+
+
+def with_band(algorithm_class, band):
+    '''Instance of the algorithm whose equal weight model is swapped for the banded one
+    once Initialize has set it'''
+    algorithm = algorithm_class()
+    initialize = algorithm.Initialize
+
+    def Initialize():
+        initialize()
+        model = algorithm.PortfolioConstruction
+        if type(model) is not EqualWeightingPortfolioConstructionModel:
+            raise TypeError('{} does not use EqualWeightingPortfolioConstructionModel'.format(algorithm_class.__name__))
+        banded = BandedEqualWeightingPortfolioConstructionModel(portfolioBias=model.portfolioBias, band=band)
+        banded._rebalancing_func = model._rebalancing_func
+        algorithm.SetPortfolioConstruction(banded)
+
+    algorithm.Initialize = Initialize
+    return algorithm
+
+
+def compare_bands(algorithm_class, source, bands):
+    '''Returns [(label, BacktestResult)]: the algorithm as written, then one run per band'''
+    rows = [('equal weight', BacktestEngine(source).run(algorithm_class))]
+    for band in bands:
+        rows.append(('band {:g}'.format(band), BacktestEngine(source).run(with_band(algorithm_class, band))))
+    return rows
+
+
+def format_savings(rows):
+    baseline = rows[0][1]
+    base_orders = baseline.statistics['Total Orders']
+    base_fees = baseline.statistics['Total Fees']
+    base_turnover = baseline.statistics['Turnover']
+
+    def saved(value, base):
+        return '-' if not base else '{:.1%}'.format(1 - value / base)
+
+    lines = [[''] + [label for label, _ in rows]]
+    for name in ('Total Orders', 'Total Fees', 'Turnover', 'Net Profit', 'Sharpe Ratio', 'Drawdown'):
+        lines.append([name] + [format_statistic(name, result.statistics[name]) for _, result in rows])
+    lines.append(['orders saved'] + [saved(r.statistics['Total Orders'], base_orders) for _, r in rows])
+    lines.append(['fees saved'] + [saved(r.statistics['Total Fees'], base_fees) for _, r in rows])
+    lines.append(['turnover saved'] + [saved(r.statistics['Turnover'], base_turnover) for _, r in rows])
+    lines.append(['targets in band'] + ['-' if not isinstance(r.algorithm.PortfolioConstruction,
+                                                               BandedEqualWeightingPortfolioConstructionModel)
+                                        else str(r.algorithm.PortfolioConstruction.targets_in_band)
+                                        for _, r in rows])
+    lines.append(['runtime'] + ['{:.3f}s'.format(result.runtime) for _, result in rows])
+    widths = [max(len(line[i]) for line in lines) for i in range(len(lines[0]))]
+    return '\n'.join('  '.join(cell.ljust(width) if i == 0 else cell.rjust(width)
+                               for i, (cell, width) in enumerate(zip(line, widths)))
+                     for line in lines)
@@ -0,0 +1,39 @@
+'''Short synthetic backtests the tests run two ways and compare'''
+
+from qclocal import BacktestEngine, SyntheticDataSource
+from qclocal.imports import *
+
+TICKERS = ['T{:02d}'.format(i) for i in range(12)]
+
+
+class MacdStrategy(QCAlgorithm):
+    '''25.py on a year of synthetic prices; alpha() gives the alpha model'''
+
+    def alpha(self):
+        return MacdAlphaModel(12, 26, 9, MovingAverageType.Simple, Resolution.Daily)
+
+    def Initialize(self):
+        self.SetStartDate(2019, 1, 1)
+        self.SetEndDate(2019, 12, 31)
+        self.SetCash(100000)
+        self.AddAlpha(self.alpha())
+        self.SetExecution(ImmediateExecutionModel())
+        self.SetPortfolioConstruction(EqualWeightingPortfolioConstructionModel())
+        self.SetRiskManagement(MaximumUnrealizedProfitPercentPerSecurity(0.03))
+        self.SetUniverseSelection(ManualUniverseSelectionModel([Symbol.Create(ticker) for ticker in TICKERS]))
+
+
+def with_alpha(alpha):
+    '''MacdStrategy with the alpha model alpha() returns'''
+    return type('Strategy', (MacdStrategy,), {'alpha': lambda self: alpha()})
+
+
+def run(algorithm, source=None, engine=BacktestEngine, **options):
+    return engine(source or SyntheticDataSource(), **options).run(algorithm)
+
+
+def same_run(first, second):
+    '''Whether two BacktestResults have the same equity curve, orders and statistics'''
+    assert first.statistics['Total Orders'] > 0
+    return (first.equity.tobytes() == second.equity.tobytes() and first.times.tobytes() == second.times.tobytes()
+            and repr(first.statistics) == repr(second.statistics))
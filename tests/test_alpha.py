@@ -0,0 +1,41 @@
+'''BatchedMacdAlphaModel against MacdAlphaModel'''
+
+import pytest
+
+from qclocal.imports import *
+
+from backtests import run, same_run, with_alpha
+
+BATCHED_TYPES = [MovingAverageType.Simple, MovingAverageType.Exponential, MovingAverageType.Wilders]
+
+
+@pytest.mark.parametrize('kind', BATCHED_TYPES)
+@pytest.mark.parametrize('history', [False, True])
+def test_batched_macd_trades_like_the_scalar_model(kind, history):
+    scalar = run(with_alpha(lambda: MacdAlphaModel(12, 26, 9, kind, Resolution.Daily)))
+    batched = run(with_alpha(lambda: BatchedMacdAlphaModel(12, 26, 9, kind, Resolution.Daily, history=history)))
+    assert same_run(scalar, batched)
+
+
+@pytest.mark.parametrize('kind', [MovingAverageType.LinearWeightedMovingAverage, MovingAverageType.DoubleExponential,
+                                  MovingAverageType.Hull, MovingAverageType.Kama])
+def test_batched_macd_refuses_unbatched_averages(kind):
+    with pytest.raises(ValueError):
+        BatchedMacdAlphaModel(12, 26, 9, kind)
+
+
+def test_batched_macd_refuses_other_resolutions():
+    with pytest.raises(ValueError):
+        run(with_alpha(lambda: BatchedMacdAlphaModel(12, 26, 9, MovingAverageType.Simple, Resolution.Hour)))
+
+
+def test_macd_only_ensemble_trades_like_the_batched_model():
+    batched = run(with_alpha(lambda: BatchedMacdAlphaModel(12, 26, 9, MovingAverageType.Simple, Resolution.Daily)))
+    ensemble = run(with_alpha(lambda: EnsembleAlphaModel([MacdSignal(12, 26, 9, MovingAverageType.Simple)],
+                                                         resolution=Resolution.Daily)))
+    assert same_run(batched, ensemble)
+
+
+def test_ensemble_signals_refuse_unbatched_averages():
+    with pytest.raises(ValueError):
+        RsiSignal(14, MovingAverageType.Hull)
@@ -0,0 +1,35 @@
+'''Batch variants against running each algorithm file on its own'''
+
+import json
+import os
+
+from qclocal import BacktestEngine, SyntheticDataSource, load_algorithm
+from qclocal.batch import format_comparison, load_variants, run_batch
+from qclocal.strategy import MacdStrategy
+
+from backtests import run, same_run
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FILES = ('22.py', '25.py', 'Final26.py', 'MACD Manual.py')
+
+
+def test_batch_variants_match_separate_runs_of_their_files(tmp_path):
+    path = str(tmp_path / 'variants.json')
+    declarations = [{'name': name, 'algorithm': os.path.join(ROOT, name)} for name in FILES]
+    declarations.append({'name': '25 loose risk', 'algorithm': os.path.join(ROOT, '25.py'), 'risk_threshold': 0.05})
+    with open(path, 'w') as handle:
+        json.dump({'defaults': {'risk_threshold': 0.2}, 'variants': declarations}, handle)
+    variants = load_variants(path)
+    results = run_batch(variants, SyntheticDataSource(), workers=2)
+    assert [name for name, _, _ in results] == list(FILES) + ['25 loose risk']
+
+    for name, parameters, statistics in results:
+        strategy = run(MacdStrategy(parameters))
+        assert repr(statistics) == repr(strategy.statistics), name
+        if name in FILES:
+            # the parameters read from the file rebuild the file's own backtest
+            assert parameters.risk_threshold == 0.03
+            assert same_run(run(load_algorithm(os.path.join(ROOT, name))), strategy), name
+    loose = dict((name, statistics) for name, _, statistics in results)
+    assert repr(loose['25 loose risk']) != repr(loose['25.py'])
+    assert '25 loose risk' in format_comparison(results)
@@ -0,0 +1,49 @@
+'''A backtest resumed from a checkpoint against the same backtest run straight through'''
+
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PRELUDE = '''
+import hashlib
+from qclocal import BacktestEngine, SyntheticDataSource, load_algorithm
+from qclocal.checkpoint import CheckpointSchedule, resume_backtest
+source = SyntheticDataSource()
+algorithm = load_algorithm({algorithm!r})
+
+
+def show(result):
+    print(hashlib.sha1(result.equity.tobytes()).hexdigest(), result.statistics['Total Orders'],
+          result.statistics['Sharpe Ratio'])
+'''
+
+STRAIGHT = 'show(BacktestEngine(source).run(algorithm))'
+
+# stops the run at the first due step after a checkpoint was written, as a crash would
+CRASH = '''
+class Crash(CheckpointSchedule):
+    def due(self, time):
+        if self.written:
+            raise SystemExit(0)
+        return super().due(time)
+BacktestEngine(source).run(algorithm, Crash({path!r}, {every}))
+'''
+
+RESUME = 'show(resume_backtest({path!r}, source))'
+
+
+def _python(code, seed, **values):
+    environment = dict(os.environ, PYTHONHASHSEED=str(seed), PYTHONPATH=ROOT)
+    return subprocess.run([sys.executable, '-c', (PRELUDE + code).format(**values)], env=environment, cwd=ROOT,
+                          capture_output=True, text=True, check=True).stdout
+
+
+def test_resume_in_another_process_matches_the_straight_run(tmp_path):
+    values = {'algorithm': os.path.join(ROOT, '25.py'), 'path': str(tmp_path / 'run.ckpt'), 'every': 300}
+    straight = _python(STRAIGHT, 1, **values)
+    _python(CRASH, 2, **values)
+    assert os.path.exists(values['path'])
+    # a different hash seed in every process
+    assert _python(RESUME, 3, **values) == straight
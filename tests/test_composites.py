@@ -0,0 +1,45 @@
+'''Composite indicators that feed their parts directly against the parts fed by hand'''
+
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from qclocal.benchmarks.indicators import synthetic_bars
+from qclocal.imports import *
+from qclocal.indicators.ichimoku import IchimokuKinkoHyoValues
+
+START = datetime(2019, 1, 2)
+
+
+def test_simple_macd_parts_match_moving_averages_fed_by_hand():
+    high, low, close, volume = synthetic_bars(300, seed=4)
+    macd = MovingAverageConvergenceDivergence(12, 26, 9, MovingAverageType.Simple)
+    fast, slow, signal = SimpleMovingAverage(12), SimpleMovingAverage(26), SimpleMovingAverage(9)
+    fast_updates = []
+    macd.Fast.Updated.append(lambda indicator, point: fast_updates.append(point.Value))
+    for i, value in enumerate(close.tolist()):
+        time = START + timedelta(days=i)
+        ready = macd.Update(time, value)
+        fast_ready, slow_ready = fast.Update(time, value), slow.Update(time, value)
+        expected = fast.Current.Value - slow.Current.Value
+        if fast_ready and slow_ready:
+            signal.Update(time, expected)
+        assert macd.Current.Value == expected
+        assert (macd.Fast.Current.Value, macd.Slow.Current.Value) == (fast.Current.Value, slow.Current.Value)
+        assert (macd.Signal.Current.Value, macd.Signal.Samples) == (signal.Current.Value, signal.Samples)
+        assert ready == signal.IsReady
+        if signal.IsReady:
+            assert macd.Histogram.Current.Value == expected - signal.Current.Value
+            assert macd.Histogram.Current.Time == time
+    assert fast_updates[-1] == fast.Current.Value and len(fast_updates) == 300
+
+
+def test_ichimoku_matches_compute():
+    high, low, close, volume = synthetic_bars(400, seed=5)
+    ichimoku = IchimokuKinkoHyo(9, 26, 26, 52, 26, 26)
+    streamed = []
+    for i, bar in enumerate(zip(close.tolist(), high.tolist(), low.tolist(), close.tolist(), volume.tolist())):
+        ready = ichimoku.update_bar(START + timedelta(days=i), *bar)
+        assert ready == (i + 1 >= 52 + 26)
+        streamed.append([getattr(ichimoku, part).Current.Value for part in IchimokuKinkoHyoValues._fields])
+    assert np.array_equal(np.array(streamed).T, IchimokuKinkoHyo.compute(high, low, close, 9, 26, 26, 52, 26, 26))
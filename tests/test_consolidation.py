@@ -0,0 +1,49 @@
+'''Consolidators aggregated by the ConsolidationRouter against consolidators pushed every bar'''
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from qclocal import BacktestEngine, SyntheticDataSource
+from qclocal.imports import *
+
+MINUTES = SyntheticDataSource(resolution=Resolution.Minute, start=datetime(2019, 1, 1), end=datetime(2019, 1, 18))
+
+
+class PushedConsolidator(TradeBarConsolidator):
+    '''The router only aggregates TradeBarConsolidator itself, so this one is updated bar by bar'''
+
+
+def _bars(consolidator_type, period):
+    '''Consolidated bars and working bars an algorithm sees with consolidators of the type'''
+    log = []
+
+    class Algorithm(QCAlgorithm):
+        def Initialize(self):
+            self.SetStartDate(2019, 1, 7)
+            self.SetEndDate(2019, 1, 18)
+            self.consolidators = []
+            for ticker in ('A', 'B', 'C'):
+                symbol = self.AddEquity(ticker, Resolution.Minute).Symbol
+                consolidator = consolidator_type(period)
+                consolidator.DataConsolidated.append(lambda sender, bar: log.append(
+                    (str(bar.Symbol), bar.Time, bar.EndTime, bar.Open, bar.High, bar.Low, bar.Close, bar.Volume)))
+                self.SubscriptionManager.AddConsolidator(symbol, consolidator)
+                self.consolidators.append(consolidator)
+
+        def OnData(self, data):
+            for consolidator in self.consolidators:
+                bar = consolidator.WorkingBar
+                if bar is not None:
+                    log.append((bar.Time, bar.Open, bar.High, bar.Low, bar.Close, bar.Volume))
+
+    BacktestEngine(MINUTES).run(Algorithm)
+    return log
+
+
+@pytest.mark.parametrize('period', [timedelta(minutes=7), timedelta(minutes=30), timedelta(hours=1),
+                                    timedelta(days=1)])
+def test_router_matches_consolidators_updated_bar_by_bar(period):
+    routed = _bars(TradeBarConsolidator, period)
+    assert any(len(entry) == 8 for entry in routed)
+    assert routed == _bars(PushedConsolidator, period)
@@ -0,0 +1,35 @@
+'''ImmediateExecutionModel's batched fills against market orders filled one at a time'''
+
+from qclocal.framework.execution import PortfolioTargetCollection
+from qclocal.imports import *
+
+from backtests import MacdStrategy, run, same_run
+
+
+class OneOrderAtATime(ExecutionModel):
+    '''LEAN's ImmediateExecutionModel: one MarketOrder per target'''
+
+    def __init__(self):
+        self.targetsCollection = PortfolioTargetCollection()
+
+    def Execute(self, algorithm, targets):
+        self.targetsCollection.AddRange(targets)
+        for target in self.targetsCollection.OrderByMarginImpact(algorithm):
+            security = algorithm.Securities[target.Symbol]
+            quantity = target.Quantity - security.Holdings.Quantity
+            if quantity != 0:
+                algorithm.MarketOrder(security.Symbol, quantity)
+        self.targetsCollection.ClearFulfilled(algorithm)
+
+
+class OrderByOrder(MacdStrategy):
+    def Initialize(self):
+        super().Initialize()
+        self.SetExecution(OneOrderAtATime())
+
+
+def test_batched_fills_match_orders_filled_one_at_a_time():
+    batched, single = run(MacdStrategy), run(OrderByOrder)
+    assert same_run(batched, single)
+    for field in ('time', 'column', 'quantity', 'fill_quantity', 'fill_price', 'fee'):
+        assert getattr(batched.orders, field).tobytes() == getattr(single.orders, field).tobytes()
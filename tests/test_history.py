@@ -0,0 +1,42 @@
+'''HistoryCache: warm-up through the cache, and its disk size limit'''
+
+import os
+
+from qclocal import SyntheticDataSource
+from qclocal import history
+from qclocal.history import HistoryCache
+
+from backtests import MacdStrategy, TICKERS, run, same_run
+
+
+def _disk_bytes(root):
+    return sum(os.path.getsize(os.path.join(directory, name))
+               for directory, _, names in os.walk(root) for name in names if name.endswith('.npz'))
+
+
+def test_cached_warm_up_matches_the_source(tmp_path):
+    direct = run(MacdStrategy)
+    assert same_run(direct, run(MacdStrategy, HistoryCache(SyntheticDataSource(), str(tmp_path))))
+    # the second run is served from disk
+    warm = HistoryCache(SyntheticDataSource(), str(tmp_path))
+    assert same_run(direct, run(MacdStrategy, warm))
+    assert warm.disk_hits == len(TICKERS)
+
+
+def test_saves_scan_the_directory_only_when_over_the_limit(tmp_path, monkeypatch):
+    scans = []
+    cached_files = history._cached_files
+    monkeypatch.setattr(history, '_cached_files', lambda root: scans.append(root) or cached_files(root))
+    cache = HistoryCache(SyntheticDataSource(), str(tmp_path))
+    for ticker in TICKERS:
+        cache.read(ticker)
+    assert len(scans) == 1
+    assert cache._disk_bytes == _disk_bytes(str(tmp_path))
+
+    limit = _disk_bytes(str(tmp_path)) // 2
+    small = HistoryCache(SyntheticDataSource(seed=1), str(tmp_path), max_bytes=limit)
+    for ticker in TICKERS:
+        small.read(ticker)
+        assert _disk_bytes(str(tmp_path)) <= limit
+    assert small._disk_bytes == _disk_bytes(str(tmp_path))
+    assert len(scans) < 1 + len(TICKERS)
@@ -0,0 +1,76 @@
+'''Indicators warmed up by the helpers against the same indicators fed by hand'''
+
+import numpy as np
+import pytest
+
+from qclocal import BacktestEngine, SyntheticDataSource
+from qclocal.imports import *
+
+SPY = Symbol.Create('SPY')
+
+
+def _warmed(create):
+    '''Runs an algorithm whose Initialize creates a warmed-up indicator; returns the
+    indicator and the history it was warmed from'''
+    seen = {}
+
+    class Algorithm(QCAlgorithm):
+        def Initialize(self):
+            self.SetStartDate(2019, 1, 2)
+            self.SetEndDate(2019, 1, 10)
+            self.AddEquity('SPY', Resolution.Daily)
+            self.EnableAutomaticIndicatorWarmUp = True
+            seen['indicator'] = indicator = create(self)
+            seen['history'] = self.History(SPY, indicator.WarmUpPeriod, Resolution.Daily)
+            seen['value'] = indicator.Current.Value
+
+    BacktestEngine(SyntheticDataSource()).run(Algorithm)
+    return seen
+
+
+def _fed(indicator, times, values):
+    for time, value in zip(times.astype(object), values):
+        indicator.Update(time, value)
+    return indicator.Current.Value
+
+
+def test_selector_warm_up_feeds_the_selected_field():
+    seen = _warmed(lambda algorithm: algorithm.SMA(SPY, 10, Resolution.Daily, lambda bar: bar.High))
+    history = seen['history']
+    assert seen['value'] == _fed(SimpleMovingAverage('highs', 10), history.times, history.high)
+    assert seen['value'] != _fed(SimpleMovingAverage('closes', 10), history.times, history.close)
+
+
+def test_selector_warm_up_matches_hand_fed_indicator():
+    seen = _warmed(lambda algorithm: algorithm.EMA(SPY, 5, Resolution.Daily, lambda bar: (bar.High + bar.Low) / 2))
+    history = seen['history']
+    assert seen['value'] == _fed(ExponentialMovingAverage('expected', 5), history.times,
+                                 (history.high + history.low) / 2)
+    assert np.isfinite(seen['value'])
+
+
+def _high(bar):
+    return bar.High
+
+
+# the helpers QCcodes.py uses that take a selector
+HELPERS = [
+    (lambda a: a.BB(SPY, 10, 2, MovingAverageType.Simple, Resolution.Daily, _high),
+     lambda: BollingerBands(10, 2, MovingAverageType.Simple)),
+    (lambda a: a.DEMA(SPY, 6, Resolution.Daily, _high), lambda: DoubleExponentialMovingAverage(6)),
+    (lambda a: a.EMA(SPY, 6, Resolution.Daily, _high), lambda: ExponentialMovingAverage(6)),
+    (lambda a: a.HMA(SPY, 9, Resolution.Daily, _high), lambda: HullMovingAverage(9)),
+    (lambda a: a.KAMA(SPY, 10, 2, 30, Resolution.Daily, _high), lambda: KaufmanAdaptiveMovingAverage(10, 2, 30)),
+    (lambda a: a.MACD(SPY, 12, 26, 9, MovingAverageType.Simple, Resolution.Daily, _high),
+     lambda: MovingAverageConvergenceDivergence(12, 26, 9, MovingAverageType.Simple)),
+    (lambda a: a.RSI(SPY, 14, MovingAverageType.Wilders, Resolution.Daily, _high), lambda: RelativeStrengthIndex(14)),
+    (lambda a: a.SMA(SPY, 10, Resolution.Daily, _high), lambda: SimpleMovingAverage(10)),
+]
+
+
+@pytest.mark.parametrize('helper, fresh', HELPERS)
+def test_helpers_warm_up_through_their_selector(helper, fresh):
+    seen = _warmed(helper)
+    history = seen['history']
+    assert seen['indicator'].IsReady
+    assert seen['value'] == _fed(fresh(), history.times, history.high)
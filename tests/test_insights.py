@@ -0,0 +1,61 @@
+'''Insights emitted as InsightBatch arrays against the same insights as Insight objects,
+and the next expiry of an InsightCollection'''
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from qclocal.imports import *
+
+from backtests import MacdStrategy, run, same_run
+
+
+class AsObjects(AlphaModel):
+    '''Hands on the insights of a batched model as a list of Insight objects'''
+
+    def __init__(self, model):
+        self.model = model
+        self.Name = model.Name
+
+    def Update(self, algorithm, data):
+        return list(self.model.Update(algorithm, data))
+
+    def OnSecuritiesChanged(self, algorithm, changes):
+        self.model.OnSecuritiesChanged(algorithm, changes)
+
+
+def _strategy(objects, banded):
+    class Strategy(MacdStrategy):
+        def alpha(self):
+            model = BatchedMacdAlphaModel(12, 26, 9, MovingAverageType.Simple, Resolution.Daily)
+            return AsObjects(model) if objects else model
+
+        def Initialize(self):
+            super().Initialize()
+            if banded:
+                self.SetPortfolioConstruction(BandedEqualWeightingPortfolioConstructionModel(band=0.01))
+    return Strategy
+
+
+@pytest.mark.parametrize('banded', [False, True])
+def test_insight_batches_trade_like_insight_objects(banded):
+    batches = run(_strategy(False, banded))
+    objects = run(_strategy(True, banded))
+    assert same_run(batches, objects)
+    assert len(batches.algorithm.Insights) == len(objects.algorithm.Insights)
+
+
+def test_removing_symbols_moves_the_next_expiry_on():
+    start = datetime(2019, 1, 2)
+    insights = InsightCollection()
+    for ticker, days in (('AAA', 1), ('BBB', 3), ('CCC', 5)):
+        insight = Insight.Price(Symbol.Create(ticker), timedelta(days=days), InsightDirection.Up)
+        insight.SetPeriodAndCloseTime(start)
+        insights.Add(insight)
+    assert insights.GetNextExpiryTime() == start + timedelta(days=1)
+    assert len(insights.RemoveInsights(Symbol.Create('AAA'))) == 1
+    assert insights.GetNextExpiryTime() == start + timedelta(days=3)
+    insights.Clear([Symbol.Create('BBB')])
+    assert insights.GetNextExpiryTime() == start + timedelta(days=5)
+    insights.Clear([Symbol.Create('CCC')])
+    assert insights.GetNextExpiryTime() is None and len(insights) == 0
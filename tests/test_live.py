@@ -0,0 +1,40 @@
+'''Unpaced live replays against the backtest, and the latency histograms'''
+
+import math
+
+import pytest
+
+from qclocal import SyntheticDataSource
+from qclocal.histogram import Histogram
+from qclocal.live import run_live
+
+from backtests import MacdStrategy, run, same_run
+
+
+@pytest.mark.parametrize('socket', [False, True])
+def test_unpaced_replay_reproduces_the_backtest(socket):
+    session = run_live(MacdStrategy, SyntheticDataSource(), socket=socket)
+    assert same_run(run(MacdStrategy), session.result)
+    assert session.received == session.latency.count == len(session.result.times)
+
+
+def test_exact_histogram_percentiles():
+    histogram = Histogram()
+    for value in range(100, 0, -1):
+        histogram.record(value)
+    assert (histogram.percentile(50), histogram.percentile(99), histogram.percentile(100)) == (50, 99, 100)
+    assert histogram.percentile(0) == 1 and histogram.mean == 50.5 and histogram.maximum == 100
+    assert Histogram().percentile(50) is None
+
+
+def test_log_histogram_percentiles_are_within_precision():
+    histogram = Histogram(0.02)
+    values = [0.0] * 10 + [1e-4 * 1.01 ** i for i in range(990)]
+    for value in values:
+        histogram.record(value)
+    ordered = sorted(values)
+    for q in (1, 5, 50, 90, 99, 100):
+        exact = ordered[math.ceil(q / 100 * len(values)) - 1]
+        assert histogram.percentile(q) == pytest.approx(exact, rel=0.02, abs=0 if exact else 1e-12)
+        assert histogram.percentile(q) <= histogram.maximum
+    assert histogram.count == 1000 and histogram.mean == pytest.approx(sum(values) / 1000)
@@ -0,0 +1,46 @@
+'''StageProfiler totals against the run's wall time, and its JSON and collapsed outputs'''
+
+import json
+
+import pytest
+
+from qclocal.profiling import StageProfiler
+
+from backtests import MacdStrategy, run
+
+
+def test_stage_totals_add_up_to_the_run(tmp_path):
+    profiler = StageProfiler()
+    result = run(MacdStrategy, profiler=profiler)
+    stages = profiler.stages
+    assert stages['step'].calls == len(result.times)
+    assert profiler.runtime <= result.runtime
+
+    # outside the steps the engine only loops, so they hold nearly all the profiled time
+    roots = [path for path in stages if ';' not in path]
+    assert roots == ['step']
+    assert 0.8 * profiler.runtime <= stages['step'].total <= profiler.runtime
+    # the self times of a stage and everything inside it add up to its total
+    for path, stage in stages.items():
+        inside = [other for other in stages if other.startswith(path + ';')]
+        children = [other for other in inside if other.count(';') == path.count(';') + 1]
+        assert stage.self_time == pytest.approx(stage.total - sum(stages[child].total for child in children), abs=1e-9)
+        assert stage.total == pytest.approx(stage.self_time + sum(stages[other].self_time for other in inside),
+                                            abs=1e-9)
+        assert stage.durations.count == stage.calls
+
+    path = str(tmp_path / 'profile.json')
+    profiler.write_json(path)
+    with open(path) as handle:
+        written = json.load(handle)
+    assert written['runtime_seconds'] == profiler.runtime and written['allocations'] is False
+    assert written['stages'] == profiler.report()
+    assert written['stages']['step']['p50_seconds'] <= written['stages']['step']['max_seconds']
+
+    path = str(tmp_path / 'profile.folded')
+    profiler.write_collapsed(path)
+    with open(path) as handle:
+        lines = handle.read().splitlines()
+    collapsed = {stack: int(microseconds) for stack, microseconds in (line.rsplit(' ', 1) for line in lines)}
+    assert collapsed.keys() == stages.keys()
+    assert sum(collapsed.values()) == pytest.approx(stages['step'].total * 1e6, abs=len(lines))
@@ -0,0 +1,64 @@
+'''IndexedRiskManagementModel against a scan of every position each step'''
+
+import numpy as np
+import pytest
+
+from qclocal.imports import *
+
+from backtests import MacdStrategy, run, same_run
+
+
+class FullScan(RiskManagementModel):
+    '''Applies the rules' exact conditions to every held position that has a new price,
+    a fill, or met a rule on the previous step, tracking highs and lows since opening'''
+
+    def __init__(self, *rules):
+        self.rules = rules
+        self.side = None
+
+    def ManageRisk(self, algorithm, targets):
+        portfolio = algorithm.Portfolio
+        quantity, average, prices = portfolio.quantity, portfolio.average_price, portfolio.prices
+        if self.side is None:
+            self.side = np.zeros(len(quantity))
+            self.high, self.low = np.full(len(quantity), np.nan), np.full(len(quantity), np.nan)
+            self.quantity, self.average = quantity.copy(), average.copy()
+            self.armed = np.zeros(len(quantity), bool)
+        side = np.sign(quantity)
+        filled = (quantity != self.quantity) | (average != self.average)
+        opened = side != self.side
+        self.high = np.where(opened, average, self.high)
+        self.low = np.where(opened, average, self.low)
+        self.side, self.quantity, self.average = side, quantity.copy(), average.copy()
+
+        data = algorithm.CurrentSlice
+        check = ((side != 0) & data.frame.has_bar[data.row]) | filled | self.armed
+        self.high = np.where(check, np.fmax(self.high, prices), self.high)
+        self.low = np.where(check, np.fmin(self.low, prices), self.low)
+        hit = np.zeros(len(quantity), bool)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for rule in self.rules:
+                hit |= rule.exact(side, quantity, average, prices, self.high, self.low)
+        self.armed = hit & check & (quantity != 0)
+        return [PortfolioTarget(portfolio.symbols[column], 0) for column in np.flatnonzero(self.armed)]
+
+
+RULES = [
+    lambda: [TakeProfitRule(0.03)],
+    lambda: [StopLossRule(0.02)],
+    lambda: [TrailingStopRule(0.02)],
+    lambda: [TakeProfitRule(0.05), StopLossRule(0.03), TrailingStopRule(0.02)],
+]
+
+
+@pytest.mark.parametrize('rules', RULES)
+def test_indexed_triggers_match_a_full_scan(rules):
+    def strategy(model):
+        class Strategy(MacdStrategy):
+            def Initialize(self):
+                super().Initialize()
+                self.SetRiskManagement(model(*rules()))
+        return Strategy
+
+    indexed, scanned = run(strategy(IndexedRiskManagementModel)), run(strategy(FullScan))
+    assert same_run(indexed, scanned)
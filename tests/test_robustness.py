@@ -0,0 +1,47 @@
+'''Robustness replicas: independent of the worker count, paired and reducible to the backtest'''
+
+from datetime import datetime
+
+import numpy as np
+
+from qclocal import BacktestEngine, SyntheticDataSource
+from qclocal.robustness import METRICS, RobustnessSettings, run_robustness
+from qclocal.strategy import MacdStrategy, MacdStrategyParameters
+
+from backtests import TICKERS
+
+BASE = MacdStrategyParameters(tuple(TICKERS), datetime(2019, 3, 1), datetime(2019, 12, 31))
+FAST = BASE._replace(fast=8, slow=21)
+SETTINGS = RobustnessSettings(replicas=4, block=10, keep=0.75, start_jitter=10, seed=7)
+
+
+def test_results_do_not_depend_on_the_workers():
+    one = run_robustness([BASE, FAST], SyntheticDataSource(), SETTINGS, workers=1)
+    two = run_robustness([BASE, FAST], SyntheticDataSource(), SETTINGS, workers=2)
+    assert repr(one.observed) == repr(two.observed)
+    for metric in METRICS:
+        assert not np.isnan(one.values[metric]).any(), metric
+        assert np.array_equal(one.values[metric], two.values[metric]), metric
+    # the replicas differ from each other and the variants from each other
+    assert len(set(one.values['Sharpe Ratio'][:, 0].tolist())) == SETTINGS.replicas
+    assert one.difference('Sharpe Ratio', 1) != (0.0, 0.0, 0.0)
+    assert one.format(['base', 'fast']).count('vs base') == len(METRICS)
+
+
+def test_common_random_numbers_pair_a_strategy_with_itself():
+    result = run_robustness([BASE, BASE], SyntheticDataSource(), SETTINGS, workers=2)
+    for metric in METRICS:
+        assert np.array_equal(result.values[metric][:, 0], result.values[metric][:, 1]), metric
+        assert result.difference(metric, 1) == (0.0, 0.0, 0.0)
+
+
+def test_replicas_without_perturbation_are_the_plain_backtest():
+    settings = SETTINGS._replace(bootstrap=False, keep=1, start_jitter=0)
+    result = run_robustness([BASE, FAST], SyntheticDataSource(), settings, workers=2)
+    for variant, parameters in enumerate([BASE, FAST]):
+        statistics = BacktestEngine(SyntheticDataSource()).run(MacdStrategy(parameters)).statistics
+        assert statistics['Total Orders'] > 0
+        for metric in METRICS:
+            assert result.observed[variant][metric] == statistics[metric], metric
+            assert (result.values[metric][:, variant] == statistics[metric]).all(), metric
+        assert result.interval('Net Profit', variant) == (statistics['Net Profit'],) * 2
@@ -0,0 +1,50 @@
+'''The scaling benchmark's compare on hand-written result files'''
+
+import json
+
+from qclocal.benchmarks.scaling import main
+
+
+def _case(case, bars_per_second=1e6, peak_rss_mb=500.0, warmup_seconds=1.0):
+    return {'case': case, 'bars': 1000000, 'bars_per_second': bars_per_second, 'peak_rss_mb': peak_rss_mb,
+            'warmup_seconds': warmup_seconds, 'run_seconds': 2.0}
+
+
+BASELINE = [_case('slower'), _case('a bit slower'), _case('bigger'), _case('longer warm-up'),
+            _case('short warm-up', warmup_seconds=0.01), _case('faster'), _case('skipped now'), _case('dropped')]
+CANDIDATE = [_case('slower', bars_per_second=0.8e6), _case('a bit slower', bars_per_second=0.95e6),
+             _case('bigger', peak_rss_mb=650.0), _case('longer warm-up', warmup_seconds=1.2),
+             # 50% longer, but a warm-up of milliseconds is noise
+             _case('short warm-up', warmup_seconds=0.015),
+             _case('faster', bars_per_second=2e6, peak_rss_mb=400.0, warmup_seconds=0.5),
+             {'case': 'skipped now', 'skipped': 'about 2e+10 bars, over --max-bars'}, _case('new')]
+
+
+def _compare(tmp_path, capsys, *options):
+    paths = []
+    for name, results in (('baseline', BASELINE), ('candidate', CANDIDATE)):
+        paths.append(str(tmp_path / (name + '.json')))
+        with open(paths[-1], 'w') as handle:
+            json.dump({'results': results}, handle)
+    status = main(['compare'] + paths + list(options))
+    return status, capsys.readouterr().out.splitlines()
+
+
+def test_compare_flags_regressions_past_the_threshold(tmp_path, capsys):
+    status, lines = _compare(tmp_path, capsys)
+    assert status == 1
+    assert [line for line in lines if line.startswith('regression:')] == [
+        'regression: slower bars_per_second 1e+06 -> 8e+05',
+        'regression: bigger peak_rss_mb 500 -> 650',
+        'regression: longer warm-up warmup_seconds 1 -> 1.2',
+    ]
+    # only the cases both files ran are listed
+    compared = [line.split('  ')[0].strip() for line in lines[1:] if not line.startswith('regression')]
+    assert compared == ['slower', 'a bit slower', 'bigger', 'longer warm-up', 'short warm-up', 'faster']
+
+
+def test_compare_passes_within_the_threshold(tmp_path, capsys):
+    status, lines = _compare(tmp_path, capsys, '--threshold', '0.5')
+    assert status == 0
+    assert lines[-1] == 'no regressions beyond 50%'
+    assert not any('!' in line for line in lines)
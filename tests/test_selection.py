@@ -0,0 +1,100 @@
+'''RankedUniverseSelectionModel: what survives, is warmed up and is reset on a change'''
+
+from datetime import datetime
+
+import numpy as np
+
+from qclocal import SyntheticDataSource
+from qclocal.indicators.batch import BatchMovingAverageConvergenceDivergence
+from qclocal.imports import *
+
+from backtests import MacdStrategy, run
+
+T00, T01, T02, T03 = (Symbol.Create('T0{}'.format(i)) for i in range(4))
+# T00 leaves for T03 in April and comes back in July
+RANKINGS = UniverseRankings([datetime(2019, 1, 1), datetime(2019, 4, 1), datetime(2019, 7, 1)], [T00, T01, T02, T03],
+                            [[3, 2, 1, np.nan], [np.nan, 3, 2, 1], [3, 2, 1, np.nan]])
+
+
+class LoggedSource(SyntheticDataSource):
+    '''Logs the ticker of every history request'''
+
+    def __init__(self):
+        super().__init__()
+        self.requests = []
+
+    def history(self, symbol, end, bar_count, resolution=None):
+        self.requests.append(str(symbol))
+        return super().history(symbol, end, bar_count, resolution)
+
+
+def _ranked(alpha):
+    class Strategy(MacdStrategy):
+        def alpha(self):
+            return alpha()
+
+        def Initialize(self):
+            super().Initialize()
+            self.SetUniverseSelection(RankedUniverseSelectionModel(RANKINGS, count=3))
+            self.steps = 0
+            self.changes = []
+
+        def OnData(self, data):
+            self.steps += 1
+
+        def OnSecuritiesChanged(self, changes):
+            self.changes.append((self.steps, sorted(str(s.Symbol) for s in changes.AddedSecurities),
+                                 sorted(str(s.Symbol) for s in changes.RemovedSecurities), self.snapshot()))
+    return Strategy
+
+
+def test_survivors_keep_their_macd_and_only_new_symbols_warm_up():
+    source = LoggedSource()
+    Strategy = _ranked(lambda: MacdAlphaModel(12, 26, 9, MovingAverageType.Simple, Resolution.Daily))
+    # each MACD with its sample count at the change
+    Strategy.snapshot = lambda self: {str(symbol): (data.MACD, data.MACD.Samples)
+                                      for symbol, data in self.Alpha.symbolData.items()}
+    warm = MovingAverageConvergenceDivergence(12, 26, 9, MovingAverageType.Simple).WarmUpPeriod
+    result = run(Strategy, source)
+    changes = result.algorithm.changes
+    assert [(added, removed) for _, added, removed, _ in changes] == [
+        (['T00', 'T01', 'T02'], []), (['T03'], ['T00']), (['T00'], ['T03'])]
+    # one warm-up request per added symbol, none for the symbols that stay
+    assert source.requests == ['T00', 'T01', 'T02', 'T03', 'T00']
+
+    (first, _, _, january), (second, _, _, april), (third, _, _, july) = changes
+    for ticker in ('T01', 'T02'):
+        assert january[ticker][0] is april[ticker][0] is july[ticker][0]
+        # fed every bar in between, on top of the warm-up
+        assert (january[ticker][1], april[ticker][1], july[ticker][1]) == (warm, warm + second - first,
+                                                                           warm + third - first)
+    # removed symbols lose their MACD, which stops updating, and one that comes back is
+    # warmed up from scratch
+    assert 'T00' not in april and 'T03' not in july
+    assert january['T00'][0].Samples == warm + second - first
+    assert april['T03'][0].Samples == warm + third - second
+    assert july['T00'][0] is not january['T00'][0] and july['T00'][1] == warm
+    registered = {registration.indicator for registration in result.algorithm.IndicatorRegistry._registrations.values()}
+    assert january['T00'][0] not in registered and april['T03'][0] not in registered
+
+
+def test_batched_columns_of_removed_symbols_are_reset():
+    Strategy = _ranked(lambda: BatchedMacdAlphaModel(12, 26, 9, MovingAverageType.Simple, Resolution.Daily))
+
+    def snapshot(self):
+        model = self.Alpha
+        if model.macd is None:
+            return {}
+        return {str(symbol): model.macd.state(symbol_column) for symbol_column, symbol in enumerate(model.symbols)}
+    Strategy.snapshot = snapshot
+    result = run(Strategy, SyntheticDataSource())
+    model = result.algorithm.Alpha
+    fresh = BatchMovingAverageConvergenceDivergence(12, 26, 9, MovingAverageType.Simple, len(model.symbols))
+    changes = result.algorithm.changes
+    _, _, _, april = changes[1]
+    _, _, _, july = changes[2]
+    # T00 was reset in April and warmed again in July; T03 reset in July
+    assert np.array_equal(april['T00'], fresh.state(0))
+    assert np.array_equal(july['T03'], fresh.state(0))
+    assert not np.array_equal(april['T01'], fresh.state(0))
+    assert sorted(str(model.symbols[column]) for column in model.columns.tolist()) == ['T00', 'T01', 'T02']
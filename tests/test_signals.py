@@ -0,0 +1,64 @@
+'''BatchedMacdAlphaModel resumed from the signal cache against cold runs'''
+
+from datetime import datetime
+
+import numpy as np
+
+from qclocal import SyntheticDataSource
+from qclocal.data import FIELDS, BarFrame, FrameDataSource
+from qclocal.imports import *
+from qclocal.signals import SignalCache
+
+from backtests import TICKERS, MacdStrategy, run, same_run
+
+SYMBOLS = [Symbol.Create(ticker) for ticker in TICKERS]
+
+
+def _strategy(end, cache=None):
+    '''MacdStrategy ending at end, with a BatchedMacdAlphaModel precomputing its signal'''
+
+    class Strategy(MacdStrategy):
+        def alpha(self):
+            return BatchedMacdAlphaModel(12, 26, 9, MovingAverageType.Simple, Resolution.Daily, history=True,
+                                         cache=cache)
+
+        def Initialize(self):
+            super().Initialize()
+            self.SetEndDate(end)
+    return Strategy
+
+
+def _cached(directory, end, source=None):
+    '''(result, cache) of a run through a fresh SignalCache over directory'''
+    cache = SignalCache(str(directory))
+    return run(_strategy(end, cache), source), cache
+
+
+def test_extended_end_date_resumes_from_the_cache(tmp_path):
+    _cached(tmp_path, datetime(2019, 6, 30))
+    result, cache = _cached(tmp_path, datetime(2019, 12, 31))
+    assert same_run(run(_strategy(datetime(2019, 12, 31))), result)
+    assert cache.hits == len(SYMBOLS) and cache.misses == 0
+    assert cache.cached_bars > 0 and cache.computed_bars > 0
+
+
+def test_shortened_end_date_is_served_from_the_cache(tmp_path):
+    _cached(tmp_path, datetime(2019, 12, 31))
+    result, cache = _cached(tmp_path, datetime(2019, 6, 30))
+    assert same_run(run(_strategy(datetime(2019, 6, 30))), result)
+    assert cache.hits == len(SYMBOLS) and cache.misses == 0
+    assert cache.cached_bars > 0 and cache.computed_bars == 0
+
+
+def test_changed_close_invalidates_the_entry(tmp_path):
+    frame = SyntheticDataSource().load_frame(SYMBOLS)
+    fields = {field: getattr(frame, field).copy() for field in FIELDS}
+    fields['close'][frame.rows(datetime(2019, 3, 15))[0], 3] *= 1.5
+    changed = FrameDataSource(BarFrame(frame.times, SYMBOLS, *(fields[field] for field in FIELDS)))
+
+    _cached(tmp_path, datetime(2019, 12, 31), FrameDataSource(frame))
+    result, cache = _cached(tmp_path, datetime(2019, 12, 31), changed)
+    assert same_run(run(_strategy(datetime(2019, 12, 31)), changed), result)
+    assert cache.invalidated == 1 and cache.hits == len(SYMBOLS) - 1
+    # the change moves the results, so serving the stale entry would have shown
+    assert not same_run(run(_strategy(datetime(2019, 12, 31)), FrameDataSource(frame)), result)
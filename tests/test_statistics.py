@@ -0,0 +1,73 @@
+'''Running statistics against compute_statistics, and the downsampled equity store'''
+
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from qclocal.engine import compute_statistics
+from qclocal.orders import OrderLedger
+from qclocal.statistics import EquityStore, RunningStatistics
+
+from backtests import MacdStrategy, run
+
+EXACT = ('Start Equity', 'End Equity', 'Net Profit', 'Drawdown', 'Total Orders', 'Total Fees')
+
+
+def _assert_matches_the_batch_statistics(statistics, expected):
+    assert statistics.keys() == expected.keys()
+    for name in EXACT:
+        assert statistics[name] == expected[name], name
+    # Welford's update and numpy's pairwise sums round differently
+    for name in ('Sharpe Ratio', 'Turnover'):
+        assert statistics[name] == pytest.approx(expected[name], rel=1e-9, abs=1e-12), name
+
+
+def test_running_statistics_match_the_whole_equity_curve():
+    result = run(MacdStrategy)
+    assert result.statistics['Total Orders'] > 0 and result.statistics['Drawdown'] > 0
+    _assert_matches_the_batch_statistics(result.statistics,
+                                         compute_statistics(result.equity, result.orders, 100000))
+
+
+@pytest.mark.parametrize('values', [[0.0, 0.0, 0.0], [100.0, 0.0, 0.0, 50.0, 120.0], [0.0, 10.0, 5.0]])
+def test_steps_from_zero_equity_have_no_return(values):
+    starting, equity = values[0], np.array(values[1:])
+    statistics = RunningStatistics(starting)
+    for value in equity:
+        statistics.update(value)
+    _assert_matches_the_batch_statistics(statistics.as_dict(), compute_statistics(equity, OrderLedger(), starting))
+    assert all(np.isfinite(value) for value in statistics.as_dict().values())
+
+
+def _minute_store(days=3, bars=390):
+    '''Steps stamped with their end, one per minute of a 09:30-16:00 session'''
+    store = EquityStore(16)
+    for day in range(days):
+        open_time = datetime(2019, 1, 2 + day, 9, 30)
+        for minute in range(1, bars + 1):
+            store.append(np.datetime64(open_time + timedelta(minutes=minute)), 1000.0 * day + minute)
+    return store
+
+
+def test_equity_store_keeps_every_nth_step_and_the_last():
+    store = _minute_store()
+    assert store.rows == 3 * 390
+    assert np.array_equal(store.sample(every=390), [389, 779, 1169])
+    assert np.array_equal(store.sample(every=500), [499, 999, 1169])
+    assert np.array_equal(store.sample(), np.arange(store.rows))
+
+
+def test_equity_store_keeps_the_last_step_of_each_day(tmp_path):
+    store = _minute_store()
+    # the 16:00 step ends its day
+    assert np.array_equal(store.sample(period=timedelta(days=1)), [389, 779, 1169])
+    hourly = store.sample(period=timedelta(hours=1))
+    assert store.times[hourly[0]] == np.datetime64('2019-01-02T10:00')
+    assert len(hourly) == 3 * 7
+
+    path = str(tmp_path / 'equity.npz')
+    store.write(path, period=timedelta(days=1))
+    with np.load(path) as written:
+        assert np.array_equal(written['times'], store.times[[389, 779, 1169]])
+        assert np.array_equal(written['equity'], [390.0, 1390.0, 2390.0])
@@ -0,0 +1,103 @@
+'''BarStore ingested in steps against the sources it was ingested from'''
+
+import os
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from qclocal import BarSeries, BarStore, LocalDataSource, SyntheticDataSource
+from qclocal.data import FIELDS, BarFrame
+from qclocal.imports import *
+from qclocal.store import _append_array
+
+SOURCE = SyntheticDataSource(start=datetime(2019, 1, 1), end=datetime(2019, 12, 31))
+AAA, BBB, CCC = (Symbol.Create(ticker) for ticker in ('AAA', 'BBB', 'CCC'))
+
+
+def _assert_same_frame(frame, expected):
+    assert np.array_equal(frame.times, expected.times)
+    for field in FIELDS + ('close_filled',):
+        assert np.array_equal(getattr(frame, field), getattr(expected, field), equal_nan=True), field
+
+
+def _chunked(store, symbols, rows):
+    chunks = list(store.frame_chunks(symbols, rows=rows))
+    assert all(len(chunk.times) <= rows for chunk in chunks)
+    return BarFrame(np.concatenate([chunk.times for chunk in chunks]), symbols,
+                    *(np.concatenate([getattr(chunk, field) for chunk in chunks]) for field in FIELDS),
+                    close_filled=np.concatenate([chunk.close_filled for chunk in chunks]))
+
+
+def test_ingest_in_steps_matches_the_source(tmp_path):
+    root = str(tmp_path)
+    first = BarStore(root).ingest(SOURCE, ['AAA', 'BBB'], end=datetime(2019, 6, 30))
+    second = BarStore(root).ingest(SOURCE)
+    late = BarStore(root).ingest(SOURCE, ['CCC'], start=datetime(2019, 9, 1))
+    assert first['AAA'] + second['AAA'] == len(SOURCE.read(AAA).times)
+    assert late['CCC'] == len(SOURCE.read(CCC, datetime(2019, 9, 1)).times)
+    # nothing after the stored bars: a second pass appends nothing
+    assert set(BarStore(root).ingest(SOURCE).values()) == {0}
+
+    store = BarStore(root)
+    symbols = [AAA, BBB, CCC]
+    expected = BarFrame.from_series(symbols, [SOURCE.read(AAA), SOURCE.read(BBB),
+                                              SOURCE.read(CCC, datetime(2019, 9, 1))])
+    _assert_same_frame(store.load_frame(symbols), expected)
+    _assert_same_frame(_chunked(store, symbols, 37), expected)
+    window = datetime(2019, 5, 1), datetime(2019, 10, 31)
+    _assert_same_frame(store.load_frame(symbols, *window),
+                       BarFrame.from_series(symbols, [SOURCE.read(AAA, *window), SOURCE.read(BBB, *window),
+                                                      SOURCE.read(CCC, datetime(2019, 9, 1), window[1])]))
+
+
+def _write_csv(directory, ticker, series):
+    with open(os.path.join(directory, ticker + '.csv'), 'w') as handle:
+        handle.write('date,open,high,low,close,volume\n')
+        for row in zip(series.times, *series[1:]):
+            handle.write(','.join([str(row[0])] + [repr(float(value)) for value in row[1:]]) + '\n')
+
+
+def test_ingest_aligns_gapped_symbols_on_one_calendar(tmp_path):
+    data = str(tmp_path / 'csv')
+    os.makedirs(data)
+    full, gapped = SOURCE.read(AAA), SOURCE.read(BBB)
+    keep = np.ones(len(gapped.times), bool)
+    keep[10:20] = keep[100:103] = False
+    _write_csv(data, 'AAA', full)
+    _write_csv(data, 'BBB', BarSeries(*(column[keep] for column in gapped)))
+    source = LocalDataSource(data)
+
+    BarStore(str(tmp_path / 'together')).ingest(source, ['AAA', 'BBB'], end=datetime(2019, 8, 31))
+    store = BarStore(str(tmp_path / 'together'))
+    store.ingest(source)
+    store = BarStore(str(tmp_path / 'together'))
+    _assert_same_frame(store.load_frame([AAA, BBB]), source.load_frame([AAA, BBB]))
+    assert len(store.calendar) == len(full.times)
+
+    # bars at times the calendar of an earlier ingest skipped cannot be appended
+    alone = BarStore(str(tmp_path / 'alone'))
+    alone.ingest(source, ['BBB'])
+    with pytest.raises(ValueError, match='missing from the store calendar'):
+        alone.ingest(source, ['AAA'])
+
+
+def test_torn_append_is_cut_back_and_completed(tmp_path):
+    root = str(tmp_path)
+    store = BarStore(root)
+    store.ingest(SOURCE, ['AAA', 'BBB'], end=datetime(2019, 6, 30))
+    # an ingest that died after appending the calendar and part of AAA's fields
+    rest = SOURCE.read(AAA, datetime(2019, 7, 1)).times
+    _append_array(os.path.join(root, 'calendar.i8'), rest.astype(np.int64), '<i8')
+    for field in ('open', 'high'):
+        _append_array(store._field_path('AAA', field), np.full(10, 1e9), '<f8')
+
+    torn = BarStore(root)
+    _assert_same_frame(torn.load_frame([AAA, BBB]),
+                       SOURCE.load_frame([AAA, BBB], end=datetime(2019, 6, 30, 23, 59, 59)))
+    assert torn.last_time(AAA) == SOURCE.read(AAA, end=datetime(2019, 6, 30)).times[-1]
+
+    torn.ingest(SOURCE)
+    store = BarStore(root)
+    assert {os.path.getsize(store._field_path('AAA', field)) for field in FIELDS} == {8 * len(store.calendar)}
+    _assert_same_frame(store.load_frame([AAA, BBB]), SOURCE.load_frame([AAA, BBB]))
@@ -0,0 +1,107 @@
+'''StreamingBacktestEngine against the in-memory BacktestEngine'''
+
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from qclocal import BacktestEngine, BarStore, StreamingBacktestEngine, SyntheticDataSource
+from qclocal.checkpoint import CheckpointSchedule, resume_backtest
+from qclocal.data import FIELDS, BarFrame, FrameDataSource
+from qclocal.imports import *
+
+from backtests import same_run
+
+SYMBOLS = [Symbol.Create('M{:02d}'.format(i)) for i in range(6)]
+MINUTES = SyntheticDataSource(resolution=Resolution.Minute, start=datetime(2019, 1, 1), end=datetime(2019, 1, 25))
+
+
+class MinuteStrategy(QCAlgorithm):
+    '''Hourly MACD on minute bars, with a 30 minute consolidator whose bars are logged'''
+
+    def Initialize(self):
+        self.SetStartDate(2019, 1, 14)
+        self.SetEndDate(2019, 1, 25)
+        self.SetCash(100000)
+        self.log = []
+        alpha = MacdAlphaModel(12, 26, 9, MovingAverageType.Simple, Resolution.Hour)
+        alpha.bounceThresholdPercent = 0.001
+        self.AddAlpha(alpha)
+        self.SetExecution(ImmediateExecutionModel())
+        self.SetPortfolioConstruction(EqualWeightingPortfolioConstructionModel())
+        self.SetRiskManagement(MaximumUnrealizedProfitPercentPerSecurity(0.03))
+        self.SetUniverseSelection(ManualUniverseSelectionModel(SYMBOLS))
+        symbol = self.AddEquity('M01', Resolution.Minute).Symbol
+        self.sma = self.SMA(symbol, 3, Resolution.Daily)
+        consolidator = TradeBarConsolidator(timedelta(minutes=30))
+        consolidator.DataConsolidated.append(lambda sender, bar: self.log.append((bar.Time, bar.Close, bar.Volume)))
+        self.SubscriptionManager.AddConsolidator(symbol, consolidator)
+
+    def OnData(self, data):
+        self.log.append(self.sma.Current.Value)
+
+
+def _with_gaps():
+    '''The synthetic minute bars with missing bars, including long gaps at a chunk boundary'''
+    frame = MINUTES.load_frame(SYMBOLS)
+    holes = np.random.default_rng(7).random(frame.shape) < 0.2
+    holes[1000:1600, 2] = True
+    holes[-500:, 4] = True
+    matrices = [np.where(holes, np.nan, getattr(frame, field)) for field in FIELDS]
+    return FrameDataSource(BarFrame(frame.times, SYMBOLS, *matrices), Resolution.Minute)
+
+
+@pytest.fixture(scope='module')
+def sources(tmp_path_factory):
+    store = BarStore(str(tmp_path_factory.mktemp('store')), Resolution.Minute)
+    store.ingest(MINUTES, [symbol.Value for symbol in SYMBOLS])
+    return {'gaps': _with_gaps(), 'store': store}
+
+
+def _same(first, second):
+    return same_run(first, second) and first.algorithm.log == second.algorithm.log
+
+
+@pytest.mark.parametrize('source', ['gaps', 'store'])
+@pytest.mark.parametrize('rows, read_ahead', [(97, True), (1000, False), (10 ** 6, True)])
+def test_streamed_run_matches_the_in_memory_run(sources, source, rows, read_ahead):
+    source = sources[source]
+    streamed = StreamingBacktestEngine(source, rows, read_ahead)
+    assert _same(BacktestEngine(source).run(MinuteStrategy), streamed.run(MinuteStrategy))
+    assert streamed.chunks >= 1
+
+
+class _Crash(CheckpointSchedule):
+    def due(self, time):
+        if self.written:
+            raise SystemExit
+        return super().due(time)
+
+
+@pytest.mark.parametrize('source', ['gaps', 'store'])
+def test_streamed_run_resumes_from_a_checkpoint(sources, source, tmp_path):
+    source, path = sources[source], str(tmp_path / 'run.ckpt')
+    with pytest.raises(SystemExit):
+        StreamingBacktestEngine(source, 777).run(MinuteStrategy, _Crash(path, 1500))
+    assert _same(BacktestEngine(source).run(MinuteStrategy), resume_backtest(path, source))
+
+
+def _ranked(rankings):
+    class RankedStrategy(MinuteStrategy):
+        def Initialize(self):
+            super().Initialize()
+            self.SetUniverseSelection(RankedUniverseSelectionModel(rankings, count=3, candidates=SYMBOLS,
+                                                                   rebalance=timedelta(days=2)))
+    return RankedStrategy
+
+
+def test_streamed_run_refuses_to_rank_dollar_volume_itself(sources):
+    with pytest.raises(ValueError, match='precompute UniverseRankings'):
+        StreamingBacktestEngine(sources['store'], 1000).run(_ranked(None))
+
+
+def test_streamed_run_selects_from_precomputed_rankings(sources):
+    source = sources['store']
+    rankings = UniverseRankings.dollar_volume(source.load_frame(SYMBOLS), SYMBOLS, Resolution.Minute, 390)
+    algorithm = _ranked(rankings)
+    assert _same(BacktestEngine(source).run(algorithm), StreamingBacktestEngine(source, 1000).run(algorithm))
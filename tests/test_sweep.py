@@ -0,0 +1,30 @@
+'''The parallel MACD sweep over memory-mapped frames against one backtest per parameter set'''
+
+from datetime import datetime
+
+from qclocal import BacktestEngine, SyntheticDataSource
+from qclocal.strategy import MacdStrategy, MacdStrategyParameters
+from qclocal.sweep import parameter_grid, run_sweep
+
+from backtests import TICKERS
+
+BASE = MacdStrategyParameters(tuple(TICKERS), datetime(2019, 3, 1), datetime(2019, 12, 31))
+
+
+def test_sweep_matches_and_ranks_individual_backtests():
+    runs = list(parameter_grid(BASE, fast=[8, 12], slow=[12, 26], risk_threshold=[0.03, 0.1]))
+    # fast >= slow is skipped
+    assert len(runs) == 6 and all(parameters.fast < parameters.slow for parameters in runs)
+    arrived = []
+    table = run_sweep(runs, SyntheticDataSource(), workers=2,
+                      on_result=lambda table, parameters, statistics, rank: arrived.append(parameters))
+    assert sorted(arrived) == sorted(runs) and len(table) == len(runs)
+
+    expected = {parameters: BacktestEngine(SyntheticDataSource()).run(MacdStrategy(parameters)).statistics
+                for parameters in runs}
+    for parameters, statistics in table.rows:
+        assert statistics['Total Orders'] > 0
+        assert repr(statistics) == repr(expected[parameters]), parameters
+    assert [parameters for parameters, _ in table.rows] == sorted(
+        runs, key=lambda parameters: -expected[parameters]['Sharpe Ratio'])
+    assert table.format(top=3).count('\n') == 3